@@ -0,0 +1,46 @@
+"""add judge_jobs table for the judge worker queue
+
+本迁移作用：
+  新建 judge_jobs 表，作为持久化判题任务队列：check_sql 写入任务，判题 worker 以
+  SELECT ... FOR UPDATE SKIP LOCKED 领取，locked_until 为租约（可见性超时），worker 崩溃后任务可被重新领取。
+
+Revision ID: a4b5c6d7e8f9
+Revises: f3a4b5c6d7e8
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "a4b5c6d7e8f9"
+down_revision: Union[str, Sequence[str], None] = "f3a4b5c6d7e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "judge_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("locked_by", sa.String(length=64), nullable=True),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_judge_jobs_id"), "judge_jobs", ["id"], unique=False)
+    op.create_index(op.f("ix_judge_jobs_status"), "judge_jobs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_judge_jobs_status"), table_name="judge_jobs")
+    op.drop_index(op.f("ix_judge_jobs_id"), table_name="judge_jobs")
+    op.drop_table("judge_jobs")
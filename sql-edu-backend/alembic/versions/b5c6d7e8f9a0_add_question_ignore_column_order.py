@@ -0,0 +1,32 @@
+"""add question ignore_column_order for column-order-insensitive judging
+
+本迁移作用：
+  在 questions 表上新增 ignore_column_order：题目无别名要求时是否忽略列顺序，
+  开启后判题按列值签名配对学生列与标准答案列（SELECT name, id 与 SELECT id, name 等价）。
+
+Revision ID: b5c6d7e8f9a0
+Revises: a4b5c6d7e8f9
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "b5c6d7e8f9a0"
+down_revision: Union[str, Sequence[str], None] = "a4b5c6d7e8f9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "questions",
+        sa.Column("ignore_column_order", sa.Boolean(), nullable=False, server_default=sa.text("0")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("questions", "ignore_column_order")
@@ -0,0 +1,29 @@
+"""add question hidden_datasets for multi-dataset judging
+
+本迁移作用：
+  在 questions 表上新增 hidden_datasets 列（文本，JSON），存放除可见示例数据外的隐藏测试数据
+  （空表、NULL 密集、边界值、大数据量等），判题时并发校验，防止学生按示例数据硬编码结果。
+
+Revision ID: b8c9d0e1f2a3
+Revises: aa1b2c3d4e5f
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "b8c9d0e1f2a3"
+down_revision: Union[str, Sequence[str], None] = "aa1b2c3d4e5f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("questions", sa.Column("hidden_datasets", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("questions", "hidden_datasets")
@@ -0,0 +1,41 @@
+"""add efficiency grading fields
+
+本迁移作用：
+  1) 在 questions 表上新增 grade_efficiency：是否对正确提交评估查询效率。
+  2) 在 submissions 表上新增 rows_examined、full_scans、exec_time_ms、efficiency_score：
+     由后台任务根据 EXPLAIN 与实际执行耗时填充，efficiency_score 为相对标准答案的效率分（0～100）。
+
+Revision ID: c0d1e2f3a4b5
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "c0d1e2f3a4b5"
+down_revision: Union[str, Sequence[str], None] = "b8c9d0e1f2a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "questions",
+        sa.Column("grade_efficiency", sa.Boolean(), nullable=False, server_default=sa.text("0")),
+    )
+    op.add_column("submissions", sa.Column("rows_examined", sa.BigInteger(), nullable=True))
+    op.add_column("submissions", sa.Column("full_scans", sa.Integer(), nullable=True))
+    op.add_column("submissions", sa.Column("exec_time_ms", sa.Float(), nullable=True))
+    op.add_column("submissions", sa.Column("efficiency_score", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("submissions", "efficiency_score")
+    op.drop_column("submissions", "exec_time_ms")
+    op.drop_column("submissions", "full_scans")
+    op.drop_column("submissions", "rows_examined")
+    op.drop_column("questions", "grade_efficiency")
@@ -0,0 +1,51 @@
+"""add user_question_progress and user_stats tables
+
+本迁移作用：
+  新建 user_question_progress（每个学生每道题的失败次数、正确次数、首次做对时间、对话条数）与
+  user_stats（每个学生的总提交数、正确数），随提交与对话写入在同一事务中更新，
+  check_sql / chat 改为按主键读取，不再统计 submissions / chat_messages。
+  升级后需运行一次 python -m core.progress 从已有数据回填。
+
+Revision ID: c6d7e8f9a0b1
+Revises: b5c6d7e8f9a0
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "c6d7e8f9a0b1"
+down_revision: Union[str, Sequence[str], None] = "b5c6d7e8f9a0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_question_progress",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("question_id", sa.Integer(), nullable=False),
+        sa.Column("fail_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("correct_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("first_solved_at", sa.DateTime(), nullable=True),
+        sa.Column("chat_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["question_id"], ["questions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "question_id"),
+    )
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("correct", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_stats")
+    op.drop_table("user_question_progress")
@@ -0,0 +1,29 @@
+"""add question max_estimated_rows for pre-execution cost guard
+
+本迁移作用：
+  在 questions 表上新增 max_estimated_rows：学生 SQL 执行前 EXPLAIN 估算扫描行数的预算，
+  超出即拒绝执行（如误写的多表笛卡尔积）。为空时使用全局 JUDGE_COST_GUARD_ROW_BUDGET，<=0 表示不检查。
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "d1e2f3a4b5c6"
+down_revision: Union[str, Sequence[str], None] = "c0d1e2f3a4b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("questions", sa.Column("max_estimated_rows", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("questions", "max_estimated_rows")
@@ -0,0 +1,43 @@
+"""add question_stats table for materialized per-question statistics
+
+本迁移作用：
+  新建 question_stats：每道题的提交数、正确数、对话条数、难度评分条数与评分总和，
+  随提交 / 对话 / 评分写入在同一事务中累加，并由定期对账任务按明细重算；
+  display_difficulty 为对账时预先算好的展示难度。题目列表改为一次联表读取，不再对明细表 GROUP BY。
+  升级后需运行一次 python -m core.question_stats 从已有数据回填。
+
+Revision ID: d7e8f9a0b1c2
+Revises: c6d7e8f9a0b1
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "d7e8f9a0b1c2"
+down_revision: Union[str, Sequence[str], None] = "c6d7e8f9a0b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "question_stats",
+        sa.Column("question_id", sa.Integer(), nullable=False),
+        sa.Column("total_submissions", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("correct_submissions", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("chat_messages", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("feedback_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("feedback_rating_sum", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("display_difficulty", sa.Float(), nullable=True),
+        sa.Column("reconciled_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["question_id"], ["questions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("question_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("question_stats")
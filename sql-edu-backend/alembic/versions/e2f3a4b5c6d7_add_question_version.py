@@ -0,0 +1,32 @@
+"""add question version for result caching
+
+本迁移作用：
+  在 questions 表上新增 version（默认 1）：题面、标准答案或表数据每次修改时 +1，
+  「运行查询」预览等结果缓存以 (题目 ID, version, 规范化 SQL) 为键，题目修改后自然失效。
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "e2f3a4b5c6d7"
+down_revision: Union[str, Sequence[str], None] = "d1e2f3a4b5c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "questions",
+        sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("questions", "version")
@@ -0,0 +1,34 @@
+"""add judge error fields to submissions
+
+本迁移作用：
+  在 submissions 表上新增 error_message、is_safety_blocked：保存判题时的错误信息与是否被安全检查拦截，
+  考试提交延后生成 AI 提示时据此给出与即时判题相同的提示。
+
+Revision ID: e8f9a0b1c2d3
+Revises: d7e8f9a0b1c2
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "e8f9a0b1c2d3"
+down_revision: Union[str, Sequence[str], None] = "d7e8f9a0b1c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("submissions", sa.Column("error_message", sa.Text(), nullable=True))
+    op.add_column(
+        "submissions",
+        sa.Column("is_safety_blocked", sa.Boolean(), nullable=False, server_default=sa.text("0")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("submissions", "is_safety_blocked")
+    op.drop_column("submissions", "error_message")
@@ -0,0 +1,29 @@
+"""add question judge_dialect for pluggable judge backends
+
+本迁移作用：
+  在 questions 表上新增 judge_dialect（mysql / sqlite / postgresql / duckdb）：
+  指定该题在哪种数据库后端上建表与判题，为空时使用默认沙箱（SANDBOX_DB_URL）。
+
+Revision ID: f3a4b5c6d7e8
+Revises: e2f3a4b5c6d7
+Create Date: 2026-10-18
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "f3a4b5c6d7e8"
+down_revision: Union[str, Sequence[str], None] = "e2f3a4b5c6d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("questions", sa.Column("judge_dialect", sa.String(length=20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("questions", "judge_dialect")
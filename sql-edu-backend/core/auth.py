@@ -39,6 +39,8 @@ class TokenTypeEnum(Enum):
 class AuthHandler(metaclass=SingletonMeta):
     # HTTPBearer 是 FastAPI 自带的工具，它会让 Swagger 文档里出现那个“小锁”图标
     security = HTTPBearer()
+    # auto_error=False：没带 Authorization 头时不报错，交给接口自己决定（用于匿名也能访问的接口）
+    optional_security = HTTPBearer(auto_error=False)
     # 从配置文件读取加密的密钥 (绝密，不能泄露)
     secret = settings.JWT_SECRET_KEY
     
@@ -141,4 +143,15 @@ class AuthHandler(metaclass=SingletonMeta):
 
     def auth_refresh_dependency(self, auth: HTTPAuthorizationCredentials = Security(security)):
         # 同上，专门用于验证 Refresh Token 的接口
-        return self.decode_refresh_token(auth.credentials)
\ No newline at end of file
+        return self.decode_refresh_token(auth.credentials)
+
+    def auth_optional_dependency(self, auth: HTTPAuthorizationCredentials | None = Security(optional_security)):
+        # 可选登录：匿名也能访问的接口用它来“认出”已登录的用户
+        # 1. 没带 token，或 token 无效/过期 -> 返回 None，按匿名处理，不报错
+        # 2. token 有效 -> 返回 user_id
+        if auth is None:
+            return None
+        try:
+            return self.decode_access_token(auth.credentials)
+        except HTTPException:
+            return None
\ No newline at end of file
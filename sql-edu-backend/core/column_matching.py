@@ -0,0 +1,83 @@
+"""列顺序无关的结果对比：按列值签名配对学生列与标准答案列。
+
+题目无别名要求时只按列值比较，列顺序仍须一致（SELECT name, id 与 SELECT id, name 判为不同）。
+开启题目的 ignore_column_order 后：
+- 对每一列计算多重集签名（列内各值哈希之和，与行序无关），O(c·n)；
+- 签名相同的列互相配对，签名重复（如两列取值分布相同）的组内按排列逐一尝试；
+- 每种配对把学生行重排为标准答案的列序后逐行校验，签名碰撞或组内配错都会在这一步被排除。
+
+签名只用于缩小候选，最终结论始终来自逐行对比，不会因哈希碰撞误判。
+"""
+
+import itertools
+from typing import Iterable, Iterator, Sequence
+
+_MASK = (1 << 64) - 1
+
+# 签名重复的列组内最多尝试的配对数（组内排列数的乘积），避免极端情况退化为阶乘
+MAX_PAIRING_CANDIDATES = 120
+
+
+class ColumnSignatures:
+    """逐批累积各列的多重集签名（落盘对比时结果分批到达）。"""
+
+    def __init__(self) -> None:
+        self.sums: list[int] = []
+
+    def update(self, values: Sequence[str]) -> None:
+        """累积一行（已标准化、NULL 已转为空串的列值）。"""
+        if not self.sums:
+            self.sums = [0] * len(values)
+        for i, v in enumerate(values):
+            self.sums[i] = (self.sums[i] + hash(v)) & _MASK
+
+
+def column_signatures(rows: Iterable[Sequence[str]]) -> list[int]:
+    """计算各列的多重集签名。"""
+    acc = ColumnSignatures()
+    for row in rows:
+        acc.update(row)
+    return acc.sums
+
+
+def candidate_pairings(
+    student_signatures: Sequence[int],
+    correct_signatures: Sequence[int],
+    max_candidates: int = MAX_PAIRING_CANDIDATES,
+) -> Iterator[list[int]]:
+    """按签名生成列配对：第 j 项为标准答案第 j 列对应的学生列下标。
+
+    第一个候选在各签名组内按出现顺序配对（列顺序本就一致时即为恒等配对）；签名多重集不一致时不产生候选。
+    """
+    if len(student_signatures) != len(correct_signatures):
+        return
+    student_groups: dict[int, list[int]] = {}
+    for i, sig in enumerate(student_signatures):
+        student_groups.setdefault(sig, []).append(i)
+    correct_groups: dict[int, list[int]] = {}
+    for j, sig in enumerate(correct_signatures):
+        correct_groups.setdefault(sig, []).append(j)
+    if {s: len(g) for s, g in student_groups.items()} != {s: len(g) for s, g in correct_groups.items()}:
+        return
+    sigs = list(correct_groups)
+    choices = itertools.product(*(itertools.permutations(student_groups[s]) for s in sigs))
+    for combo in itertools.islice(choices, max(1, max_candidates)):
+        pairing = [0] * len(correct_signatures)
+        for sig, student_cols in zip(sigs, combo):
+            for j, i in zip(correct_groups[sig], student_cols):
+                pairing[j] = i
+        yield pairing
+
+
+def reorder_rows(rows: Iterable[Sequence[str]], pairing: Sequence[int]) -> list[tuple]:
+    """按配对把学生行重排为标准答案的列序。"""
+    return [tuple(row[i] for i in pairing) for row in rows]
+
+
+__all__ = [
+    "MAX_PAIRING_CANDIDATES",
+    "ColumnSignatures",
+    "column_signatures",
+    "candidate_pairings",
+    "reorder_rows",
+]
@@ -0,0 +1,152 @@
+"""执行前代价检查：学生 SQL 执行前先 EXPLAIN，估算扫描行数超出题目预算时直接拒绝。
+
+典型场景是漏写连接条件造成的多表笛卡尔积：在大数据量题目上会长时间占用沙箱连接。
+估算方式：
+  - MySQL：EXPLAIN FORMAT=JSON，按嵌套循环累计各表 rows_examined_per_scan × 驱动行数；
+  - SQLite（本地/测试）：EXPLAIN QUERY PLAN 不给行数，按 SCAN 步骤涉及表的实际行数相乘（SEARCH 视为 1 行）。
+示例数据很小的题目（总行数不超过 JUDGE_COST_GUARD_MIN_ROWS）直接跳过，不付出 EXPLAIN 的开销。
+"""
+
+import json
+import logging
+import re
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.efficiency_service import explain_query
+from core.metrics import incr, timed
+from core.sql_judge import SQLCostExceededError
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+_SQL_KEYWORDS = {
+    "on", "using", "where", "join", "inner", "left", "right", "full", "cross", "natural",
+    "group", "order", "having", "limit", "union", "select", "from", "as", "lateral",
+}
+
+
+def schema_row_upper_bound(schema_preview: str | None) -> int | None:
+    """题目各表行数之和；引用外部数据集的表行数未知，返回 None。"""
+    if not schema_preview or not schema_preview.strip():
+        return 0
+    try:
+        data = json.loads(schema_preview)
+    except json.JSONDecodeError:
+        return 0
+    tables = data.get("tables") if isinstance(data, dict) else None
+    total = 0
+    for tbl in tables if isinstance(tables, list) else []:
+        if not isinstance(tbl, dict):
+            continue
+        if isinstance(tbl.get("dataset"), dict):
+            return None
+        spec = tbl.get("generate")
+        if isinstance(spec, dict):
+            total += int(spec.get("rows") or 0)
+        elif isinstance(tbl.get("rows"), list):
+            total += len(tbl["rows"])
+    return total
+
+
+def resolve_row_budget(question_budget: int | None, schema_preview: str | None) -> int | None:
+    """确定本次判题的扫描行数预算；返回 None 表示跳过代价检查。
+
+    :param question_budget: 题目的 max_estimated_rows，为空时使用全局默认值，<=0 表示关闭
+    """
+    budget = question_budget if question_budget is not None else _settings.JUDGE_COST_GUARD_ROW_BUDGET
+    if not budget or budget <= 0:
+        return None
+    total = schema_row_upper_bound(schema_preview)
+    if total is not None and total <= _settings.JUDGE_COST_GUARD_MIN_ROWS:
+        return None
+    return budget
+
+
+def _table_aliases(sql: str) -> dict[str, str]:
+    """从 FROM / JOIN / 逗号连接中提取 别名 -> 表名（SQLite 执行计划中只显示别名）。"""
+    aliases: dict[str, str] = {}
+    pattern = r"(?:\bfrom\b|\bjoin\b|,)\s*[`\"]?(\w+)[`\"]?(?:\s+(?:as\s+)?[`\"]?(\w+)[`\"]?)?"
+    for match in re.finditer(pattern, sql, re.IGNORECASE):
+        table, alias = match.group(1), match.group(2)
+        if table.lower() in _SQL_KEYWORDS:
+            continue
+        aliases.setdefault(table, table)
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+async def _sqlite_row_estimate(
+    session: AsyncSession, sql: str, plan: dict[str, Any]
+) -> tuple[int, list[str]]:
+    aliases = _table_aliases(sql)
+    counts: dict[str, int | None] = {}
+    estimated = 1
+    scanned: list[str] = []
+    for step in plan["tables"]:
+        if step["access_type"] != "SCAN":
+            continue
+        table = aliases.get(step["name"], step["name"])
+        if table not in counts:
+            try:
+                counts[table] = await session.scalar(text(f'SELECT COUNT(*) FROM "{table}"'))
+            except Exception:
+                counts[table] = None  # CTE、物化子查询等不是真实表
+        if counts[table] is None:
+            continue
+        estimated *= max(1, counts[table])
+        scanned.append(table)
+    return (estimated if scanned else 0), scanned
+
+
+async def estimate_query_rows(session: AsyncSession, sql: str) -> tuple[int, list[str]]:
+    """估算执行 sql 需要扫描的行数。
+
+    :return: (估算行数, 全表扫描涉及的表)
+    """
+    plan = await explain_query(session, sql)
+    if plan["rows_examined"] is None:
+        return await _sqlite_row_estimate(session, sql, plan)
+    full_scans = sorted(
+        (t for t in plan["tables"] if t["access_type"] == "ALL" and t["name"]),
+        key=lambda t: -t["rows"],
+    )
+    return plan["rows_examined"], [t["name"] for t in full_scans]
+
+
+async def check_query_cost(session: AsyncSession, sql: str, row_budget: int) -> None:
+    """估算行数超出 row_budget 时抛出 SQLCostExceededError；EXPLAIN 本身失败时放行，由实际执行报错。
+
+    :raises SQLCostExceededError: 估算扫描行数超出预算
+    """
+    with timed("judge.cost_guard"):
+        try:
+            estimated, tables = await estimate_query_rows(session, sql)
+        except Exception as e:
+            incr("judge.cost_guard.explain_failed")
+            logger.debug(f"代价检查 EXPLAIN 失败，已放行: {e}")
+            return
+    if estimated <= row_budget:
+        return
+    incr("judge.cost_guard.rejected")
+    table_desc = "、".join(dict.fromkeys(tables)) or "（未知）"
+    raise SQLCostExceededError(
+        f"查询代价过高，已在执行前拒绝：预计需扫描约 {estimated:,} 行，超出本题上限 {row_budget:,} 行。"
+        f"涉及全表扫描的表：{table_desc}。请检查是否遗漏了连接条件（多表笛卡尔积）或过滤条件。",
+        estimated_rows=estimated,
+        row_budget=row_budget,
+        tables=list(dict.fromkeys(tables)),
+    )
+
+
+__all__ = [
+    "schema_row_upper_bound",
+    "resolve_row_budget",
+    "estimate_query_rows",
+    "check_query_cost",
+]
@@ -0,0 +1,238 @@
+"""大数据量练习表：将外部数据集文件（CSV/JSONL/Parquet）批量导入判题库。
+
+schema_preview 中的表可额外携带 dataset 字段引用外部文件，rows 仅作为学生端示例：
+    {"name": "orders", "columns": [...], "rows": [前几行], "dataset": {"path": "orders.csv.gz", "format": "csv"}}
+建表仍由 judge_setup 完成，本模块只负责在建表之后按批次参数化插入完整数据。
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dialects import dialect_for_session
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+DATASET_FORMATS = ("csv", "jsonl", "parquet")
+
+# CSV 中表示 NULL 的写法（与 MySQL 导出约定一致），空字符串同样视为 NULL
+_CSV_NULL_MARKERS = ("\\N", "")
+
+
+class DatasetError(Exception):
+    """数据集引用无效或读取失败。"""
+    pass
+
+
+def _safe_identifier(name: Any) -> str:
+    """表名、列名仅保留字母数字下划线，与 judge_setup 的建表规则一致。"""
+    return re.sub(r"[^\w]", "", str(name or ""))
+
+
+def resolve_dataset_path(path: str, base_dir: str | None = None) -> Path:
+    """将 dataset.path 解析为数据集目录下的绝对路径，禁止越出该目录。"""
+    if not path or not str(path).strip():
+        raise DatasetError("数据集路径为空")
+    base = Path(base_dir or _settings.JUDGE_DATASET_DIR).resolve()
+    target = (base / str(path).strip()).resolve()
+    if base != target and base not in target.parents:
+        raise DatasetError(f"数据集路径越界：{path}")
+    if not target.is_file():
+        raise DatasetError(f"数据集文件不存在：{path}")
+    return target
+
+
+def infer_dataset_format(path: str, declared: str | None = None) -> str:
+    """优先使用显式声明的 format，否则根据扩展名（忽略 .gz）推断。"""
+    if declared:
+        fmt = str(declared).strip().lower()
+    else:
+        name = str(path).lower()
+        if name.endswith(".gz"):
+            name = name[:-3]
+        fmt = name.rsplit(".", 1)[-1] if "." in name else ""
+        if fmt == "ndjson":
+            fmt = "jsonl"
+    if fmt not in DATASET_FORMATS:
+        raise DatasetError(f"不支持的数据集格式：{fmt or path}")
+    return fmt
+
+
+def _open_text(path: Path) -> io.TextIOBase:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _iter_csv(path: Path) -> Iterator[dict[str, Any]]:
+    with _open_text(path) as f:
+        for row in csv.DictReader(f):
+            yield {k: (None if v in _CSV_NULL_MARKERS else v) for k, v in row.items()}
+
+
+def _iter_jsonl(path: Path) -> Iterator[dict[str, Any]]:
+    with _open_text(path) as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise DatasetError(f"{path.name} 第 {line_no} 行不是合法 JSON：{e}") from e
+            if isinstance(obj, dict):
+                yield obj
+
+
+def _iter_parquet(path: Path) -> Iterator[dict[str, Any]]:
+    try:
+        import pyarrow.parquet as pq  # 可选依赖，仅 Parquet 数据集需要
+    except ImportError as e:
+        raise DatasetError("读取 Parquet 数据集需要安装 pyarrow") from e
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches():
+        yield from batch.to_pylist()
+
+
+def iter_dataset_rows(path: Path, fmt: str) -> Iterator[dict[str, Any]]:
+    """逐行流式读取数据集，内存占用与文件大小无关。"""
+    if fmt == "csv":
+        return _iter_csv(path)
+    if fmt == "jsonl":
+        return _iter_jsonl(path)
+    if fmt == "parquet":
+        return _iter_parquet(path)
+    raise DatasetError(f"不支持的数据集格式：{fmt}")
+
+
+async def insert_rows_in_batches(
+    session: AsyncSession,
+    table: str,
+    columns: list[str],
+    rows: Iterable[dict[str, Any]],
+    batch_size: int | None = None,
+) -> int:
+    """按批次参数化插入行（executemany），返回插入总行数。
+
+    :param table: 表名（会做标识符清洗）
+    :param columns: 需要写入的列，行中缺失的列写 NULL
+    :param rows: 行字典的可迭代对象，可以是生成器，整个过程只缓存一批
+    """
+    safe_table = _safe_identifier(table)
+    safe_cols = [c for c in (_safe_identifier(c) for c in columns) if c]
+    if not safe_table or not safe_cols:
+        return 0
+    size = max(1, batch_size or _settings.JUDGE_DATASET_BATCH_SIZE)
+    quote = dialect_for_session(session).quote_ident
+    cols_str = ", ".join(quote(c) for c in safe_cols)
+    params_str = ", ".join(f":p{i}" for i in range(len(safe_cols)))
+    stmt = text(f"INSERT INTO {quote(safe_table)} ({cols_str}) VALUES ({params_str})")
+
+    total = 0
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append({f"p{i}": row.get(c) for i, c in enumerate(safe_cols)})
+        if len(batch) >= size:
+            await session.execute(stmt, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        await session.execute(stmt, batch)
+        total += len(batch)
+    return total
+
+
+def _dataset_tables(schema_preview: str | None) -> list[dict[str, Any]]:
+    """返回 schema_preview 中引用了外部数据集的表定义。"""
+    if not schema_preview or not schema_preview.strip():
+        return []
+    try:
+        data = json.loads(schema_preview)
+    except json.JSONDecodeError:
+        return []
+    tables = data.get("tables") if isinstance(data, dict) else None
+    if not isinstance(tables, list):
+        return []
+    return [
+        t for t in tables
+        if isinstance(t, dict) and isinstance(t.get("dataset"), dict) and isinstance(t.get("columns"), list)
+    ]
+
+
+def has_external_dataset(table: dict[str, Any]) -> bool:
+    """该表是否由外部数据集或合成数据生成器提供完整数据（此时 rows 只是示例，不应再插入）。"""
+    return isinstance(table.get("dataset"), dict) or isinstance(table.get("generate"), dict)
+
+
+async def load_schema_datasets(session: AsyncSession, schema_preview: str | None) -> dict[str, int]:
+    """为 schema_preview 中引用外部数据集的表导入完整数据，需在建表之后调用。
+
+    :return: {表名: 导入行数}
+    :raises DatasetError: 数据集缺失或格式错误（此时判题结果不可信，应中止判题）
+    """
+    loaded: dict[str, int] = {}
+    for tbl in _dataset_tables(schema_preview):
+        spec = tbl["dataset"]
+        path = resolve_dataset_path(spec.get("path"))
+        fmt = infer_dataset_format(str(path), spec.get("format"))
+        columns = [c for c in tbl["columns"] if isinstance(c, str)]
+        count = await insert_rows_in_batches(
+            session, tbl.get("name"), columns, iter_dataset_rows(path, fmt)
+        )
+        loaded[_safe_identifier(tbl.get("name"))] = count
+        logger.info(f"数据集导入完成: {tbl.get('name')} <- {path.name}，共 {count} 行")
+    if loaded:
+        await session.flush()
+    return loaded
+
+
+def truncate_schema_preview_rows(schema_preview: str | None, max_rows: int | None = None) -> str | None:
+    """返回给前端的 schema_preview：引用外部数据集（或合成数据）的表只保留前 max_rows 行示例。
+
+    未引用数据集的表保持原样（其 rows 即判题数据，教师编辑时需要完整内容）。
+    """
+    if not schema_preview or not schema_preview.strip():
+        return schema_preview
+    try:
+        data = json.loads(schema_preview)
+    except json.JSONDecodeError:
+        return schema_preview
+    tables = data.get("tables") if isinstance(data, dict) else None
+    if not isinstance(tables, list):
+        return schema_preview
+    limit = _settings.SCHEMA_PREVIEW_MAX_ROWS if max_rows is None else max_rows
+    changed = False
+    for tbl in tables:
+        if not isinstance(tbl, dict) or not has_external_dataset(tbl):
+            continue
+        rows = tbl.get("rows")
+        if isinstance(rows, list) and len(rows) > limit:
+            tbl["rows"] = rows[:limit]
+            changed = True
+    if not changed:
+        return schema_preview
+    return json.dumps(data, ensure_ascii=False)
+
+
+__all__ = [
+    "DatasetError",
+    "DATASET_FORMATS",
+    "resolve_dataset_path",
+    "infer_dataset_format",
+    "iter_dataset_rows",
+    "insert_rows_in_batches",
+    "has_external_dataset",
+    "load_schema_datasets",
+    "truncate_schema_preview_rows",
+]
@@ -0,0 +1,487 @@
+"""判题数据库方言：建表语句、字面量转义、执行超时与结果值映射按后端分别实现。
+
+题目可通过 questions.judge_dialect 指定判题后端（mysql / sqlite / postgresql / duckdb），
+为空时使用默认沙箱（SANDBOX_DB_URL）。只需标准 SQL 的简单题目可交给嵌入式引擎，
+需要 MySQL 特有语法的题目仍在 MySQL 上判。
+
+建表列类型先按列名与示例值归为通用类别（pk / fk / int / decimal / datetime / bool / string），
+再由各方言映射为具体类型。
+"""
+
+import asyncio
+import datetime as dt
+import hashlib
+import re
+import zlib
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from typing import Any, AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, DisconnectionError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class JudgeDialect:
+    """方言基类：默认实现为标准 SQL（双引号标识符、无服务端语句超时）。"""
+
+    name = "ansi"
+    column_types: dict[str, str] = {
+        "pk": "INTEGER PRIMARY KEY",
+        "fk": "INTEGER NOT NULL",
+        "int": "INTEGER",
+        "decimal": "DECIMAL(12,2)",
+        "datetime": "TIMESTAMP",
+        "bool": "BOOLEAN",
+        "string": "VARCHAR(255)",
+    }
+    # CREATE 之后追加的表选项（如 MySQL 的存储引擎与字符集）
+    table_options = ""
+    temporary_keyword = "TEMPORARY"
+    # 临时表所在 schema：删除临时表时必须限定，否则不存在同名临时表时会误删正式表
+    temp_schema = "temp"
+    # 查询连接当前所在库名的 SQL。非空时隐藏测试数据建在每次判题独立的暂存库中（普通表），
+    # 为 None 时建同名临时表遮蔽正式表
+    current_database_sql: str | None = None
+
+    def quote_ident(self, name: str) -> str:
+        return f'"{name}"'
+
+    def column_type(self, kind: str) -> str:
+        return self.column_types.get(kind, self.column_types["string"])
+
+    def escape_string(self, s: str) -> str:
+        return "'" + s.replace("'", "''") + "'"
+
+    def escape_value(self, v: Any) -> str:
+        """将 Python 值转成 SQL 字面量（防注入、引号转义）。"""
+        if v is None:
+            return "NULL"
+        if isinstance(v, bool):
+            return "TRUE" if v else "FALSE"
+        if isinstance(v, (int, float, Decimal)):
+            return str(v)
+        return self.escape_string(str(v))
+
+    def drop_table_sql(self, table: str, temporary: bool = False) -> str:
+        target = self.quote_ident(table)
+        if temporary:
+            target = f"{self.temp_schema}.{target}"
+        return f"DROP TABLE IF EXISTS {target}"
+
+    def use_database_sql(self, name: str) -> str:
+        return f"USE {self.quote_ident(name)}"
+
+    def create_table_sql(self, table: str, col_defs: list[str], temporary: bool = False) -> str:
+        kw = f"{self.temporary_keyword} TABLE" if temporary else "TABLE"
+        sql = f"CREATE {kw} {self.quote_ident(table)} (\n  " + ",\n  ".join(col_defs) + "\n)"
+        return sql + (f" {self.table_options}" if self.table_options else "")
+
+    def insert_rows_sql(self, table: str, columns: list[str], value_rows: list[str], has_pk: bool) -> str:
+        """多行 INSERT；重复执行时主键冲突以新值覆盖，无主键的表忽略冲突。"""
+        cols = ", ".join(self.quote_ident(c) for c in columns)
+        sql = f"INSERT INTO {self.quote_ident(table)} ({cols}) VALUES\n  " + ",\n  ".join(value_rows)
+        pk = next((c for c in columns if c.lower() == "id"), None)
+        if has_pk and pk:
+            updates = ", ".join(f"{self.quote_ident(c)} = EXCLUDED.{self.quote_ident(c)}" for c in columns if c != pk)
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            return sql + f"\nON CONFLICT ({self.quote_ident(pk)}) {action}"
+        return sql + "\nON CONFLICT DO NOTHING"
+
+    # 读取连接当前语句超时的 SQL：设置为会话级（连接归还连接池后仍然有效）时必须提供，退出时据此恢复；
+    # 设置只在当前事务内有效（如 PostgreSQL 的 SET LOCAL）时为 None
+    current_statement_timeout_sql: str | None = None
+
+    def statement_timeout_sql(self, timeout_ms: int) -> str | None:
+        """设置服务端语句超时的 SQL；不支持时返回 None。"""
+        return None
+
+    @asynccontextmanager
+    async def statement_timeout(self, session: AsyncSession, timeout_ms: int | None) -> AsyncIterator[None]:
+        """在超时保护下执行查询：支持服务端超时的后端先 SET，执行超时由数据库中断并报错。
+
+        会话级设置在退出时恢复为原值，避免连接归还连接池后，业务查询（未配置独立沙箱时共用主库连接池）继承判题超时；
+        恢复失败时让连接失效，不带着判题超时回到连接池。
+        """
+        sql = self.statement_timeout_sql(timeout_ms) if timeout_ms and timeout_ms > 0 else None
+        if not sql:
+            yield
+            return
+        previous = None
+        if self.current_statement_timeout_sql:
+            previous = (await session.execute(text(self.current_statement_timeout_sql))).scalar()
+        await session.execute(text(sql))
+        try:
+            yield
+        finally:
+            if previous is not None:
+                try:
+                    await session.execute(text(self.statement_timeout_sql(int(previous))))
+                except Exception:
+                    await session.invalidate()
+
+    def is_timeout_error(self, exc: BaseException) -> bool:
+        return False
+
+    def read_only_snapshot_sql(self) -> str | None:
+        """开启只读一致性快照事务的 SQL（须为事务内第一条语句）；不支持时返回 None。"""
+        return None
+
+    async def begin_read_only_snapshot(self, session: AsyncSession) -> None:
+        """在新会话上开启只读快照事务，学生与标准答案在两条连接上并发执行时读到同一份已提交数据。"""
+        sql = self.read_only_snapshot_sql()
+        if sql:
+            await session.execute(text(sql))
+
+    async def interrupt_query(self, driver_connection: Any) -> None:
+        """中断驱动连接上正在执行的查询；默认不支持，由语句超时兜底。
+
+        须在取消等待查询的任务之前调用：任务被取消后 SQLAlchemy 会让连接失效，驱动连接随之不可用。
+        """
+
+    # ---- 结果指纹（数据库内对比）----
+    # 每行按判题标准化（去首尾空格、转小写）后编码为 "长度:文本"，NULL 编码为 N，列间以逗号连接，
+    # 编码是单射的，不会把判题认为不同的行编码成相同文本；再对行文本求两个独立哈希并求和，
+    # 得到与行顺序无关、对重复行敏感的指纹 (行数, 哈希和1, 哈希和2)。
+
+    def text_cast_sql(self, expr: str) -> str:
+        return f"CAST({expr} AS VARCHAR)"
+
+    def char_length_sql(self, expr: str) -> str:
+        return f"LENGTH({expr})"
+
+    def concat_sql(self, parts: list[str]) -> str:
+        return "(" + " || ".join(parts) + ")"
+
+    def row_hash_sql(self, row_expr: str) -> tuple[str, str] | None:
+        """行文本的两个独立整数哈希表达式；返回 None 表示该后端不支持数据库内对比。"""
+        return None
+
+    async def prepare_fingerprint(self, session: AsyncSession) -> None:
+        """执行指纹查询前的准备（如为嵌入式库注册哈希函数），默认无需准备。"""
+
+    def fingerprint_sql(self, sql: str, columns: list[str]) -> str | None:
+        """把查询包成派生表，计算 (COUNT(*), SUM(hash1), SUM(hash2))；columns 为参与编码的列（按此顺序）。"""
+        if not columns:
+            return None
+        encoded = []
+        for col in columns:
+            value = f"LOWER(TRIM({self.text_cast_sql('judge_q.' + self.quote_ident(col))}))"
+            length = self.text_cast_sql(self.char_length_sql(value))
+            encoded.append(f"COALESCE({self.concat_sql([length, repr(':'), value])}, 'N')")
+        row_expr = self.concat_sql([part for col in encoded for part in (col, "','")][:-1])
+        hashes = self.row_hash_sql("judge_r.judge_row")
+        if hashes is None:
+            return None
+        inner = sql.strip().rstrip(";")
+        return (
+            f"SELECT COUNT(*), SUM({hashes[0]}), SUM({hashes[1]}) FROM ("
+            f"SELECT {row_expr} AS judge_row FROM ({inner}) AS judge_q"
+            f") AS judge_r"
+        )
+
+    def map_result_value(self, value: Any) -> Any:
+        """把驱动返回的值映射为跨后端一致的 Python 值，再交给判题标准化。"""
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value).decode("utf-8", errors="replace")
+        if isinstance(value, dt.datetime):
+            return value.replace(tzinfo=None).isoformat(" ")
+        if isinstance(value, (dt.date, dt.time)):
+            return value.isoformat()
+        if isinstance(value, dt.timedelta):
+            # MySQL TIME 列返回 timedelta，统一为 HH:MM:SS
+            total = int(value.total_seconds())
+            sign = "-" if total < 0 else ""
+            total = abs(total)
+            return f"{sign}{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+        return value
+
+
+class MySQLDialect(JudgeDialect):
+    name = "mysql"
+    column_types = {
+        "pk": "INT NOT NULL AUTO_INCREMENT PRIMARY KEY",
+        "fk": "INT NOT NULL",
+        "int": "INT DEFAULT NULL",
+        "decimal": "DECIMAL(12,2) DEFAULT NULL",
+        "datetime": "DATETIME DEFAULT NULL",
+        "bool": "TINYINT(1) DEFAULT NULL",
+        "string": "VARCHAR(255) DEFAULT NULL",
+    }
+    table_options = "ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    # 临时表在同一语句中只能打开一次（自连接、子查询再次引用会报 Can't reopen table），隐藏数据改用暂存库
+    current_database_sql = "SELECT DATABASE()"
+
+    def quote_ident(self, name: str) -> str:
+        return f"`{name}`"
+
+    def escape_string(self, s: str) -> str:
+        # MySQL 默认把反斜杠当转义符，需要额外转义
+        return "'" + s.replace("\\", "\\\\").replace("'", "''") + "'"
+
+    def escape_value(self, v: Any) -> str:
+        if isinstance(v, bool):
+            return "1" if v else "0"
+        return super().escape_value(v)
+
+    def drop_table_sql(self, table: str, temporary: bool = False) -> str:
+        kw = "TEMPORARY TABLE" if temporary else "TABLE"
+        return f"DROP {kw} IF EXISTS {self.quote_ident(table)}"
+
+    def insert_rows_sql(self, table: str, columns: list[str], value_rows: list[str], has_pk: bool) -> str:
+        cols = ", ".join(self.quote_ident(c) for c in columns)
+        rows_sql = ",\n  ".join(value_rows)
+        if has_pk:
+            updates = ", ".join(f"{self.quote_ident(c)}=VALUES({self.quote_ident(c)})" for c in columns)
+            return (
+                f"INSERT INTO {self.quote_ident(table)} ({cols}) VALUES\n  {rows_sql}"
+                f"\nON DUPLICATE KEY UPDATE {updates}"
+            )
+        return f"INSERT IGNORE INTO {self.quote_ident(table)} ({cols}) VALUES\n  {rows_sql}"
+
+    current_statement_timeout_sql = "SELECT @@SESSION.max_execution_time"
+
+    def statement_timeout_sql(self, timeout_ms: int) -> str | None:
+        # 仅对只读 SELECT 生效，正好覆盖学生查询；会话级设置，退出 statement_timeout 时恢复原值
+        return f"SET SESSION MAX_EXECUTION_TIME = {int(timeout_ms)}"
+
+    def is_timeout_error(self, exc: BaseException) -> bool:
+        return "3024" in str(exc) or "maximum statement execution time exceeded" in str(exc).lower()
+
+    def read_only_snapshot_sql(self) -> str | None:
+        return "START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY"
+
+    async def interrupt_query(self, driver_connection: Any) -> None:
+        """另开一条连接执行 KILL QUERY：只终止该连接上正在执行的语句，连接本身保留。"""
+        import aiomysql
+
+        thread_id = driver_connection.thread_id()
+        conn = await aiomysql.connect(
+            host=driver_connection.host,
+            port=driver_connection.port,
+            user=driver_connection.user,
+            password=driver_connection._password,
+            db=driver_connection.db,
+            unix_socket=driver_connection._unix_socket,
+            ssl=driver_connection._ssl_context,
+        )
+        try:
+            async with conn.cursor() as cur:
+                await cur.execute(f"KILL QUERY {int(thread_id)}")
+        finally:
+            conn.close()
+
+    def text_cast_sql(self, expr: str) -> str:
+        return f"CAST({expr} AS CHAR)"
+
+    def char_length_sql(self, expr: str) -> str:
+        return f"CHAR_LENGTH({expr})"
+
+    def concat_sql(self, parts: list[str]) -> str:
+        return "CONCAT(" + ", ".join(parts) + ")"
+
+    def row_hash_sql(self, row_expr: str) -> tuple[str, str] | None:
+        return f"CRC32({row_expr})", f"CONV(LEFT(MD5({row_expr}), 8), 16, 10)"
+
+
+class SQLiteDialect(JudgeDialect):
+    name = "sqlite"
+    column_types = {
+        "pk": "INTEGER PRIMARY KEY",
+        "fk": "INTEGER NOT NULL",
+        "int": "INTEGER",
+        "decimal": "NUMERIC",
+        "datetime": "DATETIME",
+        "bool": "INTEGER",
+        "string": "TEXT",
+    }
+    temporary_keyword = "TEMP"
+
+    def escape_value(self, v: Any) -> str:
+        if isinstance(v, bool):
+            return "1" if v else "0"
+        return super().escape_value(v)
+
+    def insert_rows_sql(self, table: str, columns: list[str], value_rows: list[str], has_pk: bool) -> str:
+        cols = ", ".join(self.quote_ident(c) for c in columns)
+        verb = "INSERT OR REPLACE" if has_pk else "INSERT OR IGNORE"
+        return f"{verb} INTO {self.quote_ident(table)} ({cols}) VALUES\n  " + ",\n  ".join(value_rows)
+
+    @asynccontextmanager
+    async def statement_timeout(self, session: AsyncSession, timeout_ms: int | None) -> AsyncIterator[None]:
+        """SQLite 没有服务端语句超时：到时后调用 sqlite3 的 interrupt() 中断当前连接上的查询。"""
+        if not timeout_ms or timeout_ms <= 0:
+            yield
+            return
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        handle = asyncio.get_running_loop().call_later(
+            timeout_ms / 1000, lambda: asyncio.ensure_future(driver.interrupt())
+        )
+        try:
+            yield
+        finally:
+            handle.cancel()
+
+    def is_timeout_error(self, exc: BaseException) -> bool:
+        return "interrupted" in str(exc).lower()
+
+    async def interrupt_query(self, driver_connection: Any) -> None:
+        await driver_connection.interrupt()
+
+    def text_cast_sql(self, expr: str) -> str:
+        return f"CAST({expr} AS TEXT)"
+
+    def row_hash_sql(self, row_expr: str) -> tuple[str, str] | None:
+        return f"judge_crc32({row_expr})", f"judge_md5_32({row_expr})"
+
+    async def prepare_fingerprint(self, session: AsyncSession) -> None:
+        """SQLite 没有内置哈希函数：在当前连接上注册与 MySQL CRC32 / MD5 前 32 位等价的函数。"""
+        conn = await session.connection()
+        driver = (await conn.get_raw_connection()).driver_connection
+        await driver.create_function("judge_crc32", 1, _crc32, deterministic=True)
+        await driver.create_function("judge_md5_32", 1, _md5_32, deterministic=True)
+
+
+class PostgreSQLDialect(JudgeDialect):
+    name = "postgresql"
+    temp_schema = "pg_temp"
+    column_types = {
+        "pk": "INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+        "fk": "INTEGER NOT NULL",
+        "int": "INTEGER",
+        "decimal": "NUMERIC(12,2)",
+        "datetime": "TIMESTAMP",
+        "bool": "BOOLEAN",
+        "string": "VARCHAR(255)",
+    }
+
+    def statement_timeout_sql(self, timeout_ms: int) -> str | None:
+        # 只在当前事务内有效，事务结束（连接归还连接池前）自动恢复
+        return f"SET LOCAL statement_timeout = {int(timeout_ms)}"
+
+    def is_timeout_error(self, exc: BaseException) -> bool:
+        return "statement timeout" in str(exc).lower() or "57014" in str(exc)
+
+    def read_only_snapshot_sql(self) -> str | None:
+        return "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+
+    def text_cast_sql(self, expr: str) -> str:
+        return f"CAST({expr} AS TEXT)"
+
+    def row_hash_sql(self, row_expr: str) -> tuple[str, str] | None:
+        return (
+            f"('x' || SUBSTR(MD5({row_expr}), 1, 8))::bit(32)::bigint",
+            f"('x' || SUBSTR(MD5({row_expr}), 9, 8))::bit(32)::bigint",
+        )
+
+
+class DuckDBDialect(JudgeDialect):
+    name = "duckdb"
+    column_types = {
+        "pk": "INTEGER PRIMARY KEY",
+        "fk": "INTEGER NOT NULL",
+        "int": "INTEGER",
+        "decimal": "DECIMAL(12,2)",
+        "datetime": "TIMESTAMP",
+        "bool": "BOOLEAN",
+        "string": "VARCHAR",
+    }
+    temporary_keyword = "TEMP"
+
+    def is_timeout_error(self, exc: BaseException) -> bool:
+        return "interrupt" in str(exc).lower()
+
+    def row_hash_sql(self, row_expr: str) -> tuple[str, str] | None:
+        # hash() 为 64 位无符号整数，求和结果为 HUGEINT，不会溢出
+        return f"hash({row_expr})", f"hash({row_expr} || '#')"
+
+
+def _crc32(value: str | None) -> int | None:
+    return None if value is None else zlib.crc32(value.encode("utf-8"))
+
+
+def _md5_32(value: str | None) -> int | None:
+    return None if value is None else int(hashlib.md5(value.encode("utf-8")).hexdigest()[:8], 16)
+
+
+DIALECTS: dict[str, JudgeDialect] = {
+    d.name: d for d in (MySQLDialect(), SQLiteDialect(), PostgreSQLDialect(), DuckDBDialect())
+}
+# SQLAlchemy 方言名与别名
+_ALIASES = {"mariadb": "mysql", "postgres": "postgresql", "pg": "postgresql"}
+
+DEFAULT_DIALECT = "mysql"
+
+
+def get_dialect(name: str | None) -> JudgeDialect:
+    """按名称取方言，未知名称回退到 MySQL（历史题目均按 MySQL 编写）。"""
+    key = (name or DEFAULT_DIALECT).strip().lower()
+    return DIALECTS.get(_ALIASES.get(key, key), DIALECTS[DEFAULT_DIALECT])
+
+
+def is_supported_dialect(name: str | None) -> bool:
+    key = (name or "").strip().lower()
+    return _ALIASES.get(key, key) in DIALECTS
+
+
+def dialect_for_session(session: AsyncSession) -> JudgeDialect:
+    """根据会话实际连接的数据库确定方言（建表语法以真实后端为准）。"""
+    bind = session.bind
+    return get_dialect(bind.dialect.name if bind is not None else None)
+
+
+def is_connection_error(exc: BaseException | None) -> bool:
+    """异常（含 __cause__ / __context__ 链）是否为连接层面的失败（连接断开、失效或无法建立），而非 SQL 本身出错。"""
+    seen: set[int] = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+            return True
+        if isinstance(exc, (DisconnectionError, ConnectionError)):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def infer_column_kind(col_name: str, sample_value: Any) -> str:
+    """根据列名和示例值推断通用列类别：pk / fk / int / decimal / datetime / bool / string。"""
+    name_lower = (col_name or "").lower()
+    if name_lower == "id":
+        return "pk"
+    if name_lower.endswith("_id"):
+        return "fk"
+    if "amount" in name_lower or "price" in name_lower or "sum" in name_lower:
+        return "decimal"
+    if name_lower.endswith("_at") or name_lower in ("created_at", "updated_at", "date", "time"):
+        return "datetime"
+    if sample_value is None:
+        return "string"
+    if isinstance(sample_value, bool):
+        return "bool"
+    if isinstance(sample_value, int):
+        return "int"
+    if isinstance(sample_value, float):
+        return "decimal"
+    if isinstance(sample_value, str) and re.match(r"^\d{4}-\d{2}-\d{2}[T ]?\d{2}:\d{2}", sample_value):
+        return "datetime"
+    return "string"
+
+
+__all__ = [
+    "JudgeDialect",
+    "MySQLDialect",
+    "SQLiteDialect",
+    "PostgreSQLDialect",
+    "DuckDBDialect",
+    "DIALECTS",
+    "DEFAULT_DIALECT",
+    "get_dialect",
+    "is_supported_dialect",
+    "dialect_for_session",
+    "is_connection_error",
+    "infer_column_kind",
+]
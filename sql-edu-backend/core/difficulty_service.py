@@ -1,5 +1,12 @@
 """题目难度动态计算：教师基础难度 + 客观数据（提交/对话） + 学生主观评分，波动尽量小，数据量大时可较大幅度调整。难度统一为 1～10。"""
 
+from typing import Sequence
+
+try:
+    import numpy as np  # 批量计算（题目列表）使用；未安装时批量接口退化为逐题计算
+except ImportError:  # pragma: no cover
+    np = None
+
 
 def compute_display_difficulty(
     teacher_difficulty: int,
@@ -59,3 +66,74 @@ def suggested_time_seconds(display_difficulty: float, _teacher_time_limit: int |
     # 线性映射到 [180s, 600s]，即 [3 分钟, 10 分钟]
     return int(120 + 48 * d)
 
+
+def _weight_by_samples(n):
+    """样本数 -> 客观+主观分量的权重，与 compute_display_difficulty 的分段一致。"""
+    return np.select([n < 5, n < 15, n < 40], [0.1, 0.25, 0.4], default=0.55)
+
+
+def _round1(values):
+    """逐元素等价于 Python 的 round(x, 1)。
+
+    rint(x * 10) / 10 与 round(x, 1) 只在 x * 10 恰好落在 .5 附近时可能不同
+    （round 按 x 的精确十进制值舍入），这些元素回退到 round 逐个计算。
+    """
+    scaled = values * 10.0
+    rounded = np.rint(scaled) / 10.0
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), 1)
+    return rounded
+
+
+def compute_display_difficulties(
+    teacher_difficulty: Sequence[int],
+    total_submissions: Sequence[int],
+    correct_submissions: Sequence[int],
+    total_chat_messages: Sequence[int],
+    feedback_count: Sequence[int],
+    avg_student_rating: Sequence[float | None],
+) -> list[float]:
+    """批量计算展示难度：各参数为等长的列，第 i 个结果与 compute_display_difficulty 对第 i 行的结果完全相同。
+
+    运算顺序与标量版本逐步对应（IEEE 双精度下逐元素结果一致），舍入见 _round1。
+    """
+    if np is None:
+        return [
+            compute_display_difficulty(*row)
+            for row in zip(
+                teacher_difficulty, total_submissions, correct_submissions,
+                total_chat_messages, feedback_count, avg_student_rating,
+            )
+        ]
+    if len(teacher_difficulty) == 0:
+        return []
+    base = np.clip(np.asarray(teacher_difficulty, dtype=np.int64), 1, 10).astype(np.float64)
+    submissions = np.asarray(total_submissions, dtype=np.int64)
+    correct = np.asarray(correct_submissions, dtype=np.int64)
+    chats = np.asarray(total_chat_messages, dtype=np.int64)
+    feedback = np.asarray(feedback_count, dtype=np.int64)
+    rating = np.array(avg_student_rating, dtype=np.float64)  # None 转为 NaN
+
+    # 客观分量：有正确提交时按 提交/正确 与 对话/正确，否则按提交与对话的绝对量
+    safe_correct = np.maximum(correct, 1).astype(np.float64)
+    with_correct = (submissions / safe_correct) * 0.5 + np.minimum(chats / safe_correct * 0.2, 4.0)
+    without_correct = np.minimum(submissions * 0.1 + chats * 0.01, 9.0)
+    raw_objective = np.where(correct > 0, with_correct, without_correct)
+    objective_norm = np.maximum(1.0, np.minimum(10.0, 1.0 + raw_objective))
+
+    # 主观分量：有评分时直接采用，否则取教师难度
+    has_rating = ~np.isnan(rating) & (feedback > 0)
+    subjective_norm = np.where(has_rating, np.maximum(1.0, np.minimum(10.0, np.nan_to_num(rating))), base)
+
+    w = _weight_by_samples(submissions + feedback)
+    combined = (1.0 - w) * base + w * (0.5 * objective_norm + 0.5 * subjective_norm)
+    return _round1(np.maximum(1.0, np.minimum(10.0, combined))).tolist()
+
+
+def suggested_time_seconds_batch(display_difficulties: Sequence[float]) -> list[int]:
+    """批量计算限时挑战时长，与 suggested_time_seconds 逐个计算结果相同。"""
+    if np is None:
+        return [suggested_time_seconds(d) for d in display_difficulties]
+    d = np.clip(np.asarray(display_difficulties, dtype=np.float64), 1.0, 10.0)
+    return (120 + 48 * d).astype(np.int64).tolist()
@@ -0,0 +1,98 @@
+"""客户端断开时取消请求：中断沙箱中仍在执行的查询、取消大模型调用，未提交的写入随会话回滚丢弃。
+
+- run_until_disconnect 把请求处理放到子任务中执行，同时轮询 request.is_disconnected()；
+- 判题查询执行期间通过 cancellable_query 登记驱动连接，断开时先调用方言的 interrupt_query
+  （MySQL 为 KILL QUERY，SQLite 为 interrupt()），再取消子任务；
+- 取消子任务会中断等待中的大模型 HTTP 请求（关闭连接即中止上游生成）；
+- 指标：request.<name> 为正常完成耗时，request.<name>.cancelled 为取消次数，
+  request.<name>.reclaimed 按正常完成的平均耗时估算每次取消节省的处理时间。
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Protocol, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.metrics import incr, record_timing, snapshot
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+# 当前请求中正在执行的查询：id(驱动连接) -> (方言, 驱动连接)
+_inflight_queries: ContextVar[dict[int, tuple[Any, Any]] | None] = ContextVar("inflight_queries", default=None)
+
+
+class ClientDisconnectedError(Exception):
+    """客户端在请求处理完成前断开，处理已被取消。"""
+    pass
+
+
+class _DisconnectAware(Protocol):
+    async def is_disconnected(self) -> bool: ...
+
+
+@asynccontextmanager
+async def cancellable_query(dialect: Any, session: AsyncSession) -> AsyncIterator[None]:
+    """查询执行期间登记驱动连接，客户端断开时由 run_until_disconnect 中断；不在可取消请求中时不做任何事。"""
+    registry = _inflight_queries.get()
+    if registry is None:
+        yield
+        return
+    conn = await session.connection()
+    driver = (await conn.get_raw_connection()).driver_connection
+    registry[id(driver)] = (dialect, driver)
+    try:
+        yield
+    finally:
+        registry.pop(id(driver), None)
+
+
+async def run_until_disconnect(
+    request: _DisconnectAware, name: str, work: Awaitable[T], poll_interval: float
+) -> T:
+    """执行 work，客户端断开时中断其中的查询并取消。
+
+    :raises ClientDisconnectedError: 客户端已断开，work 已被取消
+    """
+    registry: dict[int, tuple[Any, Any]] = {}
+    token = _inflight_queries.set(registry)
+    try:
+        task = asyncio.ensure_future(work)  # 子任务复制当前上下文，共享 registry
+    finally:
+        _inflight_queries.reset(token)
+    start = time.perf_counter()
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                record_timing(f"request.{name}", (time.perf_counter() - start) * 1000)
+                return task.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+    # 先中断数据库侧的查询（连接此时仍可用），再取消等待它的任务
+    for dialect, driver in list(registry.values()):
+        try:
+            await dialect.interrupt_query(driver)
+        except Exception as e:
+            logger.warning(f"中断查询失败: {e}")
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    typical_ms = snapshot()["timings"].get(f"request.{name}", {}).get("avg_ms", 0.0)
+    incr(f"request.{name}.cancelled")
+    record_timing(f"request.{name}.reclaimed", max(0.0, typical_ms - elapsed_ms))
+    raise ClientDisconnectedError(f"客户端已断开，{name} 已取消")
+
+
+__all__ = ["ClientDisconnectedError", "cancellable_query", "run_until_disconnect"]
@@ -0,0 +1,251 @@
+"""查询效率评估：对正确提交分别获取学生 SQL 与标准答案的执行计划和耗时，给出相对效率分。
+
+仅对开启 grade_efficiency 的题目、且判题正确的提交执行；在响应返回后作为后台任务运行，
+不增加判题接口的延迟。结果写回 submissions 表的 rows_examined / full_scans / exec_time_ms / efficiency_score。
+
+计时期间持有题目表集合的闸门，并先核对沙箱中的表仍由本题的 schema 建成（其他同名表题目已重建时跳过评估）；
+每次执行都受 JUDGE_STATEMENT_TIMEOUT_MS 语句超时保护，超时同样跳过。
+
+执行计划来源：
+  - MySQL：EXPLAIN FORMAT=JSON，累计各表 rows_examined_per_scan（按嵌套循环的驱动行数放大），access_type=ALL 计为全表扫描；
+  - SQLite（本地/测试）：EXPLAIN QUERY PLAN，以 SCAN 开头的步骤计为全表扫描，无行数估算。
+"""
+
+import json
+import logging
+import re
+import time
+from typing import Any
+
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.dialects import dialect_for_session
+from core.metrics import incr
+from core.sql_judge import SQLJudgeError, SQLJudgeService
+from models.submission import Submission
+
+logger = logging.getLogger(__name__)
+
+# 计时取多次执行中的最小值，削弱缓存预热与调度抖动的影响
+_TIMING_RUNS = 3
+
+
+def _to_number(value: Any) -> float | None:
+    """EXPLAIN JSON 中的数值可能是字符串（如 "1.20"）。"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_mysql_explain_json(plan: dict[str, Any] | str) -> dict[str, Any]:
+    """解析 MySQL EXPLAIN FORMAT=JSON 的输出。
+
+    :return: {"rows_examined": int, "full_scans": int, "query_cost": float | None,
+              "tables": [{"name", "access_type", "rows"}]}
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    totals = {"rows_examined": 0.0, "full_scans": 0}
+    tables: list[dict[str, Any]] = []
+
+    def visit_table(table: dict[str, Any], fanout: float) -> float:
+        """累计单表扫描行数，返回该表参与连接后的输出行数（作为下一张表的驱动行数）。"""
+        per_scan = _to_number(table.get("rows_examined_per_scan")) or 0.0
+        totals["rows_examined"] += per_scan * fanout
+        if table.get("access_type") == "ALL":
+            totals["full_scans"] += 1
+        tables.append({
+            "name": table.get("table_name"),
+            "access_type": table.get("access_type"),
+            "rows": int(per_scan),
+        })
+        walk(table, skip_keys=("table",))
+        produced = _to_number(table.get("rows_produced_per_join"))
+        return produced if produced is not None else per_scan * fanout
+
+    def walk(node: Any, skip_keys: tuple[str, ...] = ()) -> None:
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        for key, value in node.items():
+            if key in skip_keys:
+                continue
+            if key == "nested_loop" and isinstance(value, list):
+                fanout = 1.0
+                for item in value:
+                    if isinstance(item, dict) and isinstance(item.get("table"), dict):
+                        fanout = visit_table(item["table"], fanout)
+                    else:
+                        walk(item)
+            elif key == "table" and isinstance(value, dict):
+                visit_table(value, 1.0)
+            else:
+                walk(value)
+
+    walk(plan)
+    query_block = plan.get("query_block") if isinstance(plan, dict) else None
+    cost_info = query_block.get("cost_info") if isinstance(query_block, dict) else None
+    query_cost = _to_number(cost_info.get("query_cost")) if isinstance(cost_info, dict) else None
+    return {
+        "rows_examined": int(round(totals["rows_examined"])),
+        "full_scans": totals["full_scans"],
+        "query_cost": query_cost,
+        "tables": tables,
+    }
+
+
+def parse_sqlite_query_plan(rows: list[Any]) -> dict[str, Any]:
+    """解析 SQLite EXPLAIN QUERY PLAN 的输出（每行最后一列为 detail）。
+
+    SQLite 不提供行数估算，rows_examined 为 None，评分时回退到执行耗时。
+    tables 中的 name 为查询中的表别名（未起别名时即表名），access_type 为 SCAN / SEARCH。
+    """
+    full_scans = 0
+    tables: list[dict[str, Any]] = []
+    for row in rows:
+        detail = str(row[-1] if isinstance(row, (tuple, list)) else row).strip()
+        upper = detail.upper()
+        if "CONSTANT ROW" in upper:
+            continue
+        # "SCAN users" 为全表扫描；"SCAN users USING INDEX ..." 为按索引全扫，同样计入
+        match = re.match(r"^(SCAN|SEARCH)\s+(?:TABLE\s+)?(\w+)", detail, re.IGNORECASE)
+        if not match:
+            continue
+        access_type = match.group(1).upper()
+        if access_type == "SCAN":
+            full_scans += 1
+        tables.append({
+            "name": match.group(2),
+            "access_type": access_type,
+            "rows": None,
+        })
+    return {"rows_examined": None, "full_scans": full_scans, "query_cost": None, "tables": tables}
+
+
+async def explain_query(session: AsyncSession, sql: str) -> dict[str, Any]:
+    """按当前沙箱数据库方言获取执行计划摘要。"""
+    sql = sql.strip().rstrip(";")
+    dialect = session.bind.dialect.name if session.bind is not None else ""
+    if dialect == "sqlite":
+        result = await session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return parse_sqlite_query_plan([tuple(r) for r in result.fetchall()])
+    if dialect not in ("mysql", "mariadb"):
+        raise SQLJudgeError(f"暂不支持解析 {dialect} 的执行计划")
+    result = await session.execute(text(f"EXPLAIN FORMAT=JSON {sql}"))
+    return parse_mysql_explain_json(result.scalar_one())
+
+
+async def time_query(
+    session: AsyncSession, sql: str, runs: int = _TIMING_RUNS, timeout_ms: int | None = None
+) -> float:
+    """执行并取回全部结果，返回多次执行中的最短耗时（毫秒）。
+
+    :param timeout_ms: 每次执行的语句超时（按沙箱方言实现），为空时不限制
+    """
+    dialect = dialect_for_session(session)
+    best = None
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        async with dialect.statement_timeout(session, timeout_ms):
+            result = await session.execute(text(sql))
+            result.fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3)
+
+
+def compute_efficiency_score(student: dict[str, Any], reference: dict[str, Any]) -> float | None:
+    """相对效率分 0～100：不劣于标准答案为 100，扫描行数（缺失时用耗时）每多一倍约减半。
+
+    分子分母各加 1，避免空表或极快查询时出现除零和剧烈波动。
+    """
+    stu_rows, ref_rows = student.get("rows_examined"), reference.get("rows_examined")
+    if stu_rows is not None and ref_rows is not None:
+        ratio = (ref_rows + 1) / (stu_rows + 1)
+    else:
+        stu_ms, ref_ms = student.get("exec_time_ms"), reference.get("exec_time_ms")
+        if stu_ms is None or ref_ms is None:
+            return None
+        ratio = (ref_ms + 1) / (stu_ms + 1)
+    return round(100 * min(1.0, ratio), 1)
+
+
+async def measure_query(session: AsyncSession, sql: str, timeout_ms: int | None = None) -> dict[str, Any]:
+    """执行计划摘要 + 实测耗时。"""
+    metrics = await explain_query(session, sql)
+    metrics["exec_time_ms"] = await time_query(session, sql, timeout_ms=timeout_ms)
+    return metrics
+
+
+async def grade_submission_efficiency(
+    submission_id: int,
+    student_sql: str,
+    correct_sql: str,
+    session_factory: async_sessionmaker[AsyncSession] | None = None,
+    sandbox_session_factory: async_sessionmaker[AsyncSession] | None = None,
+    judge_dialect: str | None = None,
+    question_id: int | None = None,
+    schema_preview: str | None = None,
+) -> dict[str, Any] | None:
+    """后台任务：评估一次正确提交的查询效率并写回提交记录。
+
+    沿用判题时已提交的可见数据表，不重新建表；表已被其他 schema 重建、执行超时或其他异常时只记录日志并跳过，
+    不影响已返回的判题结果。judge_dialect 为题目的判题方言，question_id 用于开启分片时定位题目所在的沙箱分片，
+    schema_preview 用于核对沙箱中的表仍是本题的数据。
+    """
+    if session_factory is None:
+        from models import AsyncSessionFactory
+
+        session_factory = AsyncSessionFactory
+    # cost_guard 依赖本模块的 explain_query，判题流水线又依赖 cost_guard：在函数内导入避免循环
+    from core.judge_pipeline import sandbox_tables
+    from core.sandbox import sandbox_session_factory_for
+
+    try:
+        if sandbox_session_factory is None:
+            sandbox_session_factory = await sandbox_session_factory_for(judge_dialect, question_id)
+        async with sandbox_session_factory() as sandbox:
+            judge = SQLJudgeService(sandbox)
+            if not judge.check_sql_safety(student_sql)[0]:
+                return None
+            async with sandbox_tables(schema_preview, sandbox, build=False) as current:
+                if not current:
+                    incr("efficiency.skipped_stale_tables")
+                    logger.info(f"提交 {submission_id} 的沙箱表已被其他题目重建，跳过效率评估")
+                    return None
+                student = await measure_query(sandbox, student_sql, judge.timeout_ms)
+                reference = await measure_query(sandbox, correct_sql, judge.timeout_ms)
+                await sandbox.rollback()
+
+        values = {
+            "rows_examined": student["rows_examined"],
+            "full_scans": student["full_scans"],
+            "exec_time_ms": student["exec_time_ms"],
+            "efficiency_score": compute_efficiency_score(student, reference),
+        }
+        async with session_factory() as session:
+            await session.execute(
+                update(Submission).where(Submission.id == submission_id).values(**values)
+            )
+            await session.commit()
+        logger.info(f"提交 {submission_id} 效率评估完成: {values}")
+        return values
+    except Exception as e:
+        logger.warning(f"提交 {submission_id} 效率评估失败，已跳过: {e}")
+        return None
+
+
+__all__ = [
+    "parse_mysql_explain_json",
+    "parse_sqlite_query_plan",
+    "explain_query",
+    "compute_efficiency_score",
+    "grade_submission_efficiency",
+]
@@ -0,0 +1,207 @@
+"""考试模式的提交准入队列：开考时的集中提交先排队，再以固定并发判题，判题延迟不随提交洪峰上升。
+
+- 每个学生同时最多一个判题在执行；执行期间的新提交排队等待，不占用判题并发；
+- 排队中的提交被同一学生对同一题的新提交覆盖（合并为最新一次），票据与排队位置不变；不同题目的提交各自排队；
+- 该题的首次提交优先于重试提交，同一优先级先到先判；
+- 提交立即返回票据与排队位置，客户端轮询（可长轮询）票据获取结果；
+- 队列已满时拒绝新提交（计入 exam.queue.rejected），由路由层返回 503。
+
+队列只在当前进程内有效；多进程部署时需按用户粘性路由，否则每个进程各自限制单用户并发。
+"""
+
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from core.metrics import incr, record_timing, timed
+from core.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ExamQueueFullError(Exception):
+    """考试提交队列已满。"""
+    pass
+
+
+@dataclass
+class ExamTicket:
+    """一次考试提交的排队票据。"""
+
+    ticket_id: str
+    user_id: int
+    question_id: int
+    sql: str
+    first_attempt: bool
+    status: str = QUEUED
+    result: dict | None = None
+    error: str | None = None
+    coalesced: int = 0  # 被同一学生对同一题的新提交覆盖的次数
+    enqueued_at: float = field(default_factory=time.monotonic)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self, position: int | None = None) -> dict:
+        return {
+            "ticket_id": self.ticket_id,
+            "status": self.status,
+            "position": position,
+            "question_id": self.question_id,
+            "coalesced": self.coalesced,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+JudgeFn = Callable[[ExamTicket], Awaitable[dict]]
+
+
+class ExamAdmissionQueue:
+    """按 (是否首次提交, 到达顺序) 排序的有界队列，由 run() 启动的判题协程消费。"""
+
+    def __init__(self, judge: JudgeFn, maxsize: int, ticket_ttl: float):
+        self._judge = judge
+        self._maxsize = max(1, maxsize)
+        self._seq = itertools.count()
+        # 排队中的票据，按 (优先级, 序号, 票据 ID) 有序
+        self._queue: list[tuple[int, int, str]] = []
+        self._keys: dict[str, tuple[int, int, str]] = {}
+        self._tickets: dict[str, ExamTicket] = {}  # 排队中或执行中
+        self._finished = TTLCache(maxsize=self._maxsize * 4, ttl=ticket_ttl)
+        # (学生 ID, 题目 ID) -> 排队中的票据 ID：只合并同一题的重复提交
+        self._queued_by_user: dict[tuple[int, int], str] = {}
+        # 有判题在执行的学生：每个学生同时最多一个判题
+        self._running_users: set[int] = set()
+        self._cond = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    async def submit(self, user_id: int, question_id: int, sql: str, first_attempt: bool) -> ExamTicket:
+        """提交一次判题。同一学生对同一题已有排队中的提交时合并为最新一次，返回原票据。
+
+        :raises ExamQueueFullError: 队列已满
+        """
+        async with self._cond:
+            ticket_id = self._queued_by_user.get((user_id, question_id))
+            if ticket_id is not None:
+                ticket = self._tickets[ticket_id]
+                ticket.sql = sql
+                ticket.coalesced += 1
+                if first_attempt != ticket.first_attempt:
+                    # 排队期间该题已有判题完成、优先级变化时按新优先级重新排位
+                    ticket.first_attempt = first_attempt
+                    self._remove(ticket_id)
+                    self._insert(ticket)
+                incr("exam.queue.coalesced")
+                return ticket
+            if len(self._queue) >= self._maxsize:
+                incr("exam.queue.rejected")
+                raise ExamQueueFullError(f"考试提交队列已满（{self._maxsize}），请稍后重试")
+            ticket = ExamTicket(uuid.uuid4().hex, user_id, question_id, sql, first_attempt)
+            self._tickets[ticket.ticket_id] = ticket
+            self._queued_by_user[(user_id, question_id)] = ticket.ticket_id
+            self._insert(ticket)
+            incr("exam.queue.admitted")
+            self._cond.notify_all()
+            return ticket
+
+    def get(self, ticket_id: str) -> ExamTicket | None:
+        return self._tickets.get(ticket_id) or self._finished.get(ticket_id)
+
+    def position(self, ticket: ExamTicket) -> int | None:
+        """排队位置（0 表示下一个被判题）；执行中或已完成时为 None。"""
+        key = self._keys.get(ticket.ticket_id)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._queue, key)
+
+    async def wait(self, ticket: ExamTicket, timeout: float) -> ExamTicket:
+        """等待票据完成，最多 timeout 秒（长轮询）。"""
+        if timeout > 0 and not ticket.done.is_set():
+            try:
+                await asyncio.wait_for(ticket.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return ticket
+
+    def _insert(self, ticket: ExamTicket) -> None:
+        key = (0 if ticket.first_attempt else 1, next(self._seq), ticket.ticket_id)
+        self._keys[ticket.ticket_id] = key
+        bisect.insort(self._queue, key)
+
+    def _remove(self, ticket_id: str) -> None:
+        key = self._keys.pop(ticket_id)
+        del self._queue[bisect.bisect_left(self._queue, key)]
+
+    def _next_eligible(self) -> ExamTicket | None:
+        """队首起第一个所属学生没有判题在执行的票据。"""
+        for _, _, ticket_id in self._queue:
+            ticket = self._tickets[ticket_id]
+            if ticket.user_id not in self._running_users:
+                return ticket
+        return None
+
+    async def _take(self) -> ExamTicket:
+        async with self._cond:
+            while (ticket := self._next_eligible()) is None:
+                await self._cond.wait()
+            self._remove(ticket.ticket_id)
+            del self._queued_by_user[(ticket.user_id, ticket.question_id)]
+            self._running_users.add(ticket.user_id)
+            ticket.status = RUNNING
+            return ticket
+
+    async def _release(self, ticket: ExamTicket) -> None:
+        async with self._cond:
+            self._running_users.discard(ticket.user_id)
+            self._tickets.pop(ticket.ticket_id, None)
+            self._finished.set(ticket.ticket_id, ticket)
+            self._cond.notify_all()
+        ticket.done.set()
+
+    async def run(self, concurrency: int = 1) -> None:
+        """以 concurrency 个协程持续判题，直到被取消。单个提交判题失败只影响该票据。"""
+
+        async def worker() -> None:
+            while True:
+                ticket = await self._take()
+                record_timing("exam.queue.wait", (time.monotonic() - ticket.enqueued_at) * 1000)
+                try:
+                    with timed("exam.judge"):
+                        ticket.result = await self._judge(ticket)
+                    ticket.status = DONE
+                    incr("exam.queue.completed")
+                except asyncio.CancelledError:
+                    ticket.status = FAILED
+                    ticket.error = "判题服务已停止"
+                    await self._release(ticket)
+                    raise
+                except Exception as e:
+                    ticket.status = FAILED
+                    ticket.error = str(getattr(e, "detail", None) or e)
+                    incr("exam.queue.failed")
+                    logger.warning(f"考试提交 {ticket.ticket_id} 判题失败: {ticket.error}")
+                await self._release(ticket)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+
+__all__ = [
+    "QUEUED",
+    "RUNNING",
+    "DONE",
+    "FAILED",
+    "ExamQueueFullError",
+    "ExamTicket",
+    "ExamAdmissionQueue",
+]
@@ -0,0 +1,124 @@
+"""条件请求与预压缩响应（题目列表、题目详情、知识点等大而少变的 JSON）。
+
+- 强 ETag：由调用方根据实体内容给出（题目记录的内容摘要 + 展示难度），不同压缩编码的表示带不同后缀；
+- If-None-Match 命中时返回 304，不再生成响应体；
+- 按 Accept-Encoding 协商 br / gzip，压缩结果按 ETag 缓存，同一实体只压缩一次。
+"""
+
+import gzip
+import hashlib
+from typing import Callable
+
+from fastapi import Request, Response
+
+from core.metrics import incr
+from core.ttl_cache import TTLCache
+from settings import get_settings
+
+try:
+    import brotli  # 可选：未安装时只协商 gzip
+except ImportError:  # pragma: no cover
+    brotli = None
+
+_settings = get_settings()
+
+# 小于此大小的响应体压缩收益有限，直接返回原文
+_MIN_COMPRESS_BYTES = 1024
+
+# (带编码后缀的 ETag) -> 压缩后的响应体
+_compressed = TTLCache(_settings.HTTP_COMPRESSED_CACHE_MAX_ENTRIES, _settings.HTTP_COMPRESSED_CACHE_TTL_SECONDS)
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def digest(*parts: bytes) -> str:
+    """计算 ETag 用的内容摘要（16 位十六进制）。"""
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """按 Accept-Encoding 选择压缩编码：优先 br，其次 gzip；q=0 视为不接受。"""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较，忽略 W/ 前缀）。"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def cached_response(
+    request: Request,
+    etag: str,
+    build: Callable[[], bytes],
+    media_type: str = "application/json",
+) -> Response:
+    """返回带 ETag 的响应：If-None-Match 命中时为 304，否则按协商的编码返回（压缩结果按 ETag 缓存）。
+
+    :param etag: 实体的强校验值（不含引号与编码后缀），内容变化时必须变化
+    :param build: 生成未压缩响应体，仅在需要返回实体时调用
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    plain = f'"{etag}"'
+    tagged = f'"{etag}-{encoding}"' if encoding else plain
+    headers = {"ETag": tagged, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    # 过小未压缩的实体以不带后缀的 ETag 返回过，重新验证时同样视为命中
+    for candidate in (tagged, plain):
+        if etag_matches(if_none_match, candidate):
+            incr("http_cache.not_modified")
+            headers["ETag"] = candidate
+            return Response(status_code=304, headers=headers)
+
+    if encoding is None:
+        return Response(content=build(), media_type=media_type, headers=headers)
+    body = _compressed.get(tagged)
+    if body is None:
+        raw = build()
+        if len(raw) < _MIN_COMPRESS_BYTES:
+            headers["ETag"] = plain
+            return Response(content=raw, media_type=media_type, headers=headers)
+        incr("http_cache.compress")
+        body = _compress(raw, encoding)
+        _compressed.set(tagged, body)
+    else:
+        incr("http_cache.compressed_hit")
+    headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+__all__ = ["digest", "choose_encoding", "etag_matches", "cached_response"]
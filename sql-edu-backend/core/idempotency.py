@@ -0,0 +1,88 @@
+"""幂等请求：同一 Idempotency-Key 的重试直接返回已保存的结果，并发的重复请求等待同一次计算。
+
+- 结果保存在进程内 TTL 缓存中，过期后同一键会重新计算；
+- 同一键携带不同请求内容时拒绝（IdempotencyKeyReusedError），避免把旧结果返回给新请求；
+- 计算失败不保存结果，等待中的重复请求收到同一异常，之后的重试重新计算；
+- 首个请求被取消（客户端断开）时，等待中的重复请求接手重新计算。
+
+只在单个进程内有效；多进程部署时重试可能落到其他进程而重新计算。
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Hashable
+
+from core.metrics import incr
+from core.ttl_cache import TTLCache
+
+
+class IdempotencyKeyReusedError(Exception):
+    """同一幂等键被用于内容不同的请求。"""
+    pass
+
+
+def request_fingerprint(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """按幂等键保存结果，并合并进行中的重复请求。"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: dict[Hashable, tuple[str, asyncio.Future]] = {}
+
+    async def run(
+        self, key: Hashable, fingerprint: str, compute: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, bool]:
+        """执行或复用一次计算。
+
+        :return: (结果, 是否为复用的结果)
+        :raises IdempotencyKeyReusedError: 同一键对应的请求内容不同
+        """
+        while True:
+            stored = self._results.get(key)
+            if stored is not None:
+                self._check(stored[0], fingerprint)
+                incr("idempotency.replayed")
+                return stored[1], True
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self._check(inflight[0], fingerprint)
+            incr("idempotency.joined")
+            future = inflight[1]
+            try:
+                # shield：本请求被取消时不影响正在进行的计算
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    continue  # 首个请求已取消，由本请求重新计算
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有重复请求等待时不告警
+            raise
+        else:
+            self._results.set(key, (fingerprint, value))
+            future.set_result(value)
+            return value, False
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _check(stored_fingerprint: str, fingerprint: str) -> None:
+        if stored_fingerprint != fingerprint:
+            incr("idempotency.key_reused")
+            raise IdempotencyKeyReusedError("该 Idempotency-Key 已用于内容不同的请求")
+
+
+__all__ = ["IdempotencyKeyReusedError", "IdempotencyStore", "request_fingerprint"]
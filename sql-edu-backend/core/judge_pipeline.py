@@ -0,0 +1,321 @@
+"""判题流水线：沙箱建表、可见数据判题、隐藏测试数据校验，与 HTTP 层解耦。
+
+check_sql 可直接在请求内调用 run_judge，也可把 JudgeTask 放入判题任务队列（core/judge_queue.py），
+由独立的判题 worker 进程执行后回写 JudgeOutcome；两种方式判题结果完全一致。
+
+沙箱中的判题表只按表名区分，不同题目可能使用同名表。建表与判题通过 sandbox_tables 持有进程内的表集合闸门：
+schema 相同的判题可以并发，schema 不同的建表要等正在使用这些表的判题全部结束。闸门只在单个进程内生效，
+多个进程（API 与判题 worker）共用一个沙箱时，应按进程划分沙箱分片或让判题只在 worker 中执行。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, fields
+from typing import Any, AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cost_guard import resolve_row_budget, schema_row_upper_bound
+from core.data_generator import DataGenerationError, generate_schema_tables
+from core.dataset_loader import DatasetError, load_schema_datasets
+from core.dialects import dialect_for_session
+from core.judge_setup import (
+    execute_setup_sql,
+    forget_sandbox_tables,
+    generate_init_sql_from_schema_preview,
+    record_sandbox_tables,
+    sandbox_tables_current,
+    schema_signature,
+    schema_table_names,
+)
+from core.metrics import incr, timed
+from core.multi_dataset_judge import judge_hidden_datasets, parse_hidden_datasets
+from core.sandbox import SandboxConnectionError, sandbox_session_for
+from core.sql_judge import (
+    SQLConnectionLostError,
+    SQLCostExceededError,
+    SQLJudgeError,
+    SQLJudgeService,
+    SQLSafetyError,
+)
+from settings import get_settings
+
+_settings = get_settings()
+
+
+class JudgeSetupError(Exception):
+    """判题数据准备失败（外部数据集缺失、合成数据出错等），此时判题结果不可信。"""
+    pass
+
+
+@dataclass
+class JudgeTask:
+    """一次判题所需的全部输入（题目字段快照 + 学生 SQL），可序列化后放入任务队列。"""
+
+    question_id: int
+    student_sql: str
+    correct_sql: str
+    schema_preview: str | None = None
+    hidden_datasets: str | None = None
+    required_output_columns: str | None = None
+    max_estimated_rows: int | None = None
+    judge_dialect: str | None = None
+    ignore_column_order: bool = False
+
+    @classmethod
+    def from_question(cls, question: Any, student_sql: str) -> "JudgeTask":
+        return cls(
+            question_id=question.id,
+            student_sql=student_sql,
+            correct_sql=question.correct_sql,
+            schema_preview=getattr(question, "schema_preview", None),
+            hidden_datasets=getattr(question, "hidden_datasets", None),
+            required_output_columns=getattr(question, "required_output_columns", None),
+            max_estimated_rows=getattr(question, "max_estimated_rows", None),
+            judge_dialect=getattr(question, "judge_dialect", None),
+            ignore_column_order=bool(getattr(question, "ignore_column_order", False)),
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "JudgeTask":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+@dataclass
+class JudgeOutcome:
+    """判题结果，字段与 SQLCheckResponse 中的判题部分一一对应。"""
+
+    is_correct: bool = False
+    error_message: str | None = None
+    is_safety_blocked: bool = False  # 因危险操作被拒
+    failed_dataset: str | None = None  # 未通过的隐藏测试数据类别
+    cost_blocked_tables: list[str] | None = None  # 执行前代价检查拒绝时涉及的表
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "JudgeOutcome":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+class SandboxTableGate:
+    """进程内按 (沙箱, 表名) 加锁：同一份 schema 的使用者共享，不同 schema 互斥。
+
+    先到的其他 schema 使用者还在等待某张表时，后来的同 schema 使用者也排在它之后，避免重建请求被持续到来的判题饿死。
+    """
+
+    def __init__(self) -> None:
+        self._cond = asyncio.Condition()
+        # (沙箱, 表名) -> (当前使用的 schema 签名, 使用者数量)
+        self._holders: dict[tuple[str, str], tuple[str, int]] = {}
+        # 按到达顺序排列的等待者：(表集合, schema 签名)
+        self._waiters: list[tuple[frozenset, str]] = []
+
+    def _can_enter(self, waiter: tuple[frozenset, str]) -> bool:
+        keys, signature = waiter
+        if any(self._holders.get(k, (signature, 0))[0] != signature for k in keys):
+            return False
+        for earlier in self._waiters:
+            if earlier is waiter:
+                return True
+            if earlier[1] != signature and earlier[0] & keys:
+                return False
+        return True
+
+    @asynccontextmanager
+    async def hold(self, sandbox: str, table_names: list[str], signature: str) -> AsyncIterator[None]:
+        keys = frozenset((sandbox, name) for name in table_names)
+        waiter = (keys, signature)
+        async with self._cond:
+            self._waiters.append(waiter)
+            try:
+                if not self._can_enter(waiter):
+                    incr("sandbox.table_gate.waited")
+                    await self._cond.wait_for(lambda: self._can_enter(waiter))
+            finally:
+                self._waiters = [w for w in self._waiters if w is not waiter]
+                # 取消等待时后面的等待者可能因此可以进入
+                self._cond.notify_all()
+            for k in keys:
+                self._holders[k] = (signature, self._holders.get(k, (signature, 0))[1] + 1)
+        try:
+            yield
+        finally:
+            async with self._cond:
+                for k in keys:
+                    held_signature, count = self._holders[k]
+                    if count > 1:
+                        self._holders[k] = (held_signature, count - 1)
+                    else:
+                        del self._holders[k]
+                self._cond.notify_all()
+
+
+_table_gate = SandboxTableGate()
+
+
+@asynccontextmanager
+async def sandbox_tables(
+    schema_preview: str | None, sandbox_session: AsyncSession, build: bool = True
+) -> AsyncIterator[bool]:
+    """持有题目表集合的闸门并调用 prepare_sandbox，退出前同名表不会被其他 schema 的题目重建。
+
+    建表、判题、运行查询与效率计时都应在此上下文内进行。
+
+    :param build: 为 False 时不建表，只检查沙箱中的表是否仍由这份 schema 建成（效率计时等只读场景）
+    :return: 上下文中得到表是否为该 schema 的最新版本；build=True 时总为 True
+    :raises JudgeSetupError: 外部数据集或合成数据准备失败
+    """
+    table_names = schema_table_names(schema_preview)
+    if not table_names:
+        if build:
+            await prepare_sandbox(schema_preview, sandbox_session)
+        yield True
+        return
+    dialect = dialect_for_session(sandbox_session)
+    signature = schema_signature(schema_preview, dialect)
+    bind = sandbox_session.bind
+    sandbox = bind.url.render_as_string(hide_password=True) if bind is not None else ""
+    async with _table_gate.hold(sandbox, table_names, signature):
+        if build:
+            await prepare_sandbox(schema_preview, sandbox_session)
+            yield True
+        else:
+            yield await sandbox_tables_current(sandbox_session, table_names, signature)
+
+
+async def prepare_sandbox(schema_preview: str | None, sandbox_session: AsyncSession) -> None:
+    """根据 schema_preview 在沙箱中建表并写入示例/外部/合成数据（建表语法按沙箱实际方言生成）。
+
+    不持有表集合闸门；需要在建表后使用这些表时改用 sandbox_tables。
+
+    :raises JudgeSetupError: 外部数据集或合成数据准备失败
+    """
+    dialect = dialect_for_session(sandbox_session)
+    init_sql = generate_init_sql_from_schema_preview(schema_preview, dialect=dialect)
+    if not init_sql:
+        return
+    # 沙箱中的表已由同一份 schema 建成（之前的判题或预热）时直接复用
+    table_names = schema_table_names(schema_preview)
+    signature = schema_signature(schema_preview, dialect)
+    if await sandbox_tables_current(sandbox_session, table_names, signature):
+        incr("sandbox.prepare.reused")
+        return
+    incr("sandbox.prepare.built")
+    with timed("sandbox.prepare"):
+        await forget_sandbox_tables(sandbox_session, table_names)
+        await execute_setup_sql(sandbox_session, init_sql)
+        # 引用外部数据集/合成数据的表：建表后批量写入完整数据
+        try:
+            await load_schema_datasets(sandbox_session, schema_preview)
+            await generate_schema_tables(sandbox_session, schema_preview)
+        except (DatasetError, DataGenerationError) as e:
+            raise JudgeSetupError(str(e)) from e
+        await record_sandbox_tables(sandbox_session, table_names, signature)
+        # 提交建表数据，隐藏测试数据判题使用的其他沙箱连接才能看到未被遮蔽的表
+        await sandbox_session.commit()
+
+
+def _has_rows_at_least(schema_preview: str | None, threshold: int) -> bool:
+    """题目数据行数达到 threshold（引用外部数据集、行数未知时视为达到）；threshold<=0 表示关闭。"""
+    if threshold <= 0:
+        return False
+    rows = schema_row_upper_bound(schema_preview)
+    return rows is None or rows >= threshold
+
+
+def should_spill_results(schema_preview: str | None) -> bool:
+    """题目数据量大（或引用外部数据集、行数未知）时，判题结果落盘对比，避免整表结果撑爆内存。"""
+    return _has_rows_at_least(schema_preview, _settings.JUDGE_SPILL_MIN_ROWS)
+
+
+def should_fingerprint_results(schema_preview: str | None) -> bool:
+    """题目数据量较大时先在数据库内比较结果指纹，正确提交无需把结果集传回应用。"""
+    return _has_rows_at_least(schema_preview, _settings.JUDGE_FINGERPRINT_MIN_ROWS)
+
+
+async def run_judge(task: JudgeTask, sandbox_session: AsyncSession) -> JudgeOutcome:
+    """执行一次完整判题：按判题方言选择沙箱，建表后判题；可见数据通过后再在隐藏测试数据上并发校验。
+
+    学生 SQL 的安全、代价与执行错误都折算进 JudgeOutcome，只有数据准备失败与沙箱不可用会抛出。
+    判题途中分片连接中断时，该分片已被标记为不可用，在环上的下一个分片重试一次（建表幂等，会在新分片上重建）；
+    调用方只在拿到结果后才写提交记录，连接中断不会计为一次错误提交。
+
+    :param sandbox_session: 默认沙箱会话；题目指定了其他方言或开启分片时改用对应沙箱的临时会话
+    :raises JudgeSetupError: 判题数据准备失败
+    :raises SandboxUnavailableError: 题目的判题方言未配置沙箱，所有分片均不可用，或重试后连接仍中断
+    """
+    try:
+        return await _run_judge_once(task, sandbox_session)
+    except SandboxConnectionError as e:
+        if e.shard is None:
+            raise
+        incr("judge.shard_retry")
+        return await _run_judge_once(task, sandbox_session)
+
+
+async def _run_judge_once(task: JudgeTask, sandbox_session: AsyncSession) -> JudgeOutcome:
+    outcome = JudgeOutcome()
+    async with (
+        sandbox_session_for(task.judge_dialect, sandbox_session, task.question_id) as judge_session,
+        sandbox_tables(task.schema_preview, judge_session),
+    ):
+
+        # 数据量较大的题目先 EXPLAIN，估算扫描行数超出预算则不执行
+        row_budget = resolve_row_budget(task.max_estimated_rows, task.schema_preview)
+        judge_service = SQLJudgeService(
+            judge_session,
+            row_budget=row_budget,
+            spill_to_disk=should_spill_results(task.schema_preview),
+            fingerprint_compare=should_fingerprint_results(task.schema_preview),
+            ignore_column_order=task.ignore_column_order,
+            parallel_queries=_settings.JUDGE_PARALLEL_QUERIES,
+        )
+        try:
+            outcome.is_correct, outcome.error_message = await judge_service.judge_sql(
+                task.student_sql, task.correct_sql, required_output_columns=task.required_output_columns
+            )
+            # 可见数据通过后，在隐藏测试数据上并发校验，防止按示例数据硬编码结果
+            hidden_datasets = parse_hidden_datasets(task.hidden_datasets)
+            if outcome.is_correct and hidden_datasets:
+                outcome.is_correct, hidden_error, outcome.failed_dataset = await judge_hidden_datasets(
+                    judge_session.bind,
+                    hidden_datasets,
+                    task.student_sql,
+                    task.correct_sql,
+                    required_output_columns=task.required_output_columns,
+                    row_budget=task.max_estimated_rows,
+                    ignore_column_order=task.ignore_column_order,
+                )
+                if not outcome.is_correct:
+                    outcome.error_message = hidden_error
+        except SQLConnectionLostError:
+            # 连接中断与学生 SQL 无关：向上抛出，由 sandbox_session_for 标记分片不可用
+            raise
+        except SQLSafetyError as e:
+            outcome = JudgeOutcome(error_message=str(e), is_safety_blocked=True)
+        except SQLCostExceededError as e:
+            # 代价超限同样作为执行错误交给 AI 提示，学生能看到是哪些表缺少连接/过滤条件
+            outcome = JudgeOutcome(error_message=str(e), cost_blocked_tables=e.tables)
+        except SQLJudgeError as e:
+            outcome = JudgeOutcome(error_message=str(e))
+    return outcome
+
+
+__all__ = [
+    "JudgeSetupError",
+    "JudgeTask",
+    "JudgeOutcome",
+    "SandboxTableGate",
+    "sandbox_tables",
+    "prepare_sandbox",
+    "should_spill_results",
+    "should_fingerprint_results",
+    "run_judge",
+]
@@ -0,0 +1,247 @@
+"""基于数据库表的持久化判题任务队列（judge_jobs）。
+
+- check_sql 调用 enqueue_judge_job 写入任务，再 wait_for_judge_result 轮询结果；两者使用独立的会话提交，
+  不会提交或结束调用方请求会话中的事务；
+- 判题 worker（core/judge_worker.py）用 SELECT ... FOR UPDATE SKIP LOCKED 领取任务，多个 worker 互不阻塞，可水平扩容；
+- 领取时写入租约 locked_until（可见性超时），判题期间 worker 定期续租；worker 崩溃后租约过期，任务会被其他 worker 重新领取；
+- 被领取次数超过 max_attempts 的任务标记为 failed，等待方收到 JudgeJobFailedError；
+- 已结束（done / failed）超过保留时间的任务由 worker 定期分批删除。
+
+SQLite 不支持 FOR UPDATE，SQLAlchemy 会省略该子句；SQLite 只适合单 worker 的本地开发与测试。
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.judge_pipeline import JudgeOutcome, JudgeTask
+from core.metrics import incr
+from models.judge_job import JudgeJob
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JudgeQueueError(Exception):
+    """判题任务队列相关错误的基类。"""
+    pass
+
+
+class JudgeJobFailedError(JudgeQueueError):
+    """判题任务执行失败（数据准备失败，或 worker 多次中断超过重试上限）。"""
+    pass
+
+
+class JudgeQueueTimeoutError(JudgeQueueError):
+    """在等待时间内没有 worker 完成该判题任务。"""
+    pass
+
+
+def _default_session_factory() -> async_sessionmaker[AsyncSession]:
+    from models import AsyncSessionFactory
+
+    return AsyncSessionFactory
+
+
+async def enqueue_judge_job(task: JudgeTask, session_factory: async_sessionmaker[AsyncSession] | None = None) -> int:
+    """在独立会话中写入一条待判题任务并提交（worker 使用其他连接，必须提交后才可见）。
+
+    :param session_factory: 为空时使用业务主库的 AsyncSessionFactory
+    :return: 任务 ID
+    """
+    async with (session_factory or _default_session_factory())() as session:
+        job = JudgeJob(status=PENDING, payload=json.dumps(task.to_dict(), ensure_ascii=False))
+        session.add(job)
+        await session.flush()
+        job_id = job.id
+        await session.commit()
+    incr("judge.queue.enqueued")
+    return job_id
+
+
+async def claim_judge_job(
+    session: AsyncSession,
+    worker_id: str,
+    visibility_timeout: float,
+    max_attempts: int,
+    now: datetime | None = None,
+) -> tuple[int, JudgeTask] | None:
+    """领取一条任务：pending 的任务，或 running 但租约已过期（worker 已崩溃）的任务。
+
+    超过重试上限的过期任务直接标记为 failed 并继续找下一条。
+
+    :return: (任务 ID, JudgeTask)；队列为空时返回 None
+    """
+    while True:
+        now = now or datetime.utcnow()
+        stmt = (
+            select(JudgeJob)
+            .where(
+                or_(
+                    JudgeJob.status == PENDING,
+                    and_(JudgeJob.status == RUNNING, JudgeJob.locked_until < now),
+                )
+            )
+            .order_by(JudgeJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = (await session.execute(stmt)).scalar_one_or_none()
+        if job is None:
+            await session.commit()
+            return None
+        if job.status == RUNNING:
+            incr("judge.queue.lease_expired")
+        if job.attempts >= max_attempts:
+            job.status = FAILED
+            job.error = f"判题 worker 连续 {job.attempts} 次未能完成该任务"
+            job.locked_by = None
+            job.locked_until = None
+            await session.commit()
+            incr("judge.queue.failed")
+            continue
+        job.status = RUNNING
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_until = now + timedelta(seconds=visibility_timeout)
+        job_id, payload = job.id, job.payload
+        await session.commit()
+        return job_id, JudgeTask.from_dict(json.loads(payload))
+
+
+async def complete_judge_job(session: AsyncSession, job_id: int, worker_id: str, outcome: JudgeOutcome) -> bool:
+    """回写判题结果；租约已被其他 worker 接管时不覆盖（返回 False）。"""
+    return await _finish(
+        session, job_id, worker_id, status=DONE, result=json.dumps(outcome.to_dict(), ensure_ascii=False)
+    )
+
+
+async def fail_judge_job(session: AsyncSession, job_id: int, worker_id: str, error: str) -> bool:
+    """标记任务失败（不再重试），例如判题数据准备失败。"""
+    incr("judge.queue.failed")
+    return await _finish(session, job_id, worker_id, status=FAILED, error=error)
+
+
+async def extend_judge_job_lease(
+    session: AsyncSession,
+    job_id: int,
+    worker_id: str,
+    visibility_timeout: float,
+    now: datetime | None = None,
+) -> bool:
+    """续租：判题耗时较长时由 worker 定期调用，避免租约过期后任务被其他 worker 重复领取。
+
+    :return: 任务仍由该 worker 持有时返回 True；已被其他 worker 接管或已结束时返回 False
+    """
+    now = now or datetime.utcnow()
+    stmt = (
+        update(JudgeJob)
+        .where(JudgeJob.id == job_id, JudgeJob.status == RUNNING, JudgeJob.locked_by == worker_id)
+        .values(locked_until=now + timedelta(seconds=visibility_timeout))
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def purge_finished_judge_jobs(
+    session: AsyncSession,
+    retention_seconds: float,
+    now: datetime | None = None,
+    batch_size: int = 1000,
+) -> int:
+    """删除结束（done / failed）超过 retention_seconds 的任务，每批删除后提交，避免长事务与大范围锁。
+
+    :return: 删除的任务数
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=retention_seconds)
+    total = 0
+    while True:
+        ids = (
+            await session.execute(
+                select(JudgeJob.id)
+                .where(JudgeJob.status.in_((DONE, FAILED)), JudgeJob.updated_at < cutoff)
+                .order_by(JudgeJob.id)
+                .limit(max(1, batch_size))
+            )
+        ).scalars().all()
+        if not ids:
+            await session.commit()
+            break
+        await session.execute(delete(JudgeJob).where(JudgeJob.id.in_(ids)))
+        await session.commit()
+        total += len(ids)
+    if total:
+        incr("judge.queue.purged", total)
+    return total
+
+
+async def _finish(session: AsyncSession, job_id: int, worker_id: str, **values) -> bool:
+    stmt = (
+        update(JudgeJob)
+        .where(JudgeJob.id == job_id, JudgeJob.status == RUNNING, JudgeJob.locked_by == worker_id)
+        .values(locked_until=None, updated_at=datetime.utcnow(), **values)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def wait_for_judge_result(
+    job_id: int,
+    timeout: float,
+    poll_interval: float = 0.1,
+    session_factory: async_sessionmaker[AsyncSession] | None = None,
+) -> JudgeOutcome:
+    """在独立会话中轮询等待判题结果。
+
+    每次读取后结束该会话的事务，避免 REPEATABLE READ 下一直读到旧快照。
+
+    :param session_factory: 为空时使用业务主库的 AsyncSessionFactory
+    :raises JudgeJobFailedError: 任务失败
+    :raises JudgeQueueTimeoutError: 超时仍未完成
+    """
+    async with (session_factory or _default_session_factory())() as session:
+        return await _poll_result(session, job_id, timeout, poll_interval)
+
+
+async def _poll_result(session: AsyncSession, job_id: int, timeout: float, poll_interval: float) -> JudgeOutcome:
+    deadline = time.monotonic() + timeout
+    while True:
+        row = (
+            await session.execute(
+                select(JudgeJob.status, JudgeJob.result, JudgeJob.error).where(JudgeJob.id == job_id)
+            )
+        ).one_or_none()
+        await session.commit()
+        if row is None:
+            raise JudgeJobFailedError(f"判题任务 {job_id} 不存在")
+        status, result, error = row
+        if status == DONE:
+            return JudgeOutcome.from_dict(json.loads(result))
+        if status == FAILED:
+            raise JudgeJobFailedError(error or "判题任务执行失败")
+        if time.monotonic() >= deadline:
+            incr("judge.queue.wait_timeout")
+            raise JudgeQueueTimeoutError(f"判题任务 {job_id} 在 {timeout:g} 秒内未完成")
+        await asyncio.sleep(poll_interval)
+
+
+__all__ = [
+    "JudgeQueueError",
+    "JudgeJobFailedError",
+    "JudgeQueueTimeoutError",
+    "enqueue_judge_job",
+    "claim_judge_job",
+    "complete_judge_job",
+    "fail_judge_job",
+    "extend_judge_job_lease",
+    "purge_finished_judge_jobs",
+    "wait_for_judge_result",
+]
@@ -1,58 +1,47 @@
 """判题前自动建表：根据题目的 schema_preview 在判题库中创建表并插入示例数据。"""
 
+import hashlib
 import json
 import logging
 import re
 from typing import Any
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+
+from core.dataset_loader import DatasetError, has_external_dataset, resolve_dataset_path
+from core.dialects import JudgeDialect, get_dialect, infer_column_kind, is_connection_error
 
 logger = logging.getLogger(__name__)
 
+MYSQL = get_dialect("mysql")
+
 
 def _infer_mysql_type(col_name: str, sample_value: Any) -> str:
     """根据列名和示例值推断 MySQL 类型。"""
-    name_lower = (col_name or "").lower()
-    if name_lower == "id":
-        return "INT NOT NULL AUTO_INCREMENT PRIMARY KEY"
-    if name_lower.endswith("_id"):
-        return "INT NOT NULL"
-    if "amount" in name_lower or "price" in name_lower or "sum" in name_lower:
-        return "DECIMAL(12,2) DEFAULT NULL"
-    if name_lower.endswith("_at") or name_lower in ("created_at", "updated_at", "date", "time"):
-        return "DATETIME DEFAULT NULL"
-    if sample_value is None:
-        return "VARCHAR(255) DEFAULT NULL"
-    if isinstance(sample_value, bool):
-        return "TINYINT(1) DEFAULT NULL"
-    if isinstance(sample_value, int):
-        return "INT DEFAULT NULL"
-    if isinstance(sample_value, (float,)):
-        return "DECIMAL(12,2) DEFAULT NULL"
-    if isinstance(sample_value, str) and re.match(r"^\d{4}-\d{2}-\d{2}[T ]?\d{2}:\d{2}", sample_value):
-        return "DATETIME DEFAULT NULL"
-    return "VARCHAR(255) DEFAULT NULL"
+    return MYSQL.column_type(infer_column_kind(col_name, sample_value))
 
 
 def _escape_sql_value(v: Any) -> str:
-    """将 Python 值转成 SQL 字面量（防注入、引号转义）。"""
-    if v is None:
-        return "NULL"
-    if isinstance(v, bool):
-        return "1" if v else "0"
-    if isinstance(v, (int, float)):
-        return str(v)
-    s = str(v).replace("\\", "\\\\").replace("'", "''")
-    return f"'{s}'"
-
-
-def generate_init_sql_from_schema_preview(schema_preview: str | None) -> str | None:
+    """将 Python 值转成 MySQL 字面量（防注入、引号转义）。"""
+    return MYSQL.escape_value(v)
+
+
+def generate_init_sql_from_schema_preview(
+    schema_preview: str | None,
+    temporary: bool = False,
+    dialect: JudgeDialect | str | None = None,
+) -> str | None:
     """从 schema_preview JSON 生成建表与插入 SQL（DROP TABLE + CREATE TABLE + INSERT）。
 
     schema_preview 格式: {"tables":[{"name":"orders","columns":["id",...],"rows":[{...}]}]}
     每次判题前先删除旧表再重建，确保表结构与 schema_preview 一致。
+    引用外部数据集（dataset 字段）的表只建表，数据由 core.dataset_loader 批量导入。
+    temporary=True 时生成仅当前连接可见的临时表（用于非 MySQL 后端的隐藏测试数据），同名临时表会遮蔽正式表。
+    dialect 为判题后端方言（默认 MySQL），决定标识符引号、列类型、字面量转义与 INSERT 冲突处理写法。
     """
+    if not isinstance(dialect, JudgeDialect):
+        dialect = get_dialect(dialect)
     if not schema_preview or not schema_preview.strip():
         return None
     try:
@@ -90,44 +79,30 @@ def generate_init_sql_from_schema_preview(schema_preview: str | None) -> str | N
                 if isinstance(row, dict) and col in row:
                     sample = row[col]
                     break
-            type_str = _infer_mysql_type(safe_col, sample)
-            col_defs.append(f"`{safe_col}` {type_str}")
+            type_str = dialect.column_type(infer_column_kind(safe_col, sample))
+            col_defs.append(f"{dialect.quote_ident(safe_col)} {type_str}")
         if not col_defs:
             continue
         # 先删除旧表，确保使用最新的表结构（避免旧表缺少新列导致判题失败）
-        drop_sql = f"DROP TABLE IF EXISTS `{safe_name}`"
-        statements.append(drop_sql)
-        create_sql = f"CREATE TABLE `{safe_name}` (\n  " + ",\n  ".join(col_defs) + "\n) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
-        statements.append(create_sql)
+        statements.append(dialect.drop_table_sql(safe_name, temporary=temporary))
+        statements.append(dialect.create_table_sql(safe_name, col_defs, temporary=temporary))
 
-        if not rows:
+        if not rows or has_external_dataset(tbl):
             continue
-        # INSERT ... ON DUPLICATE KEY UPDATE 保证重复执行不报错
+        # 主键冲突覆盖 / 无主键忽略冲突（MySQL 为 ON DUPLICATE KEY UPDATE / INSERT IGNORE），保证重复执行不报错
         insert_cols = [c for c in columns if isinstance(c, str) and re.match(r"^\w+$", c)]
         if not insert_cols:
             continue
-        cols_str = ", ".join(f"`{c}`" for c in insert_cols)
         value_rows: list[str] = []
         for row in rows:
             if not isinstance(row, dict):
                 continue
-            vals = [_escape_sql_value(row.get(c)) for c in insert_cols]
+            vals = [dialect.escape_value(row.get(c)) for c in insert_cols]
             value_rows.append("(" + ", ".join(vals) + ")")
         if not value_rows:
             continue
         has_pk = "id" in [c.lower() for c in insert_cols]
-        if has_pk:
-            update_parts = [f"`{c}`=VALUES(`{c}`)" for c in insert_cols]
-            insert_sql = (
-                f"INSERT INTO `{safe_name}` ({cols_str}) VALUES\n  "
-                + ",\n  ".join(value_rows)
-                + "\nON DUPLICATE KEY UPDATE " + ", ".join(update_parts)
-            )
-        else:
-            insert_sql = (
-                f"INSERT IGNORE INTO `{safe_name}` ({cols_str}) VALUES\n  "
-                + ",\n  ".join(value_rows)
-            )
+        insert_sql = dialect.insert_rows_sql(safe_name, insert_cols, value_rows, has_pk)
         statements.append(insert_sql)
 
     if not statements:
@@ -135,24 +110,28 @@ def generate_init_sql_from_schema_preview(schema_preview: str | None) -> str | N
     return ";\n".join(statements) + ";"
 
 
+_IDENT = r"(?:\w+\.)?[`\"]?\w+[`\"]?"
+
+
 def _is_safe_setup_statement(stmt: str) -> bool:
-    """只允许 DROP TABLE IF EXISTS、CREATE TABLE 和 INSERT [IGNORE] INTO，且表名仅字母数字下划线。"""
+    """只允许 DROP [TEMPORARY] TABLE IF EXISTS、CREATE [TEMP|TEMPORARY] TABLE 和 INSERT [IGNORE | OR IGNORE | OR REPLACE] INTO，
+    且表名仅字母数字下划线（可带 ` 或 " 引号，删除临时表时可带 temp. 等 schema 前缀）。"""
     s = stmt.strip()
     if not s:
         return False
     lower = s.lower()
     # 允许 DROP TABLE IF EXISTS（仅用于判题前重建表）
-    if lower.startswith("drop table if exists"):
-        return bool(re.match(r"drop\s+table\s+if\s+exists\s+`?\w+`?\s*$", lower))
-    if lower.startswith("create table"):
-        return bool(re.match(r"create\s+table\s+(?:if\s+not\s+exists\s+)?`?\w+`?\s*\(", lower))
-    if "insert" in lower[:20] and "into" in lower[:25]:
-        return bool(re.match(r"insert\s+(?:ignore\s+)?into\s+`?\w+`?\s*\(", lower))
+    if lower.startswith("drop table if exists") or lower.startswith("drop temporary table"):
+        return bool(re.match(rf"drop\s+(?:temporary\s+)?table\s+if\s+exists\s+{_IDENT}\s*$", lower))
+    if lower.startswith("create table") or lower.startswith("create temp"):
+        return bool(re.match(rf"create\s+(?:temp(?:orary)?\s+)?table\s+(?:if\s+not\s+exists\s+)?{_IDENT}\s*\(", lower))
+    if "insert" in lower[:20] and "into" in lower[:30]:
+        return bool(re.match(rf"insert\s+(?:ignore\s+|or\s+(?:ignore|replace)\s+)?into\s+{_IDENT}\s*\(", lower))
     return False
 
 
 async def execute_setup_sql(session: AsyncSession, init_sql: str) -> None:
-    """在判题库中执行建表/插入 SQL。仅允许 DROP TABLE IF EXISTS、CREATE TABLE 与 INSERT INTO。"""
+    """在判题库中执行建表/插入 SQL。仅允许 DROP TABLE IF EXISTS、CREATE TABLE 与 INSERT INTO（含临时表与各方言的冲突处理写法）。"""
     if not init_sql or not init_sql.strip():
         return
     # 按分号拆分，忽略空语句和注释
@@ -166,6 +145,102 @@ async def execute_setup_sql(session: AsyncSession, init_sql: str) -> None:
         try:
             await session.execute(text(stmt))
         except Exception as e:
+            if is_connection_error(e):
+                # 连接已断开：后续语句都会失败，交给调用方换连接（分片）重试
+                raise
             # 记录错误但继续执行，判题时若表结构有问题会报错
             logger.warning(f"执行建表/插入语句失败: {stmt[:100]}... 错误: {e}")
     await session.flush()
+
+
+# 沙箱中记录「各表当前由哪份 schema 建成」的标记表：签名一致时判题直接复用已建好的表，不再重建
+SANDBOX_MARKER_TABLE = "judge_sandbox_tables"
+
+
+def schema_table_names(schema_preview: str | None) -> list[str]:
+    """schema_preview 中会被建表的表名（与 generate_init_sql_from_schema_preview 的过滤规则一致）。"""
+    if not schema_preview or not schema_preview.strip():
+        return []
+    try:
+        data = json.loads(schema_preview)
+    except json.JSONDecodeError:
+        return []
+    tables = data.get("tables") if isinstance(data, dict) else None
+    if not isinstance(tables, list):
+        return []
+    names = []
+    for tbl in tables:
+        if not isinstance(tbl, dict) or not isinstance(tbl.get("columns"), list) or not tbl["columns"]:
+            continue
+        safe_name = re.sub(r"[^\w]", "", str(tbl.get("name") or ""))
+        if safe_name:
+            names.append(safe_name)
+    return names
+
+
+def schema_signature(schema_preview: str, dialect: JudgeDialect) -> str:
+    """建表内容签名：schema_preview 原文 + 方言 + 外部数据集文件的大小与修改时间（文件更新后签名随之变化）。"""
+    datasets = []
+    try:
+        tables = json.loads(schema_preview).get("tables") or []
+    except (json.JSONDecodeError, AttributeError):
+        tables = []
+    for tbl in tables:
+        spec = tbl.get("dataset") if isinstance(tbl, dict) else None
+        if not isinstance(spec, dict):
+            continue
+        try:
+            stat = resolve_dataset_path(spec.get("path")).stat()
+            datasets.append([str(spec.get("path")), stat.st_size, stat.st_mtime_ns])
+        except (DatasetError, OSError):
+            datasets.append([str(spec.get("path")), None, None])
+    payload = json.dumps([dialect.name, schema_preview, datasets], ensure_ascii=False)
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+async def sandbox_tables_current(session: AsyncSession, table_names: list[str], signature: str) -> bool:
+    """标记表显示这些表均由同一签名建成时返回 True（标记表不存在或查询失败视为需要重建）。"""
+    if not table_names:
+        return False
+    stmt = text(
+        f"SELECT table_name, signature FROM {SANDBOX_MARKER_TABLE} WHERE table_name IN :names"
+    ).bindparams(bindparam("names", expanding=True))
+    try:
+        # 标记表尚不存在时只回滚到保存点（PostgreSQL 出错后整个事务不可用）
+        async with session.begin_nested():
+            rows = (await session.execute(stmt, {"names": table_names})).all()
+    except Exception:
+        return False
+    found = {name: sig for name, sig in rows}
+    return all(found.get(name) == signature for name in table_names)
+
+
+async def _ensure_marker_table(session: AsyncSession) -> None:
+    await session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SANDBOX_MARKER_TABLE} "
+        "(table_name VARCHAR(64) PRIMARY KEY, signature VARCHAR(32) NOT NULL)"
+    ))
+
+
+async def forget_sandbox_tables(session: AsyncSession, table_names: list[str]) -> None:
+    """重建前先删除这些表的标记，重建中途失败时不会被误认为已建好。"""
+    if not table_names:
+        return
+    await _ensure_marker_table(session)
+    await session.execute(
+        text(f"DELETE FROM {SANDBOX_MARKER_TABLE} WHERE table_name IN :names").bindparams(
+            bindparam("names", expanding=True)
+        ),
+        {"names": table_names},
+    )
+
+
+async def record_sandbox_tables(session: AsyncSession, table_names: list[str], signature: str) -> None:
+    """建表与导入完成后写入标记（调用方随后提交）。"""
+    if not table_names:
+        return
+    await forget_sandbox_tables(session, table_names)
+    await session.execute(
+        text(f"INSERT INTO {SANDBOX_MARKER_TABLE} (table_name, signature) VALUES (:name, :signature)"),
+        [{"name": name, "signature": signature} for name in table_names],
+    )
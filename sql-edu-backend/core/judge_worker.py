@@ -0,0 +1,170 @@
+"""判题 worker 进程：从 judge_jobs 队列领取任务，在沙箱中判题并回写结果。
+
+启动（可在多台机器上启动多个进程，按判题负载水平扩容）：
+    python -m core.judge_worker
+
+API 进程设置 JUDGE_QUEUE_ENABLED=true 后，check_sql 只负责入队与等待结果，判题开销全部落在 worker 上。
+判题期间每隔 1/3 可见性超时续租一次，耗时较长的判题不会被其他 worker 重复领取；
+每个进程另有一个协程按 JUDGE_QUEUE_PURGE_INTERVAL_SECONDS 清理已结束的旧任务。
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.judge_pipeline import JudgeSetupError, run_judge
+from core.judge_queue import (
+    claim_judge_job,
+    complete_judge_job,
+    extend_judge_job_lease,
+    fail_judge_job,
+    purge_finished_judge_jobs,
+)
+from core.metrics import incr, timed
+from core.sandbox import SandboxUnavailableError, get_sandbox_session_factory
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+_settings = get_settings()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+async def _keep_lease(
+    session_factory: async_sessionmaker[AsyncSession], job_id: int, worker_id: str
+) -> None:
+    """判题期间定期续租，直到被取消；租约已被接管时停止续租（结果回写时会被拒绝）。"""
+    visibility_timeout = _settings.JUDGE_QUEUE_VISIBILITY_TIMEOUT_SECONDS
+    while True:
+        await asyncio.sleep(visibility_timeout / 3)
+        try:
+            async with session_factory() as session:
+                held = await extend_judge_job_lease(session, job_id, worker_id, visibility_timeout)
+        except Exception:
+            # 续租失败不中断判题：下一轮再试，租约真的过期时由回写结果时的检查兜底
+            logger.exception("judge job %s lease renewal failed", job_id)
+            continue
+        if not held:
+            incr("judge.worker.lease_lost")
+            logger.warning("judge job %s lease lost by %s during judging", job_id, worker_id)
+            return
+        incr("judge.worker.lease_renewed")
+
+
+async def process_one(
+    session_factory: async_sessionmaker[AsyncSession],
+    sandbox_session_factory: async_sessionmaker[AsyncSession],
+    worker_id: str,
+) -> bool:
+    """领取并执行一条判题任务。
+
+    :return: 是否领到了任务（队列为空时返回 False）
+    """
+    async with session_factory() as session:
+        claimed = await claim_judge_job(
+            session,
+            worker_id,
+            visibility_timeout=_settings.JUDGE_QUEUE_VISIBILITY_TIMEOUT_SECONDS,
+            max_attempts=_settings.JUDGE_QUEUE_MAX_ATTEMPTS,
+        )
+    if claimed is None:
+        return False
+    job_id, task = claimed
+
+    heartbeat = asyncio.create_task(_keep_lease(session_factory, job_id, worker_id))
+    try:
+        async with sandbox_session_factory() as sandbox_session:
+            with timed("judge.worker.run"):
+                outcome = await run_judge(task, sandbox_session)
+    except (JudgeSetupError, SandboxUnavailableError) as e:
+        # 数据或环境问题，重试也无法恢复，直接失败让 API 返回 503
+        async with session_factory() as session:
+            await fail_judge_job(session, job_id, worker_id, str(e))
+        return True
+    finally:
+        heartbeat.cancel()
+
+    async with session_factory() as session:
+        if not await complete_judge_job(session, job_id, worker_id, outcome):
+            # 判题超过可见性超时，任务已被其他 worker 接管，结果以对方为准
+            incr("judge.worker.stale_result")
+            logger.warning("judge job %s lease lost by %s", job_id, worker_id)
+    incr("judge.worker.completed")
+    return True
+
+
+async def _worker_loop(
+    session_factory: async_sessionmaker[AsyncSession],
+    sandbox_session_factory: async_sessionmaker[AsyncSession],
+    worker_id: str,
+    stop: asyncio.Event,
+) -> None:
+    idle_sleep = _settings.JUDGE_QUEUE_POLL_INTERVAL_MS / 1000
+    while not stop.is_set():
+        try:
+            busy = await process_one(session_factory, sandbox_session_factory, worker_id)
+        except Exception:
+            # 意外异常不退出进程；任务保持 running，租约过期后会被重新领取
+            logger.exception("judge worker %s failed to process a job", worker_id)
+            busy = False
+        if not busy:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=idle_sleep)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _purge_loop(session_factory: async_sessionmaker[AsyncSession], stop: asyncio.Event) -> None:
+    """定期删除已结束的旧任务；多个 worker 进程同时清理也只是重复删除同一批行。"""
+    interval = _settings.JUDGE_QUEUE_PURGE_INTERVAL_SECONDS
+    if interval <= 0:
+        return
+    while not stop.is_set():
+        try:
+            async with session_factory() as session:
+                await purge_finished_judge_jobs(session, _settings.JUDGE_QUEUE_RETENTION_SECONDS)
+        except Exception:
+            logger.exception("judge job purge failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(
+    session_factory: async_sessionmaker[AsyncSession] | None = None,
+    sandbox_session_factory: async_sessionmaker[AsyncSession] | None = None,
+    concurrency: int | None = None,
+    stop: asyncio.Event | None = None,
+) -> None:
+    """启动 concurrency 个并发消费协程与一个清理协程，直到 stop 被设置。"""
+    if session_factory is None:
+        from models import AsyncSessionFactory
+
+        session_factory = AsyncSessionFactory
+    if sandbox_session_factory is None:
+        sandbox_session_factory = get_sandbox_session_factory()
+    concurrency = max(1, concurrency or _settings.JUDGE_WORKER_CONCURRENCY)
+    stop = stop or asyncio.Event()
+    base_id = default_worker_id()
+    await asyncio.gather(
+        *(
+            _worker_loop(session_factory, sandbox_session_factory, f"{base_id}/{i}", stop)
+            for i in range(concurrency)
+        ),
+        _purge_loop(session_factory, stop),
+    )
+
+
+__all__ = ["process_one", "run_worker", "default_worker_id"]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
@@ -0,0 +1,27 @@
+"""事件循环阻塞监控：周期性 sleep，实际醒来时间比预期晚多少即为事件循环被同步代码占用的时间。
+
+指标（见 /metrics）：
+- event_loop.lag：每次采样的延迟；
+- event_loop.blocked：延迟超过阈值的采样（即明显卡住其他请求的阻塞），计数器同名。
+"""
+
+import asyncio
+import time
+
+from core.metrics import incr, record_timing
+
+
+async def monitor_event_loop_lag(interval_ms: float, warn_ms: float) -> None:
+    """持续采样事件循环延迟，直到任务被取消。"""
+    interval = interval_ms / 1000
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms = max(0.0, (time.perf_counter() - start - interval) * 1000)
+        record_timing("event_loop.lag", lag_ms)
+        if lag_ms >= warn_ms:
+            record_timing("event_loop.blocked", lag_ms)
+            incr("event_loop.blocked")
+
+
+__all__ = ["monitor_event_loop_lag"]
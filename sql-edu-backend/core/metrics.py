@@ -0,0 +1,62 @@
+"""进程内轻量指标：记录判题各环节的耗时与计数，供 /metrics 查看与压测对比。
+
+只在单个进程内累计，不做持久化；多 worker 部署时每个进程各自统计。
+"""
+
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator
+
+_lock = Lock()
+_timings: dict[str, dict[str, float]] = {}
+_counters: dict[str, int] = {}
+
+
+def record_timing(name: str, elapsed_ms: float) -> None:
+    """累计一次耗时（毫秒）。"""
+    with _lock:
+        stat = _timings.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stat["count"] += 1
+        stat["total_ms"] += elapsed_ms
+        stat["max_ms"] = max(stat["max_ms"], elapsed_ms)
+
+
+def incr(name: str, value: int = 1) -> None:
+    """计数器加 value。"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """with timed("judge.cost_guard"): ... 记录代码块耗时（异常时同样记录）。"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, (time.perf_counter() - start) * 1000)
+
+
+def snapshot() -> dict[str, dict]:
+    """当前指标快照：timings 含 count / avg_ms / max_ms，counters 为累计值。"""
+    with _lock:
+        timings = {
+            name: {
+                "count": int(stat["count"]),
+                "avg_ms": round(stat["total_ms"] / stat["count"], 3) if stat["count"] else 0.0,
+                "max_ms": round(stat["max_ms"], 3),
+            }
+            for name, stat in _timings.items()
+        }
+        return {"timings": timings, "counters": dict(_counters)}
+
+
+def reset() -> None:
+    """清空全部指标（测试用）。"""
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+__all__ = ["record_timing", "incr", "timed", "snapshot", "reset"]
@@ -0,0 +1,282 @@
+"""隐藏测试数据判题：在多组不可见数据上并发校验学生 SQL，防止按示例数据硬编码结果。
+
+questions.hidden_datasets 格式（JSON 数组）：
+    [{"label": "empty", "tables": [{"name": "orders", "columns": [...], "rows": []}]},
+     {"label": "large", "tables": [{"name": "orders", "columns": [...], "generate": {"rows": 100000}}]}]
+
+每组数据在独立的沙箱连接上建表（未列出的表沿用可见数据），各组并发执行，
+任一组不一致即取消其余组并返回该组的类别，不透露其数据内容：
+- MySQL：临时表在同一语句中只能打开一次，学生 SQL 自连接会报错，因此每组数据新建一个暂存库
+  （SCRATCH_DATABASE_PREFIX + 随机后缀），用普通表装载隐藏数据、未列出的表建成指向原库同名表的视图，
+  连接切到暂存库后判题，结束后删库。沙箱账号需有该前缀库的 CREATE / DROP / CREATE VIEW 权限；
+- 其他后端的临时表没有此限制，建同名临时表（仅该连接可见，遮蔽正式表）。
+"""
+
+import asyncio
+import json
+import logging
+import re
+import uuid
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from core.data_generator import generate_schema_tables
+from core.dataset_loader import load_schema_datasets
+from core.dialects import JudgeDialect, get_dialect, is_connection_error
+from core.cost_guard import resolve_row_budget
+from core.judge_setup import execute_setup_sql, generate_init_sql_from_schema_preview
+from core.sql_judge import SQLCostExceededError, SQLJudgeService, SQLSafetyError
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+# 隐藏数据暂存库的库名前缀（每组数据一个，判题结束后删除）
+SCRATCH_DATABASE_PREFIX = "judge_scratch_"
+
+# 常见数据类别的展示名，判题失败时告诉学生「哪一类」数据没通过
+DATASET_LABEL_NAMES = {
+    "edge": "边界值数据",
+    "empty": "空表数据",
+    "null_heavy": "大量 NULL 数据",
+    "duplicates": "重复值数据",
+    "large": "大数据量",
+}
+
+
+def parse_hidden_datasets(raw: str | None) -> list[dict[str, Any]]:
+    """解析 hidden_datasets，返回 [{"label": str, "schema": schema_preview 格式字符串, "tables": [...]}]。
+
+    格式不合法的条目直接忽略，不影响可见数据的判题。
+    """
+    if not raw or not raw.strip():
+        return []
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        logger.warning("hidden_datasets 不是合法 JSON，已忽略")
+        return []
+    if not isinstance(data, list):
+        return []
+    datasets: list[dict[str, Any]] = []
+    for i, item in enumerate(data):
+        if not isinstance(item, dict):
+            continue
+        tables = [t for t in (item.get("tables") or []) if isinstance(t, dict) and t.get("name")]
+        if not tables:
+            continue
+        label = str(item.get("label") or f"hidden_{i + 1}").strip()
+        datasets.append({
+            "label": label,
+            "tables": tables,
+            "schema": json.dumps({"tables": tables}, ensure_ascii=False),
+        })
+    return datasets
+
+
+def describe_dataset_label(label: str) -> str:
+    return DATASET_LABEL_NAMES.get(label, label)
+
+
+async def _load_and_judge(
+    session: AsyncSession,
+    dialect: JudgeDialect,
+    dataset: dict[str, Any],
+    student_sql: str,
+    correct_sql: str,
+    required_output_columns: str | None,
+    row_budget: int | None,
+    ignore_column_order: bool,
+    temporary: bool,
+) -> tuple[bool, str]:
+    """在当前连接上为该组数据建表、导入数据并判题。"""
+    init_sql = generate_init_sql_from_schema_preview(dataset["schema"], temporary=temporary, dialect=dialect)
+    if init_sql:
+        await execute_setup_sql(session, init_sql)
+    await load_schema_datasets(session, dataset["schema"])
+    await generate_schema_tables(session, dataset["schema"])
+    judge = SQLJudgeService(
+        session,
+        row_budget=resolve_row_budget(row_budget, dataset["schema"]),
+        ignore_column_order=ignore_column_order,
+    )
+    return await judge.judge_sql(student_sql, correct_sql, required_output_columns=required_output_columns)
+
+
+async def _drop_scratch_database(engine: AsyncEngine, dialect: JudgeDialect, scratch: str) -> None:
+    """判题连接已失效时另取一条连接删除暂存库；失败只记录日志。"""
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f"DROP DATABASE IF EXISTS {dialect.quote_ident(scratch)}"))
+    except Exception as e:
+        logger.warning(f"删除隐藏数据暂存库 {scratch} 失败: {e}")
+
+
+async def _judge_in_scratch_database(
+    engine: AsyncEngine,
+    dialect: JudgeDialect,
+    dataset: dict[str, Any],
+    table_names: list[str],
+    **judge_kwargs: Any,
+) -> tuple[bool, str]:
+    """在本组数据专用的暂存库中用普通表判题（MySQL），结束后切回原库并删除暂存库。
+
+    被取消或出错时让连接失效（避免停留在暂存库的连接回到连接池），再另取连接删库。
+    """
+    scratch = f"{SCRATCH_DATABASE_PREFIX}{uuid.uuid4().hex[:16]}"
+    quote = dialect.quote_ident
+    created = False
+    try:
+        async with engine.connect() as conn:
+            clean = False
+            try:
+                origin = (await conn.execute(text(dialect.current_database_sql))).scalar()
+                await conn.execute(text(f"CREATE DATABASE {quote(scratch)}"))
+                created = True
+                await conn.execute(text(dialect.use_database_sql(scratch)))
+                # 未列出的表沿用可见数据：建成指向原库同名表的视图
+                shadowed = {name.lower() for name in table_names}
+                visible = (await conn.execute(
+                    text("SELECT table_name FROM information_schema.tables WHERE table_schema = :db"),
+                    {"db": origin},
+                )).scalars().all()
+                for name in visible:
+                    if name.lower() not in shadowed:
+                        await conn.execute(
+                            text(f"CREATE VIEW {quote(name)} AS SELECT * FROM {quote(origin)}.{quote(name)}")
+                        )
+                async with AsyncSession(bind=conn) as session:
+                    result = await _load_and_judge(session, dialect, dataset, temporary=False, **judge_kwargs)
+                    await session.rollback()
+                if origin:
+                    await conn.execute(text(dialect.use_database_sql(origin)))
+                    await conn.execute(text(f"DROP DATABASE IF EXISTS {quote(scratch)}"))
+                    created = False
+                    clean = True
+                return result
+            finally:
+                if not clean:
+                    await conn.invalidate()
+    finally:
+        if created:
+            await _drop_scratch_database(engine, dialect, scratch)
+
+
+async def _judge_on_dataset(
+    engine: AsyncEngine,
+    dataset: dict[str, Any],
+    student_sql: str,
+    correct_sql: str,
+    required_output_columns: str | None,
+    row_budget: int | None = None,
+    ignore_column_order: bool = False,
+) -> tuple[bool, str]:
+    """在一条独立沙箱连接上为该组数据建表并判题（MySQL 用暂存库，其他后端用临时表）。
+
+    临时表随连接存在：正常结束时显式删除；被取消或出错时让连接失效，避免带着临时表回到连接池。
+    """
+    dialect = get_dialect(engine.dialect.name)
+    table_names = [re.sub(r"[^\w]", "", str(t["name"])) for t in dataset["tables"]]
+    judge_kwargs = {
+        "student_sql": student_sql,
+        "correct_sql": correct_sql,
+        "required_output_columns": required_output_columns,
+        "row_budget": row_budget,
+        "ignore_column_order": ignore_column_order,
+    }
+    if dialect.current_database_sql:
+        return await _judge_in_scratch_database(engine, dialect, dataset, table_names, **judge_kwargs)
+    async with engine.connect() as conn:
+        clean = False
+        try:
+            async with AsyncSession(bind=conn) as session:
+                result = await _load_and_judge(session, dialect, dataset, temporary=True, **judge_kwargs)
+                for name in table_names:
+                    if name:
+                        await session.execute(text(dialect.drop_table_sql(name, temporary=True)))
+                await session.rollback()
+            clean = True
+            return result
+        finally:
+            if not clean:
+                await conn.invalidate()
+
+
+async def judge_hidden_datasets(
+    engine: AsyncEngine,
+    datasets: list[dict[str, Any]],
+    student_sql: str,
+    correct_sql: str,
+    required_output_columns: str | None = None,
+    row_budget: int | None = None,
+    ignore_column_order: bool = False,
+) -> tuple[bool, str | None, str | None]:
+    """并发在所有隐藏数据上判题，遇到第一个不一致立即取消其余任务。
+
+    row_budget 为题目的 max_estimated_rows，每组数据按自身规模决定是否做执行前代价检查；
+    ignore_column_order 同题目设置，无别名要求时不要求列顺序一致。
+
+    :return: (是否全部通过, 面向学生的错误描述, 未通过的数据类别 label)
+    """
+    if not datasets:
+        return True, None, None
+    semaphore = asyncio.Semaphore(max(1, _settings.JUDGE_HIDDEN_DATASET_CONCURRENCY))
+
+    async def run(dataset: dict[str, Any]) -> tuple[dict[str, Any], bool, str]:
+        async with semaphore:
+            ok, msg = await _judge_on_dataset(
+                engine,
+                dataset,
+                student_sql,
+                correct_sql,
+                required_output_columns,
+                row_budget=row_budget,
+                ignore_column_order=ignore_column_order,
+            )
+            return dataset, ok, msg
+
+    tasks = [asyncio.create_task(run(d)) for d in datasets]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            try:
+                dataset, ok, msg = await finished
+            except (SQLSafetyError, SQLCostExceededError):
+                raise
+            except Exception as e:
+                if is_connection_error(e):
+                    # 沙箱连接中断不是数据配置问题，跳过该组会让学生误判为通过
+                    raise
+                # 隐藏数据本身配置有误时不应误伤学生，记录后跳过该组
+                logger.warning(f"隐藏测试数据判题异常，已跳过: {e}")
+                continue
+            if not ok and msg.startswith("标准答案 SQL 执行失败"):
+                # 标准答案在该组数据上无法执行，属于出题配置问题，不判学生错
+                logger.warning(f"隐藏测试数据 {dataset['label']} 上标准答案执行失败，已跳过: {msg}")
+                continue
+            if not ok:
+                label = dataset["label"]
+                logger.info(f"隐藏测试数据未通过: {label}（{msg}）")
+                return (
+                    False,
+                    f"你的 SQL 在示例数据上结果正确，但在隐藏测试数据（{describe_dataset_label(label)}）上"
+                    "与标准答案不一致。请检查是否依赖了示例数据中的具体取值，或遗漏了空表、NULL 等情况。",
+                    label,
+                )
+        return True, None, None
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+__all__ = [
+    "SCRATCH_DATABASE_PREFIX",
+    "DATASET_LABEL_NAMES",
+    "parse_hidden_datasets",
+    "describe_dataset_label",
+    "judge_hidden_datasets",
+]
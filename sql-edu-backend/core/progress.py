@@ -0,0 +1,40 @@
+"""回填做题进度表：按已有 submissions / chat_messages 重新计算 user_question_progress 与 user_stats。
+
+迁移到进度表后运行一次（之后计数随提交与对话写入实时累加；计数疑似不一致时也可重跑）：
+    python -m core.progress
+
+回填在单个事务中先清空再重建，建议在低峰期执行。
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from repository.progress_repo import ProgressRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_progress(session_factory: async_sessionmaker | None = None) -> tuple[int, int]:
+    """重建全部进度并提交。
+
+    :return: (进度行数, 用户数)
+    """
+    if session_factory is None:
+        from models import AsyncSessionFactory
+
+        session_factory = AsyncSessionFactory
+    async with session_factory() as session:
+        rows, users = await ProgressRepository(session).rebuild()
+        await session.commit()
+    logger.info(f"进度回填完成：{rows} 条题目进度，{users} 个用户")
+    return rows, users
+
+
+__all__ = ["backfill_progress"]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill_progress())
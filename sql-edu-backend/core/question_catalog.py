@@ -0,0 +1,143 @@
+"""进程内题目目录：题目的紧凑只读快照与预先序列化的响应体。
+
+- QuestionRecord 使用 __slots__，属性名与 Question 的列一致，可直接替代 ORM 对象传给判题、提示等流程；
+- 每条记录保存不含动态字段的 QuestionOut JSON，列表/详情接口只需拼接展示难度与建议限时；
+- 按 ID 读取的记录缓存 QUESTION_CATALOG_TTL_SECONDS 秒；题目列表整体加载一次后按页切片，同样按 TTL 刷新；
+- 本进程内创建、修改、删除题目后调用 invalidate 立即失效；其他进程的修改在 TTL 内生效。
+"""
+
+import json
+import time
+from typing import Any, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.dataset_loader import truncate_schema_preview_rows
+from core.http_cache import digest
+from core.metrics import incr
+from core.ttl_cache import TTLCache
+from models.question import Question
+from schemas.question import QuestionOut
+from settings import get_settings
+
+_settings = get_settings()
+
+_COLUMNS = tuple(c.key for c in Question.__table__.columns)
+# 按请求计算的字段，不进入预序列化的响应体
+_DYNAMIC_FIELDS = {"display_difficulty", "suggested_time_seconds"}
+
+
+class QuestionRecord:
+    """题目的只读快照。body 为不含动态字段的 QuestionOut JSON，digest 为其摘要（用于 ETag）。"""
+
+    __slots__ = _COLUMNS + ("body", "digest")
+
+    def __init__(self, source: Any):
+        for name in _COLUMNS:
+            setattr(self, name, getattr(source, name))
+        self.body = question_out(self).model_dump_json(exclude=_DYNAMIC_FIELDS).encode("utf-8")
+        self.digest = digest(self.body)
+
+    def render(self, display_difficulty: float, suggested_time_seconds: int) -> bytes:
+        """拼接动态字段，得到完整的 QuestionOut JSON。"""
+        head = (
+            f'{{"display_difficulty":{json.dumps(display_difficulty)},'
+            f'"suggested_time_seconds":{int(suggested_time_seconds)},'
+        ).encode("utf-8")
+        return head + self.body[1:]
+
+
+def question_out(
+    question: Any, display_difficulty: float | None = None, suggested_time_seconds: int | None = None
+) -> QuestionOut:
+    """由 Question 或 QuestionRecord 构造返回给前端的 QuestionOut。"""
+    return QuestionOut(
+        id=question.id,
+        title=question.title,
+        content=question.content,
+        title_en=getattr(question, "title_en", None),
+        content_en=getattr(question, "content_en", None),
+        title_zh_tw=getattr(question, "title_zh_tw", None),
+        content_zh_tw=getattr(question, "content_zh_tw", None),
+        difficulty=question.difficulty,
+        correct_sql=question.correct_sql,
+        time_limit_seconds=question.time_limit_seconds,
+        schema_preview=truncate_schema_preview_rows(getattr(question, "schema_preview", None)),
+        # 不从 SQL 推断填充，只返回数据库中实际存储的值（题目描述有别名要求时才会存储）
+        required_output_columns=getattr(question, "required_output_columns", None),
+        display_difficulty=display_difficulty,
+        suggested_time_seconds=suggested_time_seconds,
+        grade_efficiency=bool(getattr(question, "grade_efficiency", False)),
+        judge_dialect=getattr(question, "judge_dialect", None),
+        ignore_column_order=bool(getattr(question, "ignore_column_order", False)),
+        version=getattr(question, "version", None) or 1,
+    )
+
+
+class QuestionCatalog:
+    """按 ID 缓存的题目记录，加上按 ID 倒序的全量列表快照。"""
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._timer = timer
+        self._records = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+        self._listing: list[QuestionRecord] | None = None
+        self._listing_by_id: dict[int, QuestionRecord] = {}
+        self._listing_expires_at = 0.0
+        # 每次失效 +1：读取期间发生失效时，读到的旧数据不写入缓存
+        self._generation = 0
+
+    async def get(self, session: AsyncSession, question_id: int) -> QuestionRecord | None:
+        record = self._records.get(question_id)
+        if record is None and self._listing is not None and self._listing_expires_at > self._timer():
+            record = self._listing_by_id.get(question_id)
+        if record is not None:
+            incr("question_catalog.hit")
+            return record
+        incr("question_catalog.miss")
+        generation = self._generation
+        row = (await session.execute(select(*Question.__table__.columns).where(Question.id == question_id))).first()
+        if row is None:
+            return None
+        record = QuestionRecord(row)
+        if generation == self._generation:
+            self._records.set(question_id, record)
+        return record
+
+    async def list(self, session: AsyncSession, skip: int, limit: int) -> list[QuestionRecord]:
+        """按 ID 倒序（新题在前）分页，与 QuestionRepository.get_all 顺序一致。"""
+        if self._listing is None or self._listing_expires_at <= self._timer():
+            incr("question_catalog.listing_reload")
+            generation = self._generation
+            result = await session.execute(select(*Question.__table__.columns).order_by(Question.id.desc()))
+            listing = [QuestionRecord(row) for row in result]
+            if generation != self._generation:
+                return listing[skip:skip + limit]
+            self._listing = listing
+            self._listing_by_id = {r.id: r for r in listing}
+            self._listing_expires_at = self._timer() + self.ttl
+        return self._listing[skip:skip + limit]
+
+    def invalidate(self, question_id: int | None = None) -> None:
+        """题目创建、修改或删除后调用；question_id 为空时清空全部。"""
+        self._generation += 1
+        if question_id is None:
+            self._records.clear()
+        else:
+            self._records.pop(question_id)
+        self._listing = None
+        self._listing_by_id = {}
+
+
+_catalog: QuestionCatalog | None = None
+
+
+def get_question_catalog() -> QuestionCatalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = QuestionCatalog(_settings.QUESTION_CATALOG_MAX_ENTRIES, _settings.QUESTION_CATALOG_TTL_SECONDS)
+    return _catalog
+
+
+__all__ = ["QuestionRecord", "QuestionCatalog", "question_out", "get_question_catalog"]
@@ -0,0 +1,132 @@
+"""题目累计统计：展示难度的读取与定期对账。
+
+question_stats 的计数随提交、对话与难度评分写入实时累加（见 QuestionStatsRepository），
+本模块负责：
+- 读取展示难度：优先使用对账时预算的值，计数变化后按当前计数现算（纯计算，无额外查询）；
+- 定期对账：按明细表重算全部计数与展示难度，逐行修正累加过程中可能出现的偏差（不删除、不整表重建）。
+
+上线或需要立即修复计数时可手动执行一次：
+    python -m core.question_stats
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.difficulty_service import compute_display_difficulties, compute_display_difficulty
+from core.metrics import incr, timed
+from models.question import Question
+from models.question_stats import QuestionStats
+from repository.question_stats_repo import QuestionStatsRepository
+
+logger = logging.getLogger(__name__)
+
+
+# 对账时每批校正并提交的题目数
+_RECONCILE_BATCH_SIZE = 500
+
+_COUNT_COLUMNS = (
+    "total_submissions", "correct_submissions", "chat_messages", "feedback_count", "feedback_rating_sum"
+)
+
+
+def _compute(teacher_difficulty: int, counts) -> float:
+    feedback_count = counts["feedback_count"]
+    return compute_display_difficulty(
+        teacher_difficulty=teacher_difficulty,
+        total_submissions=counts["total_submissions"],
+        correct_submissions=counts["correct_submissions"],
+        total_chat_messages=counts["chat_messages"],
+        feedback_count=feedback_count,
+        avg_student_rating=counts["feedback_rating_sum"] / feedback_count if feedback_count else None,
+    )
+
+
+def display_difficulty(question: Question, stats: QuestionStats | None) -> float:
+    """题目的展示难度：有预算值时直接使用，否则按累计计数现算（尚无统计时只看教师难度）。"""
+    if stats is not None and stats.display_difficulty is not None:
+        return stats.display_difficulty
+    counts = {name: getattr(stats, name) if stats is not None else 0 for name in _COUNT_COLUMNS}
+    return _compute(question.difficulty, counts)
+
+
+def display_difficulties(rows: list[tuple[Question, QuestionStats | None]]) -> list[float]:
+    """批量版 display_difficulty（题目列表使用）：没有预算值的题目一次性向量化计算。"""
+    result = [stats.display_difficulty if stats is not None else None for _, stats in rows]
+    pending = [i for i, value in enumerate(result) if value is None]
+    if pending:
+        columns = {name: [] for name in _COUNT_COLUMNS}
+        for i in pending:
+            stats = rows[i][1]
+            for name in _COUNT_COLUMNS:
+                columns[name].append(getattr(stats, name) if stats is not None else 0)
+        computed = compute_display_difficulties(
+            [rows[i][0].difficulty for i in pending],
+            columns["total_submissions"],
+            columns["correct_submissions"],
+            columns["chat_messages"],
+            columns["feedback_count"],
+            [s / c if c else None for s, c in zip(columns["feedback_rating_sum"], columns["feedback_count"])],
+        )
+        for i, value in zip(pending, computed):
+            result[i] = value
+    return result
+
+
+async def reconcile_question_stats(session: AsyncSession, batch_size: int = _RECONCILE_BATCH_SIZE) -> int:
+    """按明细重算全部题目的统计与展示难度，逐行校正并分批提交，返回题目数。
+
+    计数按对账开始时的快照截止点重算；截止点之后的写入照常累加，不会被对账覆盖。
+    每批单独提交，对账期间只短暂锁住当前批次的统计行。
+    """
+    repo = QuestionStatsRepository(session)
+    written = 0
+    with timed("question_stats.reconcile"):
+        cutoff = await repo.snapshot_cutoff()
+        rows = await repo.recount(cutoff)
+        computed = compute_display_difficulties(
+            [r["difficulty"] for r in rows],
+            [r["total_submissions"] for r in rows],
+            [r["correct_submissions"] for r in rows],
+            [r["chat_messages"] for r in rows],
+            [r["feedback_count"] for r in rows],
+            [r["feedback_rating_sum"] / r["feedback_count"] if r["feedback_count"] else None for r in rows],
+        )
+        for row, value in zip(rows, computed):
+            row["display_difficulty"] = value
+        reconciled_at = datetime.utcnow()
+        for start in range(0, len(rows), batch_size):
+            written += await repo.reconcile(rows[start:start + batch_size], cutoff, reconciled_at)
+            await session.commit()
+    incr("question_stats.reconciled", len(rows))
+    incr("question_stats.reconcile_written", written)
+    return len(rows)
+
+
+async def run_question_stats_reconciler(session_factory: async_sessionmaker[AsyncSession], interval: float) -> None:
+    """每 interval 秒对账一次（启动后先等待一个间隔），直到被取消。单次失败只记录日志。"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as session:
+                count = await reconcile_question_stats(session)
+            logger.info(f"题目统计对账完成：{count} 道题")
+        except Exception as e:
+            incr("question_stats.reconcile_failed")
+            logger.warning(f"题目统计对账失败: {e}")
+
+
+__all__ = ["display_difficulty", "display_difficulties", "reconcile_question_stats", "run_question_stats_reconciler"]
+
+
+if __name__ == "__main__":
+    from models import AsyncSessionFactory
+
+    async def _main() -> None:
+        async with AsyncSessionFactory() as session:
+            print(f"题目统计对账完成：{await reconcile_question_stats(session)} 道题")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
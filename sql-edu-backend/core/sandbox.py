@@ -0,0 +1,260 @@
+"""判题沙箱数据库：学生 SQL、建表与隐藏测试数据均在此库执行，与业务主库的连接池相互独立。
+
+未配置 SANDBOX_DB_URL 时沙箱即业务主库，直接复用 models 中的引擎，避免重复建连接池。
+题目指定了其他判题方言（questions.judge_dialect）时，按 SANDBOX_DIALECT_URLS 为该方言单独建引擎。
+配置了 SANDBOX_SHARD_URLS 时，默认方言的判题按题目 ID 一致性哈希分散到多个沙箱分片，
+分片健康检查失败时顺延到环上的下一个分片（建表语句幂等，判题前会在新分片上重建该题的表）；
+判题途中连接中断（判题与建表会把连接层面的失败原样或包装后抛出）时同样标记该分片不可用，由 run_judge 换分片重试一次。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from core.dialects import get_dialect, is_connection_error, is_supported_dialect
+from core.metrics import incr
+from core.shard_ring import ConsistentHashRing
+from core.ttl_cache import TTLCache
+from settings import get_settings
+
+_settings = get_settings()
+
+# 嵌入式 SQLite 沙箱未配置连接串时使用的本地文件库
+_DEFAULT_SQLITE_URL = "sqlite+aiosqlite:///judge_sandbox.db"
+
+_sandbox_engine: AsyncEngine | None = None
+_sandbox_session_factory: async_sessionmaker[AsyncSession] | None = None
+_dialect_engines: dict[str, AsyncEngine] = {}
+_dialect_session_factories: dict[str, async_sessionmaker[AsyncSession]] = {}
+_shard_ring: ConsistentHashRing | None = None
+_shard_engines: dict[str, AsyncEngine] = {}
+_shard_session_factories: dict[str, async_sessionmaker[AsyncSession]] = {}
+# 分片健康状态缓存：连接串 -> 是否可用，过期后重新探测
+_shard_health = TTLCache(maxsize=256, ttl=_settings.SANDBOX_SHARD_HEALTH_TTL_SECONDS)
+_HEALTH_CHECK_TIMEOUT = 2.0
+
+
+class SandboxUnavailableError(Exception):
+    """题目指定的判题方言未配置沙箱连接。"""
+    pass
+
+
+class SandboxConnectionError(SandboxUnavailableError):
+    """判题途中沙箱连接中断。shard 为出错的分片（已标记为不可用，调用方可在环上的下一个分片重试），未分片时为 None。"""
+
+    def __init__(self, message: str, shard: str | None = None):
+        super().__init__(message)
+        self.shard = shard
+
+
+def get_sandbox_engine(dialect: str | None = None) -> AsyncEngine:
+    """获取（懒加载）沙箱引擎；dialect 为空或与默认沙箱相同时返回默认沙箱引擎。
+
+    :raises SandboxUnavailableError: 方言不受支持或未配置连接串
+    """
+    global _sandbox_engine
+    if _sandbox_engine is None:
+        url = _settings.SANDBOX_DB_URL or _settings.DB_URL
+        if url == _settings.DB_URL:
+            from models import engine
+
+            _sandbox_engine = engine
+        else:
+            _sandbox_engine = create_async_engine(
+                url,
+                pool_size=_settings.SANDBOX_POOL_SIZE,
+                max_overflow=_settings.SANDBOX_MAX_OVERFLOW,
+                pool_timeout=10,
+                pool_recycle=3600,
+                pool_pre_ping=True,
+            )
+    if not dialect or get_dialect(_sandbox_engine.dialect.name).name == get_dialect(dialect).name:
+        return _sandbox_engine
+    return _get_dialect_engine(dialect)
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    if url.startswith("sqlite"):
+        # 嵌入式库无需连接池；每个会话独立连接，临时表随连接关闭释放
+        return create_async_engine(url, poolclass=NullPool)
+    return create_async_engine(
+        url,
+        pool_size=_settings.SANDBOX_POOL_SIZE,
+        max_overflow=_settings.SANDBOX_MAX_OVERFLOW,
+        pool_timeout=10,
+        pool_recycle=3600,
+        pool_pre_ping=True,
+    )
+
+
+def _get_dialect_engine(dialect: str) -> AsyncEngine:
+    if not is_supported_dialect(dialect):
+        raise SandboxUnavailableError(f"不支持的判题方言：{dialect}")
+    name = get_dialect(dialect).name
+    if name not in _dialect_engines:
+        url = _settings.SANDBOX_DIALECT_URLS.get(name)
+        if not url and name == "sqlite":
+            url = _DEFAULT_SQLITE_URL
+        if not url:
+            raise SandboxUnavailableError(f"判题方言 {name} 未配置沙箱连接（SANDBOX_DIALECT_URLS）")
+        _dialect_engines[name] = _create_engine(url)
+    return _dialect_engines[name]
+
+
+def is_sandbox_isolated(dialect: str | None = None) -> bool:
+    """判题沙箱是否与业务主库分离。未配置 SANDBOX_DB_URL 时默认沙箱就是主库，学生 SQL 能读到业务表。"""
+    if _uses_shards(dialect):
+        return _settings.DB_URL not in _settings.SANDBOX_SHARD_URLS
+    from models import engine
+
+    return get_sandbox_engine(dialect) is not engine
+
+
+def get_sandbox_session_factory(dialect: str | None = None) -> async_sessionmaker[AsyncSession]:
+    """沙箱会话工厂；每个会话独占一条沙箱连接。"""
+    global _sandbox_session_factory
+    engine = get_sandbox_engine(dialect)
+    if engine is _sandbox_engine:
+        if _sandbox_session_factory is None:
+            _sandbox_session_factory = async_sessionmaker(
+                bind=engine,
+                autoflush=True,
+                expire_on_commit=False,
+            )
+        return _sandbox_session_factory
+    name = get_dialect(dialect).name
+    if name not in _dialect_session_factories:
+        _dialect_session_factories[name] = async_sessionmaker(
+            bind=engine,
+            autoflush=True,
+            expire_on_commit=False,
+        )
+    return _dialect_session_factories[name]
+
+
+def get_shard_ring() -> ConsistentHashRing | None:
+    """按 SANDBOX_SHARD_URLS 构建的一致性哈希环；未配置分片时返回 None。"""
+    global _shard_ring
+    urls = list(dict.fromkeys(_settings.SANDBOX_SHARD_URLS))
+    if not urls:
+        return None
+    if _shard_ring is None or _shard_ring.nodes != urls or _shard_ring.vnodes != _settings.SANDBOX_SHARD_VNODES:
+        _shard_ring = ConsistentHashRing(urls, _settings.SANDBOX_SHARD_VNODES)
+    return _shard_ring
+
+
+def _get_shard_session_factory(url: str) -> async_sessionmaker[AsyncSession]:
+    if url not in _shard_session_factories:
+        _shard_engines[url] = _create_engine(url)
+        _shard_session_factories[url] = async_sessionmaker(
+            bind=_shard_engines[url],
+            autoflush=True,
+            expire_on_commit=False,
+        )
+    return _shard_session_factories[url]
+
+
+async def _ping(url: str) -> None:
+    async with _get_shard_session_factory(url)() as session:
+        await session.execute(text("SELECT 1"))
+
+
+async def is_shard_healthy(url: str) -> bool:
+    """探测分片是否可用（SELECT 1），结果缓存 SANDBOX_SHARD_HEALTH_TTL_SECONDS 秒。"""
+    healthy = _shard_health.get(url)
+    if healthy is None:
+        try:
+            await asyncio.wait_for(_ping(url), timeout=_HEALTH_CHECK_TIMEOUT)
+            healthy = True
+        except Exception:
+            healthy = False
+            incr("sandbox.shard.unhealthy")
+        _shard_health.set(url, healthy)
+    return healthy
+
+
+def mark_shard_unhealthy(url: str) -> None:
+    """判题中途连接失效时调用，该分片在健康缓存过期前不再被选中。"""
+    _shard_health.set(url, False)
+
+
+def _uses_shards(dialect: str | None) -> bool:
+    """只有默认方言的判题参与分片；其他方言仍走 SANDBOX_DIALECT_URLS。"""
+    return bool(_settings.SANDBOX_SHARD_URLS) and (
+        not dialect or get_sandbox_engine(dialect) is get_sandbox_engine()
+    )
+
+
+async def select_sandbox_shard(question_id: int) -> str:
+    """题目所在分片的连接串：一致性哈希的首选分片，不可用时按环上顺序故障转移。
+
+    :raises SandboxUnavailableError: 所有分片均不可用
+    """
+    ring = get_shard_ring()
+    for i, url in enumerate(ring.iter_nodes(question_id) if ring else ()):
+        if await is_shard_healthy(url):
+            if i:
+                incr("sandbox.shard.failover")
+            return url
+    raise SandboxUnavailableError("所有沙箱分片均不可用")
+
+
+async def sandbox_session_factory_for(
+    dialect: str | None, question_id: int | None = None
+) -> async_sessionmaker[AsyncSession]:
+    """题目判题使用的沙箱会话工厂：开启分片时为题目所在分片，否则同 get_sandbox_session_factory。"""
+    if question_id is not None and _uses_shards(dialect):
+        return _get_shard_session_factory(await select_sandbox_shard(question_id))
+    return get_sandbox_session_factory(dialect)
+
+
+@asynccontextmanager
+async def sandbox_session_for(
+    dialect: str | None, default_session: AsyncSession, question_id: int | None = None
+) -> AsyncIterator[AsyncSession]:
+    """按题目的判题方言（及分片）取沙箱会话。
+
+    开启分片且传入 question_id 时打开题目所在分片的会话；否则与默认沙箱相同则直接使用请求注入的会话，
+    不同则临时打开该方言的会话。
+
+    :raises SandboxConnectionError: 会话上出现连接层面的失败（含被判题包装过的）；分片会话出错时该分片已标记为不可用
+    """
+    url = None
+    try:
+        if question_id is not None and _uses_shards(dialect):
+            url = await select_sandbox_shard(question_id)
+            async with _get_shard_session_factory(url)() as session:
+                yield session
+        elif not dialect or get_sandbox_engine(dialect) is get_sandbox_engine():
+            yield default_session
+        else:
+            async with get_sandbox_session_factory(dialect)() as session:
+                yield session
+    except SandboxConnectionError:
+        raise
+    except Exception as e:
+        if not is_connection_error(e):
+            raise
+        if url is not None:
+            mark_shard_unhealthy(url)
+            incr("sandbox.shard.connection_lost")
+        raise SandboxConnectionError(f"沙箱连接中断：{e}", shard=url) from e
+
+
+__all__ = [
+    "SandboxUnavailableError",
+    "SandboxConnectionError",
+    "get_sandbox_engine",
+    "is_sandbox_isolated",
+    "get_sandbox_session_factory",
+    "get_shard_ring",
+    "is_shard_healthy",
+    "mark_shard_unhealthy",
+    "select_sandbox_shard",
+    "sandbox_session_factory_for",
+    "sandbox_session_for",
+]
@@ -0,0 +1,139 @@
+"""沙箱预热：学生打开题目时在后台提前建好判题表，首次提交不再承担建表与导入数据的开销。
+
+- 已登录的学生 GET /questions/{id} 时把题目放入预热队列；
+- 服务启动时按近期提交量预热 Top-K 热门题目；
+- 队列有界，满时直接丢弃（计入 sandbox.warmup.dropped）；同一题目已在队列中或刚预热过时去重。
+
+预热即在题目所在沙箱（含分片）的表集合闸门内调用 prepare_sandbox：表已由同一份 schema 建成时只做一次标记查询，
+因此重复预热与随后的判题都很便宜；同名表正被其他题目的判题使用时，等其结束后再重建。
+只有已登录的学生打开题目详情才会触发预热，匿名请求不会让沙箱执行建表。
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core.judge_pipeline import sandbox_tables
+from core.metrics import incr, timed
+from core.sandbox import sandbox_session_factory_for
+from core.ttl_cache import TTLCache
+from models.question import Question
+from models.submission import Submission
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+_settings = get_settings()
+
+
+class SandboxWarmer:
+    """有界、去重的预热队列，由 run() 启动的后台任务消费。"""
+
+    def __init__(self, maxsize: int, dedup_seconds: float):
+        self._queue: asyncio.Queue[int] = asyncio.Queue(max(1, maxsize))
+        self._pending: set[int] = set()
+        self._recent = TTLCache(maxsize=max(1, maxsize) * 8, ttl=dedup_seconds)
+
+    def request(self, question_id: int) -> bool:
+        """请求预热（不等待）。已在队列中、刚预热过或队列已满时返回 False。"""
+        if question_id in self._pending or self._recent.get(question_id):
+            incr("sandbox.warmup.deduplicated")
+            return False
+        try:
+            self._queue.put_nowait(question_id)
+        except asyncio.QueueFull:
+            incr("sandbox.warmup.dropped")
+            return False
+        self._pending.add(question_id)
+        incr("sandbox.warmup.queued")
+        return True
+
+    async def warm(self, question_id: int, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        """在题目所在的沙箱中建表（已是最新时跳过）。"""
+        async with session_factory() as session:
+            question = await session.get(Question, question_id)
+        if question is None or not (question.schema_preview or "").strip():
+            return
+        factory = await sandbox_session_factory_for(question.judge_dialect, question.id)
+        async with factory() as sandbox_session:
+            with timed("sandbox.warmup"):
+                async with sandbox_tables(question.schema_preview, sandbox_session):
+                    pass
+
+    async def run(self, session_factory: async_sessionmaker[AsyncSession], concurrency: int = 1) -> None:
+        """持续消费预热队列，直到被取消。单个题目预热失败只记录日志，不影响后续题目。"""
+
+        async def worker() -> None:
+            while True:
+                question_id = await self._queue.get()
+                try:
+                    await self.warm(question_id, session_factory)
+                    self._recent.set(question_id, True)
+                except Exception as e:
+                    incr("sandbox.warmup.failed")
+                    logger.warning(f"题目 {question_id} 沙箱预热失败: {e}")
+                finally:
+                    self._pending.discard(question_id)
+                    self._queue.task_done()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    async def join(self) -> None:
+        """等待队列中已有的题目全部处理完。"""
+        await self._queue.join()
+
+
+async def hot_question_ids(session: AsyncSession, limit: int, window_hours: int) -> list[int]:
+    """近 window_hours 小时内提交次数最多的 limit 道题目。"""
+    since = datetime.utcnow() - timedelta(hours=window_hours)  # created_at 按 UTC 写入
+    stmt = (
+        select(Submission.question_id)
+        .where(Submission.created_at >= since)
+        .group_by(Submission.question_id)
+        .order_by(func.count().desc())
+        .limit(limit)
+    )
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def warm_hot_questions(warmer: SandboxWarmer, session_factory: async_sessionmaker[AsyncSession]) -> int:
+    """启动时把热门题目放入预热队列，返回入队数量。"""
+    if _settings.SANDBOX_WARMUP_TOP_K <= 0:
+        return 0
+    try:
+        async with session_factory() as session:
+            ids = await hot_question_ids(
+                session, _settings.SANDBOX_WARMUP_TOP_K, _settings.SANDBOX_WARMUP_WINDOW_HOURS
+            )
+    except Exception as e:
+        logger.warning(f"统计热门题目失败，跳过启动预热: {e}")
+        return 0
+    return sum(warmer.request(qid) for qid in ids)
+
+
+_warmer: SandboxWarmer | None = None
+
+
+def get_sandbox_warmer() -> SandboxWarmer:
+    global _warmer
+    if _warmer is None:
+        _warmer = SandboxWarmer(_settings.SANDBOX_WARMUP_QUEUE_SIZE, _settings.SANDBOX_WARMUP_DEDUP_SECONDS)
+    return _warmer
+
+
+def request_sandbox_warmup(question_id: int) -> bool:
+    """题目详情接口在学生访问时调用：开启预热时把题目放入队列。"""
+    if not _settings.SANDBOX_WARMUP_ENABLED:
+        return False
+    return get_sandbox_warmer().request(question_id)
+
+
+__all__ = [
+    "SandboxWarmer",
+    "hot_question_ids",
+    "warm_hot_questions",
+    "get_sandbox_warmer",
+    "request_sandbox_warmup",
+]
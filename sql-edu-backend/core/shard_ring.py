@@ -0,0 +1,49 @@
+"""一致性哈希环：把题目 ID 映射到沙箱分片。
+
+每个分片在环上放 vnodes 个虚拟节点，题目落在顺时针方向第一个虚拟节点所属的分片上。
+增加一个分片只会把约 1/(n+1) 的题目迁到新分片，其余题目仍命中原分片、表数据保持预热。
+哈希使用 md5 而非内置 hash()，保证不同进程、不同机器上映射一致。
+"""
+
+import bisect
+import hashlib
+from typing import Hashable, Iterator, Sequence
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """带虚拟节点的一致性哈希环（节点为任意字符串，如沙箱连接串）。"""
+
+    def __init__(self, nodes: Sequence[str], vnodes: int = 100):
+        self.nodes = list(dict.fromkeys(nodes))
+        self.vnodes = max(1, vnodes)
+        ring = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(self.vnodes))
+        self._hashes = [h for h, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def iter_nodes(self, key: Hashable) -> Iterator[str]:
+        """按顺时针顺序依次给出 key 的首选节点与各备选节点（不重复），用于故障转移。"""
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, _hash(str(key)))
+        seen: set[str] = set()
+        for offset in range(len(self._hashes)):
+            node = self._owners[(start + offset) % len(self._hashes)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+    def get_node(self, key: Hashable) -> str | None:
+        """key 的首选节点；环为空时返回 None。"""
+        return next(self.iter_nodes(key), None)
+
+
+__all__ = ["ConsistentHashRing"]
@@ -0,0 +1,192 @@
+"""超出内存的结果集对比：把标准化后的行落盘为有序的哈希分区 run 文件，再逐分区归并比较。
+
+每行先编码为一行 JSON 文本（标准化后的值只有字符串与 null，编码确定，文本相等即行相等）：
+- 无序对比：按行文本的哈希分到若干分区（两侧在同一进程内分区，内置 hash 即可保证相同行同分区）；缓冲区超过内存预算时排序并写成一批 run 文件。
+  相同的行必然落在同一分区，逐分区用 heapq.merge 归并各 run，两边的有序流逐行比较即可判断
+  多重集（或集合）是否相等，内存只占缓冲区与每个 run 的读缓冲。
+- 有序对比（标准答案含 ORDER BY）：按到达顺序写入单个文件，两边逐行比较。
+
+判题结论与错误提示与内存中对比（SQLJudgeService 的各 compare 方法）保持一致。
+"""
+
+import heapq
+import itertools
+import os
+import shutil
+import tempfile
+from typing import Callable, Iterable, Iterator
+
+# 每个缓冲行在 Python 中除文本本身外的大致开销（str 对象头 + 列表槽位）
+_LINE_OVERHEAD = 64
+_SENTINEL = object()
+
+
+class SpilledRows:
+    """一侧结果集的落盘存储。用完需 close()（或 with 语句）删除临时文件。"""
+
+    def __init__(
+        self,
+        *,
+        ordered: bool,
+        memory_budget: int,
+        partitions: int = 8,
+        directory: str | None = None,
+    ):
+        self.ordered = ordered
+        self.memory_budget = max(1, memory_budget)
+        self.partitions = 1 if ordered else max(1, partitions)
+        self.row_count = 0
+        self.columns: list[str] = []
+        self._dir = tempfile.mkdtemp(prefix="judge_spill_", dir=directory or None)
+        self._buffer: list[str] = []
+        self._buffered_bytes = 0
+        self._runs: list[list[str]] = [[] for _ in range(self.partitions)]
+        self._ordered_file = open(os.path.join(self._dir, "rows"), "w", encoding="utf-8") if ordered else None
+
+    def add(self, lines: Iterable[str]) -> None:
+        """追加一批已编码的行。"""
+        if self._ordered_file is not None:
+            for line in lines:
+                self._ordered_file.write(line)
+                self._ordered_file.write("\n")
+                self.row_count += 1
+            return
+        for line in lines:
+            self._buffer.append(line)
+            self._buffered_bytes += len(line) + _LINE_OVERHEAD
+            self.row_count += 1
+            if self._buffered_bytes >= self.memory_budget:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        buckets: list[list[str]] = [[] for _ in range(self.partitions)]
+        for line in self._buffer:
+            buckets[hash(line) % self.partitions].append(line)
+        self._buffer = []
+        self._buffered_bytes = 0
+        for p, bucket in enumerate(buckets):
+            if not bucket:
+                continue
+            bucket.sort()
+            path = os.path.join(self._dir, f"p{p}_r{len(self._runs[p])}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(bucket))
+                f.write("\n")
+            self._runs[p].append(path)
+
+    def finish(self) -> None:
+        """写入完成：刷出剩余缓冲。"""
+        if self._ordered_file is not None:
+            self._ordered_file.close()
+            self._ordered_file = None
+        else:
+            self._flush()
+
+    def iter_partition(self, partition: int) -> Iterator[str]:
+        """某分区内全部行的有序流（归并该分区的所有 run）。"""
+        files = [open(path, encoding="utf-8") for path in self._runs[partition]]
+        try:
+            yield from heapq.merge(*files)
+        finally:
+            for f in files:
+                f.close()
+
+    def iter_ordered(self) -> Iterator[str]:
+        """有序模式下按到达顺序读出全部行。"""
+        with open(os.path.join(self._dir, "rows"), encoding="utf-8") as f:
+            yield from f
+
+    def close(self) -> None:
+        if self._ordered_file is not None:
+            self._ordered_file.close()
+            self._ordered_file = None
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def __enter__(self) -> "SpilledRows":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def respill(source: SpilledRows, transform: Callable[[str], str] | None = None, **options) -> SpilledRows:
+    """把有序模式落盘的行（可逐行变换）重新写入新的 SpilledRows，options 同 SpilledRows 构造参数。"""
+    target = SpilledRows(**options)
+    try:
+        target.columns = source.columns
+        lines = (line.rstrip("\n") for line in source.iter_ordered())
+        target.add(map(transform, lines) if transform else lines)
+        target.finish()
+    except BaseException:
+        target.close()
+        raise
+    return target
+
+
+def _distinct(lines: Iterator[str]) -> Iterator[str]:
+    return (line for line, _ in itertools.groupby(lines))
+
+
+def _streams_equal(a: Iterator[str], b: Iterator[str]) -> bool:
+    return all(x == y for x, y in itertools.zip_longest(a, b, fillvalue=_SENTINEL))
+
+
+def _rows_match_unordered(student: SpilledRows, correct: SpilledRows, *, distinct: bool) -> bool:
+    for p in range(student.partitions):
+        s, c = student.iter_partition(p), correct.iter_partition(p)
+        if distinct:
+            s, c = _distinct(s), _distinct(c)
+        if not _streams_equal(s, c):
+            return False
+    return True
+
+
+def _first_ordered_mismatch(student: SpilledRows, correct: SpilledRows) -> int | None:
+    for i, (s, c) in enumerate(zip(student.iter_ordered(), correct.iter_ordered())):
+        if s != c:
+            return i
+    return None
+
+
+def compare_spilled(
+    student: SpilledRows,
+    correct: SpilledRows,
+    *,
+    by_column_names: bool,
+) -> tuple[bool, str]:
+    """对比两侧落盘结果，提示语与内存对比一致。
+
+    :param by_column_names: True 对应有别名要求（列名参与比较，无序时按集合比较）；
+                            False 对应只比较列值（无序时按多重集比较）
+    """
+    if student.row_count != correct.row_count:
+        return False, f"结果行数不匹配：期望 {correct.row_count} 行，实际 {student.row_count} 行。"
+    if student.row_count and correct.row_count:
+        # 行在内存中是 dict，同名列只保留一个，这里同样按去重后的列名比较
+        sk, ck = list(dict.fromkeys(student.columns)), list(dict.fromkeys(correct.columns))
+        if by_column_names and set(sk) != set(ck):
+            missing = set(ck) - set(sk)
+            extra = set(sk) - set(ck)
+            error_msg = "列结构不匹配。"
+            if missing:
+                error_msg += f" 缺少列: {', '.join(missing)}"
+            if extra:
+                error_msg += f" 多余列: {', '.join(extra)}"
+            return False, error_msg
+        if not by_column_names and len(sk) != len(ck):
+            return False, f"列数不匹配：期望 {len(ck)} 列，实际 {len(sk)} 列。"
+
+    if student.ordered:
+        mismatch = _first_ordered_mismatch(student, correct)
+        if mismatch is not None:
+            hint = "（顺序或数据有误，如 ORDER BY 方向相反）" if by_column_names else "（顺序或数据有误）"
+            return False, f"第 {mismatch + 1} 行与标准答案不一致{hint}。"
+        return True, "结果匹配（含顺序）。"
+    if not _rows_match_unordered(student, correct, distinct=by_column_names):
+        return False, "结果数据不匹配（可能顺序不同或数据有误）。"
+    return True, "结果匹配。"
+
+
+__all__ = ["SpilledRows", "respill", "compare_spilled"]
@@ -0,0 +1,230 @@
+"""SQL 编辑器自动补全：按题目版本缓存前缀树，根据光标前的上下文给出表名、列名、关键字与函数候选。
+
+- 表名/列名来自题目的 schema_preview，每个 (题目 ID, 版本) 只解析、建树一次；
+- 关键字与函数是全局的前缀树，知识点常用函数排在前面；
+- 每个前缀树节点预存排好序的前 N 个候选，查询只需沿前缀走一遍，与词表大小无关。
+
+上下文判断只看光标前的文本：FROM/JOIN 之后补全表名，SELECT/WHERE/ON/BY 等之后补全列名与函数，
+「别名.」之后只补全该表的列，其余位置补全关键字。
+"""
+
+import re
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.metrics import incr
+from core.sql_knowledge_points import KNOWLEDGE_POINT_FUNCTIONS, get_knowledge_point_functions
+from core.sql_precheck import schema_catalog
+from core.ttl_cache import TTLCache
+from models.question import Question
+from settings import get_settings
+
+_settings = get_settings()
+
+# 每个节点预存的候选数上限，也是单次补全返回数量的上限
+TRIE_TOP_K = 50
+
+SQL_KEYWORDS = (
+    "SELECT", "FROM", "WHERE", "GROUP BY", "ORDER BY", "HAVING", "LIMIT", "OFFSET", "JOIN", "INNER JOIN",
+    "LEFT JOIN", "RIGHT JOIN", "CROSS JOIN", "ON", "AS", "AND", "OR", "NOT", "IN", "IS NULL", "IS NOT NULL",
+    "LIKE", "BETWEEN", "EXISTS", "DISTINCT", "CASE", "WHEN", "THEN", "ELSE", "END", "UNION", "UNION ALL",
+    "WITH", "OVER", "PARTITION BY", "ASC", "DESC", "NULL", "ALL", "ANY", "INTERVAL",
+)
+
+COMMON_FUNCTIONS = (
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "ROUND", "ABS", "CEIL", "FLOOR", "CONCAT", "LENGTH", "UPPER", "LOWER",
+    "SUBSTRING", "TRIM", "REPLACE", "COALESCE", "NULLIF", "IFNULL", "IF", "CAST", "NOW", "CURDATE", "DATE",
+    "YEAR", "MONTH", "DAY", "DATEDIFF", "DATE_ADD", "DATE_SUB", "DATE_FORMAT", "ROW_NUMBER", "RANK",
+    "DENSE_RANK", "NTILE", "LAG", "LEAD", "FIRST_VALUE", "LAST_VALUE", "GROUP_CONCAT",
+)
+
+# 光标前最后一个词为这些关键字时补全表名
+_TABLE_CONTEXT = frozenset({"from", "join", "into", "update", "table"})
+# 这些关键字之后补全列名与函数
+_COLUMN_CONTEXT = frozenset(
+    {"select", "where", "on", "by", "having", "and", "or", "not", "when", "then", "else", "distinct", "set",
+     "in", "like", "between", "case", "over", "partition"}
+)
+_CLAUSES = frozenset({"select", "from", "join", "where", "group", "order", "having", "on", "limit", "set"})
+
+_WORD = re.compile(r"[^\W\d][\w$]*|\d+|'(?:[^'\\]|\\.|'')*'|\S")
+_QUALIFIED_TAIL = re.compile(r"([^\W\d][\w$]*)\.([\w$]*)$")
+_PREFIX_TAIL = re.compile(r"[\w$]*$")
+_TABLE_ALIAS = re.compile(
+    r"\b(?:from|join)\s+([^\W\d][\w$]*)(?:\s+(?:as\s+)?([^\W\d][\w$]*))?", re.IGNORECASE
+)
+
+
+@dataclass(frozen=True)
+class Completion:
+    text: str
+    kind: str  # table / column / keyword / function
+    detail: str | None = None  # 列所属的表
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+_BY = Completion("BY", "keyword")
+
+
+class PrefixTrie:
+    """按小写前缀查找候选的前缀树；每个节点保存以该前缀开头、按排序键排好的前 top_k 个候选。"""
+
+    __slots__ = ("_root", "_top_k")
+
+    def __init__(self, top_k: int = TRIE_TOP_K):
+        self._root: dict = {"": []}
+        self._top_k = top_k
+
+    def insert(self, word: str, item: Completion, rank: tuple = ()) -> None:
+        node = self._root
+        self._offer(node, rank, item)
+        for ch in word.lower():
+            node = node.setdefault(ch, {"": []})
+            self._offer(node, rank, item)
+
+    def _offer(self, node: dict, rank: tuple, item: Completion) -> None:
+        top = node[""]
+        top.append((rank, item.text.lower(), item))
+        top.sort(key=lambda entry: entry[:2])
+        del top[self._top_k:]
+
+    def search(self, prefix: str, limit: int = TRIE_TOP_K) -> list[Completion]:
+        node = self._root
+        for ch in prefix.lower():
+            node = node.get(ch)
+            if node is None:
+                return []
+        return [item for _, _, item in node[""][:limit]]
+
+
+class QuestionCompleter:
+    """单道题目（某一版本）的表名与列名前缀树。"""
+
+    def __init__(self, schema_preview: str | None):
+        catalog = schema_catalog(schema_preview)
+        self.tables = PrefixTrie()
+        self.columns = PrefixTrie()
+        self.table_columns: dict[str, PrefixTrie] = {}
+        owners: dict[str, tuple[str, list[str]]] = {}
+        for key, (table, columns) in catalog.items():
+            self.tables.insert(table, Completion(table, "table"))
+            trie = self.table_columns[key] = PrefixTrie()
+            for col_key, column in columns.items():
+                trie.insert(column, Completion(column, "column", table))
+                owners.setdefault(col_key, (column, []))[1].append(table)
+        for column, tables in owners.values():
+            self.columns.insert(column, Completion(column, "column", ", ".join(tables)))
+
+    def complete(
+        self, sql: str, cursor: int | None = None, knowledge_point: str | None = None, limit: int = 20
+    ) -> tuple[str, str, list[Completion]]:
+        """返回 (上下文, 前缀, 候选)。cursor 为光标的字符偏移，缺省为文本末尾；别名按整段 SQL 解析。"""
+        limit = max(1, min(limit, TRIE_TOP_K))
+        before = sql if cursor is None else sql[: max(0, cursor)]
+        if before.count("'") % 2 or "--" in before.rsplit("\n", 1)[-1]:
+            return "none", "", []  # 光标在字符串或行注释中
+        qualified = _QUALIFIED_TAIL.search(before)
+        if qualified:
+            alias, prefix = qualified.group(1).lower(), qualified.group(2)
+            trie = self.table_columns.get(_resolve_alias(sql, alias))
+            return "qualified_column", prefix, trie.search(prefix, limit) if trie else []
+
+        prefix = _PREFIX_TAIL.search(before).group(0)
+        context = _context(before[: len(before) - len(prefix)])
+        if knowledge_point not in KNOWLEDGE_POINT_FUNCTIONS:
+            knowledge_point = None
+        if context == "table":
+            groups = [self.tables.search(prefix, limit)]
+        elif context == "column":
+            groups = [
+                self.columns.search(prefix, limit),
+                _function_trie(knowledge_point).search(prefix, limit),
+                _keyword_trie().search(prefix, limit),
+            ]
+        elif context == "by":
+            groups = [[_BY]] if "by".startswith(prefix.lower()) else []
+        else:
+            groups = [_keyword_trie().search(prefix, limit)]
+        items = [item for group in groups for item in group][:limit]
+        return context, prefix, items
+
+
+def _resolve_alias(sql: str, alias: str) -> str:
+    """把 FROM/JOIN 中的别名解析为表名（小写）；找不到时按表名处理。"""
+    for m in _TABLE_ALIAS.finditer(sql):
+        if (m.group(2) or "").lower() == alias:
+            return m.group(1).lower()
+    return alias
+
+
+def _context(before: str) -> str:
+    words = [w.lower() for w in _WORD.findall(before)]
+    if not words:
+        return "keyword"
+    last = words[-1]
+    if last in ("group", "order", "partition"):
+        return "by"
+    if last in _TABLE_CONTEXT:
+        return "table"
+    if last in _COLUMN_CONTEXT or last in ("(", "=", "<", ">", "+", "-", "*", "/", "!"):
+        return "column"
+    if last == ",":
+        clause = next((w for w in reversed(words) if w in _CLAUSES), None)
+        return "table" if clause == "from" else "column"
+    return "keyword"
+
+
+@lru_cache(maxsize=1)
+def _keyword_trie() -> PrefixTrie:
+    trie = PrefixTrie()
+    for i, keyword in enumerate(SQL_KEYWORDS):
+        trie.insert(keyword, Completion(keyword, "keyword"), (i,))
+    return trie
+
+
+@lru_cache(maxsize=len(KNOWLEDGE_POINT_FUNCTIONS) + 1)
+def _function_trie(knowledge_point: str | None) -> PrefixTrie:
+    """函数前缀树；知识点常用函数排在其他函数前面。"""
+    preferred = get_knowledge_point_functions(knowledge_point)
+    trie = PrefixTrie()
+    for name in dict.fromkeys([*preferred, *COMMON_FUNCTIONS]):
+        trie.insert(name, Completion(name, "function"), (0 if name in preferred else 1,))
+    return trie
+
+
+# (题目 ID, 题目版本) -> QuestionCompleter；题目修改后版本号变化，旧条目自然失效
+_completers = TTLCache(_settings.AUTOCOMPLETE_CACHE_MAX_ENTRIES, _settings.AUTOCOMPLETE_CACHE_TTL_SECONDS)
+
+
+async def get_question_completer(session: AsyncSession, question_id: int) -> QuestionCompleter | None:
+    """取题目当前版本的补全器；缓存命中时只查询一次版本号。题目不存在时返回 None。"""
+    version = (await session.execute(select(Question.version).where(Question.id == question_id))).scalar()
+    if version is None:
+        return None
+    key = (question_id, version)
+    completer = _completers.get(key)
+    if completer is None:
+        incr("autocomplete.cache_miss")
+        schema_preview = (
+            await session.execute(select(Question.schema_preview).where(Question.id == question_id))
+        ).scalar()
+        completer = QuestionCompleter(schema_preview)
+        _completers.set(key, completer)
+    else:
+        incr("autocomplete.cache_hit")
+    return completer
+
+
+__all__ = [
+    "SQL_KEYWORDS",
+    "COMMON_FUNCTIONS",
+    "Completion",
+    "PrefixTrie",
+    "QuestionCompleter",
+    "get_question_completer",
+]
@@ -1,11 +1,24 @@
 """SQL 判题引擎：安全执行 SQL 并对比结果。"""
 
+import asyncio
+import json
+from contextlib import ExitStack, asynccontextmanager
 from decimal import Decimal
-from typing import Any
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Awaitable, Callable
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
 from sqlalchemy import text
 import re
 
+from core.column_matching import ColumnSignatures, candidate_pairings, column_signatures, reorder_rows
+from core.dialects import dialect_for_session, is_connection_error
+from core.disconnect import cancellable_query
+from core.metrics import incr, timed
+from core.spill_compare import SpilledRows, compare_spilled, respill
+from settings import get_settings
+
+_settings = get_settings()
+
 
 class SQLJudgeError(Exception):
     """SQL 判题过程中的自定义异常。"""
@@ -19,11 +32,61 @@ class SQLSafetyError(SQLJudgeError):
         self.detected_keyword = detected_keyword
 
 
+class SQLCostExceededError(SQLJudgeError):
+    """执行计划估算的扫描行数超出题目预算（如误写的多表笛卡尔积），系统在执行前拒绝。"""
+    def __init__(self, message: str, estimated_rows: int, row_budget: int, tables: list[str] | None = None):
+        super().__init__(message)
+        self.estimated_rows = estimated_rows
+        self.row_budget = row_budget
+        self.tables = tables or []
+
+
+class SQLConnectionLostError(SQLJudgeError):
+    """判题途中沙箱连接中断（数据库宕机、网络断开等），与学生 SQL 无关，不应计为一次错误提交。"""
+    pass
+
+
 class SQLJudgeService:
     """SQL 判题服务，负责安全执行 SQL 并对比结果。"""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        row_budget: int | None = None,
+        timeout_ms: int | None = None,
+        spill_to_disk: bool = False,
+        fingerprint_compare: bool = False,
+        ignore_column_order: bool = False,
+        parallel_queries: bool = False,
+    ):
+        """
+        :param row_budget: 学生 SQL 执行前的扫描行数预算（EXPLAIN 估算），为空时不做代价检查
+        :param timeout_ms: 单条 SQL 执行超时（毫秒），为空时使用 JUDGE_STATEMENT_TIMEOUT_MS
+        :param spill_to_disk: 大数据量题目：结果集流式落盘后归并对比，不把完整结果集放进内存
+        :param fingerprint_compare: 先在数据库内计算两条 SQL 结果的无序指纹，相同即判为正确，不取回结果行；
+                                    指纹不同或后端不支持时回退到逐行对比
+        :param ignore_column_order: 无别名要求时不要求列顺序一致，按列值签名配对学生列与标准答案列
+        :param parallel_queries: 学生与标准答案 SQL 在两条独立沙箱连接（只读快照事务）上并发执行，
+                                 需要表数据已提交；会话未绑定连接池时自动退回在当前会话上依次执行
+        """
         self.session = session
+        self.row_budget = row_budget
+        self.spill_to_disk = spill_to_disk
+        self.fingerprint_compare = fingerprint_compare
+        self.ignore_column_order = ignore_column_order
+        self.parallel_queries = parallel_queries
+        self.timeout_ms = _settings.JUDGE_STATEMENT_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        # 判题后端方言：决定超时机制与结果值映射
+        self.dialect = dialect_for_session(session)
+
+    def _execution_error(self, e: Exception) -> SQLJudgeError:
+        if is_connection_error(e):
+            return SQLConnectionLostError(f"判题沙箱连接中断: {e}")
+        if self.dialect.is_timeout_error(e):
+            return SQLJudgeError(
+                f"SQL 执行超时（超过 {self.timeout_ms / 1000:g} 秒），已被中断。请检查是否存在多表笛卡尔积或缺少过滤条件。"
+            )
+        return SQLJudgeError(f"SQL 执行失败: {str(e)}")
 
     def _check_sql_safety(self, sql: str) -> tuple[bool, str | None]:
         """检查 SQL 语句的安全性。
@@ -67,13 +130,12 @@ class SQLJudgeService:
             return True, None
         return False, None
 
-    async def execute_sql_safely(self, sql: str) -> list[dict[str, Any]]:
-        """安全执行 SQL 语句并返回结果。
+    def check_sql_safety(self, sql: str) -> tuple[bool, str | None]:
+        """供判题服务之外的调用方（如效率评估）使用的安全检查，规则同 _check_sql_safety。"""
+        return self._check_sql_safety(sql)
 
-        :param sql: SQL 语句
-        :return: 查询结果列表（每行是一个字典）
-        :raises SQLJudgeError: 如果 SQL 不安全或执行失败
-        """
+    def _ensure_sql_safe(self, sql: str) -> None:
+        """不安全时抛出 SQLSafetyError（执行与 EXPLAIN 之前共用）。"""
         safe, keyword = self._check_sql_safety(sql)
         if not safe:
             if keyword:
@@ -86,10 +148,58 @@ class SQLJudgeService:
                 detected_keyword=None,
             )
 
+    async def _check_cost(self, sql: str) -> None:
+        """设置了 row_budget 时执行前 EXPLAIN，估算扫描行数超出预算则抛出 SQLCostExceededError。"""
+        if not self.row_budget:
+            return
+        self._ensure_sql_safe(sql)
+        from core.cost_guard import check_query_cost
+
+        await check_query_cost(self.session, sql, self.row_budget)
+
+    async def preview_sql(self, sql: str, max_rows: int) -> tuple[list[str], list[tuple], bool]:
+        """只运行、不判题：经过安全检查与代价检查后执行，最多取回 max_rows 行。
+
+        使用流式结果（服务端游标）并多取 1 行判断是否被截断，不把完整结果集拉到应用内存。
+
+        :return: (列名, 行数据, 是否截断)
+        :raises SQLSafetyError / SQLCostExceededError: 同 judge_sql
+        :raises SQLJudgeError: 执行失败
+        """
+        self._ensure_sql_safe(sql)
+        await self._check_cost(sql)
         try:
-            # 执行 SQL（使用 text() 包装原始 SQL）
-            result = await self.session.execute(text(sql))
-            rows = result.fetchall()
+            async with self._statement_guard(self.session):
+                result = await self.session.stream(text(sql))
+                try:
+                    columns = list(result.keys())
+                    rows = [
+                        tuple(self.dialect.map_result_value(v) for v in r)
+                        for r in await result.fetchmany(max_rows + 1)
+                    ]
+                finally:
+                    await result.close()
+        except Exception as e:
+            raise self._execution_error(e)
+        truncated = len(rows) > max_rows
+        return columns, rows[:max_rows], truncated
+
+    async def execute_sql_safely(self, sql: str, session: AsyncSession | None = None) -> list[dict[str, Any]]:
+        """安全执行 SQL 语句并返回结果。
+
+        :param sql: SQL 语句
+        :param session: 执行所用会话，为空时使用 self.session
+        :return: 查询结果列表（每行是一个字典）
+        :raises SQLJudgeError: 如果 SQL 不安全或执行失败
+        """
+        self._ensure_sql_safe(sql)
+        session = session or self.session
+
+        try:
+            # 执行 SQL（使用 text() 包装原始 SQL），超时由各方言的机制中断
+            async with self._statement_guard(session):
+                result = await session.execute(text(sql))
+                rows = result.fetchall()
 
             # 转换为字典列表
             columns = result.keys()
@@ -97,7 +207,7 @@ class SQLJudgeService:
 
             return result_list
         except Exception as e:
-            raise SQLJudgeError(f"SQL 执行失败: {str(e)}")
+            raise self._execution_error(e)
 
     def _sql_has_order_by(self, sql: str) -> bool:
         """粗略判断 SQL 是否包含 ORDER BY（标准答案若要求顺序，则判题需按行序比较）。"""
@@ -107,7 +217,11 @@ class SQLJudgeService:
         return "order" in sql_lower and " by " in sql_lower
 
     def _normalize_value(self, value: Any) -> Any:
-        """标准化单个值：MySQL 返回 Decimal，需与 float 统一；浮点保留6位小数。"""
+        """标准化单个值：MySQL 返回 Decimal，需与 float 统一；浮点保留6位小数。
+
+        先经方言映射（布尔、时间、二进制等驱动差异），保证同一题目在不同后端上判题结果一致。
+        """
+        value = self.dialect.map_result_value(value)
         if value is None:
             return None
         if isinstance(value, (int, float, Decimal)):
@@ -217,6 +331,10 @@ class SQLJudgeService:
             cc = len(correct_norm[0])
             if sc != cc:
                 return False, f"列数不匹配：期望 {cc} 列，实际 {sc} 列。"
+        if self.ignore_column_order and student_tuples != correct_tuples:
+            for pairing in self._column_pairings(student_tuples, correct_tuples):
+                if sorted(reorder_rows(student_tuples, pairing)) == correct_tuples:
+                    return True, "结果匹配。"
         if student_tuples != correct_tuples:
             return False, "结果数据不匹配（可能顺序不同或数据有误）。"
         return True, "结果匹配。"
@@ -237,34 +355,352 @@ class SQLJudgeService:
         :param correct_sql: 标准答案 SQL 语句
         :param required_output_columns: 若非空，表示题目对输出列名/别名有明确要求
         :return: (是否正确, 错误描述)
+        :raises SQLCostExceededError: 设置了 row_budget 且学生 SQL 的估算扫描行数超出预算
         """
-        try:
-            student_result = await self.execute_sql_safely(student_sql)
-        except SQLSafetyError:
-            raise  # 向上抛出，由路由层识别并设置 is_safety_blocked
-        except SQLJudgeError as e:
-            return False, f"学生 SQL 执行失败: {str(e)}"
+        await self._check_cost(student_sql)
+        by_names = bool(required_output_columns and str(required_output_columns).strip())
+        # 指纹按列序编码；列顺序无关的题目跳过指纹，直接走逐行对比
+        if (
+            self.fingerprint_compare
+            and not self._sql_has_order_by(correct_sql)
+            and (by_names or not self.ignore_column_order)
+        ):
+            if await self._fingerprints_match(student_sql, correct_sql, required_output_columns):
+                incr("judge.fingerprint.match")
+                return True, "结果匹配。"
+            incr("judge.fingerprint.fallback")
+        if self.spill_to_disk:
+            return await self._judge_spilled(student_sql, correct_sql, required_output_columns)
+
+        self._ensure_sql_safe(student_sql)  # 不安全时向上抛出，由路由层识别并设置 is_safety_blocked
+        student_result, correct_result, error = await self._execute_pair(
+            lambda session: self.execute_sql_safely(student_sql, session),
+            lambda session: self.execute_sql_safely(correct_sql, session),
+        )
+        if error:
+            return False, error
+
+        # 标准化、排序与集合比较是纯 CPU 计算：结果较大时放到线程池，避免卡住同一 worker 上的其他请求
+        width = max(len(student_result[0]) if student_result else 0, len(correct_result[0]) if correct_result else 0)
+        cells = (len(student_result) + len(correct_result)) * max(width, 1)
+        if cells >= _settings.JUDGE_OFFLOAD_MIN_CELLS:
+            incr("judge.compare.offloaded")
+            with timed("judge.compare.offloaded"):
+                return await asyncio.to_thread(
+                    self._compare_for_judge, student_result, correct_result, correct_sql, required_output_columns
+                )
+        with timed("judge.compare.inline"):
+            return self._compare_for_judge(student_result, correct_result, correct_sql, required_output_columns)
 
-        try:
-            correct_result = await self.execute_sql_safely(correct_sql)
-        except SQLJudgeError as e:
-            return False, f"标准答案 SQL 执行失败: {str(e)}"
+    def _parallel_engine(self) -> AsyncEngine | None:
+        """可并发执行时返回沙箱引擎：会话须绑定在连接池上，且每次取到的是能看到同一份数据的独立连接。"""
+        if not self.parallel_queries:
+            return None
+        bind = self.session.bind
+        if not isinstance(bind, AsyncEngine):
+            return None
+        if isinstance(bind.sync_engine.pool, (StaticPool, SingletonThreadPool)):
+            return None  # 所有会话共用同一条连接，无法并发
+        if bind.dialect.name == "sqlite" and bind.url.database in (None, "", ":memory:"):
+            return None  # 内存库每条连接各是一个空库
+        return bind
+
+    @asynccontextmanager
+    async def _statement_guard(self, session: AsyncSession) -> AsyncIterator[None]:
+        """语句超时保护；在可取消的请求中同时登记连接，客户端断开时中断查询。"""
+        async with cancellable_query(self.dialect, session):
+            async with self.dialect.statement_timeout(session, self.timeout_ms):
+                yield
+
+    @asynccontextmanager
+    async def _snapshot_session(self, engine: AsyncEngine) -> AsyncIterator[tuple[AsyncSession, Any]]:
+        """从沙箱连接池取一条独立连接并开启只读快照事务，返回 (会话, 驱动连接)。
+
+        被取消时让连接失效，避免带着未结束的查询回到连接池。
+        """
+        async with engine.connect() as conn:
+            driver_connection = (await conn.get_raw_connection()).driver_connection
+            async with AsyncSession(bind=conn) as session:
+                try:
+                    await self.dialect.begin_read_only_snapshot(session)
+                    yield session, driver_connection
+                except asyncio.CancelledError:
+                    await conn.invalidate()
+                    raise
+
+    async def _execute_pair(
+        self,
+        student_call: Callable[[AsyncSession], Awaitable[Any]],
+        correct_call: Callable[[AsyncSession], Awaitable[Any]],
+    ) -> tuple[Any, Any, str | None]:
+        """执行学生与标准答案 SQL。
+
+        可并发时两条 SQL 在两条独立连接上同时执行，学生 SQL 失败时立即取消标准答案，判题耗时约为两者中较慢的一条；
+        否则在当前会话上依次执行。学生 SQL 的失败优先于标准答案的失败（与依次执行一致）。
 
+        :return: (学生侧结果, 标准答案侧结果, 执行失败时面向学生的错误描述)
+        :raises SQLSafetyError / SQLCostExceededError: 学生 SQL 被拒绝，向上抛出由路由层识别
+        :raises SQLConnectionLostError: 沙箱连接中断，不折算成学生或标准答案的执行错误
+        """
+        engine = self._parallel_engine()
+        if engine is None:
+            try:
+                student_value = await student_call(self.session)
+            except (SQLSafetyError, SQLCostExceededError, SQLConnectionLostError):
+                raise
+            except SQLJudgeError as e:
+                return None, None, f"学生 SQL 执行失败: {str(e)}"
+            try:
+                correct_value = await correct_call(self.session)
+            except SQLConnectionLostError:
+                raise
+            except SQLJudgeError as e:
+                return None, None, f"标准答案 SQL 执行失败: {str(e)}"
+            return student_value, correct_value, None
+
+        drivers: dict[asyncio.Task, Any] = {}
+
+        async def isolated(call: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+            async with self._snapshot_session(engine) as (session, driver_connection):
+                drivers[asyncio.current_task()] = driver_connection
+                return await call(session)
+
+        student_task = asyncio.create_task(isolated(student_call))
+        correct_task = asyncio.create_task(isolated(correct_call))
+        tasks = (student_task, correct_task)
+        try:
+            with timed("judge.parallel"):
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                if not student_task.done():
+                    # 标准答案先失败：仍等学生 SQL 执行完，两侧都失败时报告学生 SQL 的错误
+                    await asyncio.wait((student_task,))
+        finally:
+            pending = [t for t in tasks if not t.done()]
+            for t in pending:
+                # 先中断数据库侧仍在执行的查询（连接此时仍可用），再取消等待它的任务
+                if t in drivers:
+                    try:
+                        await self.dialect.interrupt_query(drivers[t])
+                    except Exception:
+                        pass
+                t.cancel()
+            if pending:
+                incr("judge.parallel.cancelled")
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        for task, side in ((student_task, "学生"), (correct_task, "标准答案")):
+            if task.cancelled():
+                continue
+            e = task.exception()
+            if e is None:
+                continue
+            if isinstance(e, (SQLSafetyError, SQLCostExceededError)) and task is student_task:
+                raise e
+            if isinstance(e, SQLJudgeError) and not isinstance(e, SQLConnectionLostError):
+                return None, None, f"{side} SQL 执行失败: {str(e)}"
+            raise e
+        return student_task.result(), correct_task.result(), None
+
+    def _compare_for_judge(
+        self,
+        student_result: list[dict[str, Any]],
+        correct_result: list[dict[str, Any]],
+        correct_sql: str,
+        required_output_columns: str | None,
+    ) -> tuple[bool, str]:
+        """按题目要求选择对比方式（同步，可在线程池中执行）。"""
         enforce_aliases = bool(required_output_columns and str(required_output_columns).strip())
         if enforce_aliases:
             # 有别名要求：使用原来的「列结构 + 值」比较逻辑
             if self._sql_has_order_by(correct_sql):
-                is_correct, error_msg = self.compare_results_ordered(student_result, correct_result)
-            else:
-                is_correct, error_msg = self.compare_results_unordered(student_result, correct_result)
-        else:
-            # 无别名要求：忽略列名，只按列值等价判定
-            if self._sql_has_order_by(correct_sql):
-                is_correct, error_msg = self._compare_by_values_ordered(student_result, correct_result)
-            else:
-                is_correct, error_msg = self.compare_results_by_values_only(student_result, correct_result)
+                return self.compare_results_ordered(student_result, correct_result)
+            return self.compare_results_unordered(student_result, correct_result)
+        # 无别名要求：忽略列名，只按列值等价判定
+        if self._sql_has_order_by(correct_sql):
+            return self._compare_by_values_ordered(student_result, correct_result)
+        return self.compare_results_by_values_only(student_result, correct_result)
+
+    async def _fingerprints_match(
+        self, student_sql: str, correct_sql: str, required_output_columns: str | None
+    ) -> bool:
+        """数据库内对比：两条 SQL 的结果指纹相同返回 True。
+
+        指纹按与 _normalize_value 相同的方向标准化（去首尾空格、转小写），但数值不做 6 位小数舍入、
+        NULL 与空串区分，只会比内存对比更严格：指纹相同则内存对比必然判为正确，指纹不同时交给逐行对比定论。
+        有别名要求时两边列名集合须一致，并按列名排序编码（与按列名比较的语义一致）。
+        """
+        self._ensure_sql_safe(student_sql)
+        by_names = bool(required_output_columns and str(required_output_columns).strip())
+        with timed("judge.fingerprint"):
+            student_cols = await self._probe_columns(student_sql)
+            correct_cols = await self._probe_columns(correct_sql)
+            if student_cols is None or correct_cols is None:
+                return False
+            if len(set(student_cols)) != len(student_cols) or len(set(correct_cols)) != len(correct_cols):
+                return False  # 同名列在内存对比中会被合并，交给逐行对比
+            if by_names:
+                if set(student_cols) != set(correct_cols):
+                    return False
+                student_cols = correct_cols = sorted(correct_cols)
+            elif len(student_cols) != len(correct_cols):
+                return False
+            student_fp = await self._fingerprint(student_sql, student_cols)
+            if student_fp is None:
+                return False
+            return student_fp == await self._fingerprint(correct_sql, correct_cols)
+
+    async def _probe_columns(self, sql: str) -> list[str] | None:
+        """只取列名（LIMIT 0），执行失败返回 None。
+
+        LIMIT 0 在部分后端仍会物化派生表（如 MySQL 的 GROUP BY / DISTINCT 子查询），同样受语句超时保护。
+        """
+        probe = f"SELECT * FROM ({sql.strip().rstrip(';')}) AS judge_q LIMIT 0"
+        try:
+            async with self.session.begin_nested():
+                async with self._statement_guard(self.session):
+                    result = await self.session.execute(text(probe))
+                return list(result.keys())
+        except Exception:
+            return None
 
-        return is_correct, error_msg
+    async def _fingerprint(self, sql: str, columns: list[str]) -> tuple | None:
+        """计算结果指纹 (行数, 哈希和1, 哈希和2)；后端不支持或执行失败返回 None。"""
+        fingerprint_sql = self.dialect.fingerprint_sql(sql, columns)
+        if fingerprint_sql is None:
+            return None
+        try:
+            # 出错时只回滚到保存点，不影响随后的逐行对比（PostgreSQL 出错后整个事务不可用）
+            async with self.session.begin_nested():
+                await self.dialect.prepare_fingerprint(self.session)
+                async with self._statement_guard(self.session):
+                    row = (await self.session.execute(text(fingerprint_sql))).one()
+        except Exception:
+            return None
+        return tuple(int(v) if v is not None else None for v in row)
+
+    async def _judge_spilled(
+        self, student_sql: str, correct_sql: str, required_output_columns: str | None
+    ) -> tuple[bool, str]:
+        """落盘对比：两条 SQL 依次流式执行并写入临时 run 文件，再归并比较；结论与内存对比一致。
+
+        列顺序无关（ignore_column_order 且无别名要求）时，先按到达顺序落盘并累积列签名；
+        按原列序对比不一致时，与内存对比一样逐一尝试候选配对（最多 MAX_PAIRING_CANDIDATES 种），
+        每种配对把学生行按标准答案列序重新落盘后对比，用完即删除。
+        """
+        by_names = bool(required_output_columns and str(required_output_columns).strip())
+        options = dict(
+            ordered=self._sql_has_order_by(correct_sql),
+            memory_budget=_settings.JUDGE_SPILL_MEMORY_BYTES,
+            partitions=_settings.JUDGE_SPILL_PARTITIONS,
+            directory=_settings.JUDGE_SPILL_DIR,
+        )
+        match_columns = self.ignore_column_order and not by_names
+        student_sigs = ColumnSignatures() if match_columns else None
+        correct_sigs = ColumnSignatures() if match_columns else None
+        spill_options = dict(options, ordered=True) if match_columns else options
+        self._ensure_sql_safe(student_sql)
+        with ExitStack() as stack:
+            student = stack.enter_context(SpilledRows(**spill_options))
+            correct = stack.enter_context(SpilledRows(**spill_options))
+            _, _, error = await self._execute_pair(
+                lambda session: self._spill_query(student_sql, student, by_names, student_sigs, session=session),
+                lambda session: self._spill_query(correct_sql, correct, by_names, correct_sigs, session=session),
+            )
+            if error:
+                return False, error
+            if not match_columns:
+                incr("judge.compare.spilled")
+                with timed("judge.compare.spilled"):
+                    return await asyncio.to_thread(compare_spilled, student, correct, by_column_names=by_names)
+            arrived = student
+            if not options["ordered"]:
+                student = stack.enter_context(await asyncio.to_thread(respill, arrived, None, **options))
+                correct = stack.enter_context(await asyncio.to_thread(respill, correct, None, **options))
+            incr("judge.compare.spilled")
+            with timed("judge.compare.spilled"):
+                result = await asyncio.to_thread(compare_spilled, student, correct, by_column_names=False)
+            if result[0] or student.row_count != correct.row_count:
+                return result
+            with timed("judge.column_matching"):
+                pairings = [
+                    p for p in candidate_pairings(student_sigs.sums, correct_sigs.sums)
+                    if p != list(range(len(p)))
+                ]
+            incr("judge.column_matching.matched" if pairings else "judge.column_matching.unmatched")
+            for pairing in pairings:
+                with await asyncio.to_thread(respill, arrived, self._line_reorderer(pairing), **options) as paired:
+                    with timed("judge.compare.spilled"):
+                        matched = await asyncio.to_thread(compare_spilled, paired, correct, by_column_names=False)
+                if matched[0]:
+                    return matched
+            # 所有配对均不一致：提示语与按原列序对比一致
+            return result
+
+    async def _spill_query(
+        self,
+        sql: str,
+        spilled: SpilledRows,
+        by_column_names: bool,
+        signatures: ColumnSignatures | None = None,
+        session: AsyncSession | None = None,
+    ) -> None:
+        """流式执行 SQL，逐批标准化、编码并写入 spilled（编码与写盘在线程池中执行）。"""
+        self._ensure_sql_safe(sql)
+        session = session or self.session
+        try:
+            async with self._statement_guard(session):
+                result = await session.stream(text(sql))
+                try:
+                    columns = list(result.keys())
+                    spilled.columns = columns
+                    async for batch in result.partitions(_settings.JUDGE_SPILL_BATCH_ROWS):
+                        await asyncio.to_thread(
+                            self._spill_batch, spilled, columns, batch, by_column_names, signatures
+                        )
+                finally:
+                    await result.close()
+        except Exception as e:
+            raise self._execution_error(e)
+        await asyncio.to_thread(spilled.finish)
+
+    def _spill_batch(
+        self,
+        spilled: SpilledRows,
+        columns: list[str],
+        batch,
+        by_column_names: bool,
+        signatures: ColumnSignatures | None = None,
+    ) -> None:
+        if signatures is None:
+            spilled.add(self._encode_row(columns, row, by_column_names) for row in batch)
+            return
+        lines = []
+        for row in batch:
+            values = self._row_values(columns, row)
+            signatures.update(values)
+            lines.append(json.dumps(values, ensure_ascii=False))
+        spilled.add(lines)
+
+    def _row_values(self, columns: list[str], row) -> list[str]:
+        """一行标准化后的列值（按列顺序，NULL 与空串视为相同）。"""
+        return ["" if v is None else str(v) for v in self._normalize_row(dict(zip(columns, row))).values()]
+
+    @staticmethod
+    def _line_reorderer(pairing: list[int]):
+        """返回把已编码的学生行按配对重排列序的函数（编码同 _encode_row 的按列值模式）。"""
+        def reorder(line: str) -> str:
+            values = json.loads(line)
+            return json.dumps([values[i] for i in pairing], ensure_ascii=False)
+        return reorder
+
+    def _encode_row(self, columns: list[str], row, by_column_names: bool) -> str:
+        """把一行标准化后编码为 JSON 文本，编码规则与内存对比的比较键一致。"""
+        norm = self._normalize_row(dict(zip(columns, row)))
+        if by_column_names:
+            # 同 _compare_normalized：按 (列名, 值) 比较
+            return json.dumps(sorted(norm.items()), ensure_ascii=False)
+        # 同 compare_results_by_values_only：只按列值比较，NULL 与空串视为相同
+        return json.dumps(["" if v is None else str(v) for v in norm.values()], ensure_ascii=False)
 
     def _compare_by_values_ordered(
         self, student_result: list[dict[str, Any]], correct_result: list[dict[str, Any]]
@@ -277,12 +713,26 @@ class SQLJudgeService:
         if student_norm and correct_norm:
             if len(student_norm[0]) != len(correct_norm[0]):
                 return False, f"列数不匹配：期望 {len(correct_norm[0])} 列，实际 {len(student_norm[0])} 列。"
-        for i, (sr, cr) in enumerate(zip(student_norm, correct_norm)):
-            sv = tuple(str(v) if v is not None else "" for v in sr.values())
-            cv = tuple(str(v) if v is not None else "" for v in cr.values())
+        student_tuples = [tuple(str(v) if v is not None else "" for v in r.values()) for r in student_norm]
+        correct_tuples = [tuple(str(v) if v is not None else "" for v in r.values()) for r in correct_norm]
+        if self.ignore_column_order and student_tuples != correct_tuples:
+            for pairing in self._column_pairings(student_tuples, correct_tuples):
+                if reorder_rows(student_tuples, pairing) == correct_tuples:
+                    return True, "结果匹配（含顺序）。"
+        for i, (sv, cv) in enumerate(zip(student_tuples, correct_tuples)):
             if sv != cv:
                 return False, f"第 {i + 1} 行与标准答案不一致（顺序或数据有误）。"
         return True, "结果匹配（含顺序）。"
 
+    def _column_pairings(self, student_tuples: list[tuple], correct_tuples: list[tuple]) -> list[list[int]]:
+        """按列值签名得到候选列配对（恒等配对已由调用方比较过，这里跳过）。"""
+        with timed("judge.column_matching"):
+            pairings = [
+                p for p in candidate_pairings(column_signatures(student_tuples), column_signatures(correct_tuples))
+                if p != list(range(len(p)))
+            ]
+        incr("judge.column_matching.matched" if pairings else "judge.column_matching.unmatched")
+        return pairings
+
 
-__all__ = ["SQLJudgeService", "SQLJudgeError", "SQLSafetyError"]
+__all__ = ["SQLJudgeService", "SQLJudgeError", "SQLSafetyError", "SQLCostExceededError", "SQLConnectionLostError"]
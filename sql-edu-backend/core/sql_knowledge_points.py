@@ -327,6 +327,22 @@ SQL_KNOWLEDGE_POINTS: list[KnowledgePoint] = [
 
 LEVEL_ORDER = ("入门", "进阶", "精通")
 
+# 各知识点常用的函数，供编辑器自动补全优先展示
+KNOWLEDGE_POINT_FUNCTIONS: dict[str, list[str]] = {
+    "arithmetic": [
+        "ABS", "ROUND", "CEIL", "FLOOR", "MOD", "CONCAT", "LENGTH", "UPPER", "LOWER", "SUBSTRING", "TRIM",
+        "REPLACE", "NOW", "CURDATE", "DATE", "YEAR", "MONTH", "DAY", "DATEDIFF", "DATE_ADD", "DATE_FORMAT",
+    ],
+    "agg-count": ["COUNT", "SUM", "AVG", "MIN", "MAX"],
+    "group-by": ["COUNT", "SUM", "AVG", "MIN", "MAX", "GROUP_CONCAT"],
+    "having": ["COUNT", "SUM", "AVG", "MIN", "MAX"],
+    "subquery-scalar": ["MAX", "MIN", "AVG", "COUNT"],
+    "case": ["IF", "IFNULL", "COALESCE"],
+    "window-row-number": ["ROW_NUMBER", "RANK", "DENSE_RANK", "NTILE"],
+    "window-agg": ["SUM", "AVG", "COUNT", "MIN", "MAX", "LAG", "LEAD", "FIRST_VALUE", "LAST_VALUE"],
+    "null-handling": ["COALESCE", "NULLIF", "IFNULL"],
+}
+
 
 def get_all_knowledge_points() -> list[KnowledgePoint]:
     """返回所有知识点（按入门→进阶→精通、同级别按列表顺序）。"""
@@ -342,9 +358,16 @@ def get_knowledge_point_by_id(point_id: str) -> KnowledgePoint | None:
     return None
 
 
+def get_knowledge_point_functions(point_id: str | None) -> list[str]:
+    """知识点常用的函数名；未知知识点返回空列表。"""
+    return KNOWLEDGE_POINT_FUNCTIONS.get(point_id or "", [])
+
+
 __all__ = [
     "KnowledgePoint",
     "SQL_KNOWLEDGE_POINTS",
+    "KNOWLEDGE_POINT_FUNCTIONS",
     "get_all_knowledge_points",
     "get_knowledge_point_by_id",
+    "get_knowledge_point_functions",
 ]
@@ -88,3 +88,27 @@ def infer_output_columns_from_sql(sql: str) -> str | None:
     if not names:
         return None
     return ", ".join(names)
+
+
+_CANONICAL_TOKEN = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|--[^\n]*|/\*[\s\S]*?\*/|\s+|[^'\"`\s/-]+|.",
+)
+
+
+def canonicalize_sql(sql: str) -> str:
+    """规范化 SQL 文本用作缓存键：去注释、合并空白、去掉末尾分号；字符串字面量与引号标识符保持原样。
+
+    例如 "select *\n  from t -- all\n;" 与 "select * from t" 得到相同结果。
+    """
+    parts: list[str] = []
+    pending_space = False
+    for match in _CANONICAL_TOKEN.finditer(sql or ""):
+        token = match.group(0)
+        if token.startswith("--") or token.startswith("/*") or token.isspace():
+            pending_space = True
+            continue
+        if pending_space and parts:
+            parts.append(" ")
+        pending_space = False
+        parts.append(token)
+    return "".join(parts).strip().rstrip(";").rstrip()
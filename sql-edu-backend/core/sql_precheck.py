@@ -0,0 +1,583 @@
+"""SQL 本地预检查：不连接数据库，在进程内完成词法/结构检查，并按题目 schema_preview 解析表名与列名。
+
+用于在线编辑器的实时提示，以及 check_sql 判题前的短路：拼写错误、未知表/列这类提交
+不必再付出沙箱建表、数据库往返与大模型提示的开销。
+
+检查尽量只报告「确定会执行失败」的问题，宁可漏报也不误报：
+- 词法：未闭合的字符串/引号标识符/注释、无法识别的字符；
+- 结构：括号不匹配、多条语句、多余逗号、GROUP/ORDER 缺少 BY、语句意外结束、关键字拼写错误；
+- 名称：FROM/JOIN 中的表不在题目表结构中；限定列（别名.列）不存在；
+  FROM 中全部是题目中的表时（无子查询、CTE、表函数），未限定的列名在这些表中都不存在。
+引号标识符（"x" 在 MySQL 中是字符串）、函数名、SELECT 别名、USING 之后的字符集名与
+字符集前缀（_utf8mb4'x'、N'x'）一律不检查。非保留关键字（first、date、year 等）可以作为表别名。
+
+名称类问题依赖对 SQL 的近似解析，标记为 certain=False：check_sql 只在存在确定的问题时短路，
+否则仍交给沙箱判题，避免误报被记为一次失败提交。
+
+strict_tables=True（运行查询预览使用）时改为白名单：只允许引用题目表结构中的表、CTE 与 DUAL，
+带库名的表、表函数、TABLE 语句中的其他表以及 MySQL 可执行注释（/*! ... */）都视为问题。
+"""
+
+import difflib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+
+from schemas.agent import SQLCheckResultSchema, SQLDiagnosisSchema
+
+_TOKEN = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<comment>--[^\n]*|\#[^\n]*|/\*[\s\S]*?\*/)
+    |(?P<string>'(?:[^'\\]|\\[\s\S]|'')*')
+    |(?P<dquote>"(?:[^"\\]|\\[\s\S]|"")*")
+    |(?P<bquote>`(?:[^`]|``)*`)
+    |(?P<bad_string>'[\s\S]*)
+    |(?P<bad_dquote>"[\s\S]*)
+    |(?P<bad_bquote>`[\s\S]*)
+    |(?P<bad_comment>/\*[\s\S]*)
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<var>@@?[\w.$]+|\$\d+|\?)
+    |(?P<ident>[^\W\d][\w$]*)
+    |(?P<op>->>|->|<=>|<>|!=|<=|>=|\|\||::|:=|[-+*/%=<>!~^&|:])
+    |(?P<punct>[(),.;\[\]{}])
+    |(?P<other>.)
+    """,
+    re.VERBOSE,
+)
+
+# 子句关键字：决定 FROM/JOIN 解析边界，也用于拼写纠错
+_CLAUSE_KEYWORDS = (
+    "SELECT", "FROM", "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET", "JOIN", "INNER", "LEFT",
+    "RIGHT", "FULL", "CROSS", "UNION", "EXCEPT", "INTERSECT", "WINDOW", "DISTINCT", "WITH", "QUALIFY",
+)
+
+_KEYWORDS = frozenset(
+    """
+    select from where group order by having limit offset join inner left right full outer cross natural
+    on using as and or not xor in is null like ilike regexp rlike glob between exists case when then else
+    end distinct all any some union except intersect minus with recursive asc desc nulls first last over
+    partition rows range groups unbounded preceding following current row window filter within lateral
+    true false unknown interval cast convert collate escape div mod binary values distinctrow
+    straight_join sql_calc_found_rows high_priority rollup cube grouping sets fetch next only ties top
+    qualify separator signed unsigned integer int smallint bigint tinyint decimal numeric float double
+    real char varchar nchar text date time datetime timestamp year month day hour minute second
+    microsecond week quarter day_hour day_minute day_second hour_minute hour_second minute_second
+    year_month day_microsecond hour_microsecond minute_microsecond second_microsecond epoch dow doy
+    isodow isoyear century decade millennium milliseconds microseconds timezone zone at local
+    current_date current_time current_timestamp current_user localtime localtimestamp sysdate
+    leading trailing both for character charset set boolean json array row_number similar to
+    ignore respect share mode lock of nowait skip locked key primary use force index
+    """.split()
+)
+
+# MySQL 保留字（_KEYWORDS 中的子集）：不能不加引号用作表别名或 CTE 名；其余关键字（first、date 等）可以
+_RESERVED = frozenset(
+    """
+    select from where group order by having limit join inner left right outer cross natural on using as
+    and or not xor in is null like regexp rlike between exists case when then else distinct all union
+    except intersect with recursive asc desc over partition rows range groups window lateral true false
+    interval cast convert collate escape div mod binary values distinctrow straight_join
+    sql_calc_found_rows high_priority cube grouping separator signed unsigned integer int smallint bigint
+    tinyint decimal numeric float double real char varchar year_month day_hour day_minute day_second
+    hour_minute hour_second minute_second day_microsecond hour_microsecond minute_microsecond
+    second_microsecond current_date current_time current_timestamp current_user localtime localtimestamp
+    leading trailing both for character set lock key primary use force index ignore of to row_number array
+    """.split()
+)
+
+# 这些词之后的标识符不是列引用（类型名、排序规则、字符集等）
+_NON_COLUMN_AFTER = frozenset({"as", "::", "collate", "set", "charset", "character", "interval", "using", "."})
+
+# 字符串前的字符集前缀：_utf8mb4'x'、N'x'、X'41'、B'01'
+_STRING_PREFIXES = frozenset({"n", "x", "b"})
+
+# 其后出现的标识符是别名（SELECT 表达式别名、CASE ... END 别名）
+_ALIAS_AFTER_KINDS = frozenset({"ident", "number", "string", "dquote", "bquote"})
+
+# 语句开头的合法关键字；非查询语句交给判题时的安全检查处理，这里不当作拼写错误
+_STATEMENT_KEYWORDS = frozenset(
+    {"select", "with", "values", "table", "explain", "describe", "desc", "show", "insert", "update", "delete",
+     "replace", "merge", "create", "drop", "alter", "truncate", "rename", "grant", "revoke", "call", "set",
+     "use", "begin", "start", "commit", "rollback", "lock", "unlock", "load", "handler", "do", "analyze"}
+)
+
+_QUERY_KEYWORDS = frozenset({"select", "with", "values", "table"})
+
+_JOIN_KEYWORDS = frozenset({"join", "straight_join"})
+_FROM_ITEM_END = frozenset(
+    {"where", "group", "order", "having", "limit", "offset", "union", "except", "intersect", "window",
+     "on", "using", "join", "inner", "left", "right", "full", "cross", "natural", "straight_join",
+     "qualify", "fetch", "for", "lock", "minus"}
+)
+_DANGLING_END = frozenset(
+    {"select", "from", "where", "and", "or", "not", "by", "on", "join", "having", "limit", "offset",
+     "union", "in", "like", "between", "as", "when", "then", "else", "case", "is", "with", "using", "distinct"}
+)
+
+MAX_ISSUES = 5
+
+
+@dataclass
+class PrecheckIssue:
+    """一条预检查问题，位置为 1 起始的行列号与 0 起始的字符偏移。"""
+
+    kind: str  # syntax / unknown_table / unknown_column
+    message: str
+    line: int
+    column: int
+    offset: int
+    length: int
+    suggestions: list[str] = field(default_factory=list)
+    certain: bool = True  # False：基于近似解析的判断，可能误报
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class _Token:
+    kind: str
+    text: str
+    start: int
+
+    @property
+    def lower(self) -> str:
+        return self.text.lower()
+
+    def is_word(self, *words: str) -> bool:
+        return self.kind == "ident" and self.lower in words
+
+
+@lru_cache(maxsize=256)
+def schema_catalog(schema_preview: str | None) -> dict[str, tuple[str, dict[str, str]]]:
+    """{表名小写: (表名, {列名小写: 列名})}；schema_preview 无效时为空。"""
+    if not schema_preview or not schema_preview.strip():
+        return {}
+    try:
+        data = json.loads(schema_preview)
+    except json.JSONDecodeError:
+        return {}
+    tables = data.get("tables") if isinstance(data, dict) else None
+    catalog: dict[str, tuple[str, dict[str, str]]] = {}
+    for tbl in tables if isinstance(tables, list) else []:
+        if not isinstance(tbl, dict) or not isinstance(tbl.get("columns"), list):
+            continue
+        name = re.sub(r"[^\w]", "", str(tbl.get("name") or ""))
+        columns = {
+            re.sub(r"[^\w]", "", c).lower(): re.sub(r"[^\w]", "", c)
+            for c in tbl["columns"] if isinstance(c, str) and re.sub(r"[^\w]", "", c)
+        }
+        if name and columns:
+            catalog[name.lower()] = (name, columns)
+    return catalog
+
+
+def _tokenize(sql: str) -> list[_Token]:
+    tokens = []
+    for m in _TOKEN.finditer(sql):
+        kind = m.lastgroup
+        if kind in ("ws", "comment"):
+            continue
+        tokens.append(_Token(kind, m.group(0), m.start()))
+    return tokens
+
+
+class _Checker:
+    def __init__(self, sql: str, catalog: dict[str, tuple[str, dict[str, str]]], strict_tables: bool = False):
+        self.sql = sql
+        self.catalog = catalog
+        self.strict_tables = strict_tables
+        self.tokens = _tokenize(sql)
+        self.issues: list[PrecheckIssue] = []
+        self.skip_names = False
+
+    def issue(self, kind: str, token: _Token | None, message: str, suggestions: list[str] | None = None,
+              offset: int | None = None, length: int | None = None, certain: bool = True) -> None:
+        if offset is None:
+            offset = token.start if token else len(self.sql.rstrip())
+        if length is None:
+            length = len(token.text) if token else 0
+        line = self.sql.count("\n", 0, offset) + 1
+        column = offset - (self.sql.rfind("\n", 0, offset) + 1) + 1
+        self.issues.append(PrecheckIssue(kind, message, line, column, offset, length, suggestions or [], certain))
+
+    # ---- 词法与结构 ----
+
+    def check_syntax(self) -> None:
+        tokens = self.tokens
+        if not tokens:
+            self.issue("syntax", None, "SQL 为空。", offset=0)
+            return
+        if self.strict_tables and "/*!" in self.sql:
+            self.issue("syntax", None, "不支持 MySQL 可执行注释（/*! ... */）。", offset=self.sql.index("/*!"), length=3)
+            return
+        if tokens[0].kind == "ident" and tokens[0].lower in _STATEMENT_KEYWORDS - _QUERY_KEYWORDS:
+            self.skip_names = True  # 非查询语句交给判题时的安全检查拒绝，这里不报告
+            return
+        for tok in tokens:
+            if tok.kind in ("bad_string", "bad_dquote", "bad_bquote"):
+                self.issue("syntax", tok, "引号没有闭合。", length=1)
+                return
+            if tok.kind == "bad_comment":
+                self.issue("syntax", tok, "注释 /* 没有闭合。", length=2)
+                return
+            if tok.kind == "other":
+                self.issue("syntax", tok, f"无法识别的字符 {tok.text!r}。")
+                return
+
+        first = tokens[0]
+        if first.kind == "ident" and first.lower not in _STATEMENT_KEYWORDS:
+            close = difflib.get_close_matches(first.text.upper(), ["SELECT", "WITH"], n=1, cutoff=0.6)
+            if close:
+                self.issue("syntax", first, f"无法识别的关键字 {first.text}，是否为 {close[0]}？", close)
+                return
+
+        stack: list[_Token] = []
+        for i, tok in enumerate(tokens):
+            if tok.text == "(":
+                stack.append(tok)
+            elif tok.text == ")":
+                if not stack:
+                    self.issue("syntax", tok, "多余的右括号。")
+                    return
+                stack.pop()
+            elif tok.text == ";" and any(t.text != ";" for t in tokens[i + 1:]):
+                self.issue("syntax", tokens[i + 1], "只能提交一条 SQL 语句，分号后还有内容。")
+                return
+        if stack:
+            self.issue("syntax", stack[-1], "左括号没有闭合。")
+            return
+
+        significant = [t for t in tokens if t.text != ";"]
+        for i, tok in enumerate(significant):
+            nxt = significant[i + 1] if i + 1 < len(significant) else None
+            if tok.text == ",":
+                if nxt is None or nxt.text in (",", ")") or (
+                    nxt.kind == "ident" and nxt.lower in ("from", "where", "group", "order", "having", "limit")
+                ):
+                    self.issue("syntax", tok, "多余的逗号。")
+                    return
+            elif tok.is_word("select") and nxt is not None and nxt.is_word("from"):
+                self.issue("syntax", nxt, "SELECT 后缺少要查询的列。")
+                return
+            elif tok.is_word("group", "order") and (nxt is None or not nxt.is_word("by")):
+                prev = significant[i - 1] if i else None
+                # WITHIN GROUP (...) 是有序集合聚合的写法
+                if not (tok.lower == "group" and prev is not None and prev.is_word("within")):
+                    self.issue("syntax", tok, f"{tok.text.upper()} 后缺少 BY。")
+                    return
+        last = significant[-1] if significant else tokens[-1]
+        if last.kind == "op" or last.text in (",", ".") or (last.kind == "ident" and last.lower in _DANGLING_END):
+            self.issue("syntax", last, f"语句在 {last.text} 之后意外结束。")
+
+    # ---- 名称解析 ----
+
+    def _paren_kinds(self) -> list[str | None]:
+        """每个 token 所在最内层括号的类型：None 为最外层，'query' 为子查询，'expr' 为表达式/函数参数。"""
+        kinds: list[str | None] = []
+        stack: list[str] = []
+        for i, tok in enumerate(self.tokens):
+            if tok.text == ")" and stack:
+                stack.pop()
+            kinds.append(stack[-1] if stack else None)
+            if tok.text == "(":
+                nxt = self.tokens[i + 1] if i + 1 < len(self.tokens) else None
+                stack.append("query" if nxt is not None and nxt.is_word("select", "with") else "expr")
+        return kinds
+
+    def _matching_paren(self, i: int) -> int:
+        depth = 0
+        for j in range(i, len(self.tokens)):
+            if self.tokens[j].text == "(":
+                depth += 1
+            elif self.tokens[j].text == ")":
+                depth -= 1
+                if depth == 0:
+                    return j
+        return len(self.tokens) - 1
+
+    def check_names(self) -> None:
+        tokens = self.tokens
+        kinds = self._paren_kinds()
+        consumed: set[int] = set()
+        ctes: set[str] = set()
+        extra_columns: set[str] = set()
+        aliases: dict[str, str | None] = {}  # 表别名 -> 题目表名（小写）；子查询、CTE、表函数为 None
+        opaque = False
+        unknown_table = False
+
+        # CTE：name AS ( 或 name (cols) AS (
+        for i, tok in enumerate(tokens):
+            if tok.kind != "ident" or tok.lower in _RESERVED:
+                continue
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+            if nxt is None:
+                continue
+            j = i + 1
+            if nxt.text == "(" and i > 0 and (tokens[i - 1].is_word("with", "recursive") or tokens[i - 1].text == ","):
+                close = self._matching_paren(j)
+                cols = [t for t in tokens[j + 1:close] if t.kind == "ident"]
+                j = close + 1
+                if j + 1 < len(tokens) and tokens[j].is_word("as") and tokens[j + 1].text == "(":
+                    extra_columns.update(t.lower for t in cols)
+                    consumed.update(range(i, close + 1))
+                else:
+                    continue
+            elif not (nxt.is_word("as") and j + 1 < len(tokens) and tokens[j + 1].text == "("):
+                continue
+            ctes.add(tok.lower)
+            consumed.add(i)
+
+        # FROM / JOIN 中的表
+        for i, tok in enumerate(tokens):
+            if kinds[i] == "expr" or not (tok.is_word("from") or tok.lower in _JOIN_KEYWORDS and tok.kind == "ident"):
+                continue
+            j = i + 1
+            while j < len(tokens):
+                item = tokens[j]
+                if item.is_word("lateral", "only"):
+                    j += 1
+                    continue
+                alias_target: str | None = None
+                if item.text == "(":
+                    j = self._matching_paren(j) + 1
+                    opaque = True
+                elif item.kind in ("ident", "bquote", "dquote") and not (item.kind == "ident" and item.lower in _FROM_ITEM_END):
+                    start = j
+                    parts = [item]
+                    while j + 2 < len(tokens) and tokens[j + 1].text == "." and tokens[j + 2].kind in ("ident", "bquote", "dquote"):
+                        j += 2
+                        parts.append(tokens[j])
+                    j += 1
+                    consumed.update(range(start, j))
+                    name = parts[-1].text.strip('`"').lower()
+                    if j < len(tokens) and tokens[j].text == "(":
+                        j = self._matching_paren(j) + 1  # 表函数，如 generate_series(...)
+                        opaque = True
+                        if self.strict_tables:
+                            unknown_table = True
+                            self._forbid_table(item, "".join(p.text for p in parts) + "(...)")
+                    elif len(parts) > 1:
+                        opaque = True  # 带库名的表名不做检查
+                        if self.strict_tables:
+                            unknown_table = True
+                            self._forbid_table(item, ".".join(p.text for p in parts))
+                    elif item.kind != "ident" and not self.strict_tables:
+                        opaque = True  # 引号表名不做检查
+                    elif name in ctes:
+                        opaque = True
+                    elif name == "dual":
+                        pass
+                    elif name in self.catalog:
+                        alias_target = name
+                        aliases[name] = name
+                        opaque = opaque or item.kind != "ident"
+                    else:
+                        unknown_table = True
+                        self.issue(
+                            "unknown_table", item, f"表 {item.text} 不存在。",
+                            difflib.get_close_matches(name, [v[0] for v in self.catalog.values()], n=3, cutoff=0.6),
+                            certain=False,
+                        )
+                else:
+                    break
+                # 可选的 AS alias
+                if j < len(tokens) and tokens[j].is_word("as"):
+                    consumed.add(j)
+                    j += 1
+                if j < len(tokens) and tokens[j].kind in ("ident", "bquote", "dquote") and not (
+                    tokens[j].kind == "ident" and (tokens[j].lower in _FROM_ITEM_END or tokens[j].lower in _RESERVED)
+                ):
+                    aliases[tokens[j].text.strip('`"').lower()] = alias_target
+                    consumed.add(j)
+                    j += 1
+                    if j < len(tokens) and tokens[j].text == "(":  # 派生表列名 AS t(a, b)
+                        close = self._matching_paren(j)
+                        extra_columns.update(t.lower for t in tokens[j + 1:close] if t.kind == "ident")
+                        consumed.update(range(j, close + 1))
+                        j = close + 1
+                if j < len(tokens) and tokens[j].text == "," and tok.is_word("from"):
+                    j += 1
+                    continue
+                break
+
+        if self.strict_tables:
+            unknown_table = self._check_table_statements(ctes) or unknown_table
+        if unknown_table:
+            return  # 表都找不到时列错误只是连带结果
+
+        # 所有表达式别名（含 CASE ... END 之后的别名）
+        select_aliases: set[str] = set()
+        for i, tok in enumerate(tokens):
+            if tok.kind != "ident" or i in consumed or tok.lower in _KEYWORDS:
+                continue
+            prev = tokens[i - 1] if i else None
+            if prev is None:
+                continue
+            if prev.is_word("as") or prev.is_word("end") or prev.text == ")" or (
+                prev.kind in _ALIAS_AFTER_KINDS and not (prev.kind == "ident" and prev.lower in _KEYWORDS)
+            ):
+                select_aliases.add(tok.lower)
+
+        in_scope: dict[str, str] = {}
+        for target in set(aliases.values()):
+            if target is not None:
+                in_scope.update(self.catalog[target][1])
+        check_unqualified = not opaque and bool(in_scope)
+
+        for i, tok in enumerate(tokens):
+            if tok.kind != "ident" or i in consumed:
+                continue
+            prev = tokens[i - 1] if i else None
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+            if prev is not None and prev.text == ".":
+                continue
+            if nxt is not None and nxt.text == "." and i + 2 < len(tokens):
+                self._check_qualified(tok, tokens[i + 2], aliases, ctes)
+                continue
+            if tok.lower in _KEYWORDS or (nxt is not None and nxt.text == "("):
+                continue
+            if nxt is not None and nxt.kind == "string" and (tok.lower[0] == "_" or tok.lower in _STRING_PREFIXES):
+                continue
+            if prev is not None and (prev.lower in _NON_COLUMN_AFTER or prev.is_word("end")):
+                continue
+            if prev is not None and (prev.text == ")" or (
+                prev.kind in _ALIAS_AFTER_KINDS and not (prev.kind == "ident" and prev.lower in _KEYWORDS)
+            )):
+                # 别名位置：紧跟在别名后的又一个标识符多半是拼错的关键字（如 SELECT a FORM t）
+                self._check_misspelled_keyword(tok)
+                continue
+            if not check_unqualified or tok.lower in in_scope or tok.lower in select_aliases:
+                continue
+            if tok.lower in extra_columns or tok.lower in aliases or tok.lower in ctes:
+                continue
+            close = difflib.get_close_matches(tok.text.upper(), _CLAUSE_KEYWORDS, n=1, cutoff=0.75)
+            if close:
+                self.issue("syntax", tok, f"无法识别的关键字 {tok.text}，是否为 {close[0]}？", close, certain=False)
+                continue
+            matches = difflib.get_close_matches(tok.lower, list(in_scope), n=3, cutoff=0.6)
+            self.issue(
+                "unknown_column", tok, f"列 {tok.text} 在{self._describe_tables(aliases)} 中不存在。",
+                [in_scope[c] for c in matches], certain=False,
+            )
+
+    def _forbid_table(self, token: _Token, name: str) -> None:
+        self.issue("unknown_table", token, f"只能查询本题表结构中的表，不能引用 {name}。")
+
+    def _check_table_statements(self, ctes: set[str]) -> bool:
+        """TABLE t（MySQL 8 / PostgreSQL 的简写查询）出现在语句开头、括号内或集合运算之后时，t 也须在白名单中。"""
+        found = False
+        for i, tok in enumerate(self.tokens):
+            if not tok.is_word("table") or i + 1 >= len(self.tokens):
+                continue
+            prev = self.tokens[i - 1] if i else None
+            if prev is not None and prev.text != "(" and not prev.is_word("union", "except", "intersect", "all", "distinct"):
+                continue
+            target = self.tokens[i + 1]
+            name = target.text.strip('`"').lower()
+            qualified = i + 2 < len(self.tokens) and self.tokens[i + 2].text == "."
+            if qualified or (name not in self.catalog and name not in ctes):
+                found = True
+                self._forbid_table(target, target.text)
+        return found
+
+    def _check_misspelled_keyword(self, tok: _Token) -> None:
+        idx = self.tokens.index(tok)
+        nxt = self.tokens[idx + 1] if idx + 1 < len(self.tokens) else None
+        if nxt is None or nxt.kind != "ident" or nxt.lower in _KEYWORDS:
+            return
+        close = difflib.get_close_matches(tok.text.upper(), _CLAUSE_KEYWORDS, n=1, cutoff=0.75)
+        if close:
+            self.issue("syntax", tok, f"无法识别的关键字 {tok.text}，是否为 {close[0]}？", close)
+
+    def _check_qualified(self, qualifier: _Token, column: _Token, aliases: dict[str, str | None], ctes: set[str]) -> None:
+        q = qualifier.lower
+        if q not in aliases:
+            if q in ctes or not self.catalog:
+                return
+            self.issue(
+                "unknown_table", qualifier, f"{qualifier.text} 不是 FROM 中的表或别名。",
+                difflib.get_close_matches(q, list(aliases), n=3, cutoff=0.6), certain=False,
+            )
+            return
+        target = aliases[q]
+        if target is None or column.kind != "ident":
+            return
+        table_name, columns = self.catalog[target]
+        if column.lower not in columns:
+            matches = difflib.get_close_matches(column.lower, list(columns), n=3, cutoff=0.6)
+            self.issue(
+                "unknown_column", column, f"列 {column.text} 在表 {table_name} 中不存在。",
+                [columns[c] for c in matches], certain=False,
+            )
+
+    def _describe_tables(self, aliases: dict[str, str | None]) -> str:
+        names = sorted({self.catalog[t][0] for t in aliases.values() if t is not None})
+        return "表 " + "、".join(names)
+
+
+def precheck_sql(sql: str, schema_preview: str | None = None, strict_tables: bool = False) -> list[PrecheckIssue]:
+    """预检查学生 SQL，返回问题列表（为空表示未发现问题），最多 MAX_ISSUES 条。
+
+    schema_preview 为空或无效时只做词法与结构检查；strict_tables 时表名按题目表结构白名单检查
+    （表结构为空则不允许引用任何表）。
+    """
+    checker = _Checker(sql or "", schema_catalog(schema_preview), strict_tables)
+    checker.check_syntax()
+    if not checker.issues and (checker.catalog or strict_tables) and not checker.skip_names:
+        checker.check_names()
+    issues = sorted(checker.issues, key=lambda i: i.offset)
+    return issues[:MAX_ISSUES]
+
+
+def format_precheck_message(issues: list[PrecheckIssue]) -> str:
+    """面向学生的错误描述，每条问题一行。"""
+    lines = []
+    for issue in issues:
+        text = f"第 {issue.line} 行第 {issue.column} 列：{issue.message}"
+        if issue.suggestions and "是否为" not in issue.message:
+            text += f"（是否为 {'、'.join(issue.suggestions)}？）"
+        lines.append(text)
+    return "\n".join(lines)
+
+
+_HINTS = {
+    "syntax": ("SQL 语法", "第 {line} 行附近的写法数据库能读懂吗？对照一下 SELECT 语句各子句的书写顺序和标点，哪里不太对？"),
+    "unknown_table": ("FROM 子句与表名", "第 {line} 行引用的表在题目给出的表结构里能找到吗？仔细核对一下表名和别名？"),
+    "unknown_column": ("列名与表结构", "第 {line} 行用到的列真的属于你查询的表吗？对照题目表结构再看看列名的拼写？"),
+}
+
+
+def precheck_hint(issues: list[PrecheckIssue]) -> SQLCheckResultSchema:
+    """预检查发现问题时的本地提示，结构与 AI 提示一致，无需调用大模型。"""
+    diagnoses = []
+    for issue in issues:
+        knowledge_point, hint = _HINTS.get(issue.kind, _HINTS["syntax"])
+        explanation = issue.message
+        if issue.suggestions and "是否为" not in issue.message:
+            explanation += f"相近的名称有：{'、'.join(issue.suggestions)}。"
+        diagnoses.append(
+            SQLDiagnosisSchema(
+                error_type="语法错误",
+                is_correct=False,
+                knowledge_point=knowledge_point,
+                hint=hint.format(line=issue.line),
+                explanation=explanation,
+            )
+        )
+    return SQLCheckResultSchema(
+        diagnoses=diagnoses,
+        overall_comment="这条 SQL 还不能执行，先根据标出的位置修正语法或名称，再来验证查询逻辑吧。",
+    )
+
+
+__all__ = [
+    "MAX_ISSUES",
+    "PrecheckIssue",
+    "schema_catalog",
+    "precheck_sql",
+    "format_precheck_message",
+    "precheck_hint",
+]
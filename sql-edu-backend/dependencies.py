@@ -3,6 +3,7 @@ from fastapi_mail import FastMail
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession 
 from models import AsyncSessionFactory
+from core.sandbox import get_sandbox_session_factory
 from repository.user_repo import UserRepository
 from core.auth import AuthHandler
 
@@ -11,6 +12,11 @@ async def get_session() -> AsyncSession:
     async with AsyncSessionFactory() as session:
         yield session
 
+async def get_sandbox_session() -> AsyncSession:
+    """判题沙箱会话：建表与执行学生 SQL 使用，与业务主库会话分开。"""
+    async with get_sandbox_session_factory()() as session:
+        yield session
+
 async def get_mail()-> FastMail:
     """FastAPI 依赖，提供邮件发送实例。"""
     return create_mail_instance()
@@ -45,7 +51,20 @@ async def require_teacher(
     
     return user_id
 
-__all__ = ["get_session", "get_mail", "require_teacher"]
+# 可选的学生身份：匿名也能访问的接口用来判断当前是否为已登录学生
+async def optional_student(
+    user_id: int | None = Depends(AuthHandler().auth_optional_dependency),
+    session: AsyncSession = Depends(get_session),
+) -> int | None:
+    """已登录且角色为学生时返回 user_id，匿名、token 无效或非学生返回 None（不报错）。"""
+    if user_id is None:
+        return None
+    user = await UserRepository(session).get_by_id(user_id)
+    if not user or user.role != "student":
+        return None
+    return user_id
+
+__all__ = ["get_session", "get_sandbox_session", "get_mail", "require_teacher", "optional_student"]
 
 
 
@@ -4,10 +4,19 @@ SQL 智能教学系统 — 后端入口。
 挂载路由：/auth（认证）、/ai（判题与对话）、/questions（题目管理）。
 依赖：数据库会话 get_session、邮件 get_mail、JWT 在各路由内使用。
 """
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi_mail import FastMail, MessageSchema, MessageType
 from fastapi import Depends
-from dependencies import get_mail
+from dependencies import get_mail, require_teacher
+from core.metrics import snapshot as metrics_snapshot
+from core.loop_monitor import monitor_event_loop_lag
+from core.sandbox_warmup import get_sandbox_warmer, warm_hot_questions
+from core.question_stats import run_question_stats_reconciler
+from models import AsyncSessionFactory
+from settings import get_settings
 from aiosmtplib import SMTPException
 
 from fastapi.middleware.cors import CORSMiddleware
@@ -16,7 +25,47 @@ from routers import ai as ai_router
 from routers import question as question_router
 from routers.auth import router as auth_router
 
-app = FastAPI(title="SQL 智能教学系统后端")
+_settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 事件循环阻塞监控：判题对比等同步计算卡住事件循环时，/metrics 中 event_loop.blocked 会上升
+    monitor = None
+    if _settings.EVENT_LOOP_LAG_INTERVAL_MS > 0:
+        monitor = asyncio.create_task(
+            monitor_event_loop_lag(_settings.EVENT_LOOP_LAG_INTERVAL_MS, _settings.EVENT_LOOP_LAG_WARN_MS)
+        )
+    # 沙箱预热：消费题目详情接口放入的预热队列，并在启动时预热近期热门题目
+    warmup_tasks: list[asyncio.Task] = []
+    if _settings.SANDBOX_WARMUP_ENABLED:
+        warmer = get_sandbox_warmer()
+        warmup_tasks.append(
+            asyncio.create_task(warmer.run(AsyncSessionFactory, _settings.SANDBOX_WARMUP_CONCURRENCY))
+        )
+        warmup_tasks.append(asyncio.create_task(warm_hot_questions(warmer, AsyncSessionFactory)))
+    # 考试模式：以固定并发消费考试提交准入队列
+    exam_task = None
+    if _settings.EXAM_MODE_ENABLED:
+        exam_task = asyncio.create_task(ai_router.exam_queue.run(_settings.EXAM_QUEUE_CONCURRENCY))
+    # 题目统计定期对账：修正实时累加可能出现的偏差，并预算展示难度
+    reconcile_task = None
+    if _settings.QUESTION_STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        reconcile_task = asyncio.create_task(
+            run_question_stats_reconciler(AsyncSessionFactory, _settings.QUESTION_STATS_RECONCILE_INTERVAL_SECONDS)
+        )
+    yield
+    if monitor is not None:
+        monitor.cancel()
+    for task in warmup_tasks:
+        task.cancel()
+    if exam_task is not None:
+        exam_task.cancel()
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+
+
+app = FastAPI(title="SQL 智能教学系统后端", lifespan=lifespan)
 
 app.include_router(auth_router)
 
@@ -63,6 +112,12 @@ async def root():
     return {"message": "SQL 智能教学系统后端运行中"}
 
 
+@app.get("/metrics")
+async def metrics(user_id: int = Depends(require_teacher)):
+    """判题各环节耗时与计数（当前进程内累计），仅教师可查看。"""
+    return metrics_snapshot()
+
+
 __all__ = ["app"]
 
 
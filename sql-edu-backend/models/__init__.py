@@ -5,6 +5,9 @@ from .submission import Submission
 from .auth import EmailCaptcha
 from .chat import ChatMessage
 from .question_feedback import QuestionDifficultyFeedback
+from .judge_job import JudgeJob
+from .progress import UserQuestionProgress, UserStats
+from .question_stats import QuestionStats
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from settings.config import settings
 
@@ -31,7 +34,7 @@ AsyncSessionFactory = async_sessionmaker(
 )
 
 
-__all__ = ["Base", "User", "Question", "Submission", "EmailCaptcha", "ChatMessage", "QuestionDifficultyFeedback"]
+__all__ = ["Base", "User", "Question", "Submission", "EmailCaptcha", "ChatMessage", "QuestionDifficultyFeedback", "JudgeJob", "UserQuestionProgress", "UserStats", "QuestionStats"]
 
 
 
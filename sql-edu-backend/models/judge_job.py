@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class JudgeJob(Base):
+    """判题任务队列中的一条任务：check_sql 写入，判题 worker 领取执行后回写结果。"""
+
+    __tablename__ = "judge_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+
+    # "pending" | "running" | "done" | "failed"
+    status: Mapped[str] = mapped_column(String(16), default="pending", nullable=False, index=True)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JudgeTask 的 JSON
+    result: Mapped[str | None] = mapped_column(Text, nullable=True)  # JudgeOutcome 的 JSON
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)  # 失败原因（数据准备失败、多次中断等）
+
+    # 已被领取的次数；worker 崩溃后租约过期会被重新领取，超过上限则标记失败
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    locked_by: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # 租约到期时间（可见性超时）：running 且已过期的任务视为 worker 已崩溃，可被其他 worker 领取
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+
+__all__ = ["JudgeJob"]
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class UserQuestionProgress(Base):
+    """学生在某道题目上的累计进度：随提交与对话写入在同一事务中更新，避免每次提交统计 submissions / chat_messages。"""
+
+    __tablename__ = "user_question_progress"
+
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    question_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    fail_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    correct_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    first_solved_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    chat_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class UserStats(Base):
+    """学生在所有题目上的累计提交数与正确数（支架等级的能力调整使用）。"""
+
+    __tablename__ = "user_stats"
+
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    correct: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+__all__ = ["UserQuestionProgress", "UserStats"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import Base
@@ -25,6 +25,18 @@ class Question(Base):
     schema_preview: Mapped[str | None] = mapped_column(Text, nullable=True)
     # 要求的结果列名（如「order_id, user_id, order_amount, cumulative_amount」或完整说明），供学生端显著展示，避免列名不规范错误
     required_output_columns: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # 隐藏测试数据（JSON：[{label, tables[{name,columns,rows|dataset|generate}]}]），判题时与可见数据一并校验，不返回给学生
+    hidden_datasets: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # 是否对正确提交评估查询效率（EXPLAIN 与执行耗时，与标准答案对比打分）
+    grade_efficiency: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # 执行前代价检查的扫描行数预算；为空使用全局 JUDGE_COST_GUARD_ROW_BUDGET，<=0 表示不检查
+    max_estimated_rows: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # 判题后端方言：mysql / sqlite / postgresql / duckdb，为空使用默认沙箱
+    judge_dialect: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    # 无别名要求时是否忽略列顺序（按列值签名配对学生列与标准答案列）
+    ignore_column_order: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # 题目版本号：题面、标准答案或表数据每次修改时 +1，用作结果缓存的失效依据
+    version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
 
 
 __all__ = ["Question"]
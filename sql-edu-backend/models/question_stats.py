@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class QuestionStats(Base):
+    """题目的累计统计：随提交、对话与难度评分写入在同一事务中累加，定期与明细对账。
+
+    display_difficulty 为对账时预先算好的展示难度；计数变化或教师修改难度后置空，读取时按计数现算。
+    """
+
+    __tablename__ = "question_stats"
+
+    question_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    total_submissions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    correct_submissions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    chat_messages: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    feedback_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    feedback_rating_sum: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 平均评分 = 总和 / 条数
+
+    display_difficulty: Mapped[float | None] = mapped_column(Float, nullable=True)
+    reconciled_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+__all__ = ["QuestionStats"]
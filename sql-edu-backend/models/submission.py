@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, SmallInteger, Text
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, ForeignKey, Integer, SmallInteger, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -28,6 +28,15 @@ class Submission(Base):
     is_correct: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     # 1-低支架, 2-中支架, 3-高支架
     hint_level: Mapped[int] = mapped_column(SmallInteger, default=1, nullable=False)
+    # 判题时的错误信息与是否被安全检查拦截（考试提交延后生成 AI 提示时使用）
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    is_safety_blocked: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+
+    # 查询效率（仅题目开启 grade_efficiency 且提交正确时，在后台异步填充）
+    rows_examined: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # 执行计划估算的扫描行数
+    full_scans: Mapped[int | None] = mapped_column(Integer, nullable=True)  # 全表扫描的表数量
+    exec_time_ms: Mapped[float | None] = mapped_column(Float, nullable=True)  # 实际执行耗时（毫秒）
+    efficiency_score: Mapped[float | None] = mapped_column(Float, nullable=True)  # 相对标准答案的效率分 0～100
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
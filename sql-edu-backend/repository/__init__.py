@@ -5,6 +5,8 @@ from .submission_repo import SubmissionRepository
 from .user_repo import UserRepository, EmailCodeRepository
 from .chat_repo import ChatRepository
 from .difficulty_feedback_repo import DifficultyFeedbackRepository
+from .progress_repo import ProgressRepository
+from .question_stats_repo import QuestionStatsRepository
 
 __all__ = [
     "QuestionRepository",
@@ -13,5 +15,7 @@ __all__ = [
     "EmailCodeRepository",
     "ChatRepository",
     "DifficultyFeedbackRepository",
+    "ProgressRepository",
+    "QuestionStatsRepository",
 ]
 
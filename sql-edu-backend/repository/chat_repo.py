@@ -2,6 +2,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete
 
 from models.chat import ChatMessage
+from repository.progress_repo import ProgressRepository
+from repository.question_stats_repo import QuestionStatsRepository
 
 
 class ChatRepository:
@@ -11,9 +13,12 @@ class ChatRepository:
         self.session = session
 
     async def add_message(self, user_id: int, question_id: int, role: str, content: str) -> ChatMessage:
+        """写入一条消息，并在同一事务中累加该用户该题与该题总的对话条数。"""
         msg = ChatMessage(user_id=user_id, question_id=question_id, role=role, content=content)
         self.session.add(msg)
         await self.session.flush()
+        await ProgressRepository(self.session).record_chat_messages(user_id, question_id)
+        await QuestionStatsRepository(self.session).record_chat_messages(question_id)
         return msg
 
     async def list_messages(self, user_id: int, question_id: int, limit: int = 50) -> list[ChatMessage]:
@@ -61,7 +66,11 @@ class ChatRepository:
             .where(ChatMessage.question_id == question_id)
         )
         result = await self.session.execute(stmt)
-        return result.rowcount or 0
+        deleted = result.rowcount or 0
+        await ProgressRepository(self.session).reset_chat_count(user_id, question_id)
+        if deleted:
+            await QuestionStatsRepository(self.session).record_chat_messages(question_id, -deleted)
+        return deleted
 
 
 __all__ = ["ChatRepository"]
@@ -0,0 +1,35 @@
+"""预聚合计数表的原子累加：与明细写入在同一事务中调用。"""
+
+from typing import Any
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def increment_counters(
+    session: AsyncSession, model: type, key: dict[str, Any], values: dict[str, Any], initial: dict[str, Any]
+) -> None:
+    """先按主键原子累加（UPDATE ... SET n = n + k）；行不存在时插入初始值，并发插入冲突时改为累加。
+
+    :param values: UPDATE 的 SET 表达式
+    :param initial: 行不存在时插入的各列初始值（不含主键）
+    """
+    stmt = update(model).filter_by(**key).values(**values).execution_options(synchronize_session=False)
+    if (await session.execute(stmt)).rowcount:
+        return
+    try:
+        async with session.begin_nested():
+            await session.execute(insert(model).values(**key, **initial))
+    except IntegrityError:
+        # 另一个事务刚插入了该行
+        await session.execute(stmt)
+
+
+async def insert_batches(session: AsyncSession, model: type, rows: list[dict], batch_size: int = 1000) -> None:
+    """分批批量插入（回填、对账重建计数表时使用）。"""
+    for start in range(0, len(rows), batch_size):
+        await session.execute(insert(model), rows[start:start + batch_size])
+
+
+__all__ = ["increment_counters", "insert_batches"]
@@ -4,6 +4,7 @@ from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.question_feedback import QuestionDifficultyFeedback
+from repository.question_stats_repo import QuestionStatsRepository
 
 
 class DifficultyFeedbackRepository:
@@ -11,7 +12,7 @@ class DifficultyFeedbackRepository:
         self.session = session
 
     async def add(self, user_id: int, question_id: int, rating: int) -> QuestionDifficultyFeedback:
-        """记录一次难度评分（1～10）。同一用户对同一题可多次评分（每次正确完成可评一次）。"""
+        """记录一次难度评分（1～10）并累加题目统计。同一用户对同一题可多次评分（每次正确完成可评一次）。"""
         row = QuestionDifficultyFeedback(
             user_id=user_id,
             question_id=question_id,
@@ -19,6 +20,7 @@ class DifficultyFeedbackRepository:
         )
         self.session.add(row)
         await self.session.flush()
+        await QuestionStatsRepository(self.session).record_feedback(question_id, row.rating)
         return row
 
     async def get_question_stats(self, question_id: int) -> dict:
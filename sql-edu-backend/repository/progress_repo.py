@@ -0,0 +1,141 @@
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.chat import ChatMessage
+from models.progress import UserQuestionProgress, UserStats
+from models.submission import Submission
+from repository.counters import increment_counters, insert_batches
+
+
+class ProgressRepository:
+    """学生做题进度数据访问层：读取为主键查询，计数随提交/对话写入在同一事务中累加。"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_question_progress(self, user_id: int, question_id: int) -> UserQuestionProgress:
+        """该用户在该题目上的进度；尚无记录时返回全零的临时对象（不加入会话）。"""
+        progress = await self.session.get(
+            UserQuestionProgress, (user_id, question_id), populate_existing=True
+        )
+        if progress is None:
+            progress = UserQuestionProgress(
+                user_id=user_id, question_id=question_id, fail_count=0, correct_count=0, chat_count=0
+            )
+        return progress
+
+    async def get_user_stats(self, user_id: int) -> dict:
+        """用户整体表现，与 SubmissionRepository.get_user_overall_stats 返回格式一致。
+
+        :return: {"total": int, "correct": int, "success_rate": float}
+        """
+        stats = await self.session.get(UserStats, user_id, populate_existing=True)
+        if stats is None or stats.total == 0:
+            return {"total": 0, "correct": 0, "success_rate": 0.5}
+        return {"total": stats.total, "correct": stats.correct, "success_rate": stats.correct / stats.total}
+
+    async def record_submission(
+        self, user_id: int, question_id: int, is_correct: bool, submitted_at: datetime | None = None
+    ) -> None:
+        """累加一次提交（与提交记录在同一事务中调用）。"""
+        submitted_at = submitted_at or datetime.utcnow()
+        values = {
+            "fail_count": UserQuestionProgress.fail_count + (0 if is_correct else 1),
+            "correct_count": UserQuestionProgress.correct_count + (1 if is_correct else 0),
+        }
+        if is_correct:
+            values["first_solved_at"] = func.coalesce(UserQuestionProgress.first_solved_at, submitted_at)
+        await increment_counters(
+            self.session,
+            UserQuestionProgress,
+            {"user_id": user_id, "question_id": question_id},
+            values,
+            {
+                "fail_count": 0 if is_correct else 1,
+                "correct_count": 1 if is_correct else 0,
+                "first_solved_at": submitted_at if is_correct else None,
+                "chat_count": 0,
+            },
+        )
+        await increment_counters(
+            self.session,
+            UserStats,
+            {"user_id": user_id},
+            {"total": UserStats.total + 1, "correct": UserStats.correct + (1 if is_correct else 0)},
+            {"total": 1, "correct": 1 if is_correct else 0},
+        )
+
+    async def record_chat_messages(self, user_id: int, question_id: int, count: int = 1) -> None:
+        """累加对话条数（与消息写入在同一事务中调用）。"""
+        await increment_counters(
+            self.session,
+            UserQuestionProgress,
+            {"user_id": user_id, "question_id": question_id},
+            {"chat_count": UserQuestionProgress.chat_count + count},
+            {"fail_count": 0, "correct_count": 0, "chat_count": count},
+        )
+
+    async def reset_chat_count(self, user_id: int, question_id: int) -> None:
+        """清空对话后对话条数归零。"""
+        await self.session.execute(
+            update(UserQuestionProgress)
+            .where(UserQuestionProgress.user_id == user_id)
+            .where(UserQuestionProgress.question_id == question_id)
+            .values(chat_count=0)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def rebuild(self) -> tuple[int, int]:
+        """按 submissions / chat_messages 重新计算全部进度（上线回填或修复计数），由调用方提交。
+
+        :return: (进度行数, 用户数)
+        """
+        await self.session.execute(delete(UserQuestionProgress))
+        await self.session.execute(delete(UserStats))
+
+        progress: dict[tuple[int, int], dict] = {}
+        submission_rows = await self.session.execute(
+            select(
+                Submission.user_id,
+                Submission.question_id,
+                func.sum(case((Submission.is_correct == False, 1), else_=0)),
+                func.sum(case((Submission.is_correct == True, 1), else_=0)),
+                func.min(case((Submission.is_correct == True, Submission.created_at))),
+            ).group_by(Submission.user_id, Submission.question_id)
+        )
+        for user_id, question_id, failed, correct, first_solved_at in submission_rows:
+            progress[(user_id, question_id)] = {
+                "user_id": user_id,
+                "question_id": question_id,
+                "fail_count": int(failed or 0),
+                "correct_count": int(correct or 0),
+                "first_solved_at": first_solved_at,
+                "chat_count": 0,
+            }
+        chat_rows = await self.session.execute(
+            select(ChatMessage.user_id, ChatMessage.question_id, func.count(ChatMessage.id))
+            .group_by(ChatMessage.user_id, ChatMessage.question_id)
+        )
+        for user_id, question_id, count in chat_rows:
+            row = progress.setdefault(
+                (user_id, question_id),
+                {"user_id": user_id, "question_id": question_id, "fail_count": 0, "correct_count": 0,
+                 "first_solved_at": None},
+            )
+            row["chat_count"] = count
+
+        stats: dict[int, dict] = {}
+        for row in progress.values():
+            s = stats.setdefault(row["user_id"], {"user_id": row["user_id"], "total": 0, "correct": 0})
+            s["total"] += row["fail_count"] + row["correct_count"]
+            s["correct"] += row["correct_count"]
+
+        user_stats = [s for s in stats.values() if s["total"]]  # 只有对话、没有提交的用户不建统计行
+        await insert_batches(self.session, UserQuestionProgress, list(progress.values()))
+        await insert_batches(self.session, UserStats, user_stats)
+        return len(progress), len(user_stats)
+
+
+__all__ = ["ProgressRepository"]
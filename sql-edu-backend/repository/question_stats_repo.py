@@ -0,0 +1,207 @@
+"""题目累计统计数据访问层。"""
+
+from datetime import datetime
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.chat import ChatMessage
+from models.question import Question
+from models.question_feedback import QuestionDifficultyFeedback
+from models.question_stats import QuestionStats
+from models.submission import Submission
+from repository.counters import increment_counters
+
+_ZERO = {
+    "total_submissions": 0,
+    "correct_submissions": 0,
+    "chat_messages": 0,
+    "feedback_count": 0,
+    "feedback_rating_sum": 0,
+}
+
+
+class QuestionStatsRepository:
+    """题目统计：读取为主键查询，计数随明细写入在同一事务中累加；计数变化时让预算的展示难度失效。"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, question_id: int) -> QuestionStats | None:
+        return await self.session.get(QuestionStats, question_id, populate_existing=True)
+
+    async def get_range(self, low: int, high: int) -> dict:
+        """读取 question_id 在 [low, high] 内的统计（题目列表一页一次主键范围扫描），返回 question_id -> 行。"""
+        result = await self.session.execute(
+            select(*QuestionStats.__table__.columns).where(QuestionStats.question_id.between(low, high))
+        )
+        return {row.question_id: row for row in result}
+
+    async def record_submission(self, question_id: int, is_correct: bool) -> None:
+        correct = 1 if is_correct else 0
+        await self._bump(
+            question_id,
+            total_submissions=QuestionStats.total_submissions + 1,
+            correct_submissions=QuestionStats.correct_submissions + correct,
+            initial={"total_submissions": 1, "correct_submissions": correct},
+        )
+
+    async def record_chat_messages(self, question_id: int, count: int = 1) -> None:
+        """累加对话条数；删除消息时传入负数。"""
+        await self._bump(
+            question_id,
+            chat_messages=QuestionStats.chat_messages + count,
+            initial={"chat_messages": max(0, count)},
+        )
+
+    async def record_feedback(self, question_id: int, rating: int) -> None:
+        await self._bump(
+            question_id,
+            feedback_count=QuestionStats.feedback_count + 1,
+            feedback_rating_sum=QuestionStats.feedback_rating_sum + rating,
+            initial={"feedback_count": 1, "feedback_rating_sum": rating},
+        )
+
+    async def invalidate_display(self, question_id: int) -> None:
+        """教师修改基础难度后让预算的展示难度失效。"""
+        await self.session.execute(
+            update(QuestionStats)
+            .where(QuestionStats.question_id == question_id)
+            .values(display_difficulty=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _bump(self, question_id: int, initial: dict, **values) -> None:
+        await increment_counters(
+            self.session,
+            QuestionStats,
+            {"question_id": question_id},
+            {**values, "display_difficulty": None},
+            {**_ZERO, **initial},
+        )
+
+    async def snapshot_cutoff(self) -> dict[str, int]:
+        """对账快照的截止点：submissions / chat_messages / question_difficulty_feedback 当前的最大 ID。"""
+        return {
+            "submissions": await self.session.scalar(select(func.max(Submission.id))) or 0,
+            "chat_messages": await self.session.scalar(select(func.max(ChatMessage.id))) or 0,
+            "feedback": await self.session.scalar(select(func.max(QuestionDifficultyFeedback.id))) or 0,
+        }
+
+    async def _count_details(self, cutoff: dict[str, int], after: bool) -> dict[int, dict]:
+        """按题目分组统计明细：after=False 统计截止点及之前的明细，after=True 统计截止点之后的。"""
+
+        def window(column, key):
+            return column > cutoff[key] if after else column <= cutoff[key]
+
+        counts: dict[int, dict] = {}
+        submissions = await self.session.execute(
+            select(
+                Submission.question_id,
+                func.count(Submission.id),
+                func.sum(case((Submission.is_correct == True, 1), else_=0)),
+            )
+            .where(window(Submission.id, "submissions"))
+            .group_by(Submission.question_id)
+        )
+        for qid, total, correct in submissions:
+            counts.setdefault(qid, dict(_ZERO)).update(total_submissions=total, correct_submissions=int(correct or 0))
+        chats = await self.session.execute(
+            select(ChatMessage.question_id, func.count(ChatMessage.id))
+            .where(window(ChatMessage.id, "chat_messages"))
+            .group_by(ChatMessage.question_id)
+        )
+        for qid, count in chats:
+            counts.setdefault(qid, dict(_ZERO))["chat_messages"] = count
+        feedback = await self.session.execute(
+            select(
+                QuestionDifficultyFeedback.question_id,
+                func.count(QuestionDifficultyFeedback.id),
+                func.sum(QuestionDifficultyFeedback.rating),
+            )
+            .where(window(QuestionDifficultyFeedback.id, "feedback"))
+            .group_by(QuestionDifficultyFeedback.question_id)
+        )
+        for qid, count, rating_sum in feedback:
+            counts.setdefault(qid, dict(_ZERO)).update(feedback_count=count, feedback_rating_sum=int(rating_sum or 0))
+        return counts
+
+    async def recount(self, cutoff: dict[str, int]) -> list[dict]:
+        """按 submissions / chat_messages / question_difficulty_feedback 重新统计全部题目（只计截止点及之前的明细）。
+
+        :param cutoff: snapshot_cutoff() 的返回值
+        :return: 每题一行：计数各列 + question_id + difficulty（教师基础难度）
+        """
+        counts = await self._count_details(cutoff, after=False)
+        return [
+            {"question_id": qid, "difficulty": difficulty, **counts.get(qid, _ZERO)}
+            for qid, difficulty in await self.session.execute(select(Question.id, Question.difficulty))
+        ]
+
+    async def reconcile(self, rows: list[dict], cutoff: dict[str, int], reconciled_at: datetime) -> int:
+        """用截止点的重算结果逐行校正统计（rows 须含计数各列与 display_difficulty），由调用方提交。
+
+        不删除整表：截止点之后的明细已累加进当前计数，写入时在同一条 UPDATE 中以子查询补上，
+        对账期间的并发累加不会丢失；与当前值一致的行不写入。截止点之后有新明细的题目不写预算难度，读取时按计数现算。
+        :return: 写入的行数
+        """
+        current = {
+            row.question_id: row
+            for row in await self.session.execute(
+                select(*QuestionStats.__table__.columns).where(
+                    QuestionStats.question_id.in_([row["question_id"] for row in rows])
+                )
+            )
+        }
+        after = await self._count_details(cutoff, after=True)
+        written = 0
+        for row in rows:
+            qid = row["question_id"]
+            delta = after.get(qid, _ZERO)
+            display = row["display_difficulty"] if not any(delta.values()) else None
+            stats = current.get(qid)
+            if (
+                stats is not None
+                and all(getattr(stats, c) == row[c] + delta[c] for c in _ZERO)
+                and stats.display_difficulty == display
+            ):
+                continue
+            await increment_counters(
+                self.session,
+                QuestionStats,
+                {"question_id": qid},
+                {
+                    **{c: row[c] + self._after_cutoff(c, qid, cutoff) for c in _ZERO},
+                    "display_difficulty": display,
+                    "reconciled_at": reconciled_at,
+                },
+                {
+                    **{c: row[c] + delta[c] for c in _ZERO},
+                    "display_difficulty": display,
+                    "reconciled_at": reconciled_at,
+                },
+            )
+            written += 1
+        return written
+
+    @staticmethod
+    def _after_cutoff(column: str, question_id: int, cutoff: dict[str, int]):
+        """该题截止点之后的明细对 column 的贡献（标量子查询，在 UPDATE 执行时求值）。"""
+        if column in ("total_submissions", "correct_submissions"):
+            where = [Submission.question_id == question_id, Submission.id > cutoff["submissions"]]
+            if column == "correct_submissions":
+                where.append(Submission.is_correct == True)
+            return select(func.count(Submission.id)).where(*where).scalar_subquery()
+        if column == "chat_messages":
+            return select(func.count(ChatMessage.id)).where(
+                ChatMessage.question_id == question_id, ChatMessage.id > cutoff["chat_messages"]
+            ).scalar_subquery()
+        where = [
+            QuestionDifficultyFeedback.question_id == question_id, QuestionDifficultyFeedback.id > cutoff["feedback"]
+        ]
+        if column == "feedback_count":
+            return select(func.count(QuestionDifficultyFeedback.id)).where(*where).scalar_subquery()
+        return select(func.coalesce(func.sum(QuestionDifficultyFeedback.rating), 0)).where(*where).scalar_subquery()
+
+
+__all__ = ["QuestionStatsRepository"]
@@ -1,6 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from models.submission import Submission
+from repository.progress_repo import ProgressRepository
+from repository.question_stats_repo import QuestionStatsRepository
 from schemas.submission import SubmissionCreate
 
 
@@ -11,7 +13,7 @@ class SubmissionRepository:
         self.session = session
 
     async def create(self, submission_data: SubmissionCreate) -> Submission:
-        """创建一条提交记录。
+        """创建一条提交记录，并在同一事务中累加该用户的做题进度与题目统计。
 
         :param submission_data: 提交数据 Schema
         :return: 创建的 Submission 对象
@@ -23,9 +25,15 @@ class SubmissionRepository:
             ai_hint=submission_data.ai_hint,
             is_correct=submission_data.is_correct,
             hint_level=submission_data.hint_level,
+            error_message=submission_data.error_message,
+            is_safety_blocked=submission_data.is_safety_blocked,
         )
         self.session.add(submission)
         await self.session.flush()  # 刷新以获取 ID
+        await ProgressRepository(self.session).record_submission(
+            submission.user_id, submission.question_id, submission.is_correct, submission.created_at
+        )
+        await QuestionStatsRepository(self.session).record_submission(submission.question_id, submission.is_correct)
         return submission
 
     async def get_correct_count(self, user_id: int, question_id: int) -> int:
@@ -40,12 +48,13 @@ class SubmissionRepository:
         return count or 0
 
     async def get_failure_count(
-        self, user_id: int, question_id: int
+        self, user_id: int, question_id: int, before_id: int | None = None
     ) -> int:
         """统计该用户在该题目上的失败次数（is_correct=False 的记录数）。
 
         :param user_id: 用户 ID
         :param question_id: 题目 ID
+        :param before_id: 只统计 ID 小于该值的提交（即某次提交之前的失败次数）
         :return: 失败次数
         """
         stmt = (
@@ -54,6 +63,8 @@ class SubmissionRepository:
             .where(Submission.question_id == question_id)
             .where(Submission.is_correct == False)
         )
+        if before_id is not None:
+            stmt = stmt.where(Submission.id < before_id)
         count = await self.session.scalar(stmt)
         return count or 0
 
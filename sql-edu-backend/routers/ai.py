@@ -1,20 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, TypeVar
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.ai_service import get_sql_hint, chat_with_teacher
-from core.sql_judge import SQLJudgeService, SQLJudgeError, SQLSafetyError
+from core.sql_judge import SQLConnectionLostError, SQLJudgeService, SQLJudgeError
+from core.cost_guard import resolve_row_budget
+from core.metrics import incr
+from core.disconnect import ClientDisconnectedError, run_until_disconnect
+from core.sql_parser import canonicalize_sql
+from core.sql_autocomplete import get_question_completer
+from core.sql_precheck import PrecheckIssue, format_precheck_message, precheck_hint, precheck_sql
+from core.ttl_cache import TTLCache
 from core.scaffolding import calculate_hint_level, get_ability_adjustment
-from core.judge_setup import generate_init_sql_from_schema_preview, execute_setup_sql
-from repository import QuestionRepository, SubmissionRepository, ChatRepository, UserRepository
+from core.judge_pipeline import JudgeOutcome, JudgeSetupError, JudgeTask, run_judge, sandbox_tables
+from core.judge_queue import JudgeQueueError, enqueue_judge_job, wait_for_judge_result
+from core.idempotency import IdempotencyKeyReusedError, IdempotencyStore, request_fingerprint
+from core.exam_queue import ExamAdmissionQueue, ExamQueueFullError, ExamTicket
+from core.sandbox import (
+    SandboxUnavailableError,
+    get_sandbox_engine,
+    is_sandbox_isolated,
+    sandbox_session_factory_for,
+    sandbox_session_for,
+)
+from core.efficiency_service import grade_submission_efficiency
+from core.question_catalog import get_question_catalog
+from repository import SubmissionRepository, ChatRepository, ProgressRepository, UserRepository
 from core.experience_service import compute_xp_gain, get_level_from_total
 from schemas.submission import SubmissionCreate, SubmissionOut
 from schemas.chat import ChatMessageOut, ChatSendIn, ChatSendOut
-from dependencies import get_session
+from dependencies import get_session, get_sandbox_session
+from models import AsyncSessionFactory
 from core.auth import AuthHandler
+from settings import get_settings
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 auth_handler = AuthHandler()
+_settings = get_settings()
+T = TypeVar("T")
+
+# 运行查询预览结果缓存：(题目 ID, 题目版本, 规范化 SQL) -> (NDJSON 行, 行数, 是否截断)
+_run_sql_cache = TTLCache(_settings.RUN_SQL_CACHE_MAX_ENTRIES, _settings.RUN_SQL_CACHE_TTL_SECONDS)
+
+# check_sql 的幂等结果：(用户 ID, Idempotency-Key) -> 响应
+_check_sql_idempotency = IdempotencyStore(_settings.IDEMPOTENCY_MAX_ENTRIES, _settings.IDEMPOTENCY_TTL_SECONDS)
 
 
 class SQLRequest(BaseModel):
@@ -28,12 +62,38 @@ class SQLCheckRequest(BaseModel):
     challenge_mode: bool = False  # 是否在限时挑战中完成，完成时给予额外经验
 
 
+class RunSQLRequest(BaseModel):
+    question_id: int
+    sql: str
+
+
+class SQLPrecheckRequest(BaseModel):
+    question_id: int
+    sql: str
+
+
+class SQLCompleteRequest(BaseModel):
+    question_id: int
+    sql: str
+    cursor: int | None = None  # 光标的字符偏移，缺省为文本末尾
+    knowledge_point: str | None = None  # 知识点 ID，其常用函数优先展示
+    limit: int = 20
+
+
+class ExamSubmitRequest(BaseModel):
+    question_id: int
+    student_sql: str
+
+
 class SQLCheckResponse(BaseModel):
     is_correct: bool
     hint: dict  # SQLCheckResultSchema 的字典形式
     submission_id: int
     error_message: str | None = None
     is_safety_blocked: bool = False  # True 表示因危险操作被拒，而非结果不正确
+    failed_dataset: str | None = None  # 未通过的隐藏测试数据类别（如 empty/null_heavy），不含数据内容
+    cost_blocked_tables: list[str] | None = None  # 执行前代价检查拒绝时，涉及全表扫描的表
+    precheck_issues: list[dict] | None = None  # 本地预检查发现的问题（含行列位置），此时未进入沙箱判题
     # 等级经验（仅首次正确完成该题时返回）
     earned_experience: int | None = None
     level_up: bool = False
@@ -53,74 +113,322 @@ async def sql_hint(payload: SQLRequest):
         )
 
 
+def _ensure_sandbox_available(question) -> str | None:
+    """返回题目的判题方言；该方言的沙箱未配置时直接 503，不计提交。"""
+    judge_dialect = getattr(question, "judge_dialect", None)
+    try:
+        get_sandbox_engine(judge_dialect)
+    except SandboxUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"判题环境不可用，本次未计入提交次数：{e}",
+        ) from e
+    return judge_dialect
+
+
+@asynccontextmanager
+async def _sandbox_tables(question, sandbox_session: AsyncSession) -> AsyncIterator[None]:
+    """根据题目的 schema_preview 在沙箱中建表并写入数据，退出前其他题目不会重建同名表；
+    数据缺失时判题结果不可信，直接中止且不计提交。"""
+    try:
+        async with sandbox_tables(getattr(question, "schema_preview", None), sandbox_session):
+            yield
+    except JudgeSetupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"判题数据准备失败，本次未计入提交次数：{e}",
+        ) from e
+
+
+async def _judge(task: JudgeTask, sandbox_session: AsyncSession) -> JudgeOutcome:
+    """执行判题：开启判题任务队列时交给判题 worker 并等待结果，否则在本进程内直接判题。"""
+    if not _settings.JUDGE_QUEUE_ENABLED:
+        try:
+            return await run_judge(task, sandbox_session)
+        except JudgeSetupError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"判题数据准备失败，本次未计入提交次数：{e}",
+            ) from e
+        except SandboxUnavailableError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"判题环境不可用，本次未计入提交次数：{e}",
+            ) from e
+    job_id = await enqueue_judge_job(task)
+    try:
+        return await wait_for_judge_result(
+            job_id,
+            timeout=_settings.JUDGE_QUEUE_RESULT_TIMEOUT_SECONDS,
+            poll_interval=_settings.JUDGE_QUEUE_POLL_INTERVAL_MS / 1000,
+        )
+    except JudgeQueueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"判题服务暂时不可用，本次未计入提交次数：{e}",
+        ) from e
+
+
+def _ndjson_line(obj: dict) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+@router.post("/run-sql")
+async def run_sql(
+    payload: RunSQLRequest,
+    user_id: int = Depends(auth_handler.auth_access_dependency),
+    session: AsyncSession = Depends(get_session),
+    sandbox_session: AsyncSession = Depends(get_sandbox_session),
+):
+    """运行查询预览：只在题目沙箱中执行 SQL 并返回结果，不判题、不写提交记录、不调用 AI。
+
+    响应为 NDJSON 流（application/x-ndjson），逐行为：
+      {"type": "meta", "columns": [...]}
+      {"type": "row", "values": [...]}          （最多 RUN_SQL_MAX_ROWS 行）
+      {"type": "end", "row_count": n, "truncated": bool, "cached": bool}
+    结果按 (题目 ID, 题目版本, 规范化 SQL) 缓存，题目修改后自动失效。
+    只在与业务主库分离的沙箱中运行，且 SQL 只能引用题目表结构中的表（本地预检查白名单）。
+    """
+    question = await get_question_catalog().get(session, payload.question_id)
+    if not question:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"题目 ID {payload.question_id} 不存在",
+        )
+    judge_dialect = _ensure_sandbox_available(question)
+    if not is_sandbox_isolated(judge_dialect):
+        # 未配置独立沙箱时沙箱就是业务主库，直接返回查询结果会泄露用户、题目答案等数据
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="运行查询需要独立的沙箱数据库（SANDBOX_DB_URL），当前未配置",
+        )
+    issues = precheck_sql(payload.sql, getattr(question, "schema_preview", None), strict_tables=True)
+    if issues:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=format_precheck_message(issues))
+
+    cache_key = (question.id, getattr(question, "version", None) or 1, canonicalize_sql(payload.sql))
+    cached = _run_sql_cache.get(cache_key)
+    if cached is None:
+        try:
+            async with (
+                sandbox_session_for(judge_dialect, sandbox_session, question.id) as judge_session,
+                _sandbox_tables(question, judge_session),
+            ):
+                row_budget = resolve_row_budget(
+                    getattr(question, "max_estimated_rows", None), getattr(question, "schema_preview", None)
+                )
+                judge_service = SQLJudgeService(judge_session, row_budget=row_budget)
+                try:
+                    columns, rows, truncated = await judge_service.preview_sql(
+                        payload.sql, _settings.RUN_SQL_MAX_ROWS
+                    )
+                except SQLConnectionLostError:
+                    raise  # 沙箱连接中断：由 sandbox_session_for 转为 SandboxConnectionError，返回 503
+                except SQLJudgeError as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+                finally:
+                    await judge_session.rollback()
+        except SandboxUnavailableError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"判题环境不可用：{e}"
+            ) from e
+        lines = [_ndjson_line({"type": "meta", "columns": columns})]
+        lines.extend(_ndjson_line({"type": "row", "values": list(r)}) for r in rows)
+        cached = (lines, len(rows), truncated)
+        _run_sql_cache.set(cache_key, cached)
+        hit = False
+    else:
+        hit = True
+    incr("run_sql.cache_hit" if hit else "run_sql.cache_miss")
+
+    lines, row_count, truncated = cached
+
+    async def body():
+        for line in lines:
+            yield line
+        yield _ndjson_line({"type": "end", "row_count": row_count, "truncated": truncated, "cached": hit})
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@router.post("/precheck-sql")
+async def precheck_sql_endpoint(
+    payload: SQLPrecheckRequest,
+    user_id: int = Depends(auth_handler.auth_access_dependency),
+    session: AsyncSession = Depends(get_session),
+):
+    """SQL 预检查：在本地检查语法，并按题目表结构检查表名与列名，供在线编辑器实时提示。
+
+    不连接沙箱、不执行 SQL、不写提交记录。返回 {"ok": bool, "issues": [...]}，
+    每条问题含 kind、message、line、column（1 起始）、offset、length 与 suggestions。
+    """
+    question = await get_question_catalog().get(session, payload.question_id)
+    if not question:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"题目 ID {payload.question_id} 不存在",
+        )
+    issues = precheck_sql(payload.sql, getattr(question, "schema_preview", None))
+    return {"ok": not issues, "issues": [i.to_dict() for i in issues]}
+
+
+@router.post("/complete-sql")
+async def complete_sql(
+    payload: SQLCompleteRequest,
+    user_id: int = Depends(auth_handler.auth_access_dependency),
+    session: AsyncSession = Depends(get_session),
+):
+    """SQL 自动补全：根据光标前的上下文返回表名、列名、关键字与函数候选。
+
+    返回 {"context": ..., "prefix": ..., "items": [{"text", "kind", "detail"}]}；
+    前缀树按题目版本缓存，命中时每次请求只查询一次题目版本号。
+    """
+    completer = await get_question_completer(session, payload.question_id)
+    if completer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"题目 ID {payload.question_id} 不存在",
+        )
+    context, prefix, items = completer.complete(
+        payload.sql, payload.cursor, payload.knowledge_point, payload.limit
+    )
+    return {"context": context, "prefix": prefix, "items": [i.to_dict() for i in items]}
+
+
+def _short_circuit_issues(sql: str, question) -> list[PrecheckIssue]:
+    """判题前的本地预检查：返回确定的问题（非空时跳过沙箱判题直接记为错误）。
+
+    只有名称类等不确定的问题时返回空列表，仍交给沙箱判题，避免预检查误报被记为一次失败提交。
+    """
+    if not _settings.SQL_PRECHECK_ENABLED:
+        return []
+    issues = precheck_sql(sql, getattr(question, "schema_preview", None))
+    certain = [i for i in issues if i.certain]
+    if issues and not certain:
+        incr("sql_precheck.uncertain")
+    return certain
+
+
+async def _cancel_on_disconnect(request: Request, name: str, work: Awaitable[T]) -> T:
+    """客户端断开时取消 work：先中断其沙箱查询，再取消任务（同时中止等待中的 AI 请求）。
+
+    取消发生在提交之前，已写入会话但未提交的记录在会话关闭时回滚。
+    """
+    if _settings.DISCONNECT_POLL_INTERVAL_MS <= 0:
+        return await work
+    try:
+        return await run_until_disconnect(request, name, work, _settings.DISCONNECT_POLL_INTERVAL_MS / 1000)
+    except ClientDisconnectedError as e:
+        # 499：客户端已关闭连接（响应不会被收到，仅用于访问日志）
+        raise HTTPException(status_code=499, detail=str(e)) from e
+
+
 @router.post("/check-sql", response_model=SQLCheckResponse)
 async def check_sql(
     payload: SQLCheckRequest,
+    background_tasks: BackgroundTasks,
+    request: Request,
+    response: Response,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
     user_id: int = Depends(auth_handler.auth_access_dependency),
     session: AsyncSession = Depends(get_session),
+    sandbox_session: AsyncSession = Depends(get_sandbox_session),
 ):
     """检查学生提交的 SQL 是否正确，并生成 AI 教学提示。
 
+    携带 Idempotency-Key 请求头时，IDEMPOTENCY_TTL_SECONDS 内同一键的重试直接返回已保存的响应
+    （响应头 Idempotent-Replayed: true），并发的重复请求等待同一次判题，不会重复判题、调用 AI 或写入提交记录。
+    同一键用于内容不同的请求时返回 422。客户端断开时中断沙箱查询与 AI 调用，不保存提交记录。
+    """
+    if not idempotency_key:
+        return await _cancel_on_disconnect(
+            request, "check_sql", _check_sql(payload, background_tasks, user_id, session, sandbox_session)
+        )
+    try:
+        result, replayed = await _cancel_on_disconnect(
+            request,
+            "check_sql",
+            _check_sql_idempotency.run(
+                (user_id, idempotency_key),
+                request_fingerprint(payload.model_dump_json()),
+                lambda: _check_sql(payload, background_tasks, user_id, session, sandbox_session),
+            ),
+        )
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)) from e
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _check_sql(
+    payload: SQLCheckRequest,
+    background_tasks: BackgroundTasks,
+    user_id: int,
+    session: AsyncSession,
+    sandbox_session: AsyncSession,
+) -> SQLCheckResponse:
+    """check_sql 的判题流程。
+
     完整流程：
     1. 查询题目和标准答案
-    2. 执行 SQL 判题
+    1.5 本地预检查语法与表名/列名，发现问题时跳过沙箱判题与 AI，直接给出本地提示
+    2. 执行 SQL 判题（可见数据通过后，再在隐藏测试数据上并发校验；可交给判题 worker 执行）
     3. 查询历史失败次数
     4. 计算支架等级
     5. 调用 AI 服务生成提示
     6. 保存提交记录
+    7. 题目开启效率评估且提交正确时，响应返回后在后台评估查询效率
     """
     # 1. 查询题目
-    question_repo = QuestionRepository(session)
-    question = await question_repo.get_by_id(payload.question_id)
+    question = await get_question_catalog().get(session, payload.question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"题目 ID {payload.question_id} 不存在",
         )
 
-    # 1.5 判题前自动建表：根据题目的 schema_preview 在判题库中创建表并插入示例数据，保证表存在且与题目约定一致
-    init_sql = generate_init_sql_from_schema_preview(getattr(question, "schema_preview", None))
-    if init_sql:
-        await execute_setup_sql(session, init_sql)
-
-    # 2. SQL 判题
-    judge_service = SQLJudgeService(session)
-    is_correct = False
-    error_message = None
-    is_safety_blocked = False
+    # 1.5 本地预检查：存在确定的错误时结果必然错误，无需建表执行
+    precheck_issues = _short_circuit_issues(payload.student_sql, question)
 
-    try:
-        required_cols = getattr(question, "required_output_columns", None)
-        is_correct, error_message = await judge_service.judge_sql(
-            payload.student_sql, question.correct_sql, required_output_columns=required_cols
-        )
-    except SQLSafetyError as e:
-        error_message = str(e)
-        is_correct = False
-        is_safety_blocked = True
-    except SQLJudgeError as e:
-        error_message = str(e)
+    if precheck_issues:
+        incr("sql_precheck.short_circuit")
+        judge_dialect = None
         is_correct = False
-
-    # 3. 查询历史失败次数与用户整体表现；首次正确判断（发经验用）
-    submission_repo = SubmissionRepository(session)
-    failure_count = await submission_repo.get_failure_count(
-        user_id, payload.question_id
-    )
-    correct_count_before = await submission_repo.get_correct_count(user_id, payload.question_id)
-    stats = await submission_repo.get_user_overall_stats(user_id)
+        error_message = format_precheck_message(precheck_issues)
+        is_safety_blocked = False
+        failed_dataset = None
+        cost_blocked_tables = None
+    else:
+        # 2. SQL 判题：按题目的判题方言选择沙箱、建表后判题，可见数据通过后再在隐藏测试数据上并发校验
+        #    （开启 JUDGE_QUEUE_ENABLED 时由独立的判题 worker 执行，本进程只等待结果）
+        judge_dialect = _ensure_sandbox_available(question)
+        outcome = await _judge(JudgeTask.from_question(question, payload.student_sql), sandbox_session)
+        is_correct = outcome.is_correct
+        error_message = outcome.error_message
+        is_safety_blocked = outcome.is_safety_blocked
+        failed_dataset = outcome.failed_dataset
+        cost_blocked_tables = outcome.cost_blocked_tables
+
+    # 3. 读取本题进度（失败/正确次数、对话条数）与用户整体表现；首次正确判断（发经验用）
+    #    均为进度表的主键查询，不统计 submissions / chat_messages
+    progress_repo = ProgressRepository(session)
+    progress = await progress_repo.get_question_progress(user_id, payload.question_id)
+    failure_count = progress.fail_count
+    correct_count_before = progress.correct_count
+    stats = await progress_repo.get_user_stats(user_id)
     ability_adj = get_ability_adjustment(stats["success_rate"], stats["total"])
 
     # 4. 计算支架等级（本题失败次数 + 根据能力动态调整）
     hint_level = calculate_hint_level(failure_count, ability_adj)
 
-    # 4.5 对话条数（发经验前统计，不含本轮即将写入的 3 条）
-    chat_repo = ChatRepository(session)
-    chat_count_for_xp = await chat_repo.count_messages_for_user_question(user_id, payload.question_id)
+    # 4.5 对话条数（发经验用，不含本轮即将写入的 3 条）
+    chat_count_for_xp = progress.chat_count
 
     # 5. 调用 AI 服务生成提示（仅 AI 成功后才写入提交记录与对话，避免 AI 故障时误计一次提交）
+    #    预检查已定位问题时直接使用本地提示
     try:
-        ai_hint_result = await get_sql_hint(
+        ai_hint_result = precheck_hint(precheck_issues) if precheck_issues else await get_sql_hint(
             student_sql=payload.student_sql,
             question_content=question.content,
             is_correct=is_correct,
@@ -148,8 +456,10 @@ async def check_sql(
         ai_hint=ai_hint_text,
         is_correct=is_correct,
         hint_level=hint_level,
+        error_message=error_message,
+        is_safety_blocked=is_safety_blocked,
     )
-    submission = await submission_repo.create(submission_data)
+    submission = await SubmissionRepository(session).create(submission_data)
     # 首次正确完成：发放经验并更新等级
     earned_experience = None
     level_up = False
@@ -173,6 +483,7 @@ async def check_sql(
             level_up = cur_level > prev_level
             new_level = cur_level if level_up else None
     # 同步写入“对话历史”，用于前端多轮对话展示与 AI 上下文
+    chat_repo = ChatRepository(session)
     if is_safety_blocked:
         system_result = "【新一轮提交】代码包含危险操作，系统已拒绝执行。"
     else:
@@ -198,6 +509,18 @@ async def check_sql(
 
     await session.commit()
 
+    # 6.5 查询效率评估（EXPLAIN + 计时）放到响应之后执行，不增加判题延迟
+    if is_correct and getattr(question, "grade_efficiency", False):
+        background_tasks.add_task(
+            grade_submission_efficiency,
+            submission.id,
+            payload.student_sql,
+            question.correct_sql,
+            judge_dialect=judge_dialect,
+            question_id=question.id,
+            schema_preview=getattr(question, "schema_preview", None),
+        )
+
     # 7. 返回结果
     return SQLCheckResponse(
         is_correct=is_correct,
@@ -205,12 +528,154 @@ async def check_sql(
         submission_id=submission.id,
         error_message=error_message,
         is_safety_blocked=is_safety_blocked,
+        failed_dataset=failed_dataset,
+        cost_blocked_tables=cost_blocked_tables,
+        precheck_issues=[i.to_dict() for i in precheck_issues] or None,
         earned_experience=earned_experience,
         level_up=level_up,
         new_level=new_level,
     )
 
 
+async def _judge_exam_ticket(ticket: ExamTicket) -> dict:
+    """考试提交的判题：预检查、沙箱判题并写入提交记录。
+
+    不调用 AI、不写对话、不发经验；AI 提示在考试结束后通过 /ai/exam/submissions/{id}/hint 按需生成。
+    """
+    async with AsyncSessionFactory() as session:
+        question = await get_question_catalog().get(session, ticket.question_id)
+        if not question:
+            raise ValueError(f"题目 ID {ticket.question_id} 不存在")
+        precheck_issues = _short_circuit_issues(ticket.sql, question)
+        if precheck_issues:
+            is_correct, error_message, is_safety_blocked, failed_dataset = (
+                False, format_precheck_message(precheck_issues), False, None
+            )
+        else:
+            judge_dialect = _ensure_sandbox_available(question)
+            sandbox_factory = await sandbox_session_factory_for(judge_dialect, question.id)
+            async with sandbox_factory() as sandbox_session:
+                outcome = await _judge(JudgeTask.from_question(question, ticket.sql), sandbox_session)
+            is_correct, error_message, is_safety_blocked, failed_dataset = (
+                outcome.is_correct, outcome.error_message, outcome.is_safety_blocked, outcome.failed_dataset
+            )
+
+        # 支架等级与即时判题一致：本题失败次数 + 根据能力动态调整
+        progress_repo = ProgressRepository(session)
+        progress = await progress_repo.get_question_progress(ticket.user_id, ticket.question_id)
+        stats = await progress_repo.get_user_stats(ticket.user_id)
+        ability_adj = get_ability_adjustment(stats["success_rate"], stats["total"])
+        submission = await SubmissionRepository(session).create(
+            SubmissionCreate(
+                user_id=ticket.user_id,
+                question_id=ticket.question_id,
+                student_sql=ticket.sql,
+                is_correct=is_correct,
+                hint_level=calculate_hint_level(progress.fail_count, ability_adj),
+                error_message=error_message,
+                is_safety_blocked=is_safety_blocked,
+            )
+        )
+        await session.commit()
+        return {
+            "submission_id": submission.id,
+            "is_correct": is_correct,
+            "error_message": error_message,
+            "is_safety_blocked": is_safety_blocked,
+            "failed_dataset": failed_dataset,
+            "precheck_issues": [i.to_dict() for i in precheck_issues] or None,
+            "hint_deferred": True,
+        }
+
+
+# 考试提交准入队列（判题协程在 EXAM_MODE_ENABLED 时由 main.py 的 lifespan 启动）
+exam_queue = ExamAdmissionQueue(_judge_exam_ticket, _settings.EXAM_QUEUE_MAX_SIZE, _settings.EXAM_TICKET_TTL_SECONDS)
+
+
+def _ensure_exam_mode() -> None:
+    if not _settings.EXAM_MODE_ENABLED:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="考试模式未开启")
+
+
+@router.post("/exam/submit", status_code=status.HTTP_202_ACCEPTED)
+async def exam_submit(
+    payload: ExamSubmitRequest,
+    user_id: int = Depends(auth_handler.auth_access_dependency),
+    session: AsyncSession = Depends(get_session),
+):
+    """考试模式提交：放入准入队列后立即返回票据与排队位置，不等待判题。
+
+    同一学生对同一题排队中的提交会被新提交合并（返回同一票据）；该题的首次提交优先判题。
+    客户端通过 GET /ai/exam/tickets/{ticket_id}?wait=秒数 长轮询结果。
+    """
+    _ensure_exam_mode()
+    progress = await ProgressRepository(session).get_question_progress(user_id, payload.question_id)
+    first_attempt = progress.fail_count == 0 and progress.correct_count == 0
+    try:
+        ticket = await exam_queue.submit(user_id, payload.question_id, payload.student_sql, first_attempt)
+    except ExamQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"}
+        ) from e
+    return ticket.to_dict(exam_queue.position(ticket))
+
+
+@router.get("/exam/tickets/{ticket_id}")
+async def exam_ticket(
+    ticket_id: str,
+    wait: float = Query(0, ge=0, description="判题未完成时最多等待的秒数（长轮询）"),
+    user_id: int = Depends(auth_handler.auth_access_dependency),
+):
+    """查询考试提交票据：排队中返回位置，完成后返回判题结果（含 submission_id）。"""
+    _ensure_exam_mode()
+    ticket = exam_queue.get(ticket_id)
+    if ticket is None or ticket.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="票据不存在或已过期")
+    await exam_queue.wait(ticket, min(wait, _settings.EXAM_TICKET_MAX_WAIT_SECONDS))
+    return ticket.to_dict(exam_queue.position(ticket))
+
+
+@router.post("/exam/submissions/{submission_id}/hint")
+async def exam_submission_hint(
+    submission_id: int,
+    language: str = Query("zh-CN"),
+    user_id: int = Depends(auth_handler.auth_access_dependency),
+    session: AsyncSession = Depends(get_session),
+):
+    """为考试提交按需生成（并保存）AI 提示；已生成过时直接返回。
+
+    与即时判题使用相同的输入：判题时保存的错误信息与安全拦截标记、提交当时的失败次数；预检查能定位的问题使用本地提示。
+    """
+    submission_repo = SubmissionRepository(session)
+    submission = await submission_repo.get_by_id(submission_id)
+    if submission is None or submission.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="提交记录不存在")
+    if submission.ai_hint:
+        return {"submission_id": submission.id, "overall_comment": submission.ai_hint}
+    question = await get_question_catalog().get(session, submission.question_id)
+    # 提交之前的失败次数（与即时判题生成提示时一致，不含本次及之后的提交）
+    failure_count = await submission_repo.get_failure_count(user_id, submission.question_id, before_id=submission.id)
+    precheck_issues = _short_circuit_issues(submission.student_sql, question) if question else []
+    try:
+        ai_hint_result = precheck_hint(precheck_issues) if precheck_issues else await get_sql_hint(
+            student_sql=submission.student_sql,
+            question_content=question.content if question else None,
+            is_correct=submission.is_correct,
+            hint_level=submission.hint_level,
+            failure_count=failure_count,
+            error_message=submission.error_message,
+            language=language,
+            is_safety_blocked=submission.is_safety_blocked,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="AI 服务暂时不可用，请稍后重试。"
+        ) from e
+    submission.ai_hint = ai_hint_result.overall_comment
+    await session.commit()
+    return {"submission_id": submission.id, **ai_hint_result.model_dump()}
+
+
 @router.get("/chat/messages", response_model=list[ChatMessageOut])
 async def get_chat_messages(
     question_id: int = Query(..., description="题目 ID"),
@@ -239,12 +704,17 @@ async def clear_chat_messages(
 @router.post("/chat", response_model=ChatSendOut)
 async def chat(
     payload: ChatSendIn,
+    request: Request,
     user_id: int = Depends(auth_handler.auth_access_dependency),
     session: AsyncSession = Depends(get_session),
 ):
+    """与 AI 老师对话。客户端断开时取消 AI 调用，本轮的用户消息不保存。"""
+    return await _cancel_on_disconnect(request, "chat", _chat(payload, user_id, session))
+
+
+async def _chat(payload: ChatSendIn, user_id: int, session: AsyncSession) -> ChatSendOut:
     # 题目上下文
-    question_repo = QuestionRepository(session)
-    question = await question_repo.get_by_id(payload.question_id)
+    question = await get_question_catalog().get(session, payload.question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -257,8 +727,9 @@ async def chat(
     latest = latest_list[0] if latest_list else None
 
     # 失败次数与用户整体表现用于支架等级
-    failure_count = await submission_repo.get_failure_count(user_id, payload.question_id)
-    stats = await submission_repo.get_user_overall_stats(user_id)
+    progress_repo = ProgressRepository(session)
+    failure_count = (await progress_repo.get_question_progress(user_id, payload.question_id)).fail_count
+    stats = await progress_repo.get_user_stats(user_id)
     ability_adj = get_ability_adjustment(stats["success_rate"], stats["total"])
     hint_level = calculate_hint_level(failure_count, ability_adj)
 
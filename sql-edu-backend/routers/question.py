@@ -1,6 +1,9 @@
 """题目管理路由。"""
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import json
+from functools import lru_cache
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
@@ -8,15 +11,16 @@ from typing import Annotated
 from repository import (
     QuestionRepository,
     SubmissionRepository,
-    ChatRepository,
     DifficultyFeedbackRepository,
+    QuestionStatsRepository,
 )
 from schemas.question import QuestionOut, QuestionCreate, DifficultyFeedbackIn
 from schemas import ResponseOut
-from dependencies import get_session, require_teacher
+from dependencies import get_session, optional_student, require_teacher
 from core.auth import AuthHandler
 from models.question import Question
-from core.difficulty_service import compute_display_difficulty, suggested_time_seconds
+from core.difficulty_service import suggested_time_seconds, suggested_time_seconds_batch
+from core.question_stats import display_difficulties, display_difficulty
 from core.sql_knowledge_points import get_all_knowledge_points, get_knowledge_point_by_id
 from core.ai_question_generator import (
     generate_questions_for_knowledge_point,
@@ -26,6 +30,9 @@ from core.ai_question_generator import (
     infer_alias_requirement_from_content,
 )
 from core.sql_parser import infer_output_columns_from_sql
+from core.question_catalog import get_question_catalog, question_out
+from core.http_cache import cached_response, digest
+from core.sandbox_warmup import request_sandbox_warmup
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 auth_handler = AuthHandler()
@@ -75,111 +82,55 @@ async def _enrich_question_out(
     session: AsyncSession,
     question: Question,
 ) -> QuestionOut:
-    """为题目附加动态难度与限时建议。"""
-    sub_repo = SubmissionRepository(session)
-    chat_repo = ChatRepository(session)
-    feedback_repo = DifficultyFeedbackRepository(session)
+    """为题目附加动态难度与限时建议（难度来自 question_stats 的一次主键查询）。"""
+    stats = await QuestionStatsRepository(session).get(question.id)
+    disp = display_difficulty(question, stats)
+    return question_out(question, disp, suggested_time_seconds(disp, question.time_limit_seconds))
 
-    sub_stats = await sub_repo.get_question_submission_stats(question.id)
-    chat_count = await chat_repo.count_messages_by_question(question.id)
-    feedback_stats = await feedback_repo.get_question_stats(question.id)
-
-    disp = compute_display_difficulty(
-        teacher_difficulty=question.difficulty,
-        total_submissions=sub_stats["total_submissions"],
-        correct_submissions=sub_stats["correct_submissions"],
-        total_chat_messages=chat_count,
-        feedback_count=feedback_stats["feedback_count"],
-        avg_student_rating=feedback_stats.get("avg_rating"),
-    )
-    sug = suggested_time_seconds(disp, question.time_limit_seconds)
-    required_cols = getattr(question, "required_output_columns", None)
-    # 不再从 SQL 推断填充，只返回数据库中实际存储的值（题目描述有别名要求时才会存储）
-
-    return QuestionOut(
-        id=question.id,
-        title=question.title,
-        content=question.content,
-        title_en=getattr(question, "title_en", None),
-        content_en=getattr(question, "content_en", None),
-        title_zh_tw=getattr(question, "title_zh_tw", None),
-        content_zh_tw=getattr(question, "content_zh_tw", None),
-        difficulty=question.difficulty,
-        correct_sql=question.correct_sql,
-        time_limit_seconds=question.time_limit_seconds,
-        schema_preview=getattr(question, "schema_preview", None),
-        required_output_columns=required_cols,
-        display_difficulty=disp,
-        suggested_time_seconds=sug,
-    )
+
+@lru_cache(maxsize=1)
+def _knowledge_points_body() -> bytes:
+    return json.dumps(get_all_knowledge_points(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 
 @router.get("/", response_model=list[QuestionOut])
 async def get_questions(
+    request: Request,
     skip: Annotated[int, Query(ge=0, description="跳过数量")] = 0,
     # 放宽单次最大返回数量上限，便于「无限加题」场景。
     # 默认 1000 条，最大可请求 10000 条。
     limit: Annotated[int, Query(ge=1, le=10000, description="限制数量")] = 1000,
     session: AsyncSession = Depends(get_session),
 ):
-    """获取题目列表（分页）。返回含动态难度与限时建议。"""
-    repo = QuestionRepository(session)
-    questions = await repo.get_all(skip=skip, limit=limit)
-    if not questions:
-        return []
+    """获取题目列表（分页）。返回含动态难度与限时建议。
 
-    qids = [q.id for q in questions]
-    sub_repo = SubmissionRepository(session)
-    chat_repo = ChatRepository(session)
-    feedback_repo = DifficultyFeedbackRepository(session)
+    题目来自进程内题目目录（预先序列化的响应体），统计为本页 ID 范围的一次查询，
+    响应只需为每题拼接展示难度与建议限时。ETag 由本页各题的内容摘要与展示难度得出，
+    客户端带 If-None-Match 重新验证且未变化时返回 304。
+    """
+    records = await get_question_catalog().list(session, skip=skip, limit=limit)
+    if not records:
+        return cached_response(request, digest(b"[]"), lambda: b"[]")
+    stats = await QuestionStatsRepository(session).get_range(records[-1].id, records[0].id)
+    # 展示难度与建议限时按列批量计算
+    disps = display_difficulties([(r, stats.get(r.id)) for r in records])
+    etag = digest(*(f"{r.digest}:{d};".encode() for r, d in zip(records, disps)))
 
-    sub_map = await sub_repo.get_submission_stats_by_question_ids(qids)
-    chat_map = await chat_repo.count_messages_by_question_ids(qids)
-    feedback_map = await feedback_repo.get_feedback_stats_by_question_ids(qids)
+    def build() -> bytes:
+        sugs = suggested_time_seconds_batch(disps)
+        return b"[" + b",".join(r.render(d, s) for r, d, s in zip(records, disps, sugs)) + b"]"
 
-    out = []
-    for q in questions:
-        sub = sub_map.get(q.id, {"total_submissions": 0, "correct_submissions": 0})
-        chat_count = chat_map.get(q.id, 0)
-        fb = feedback_map.get(q.id, {"feedback_count": 0, "avg_rating": None})
-        disp = compute_display_difficulty(
-            q.difficulty,
-            sub["total_submissions"],
-            sub["correct_submissions"],
-            chat_count,
-            fb["feedback_count"],
-            fb.get("avg_rating"),
-        )
-        sug = suggested_time_seconds(disp, q.time_limit_seconds)
-        required_cols = getattr(q, "required_output_columns", None)
-        # 不再从 SQL 推断填充，只返回数据库中实际存储的值
-        out.append(
-            QuestionOut(
-                id=q.id,
-                title=q.title,
-                content=q.content,
-                title_en=getattr(q, "title_en", None),
-                content_en=getattr(q, "content_en", None),
-                title_zh_tw=getattr(q, "title_zh_tw", None),
-                content_zh_tw=getattr(q, "content_zh_tw", None),
-                difficulty=q.difficulty,
-                correct_sql=q.correct_sql,
-                time_limit_seconds=q.time_limit_seconds,
-                schema_preview=getattr(q, "schema_preview", None),
-                required_output_columns=required_cols,
-                display_difficulty=disp,
-                suggested_time_seconds=sug,
-            )
-        )
-    return out
+    return cached_response(request, etag, build)
 
 
 @router.get("/knowledge-points")
 async def get_knowledge_points(
+    request: Request,
     user_id: int = Depends(require_teacher),
 ):
-    """获取 SQL 从入门到精通的知识点分类（教师端按知识点生成题目用）。"""
-    return get_all_knowledge_points()
+    """获取 SQL 从入门到精通的知识点分类（教师端按知识点生成题目用）。内容固定，支持 ETag 与压缩。"""
+    body = _knowledge_points_body()
+    return cached_response(request, digest(body), lambda: body)
 
 
 class GenerateByAIIn(BaseModel):
@@ -249,6 +200,7 @@ async def generate_questions_by_ai(
         await session.refresh(q)
         created.append(q)
     await session.commit()
+    get_question_catalog().invalidate()
     out = []
     for q in created:
         await session.refresh(q)
@@ -280,10 +232,11 @@ async def generate_schema_preview(
     stmt = (
         update(Question)
         .where(Question.id == question_id)
-        .values(schema_preview=preview)
+        .values(schema_preview=preview, version=Question.version + 1)
     )
     await session.execute(stmt)
     await session.commit()
+    get_question_catalog().invalidate(question_id)
     await session.refresh(question)
     return await _enrich_question_out(session, question)
 
@@ -326,21 +279,29 @@ async def generate_question_i18n(
             content_en=result["content_en"],
             title_zh_tw=result["title_zh_tw"][:200],
             content_zh_tw=result["content_zh_tw"],
+            version=Question.version + 1,
         )
     )
     await session.commit()
+    get_question_catalog().invalidate(question_id)
     await session.refresh(question)
     return await _enrich_question_out(session, question)
 
 
 @router.get("/{question_id}", response_model=QuestionOut)
 async def get_question(
+    request: Request,
     question_id: int,
     session: AsyncSession = Depends(get_session),
+    student_id: int | None = Depends(optional_student),
 ):
-    """获取题目详情。返回含动态难度与限时建议。若本题尚无表结构预览则自动生成并落库，保证学生端能看见表参考。"""
-    repo = QuestionRepository(session)
-    question = await repo.get_by_id(question_id)
+    """获取题目详情。返回含动态难度与限时建议。若本题尚无表结构预览则自动生成并落库，保证学生端能看见表参考。
+
+    题目来自进程内题目目录（预先序列化的响应体），只需一次 question_stats 主键查询；
+    ETag 为题目内容摘要加展示难度，未变化时返回 304。
+    """
+    catalog = get_question_catalog()
+    question = await catalog.get(session, question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -353,11 +314,21 @@ async def get_question(
         if preview:
             from sqlalchemy import update
             await session.execute(
-                update(Question).where(Question.id == question_id).values(schema_preview=preview)
+                update(Question)
+                .where(Question.id == question_id)
+                .values(schema_preview=preview, version=Question.version + 1)
             )
             await session.commit()
-            await session.refresh(question)
-    return await _enrich_question_out(session, question)
+            catalog.invalidate(question_id)
+            question = await catalog.get(session, question_id) or question
+    # 学生打开题目后很可能随即提交：后台提前在沙箱中建好判题表（匿名与教师访问不触发沙箱建表）
+    if student_id is not None:
+        request_sandbox_warmup(question_id)
+    stats = await QuestionStatsRepository(session).get(question_id)
+    disp = display_difficulty(question, stats)
+    return cached_response(
+        request, f"{question.digest}-{disp}", lambda: question.render(disp, suggested_time_seconds(disp))
+    )
 
 
 @router.post("/", response_model=QuestionOut, status_code=status.HTTP_201_CREATED)
@@ -388,11 +359,17 @@ async def create_question(
             time_limit_seconds=question_data.time_limit_seconds,
             schema_preview=question_data.schema_preview,
             required_output_columns=required_cols,
+            hidden_datasets=question_data.hidden_datasets,
+            grade_efficiency=question_data.grade_efficiency,
+            max_estimated_rows=question_data.max_estimated_rows,
+            judge_dialect=question_data.judge_dialect,
+            ignore_column_order=question_data.ignore_column_order,
         )
         session.add(question)
         await session.flush()
         await session.refresh(question)
         await session.commit()
+        get_question_catalog().invalidate(question.id)
 
         # 统一返回 QuestionOut，附带动态难度与建议限时等字段
         return await _enrich_question_out(session, question)
@@ -439,12 +416,23 @@ async def update_question(
             "difficulty": difficulty,
             "correct_sql": question_data.correct_sql,
             "required_output_columns": required_cols,
+            "version": Question.version + 1,
         }
         fields_set = getattr(question_data, "model_fields_set", set())
         if "time_limit_seconds" in fields_set:
             values["time_limit_seconds"] = question_data.time_limit_seconds
         if "schema_preview" in fields_set:
             values["schema_preview"] = question_data.schema_preview
+        if "hidden_datasets" in fields_set:
+            values["hidden_datasets"] = question_data.hidden_datasets
+        if "grade_efficiency" in fields_set:
+            values["grade_efficiency"] = question_data.grade_efficiency
+        if "max_estimated_rows" in fields_set:
+            values["max_estimated_rows"] = question_data.max_estimated_rows
+        if "judge_dialect" in fields_set:
+            values["judge_dialect"] = question_data.judge_dialect
+        if "ignore_column_order" in fields_set:
+            values["ignore_column_order"] = question_data.ignore_column_order
         if "title_en" in fields_set:
             values["title_en"] = question_data.title_en
         if "content_en" in fields_set:
@@ -456,7 +444,9 @@ async def update_question(
 
         stmt = update(Question).where(Question.id == question_id).values(**values)
         await session.execute(stmt)
+        await QuestionStatsRepository(session).invalidate_display(question_id)
         await session.commit()
+        get_question_catalog().invalidate(question_id)
         await session.refresh(question)
 
         # 统一返回 QuestionOut，附带动态难度与建议限时等字段
@@ -494,6 +484,7 @@ async def delete_question(
         stmt = delete(Question).where(Question.id == question_id)
         await session.execute(stmt)
         await session.commit()
+        get_question_catalog().invalidate(question_id)
 
         return ResponseOut(result="success", detail="题目删除成功")
     except Exception as e:
@@ -517,8 +508,7 @@ async def submit_difficulty_feedback(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="难度评分为 1～10 的整数",
         )
-    repo = QuestionRepository(session)
-    question = await repo.get_by_id(question_id)
+    question = await get_question_catalog().get(session, question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
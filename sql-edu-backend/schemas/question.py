@@ -1,5 +1,7 @@
 from pydantic import BaseModel, field_validator
 
+from core.dialects import DIALECTS, get_dialect, is_supported_dialect
+
 
 class QuestionBase(BaseModel):
     title: str
@@ -19,6 +21,11 @@ class QuestionCreate(BaseModel):
     time_limit_seconds: int | None = None
     schema_preview: str | None = None  # JSON：tables[{name,columns,rows}]，供学生查看
     required_output_columns: str | None = None  # 要求的结果列名或完整说明，供学生端显著展示
+    hidden_datasets: str | None = None  # JSON：[{label, tables[...]}]，隐藏测试数据，仅判题使用
+    grade_efficiency: bool = False  # 是否对正确提交评估查询效率
+    max_estimated_rows: int | None = None  # 执行前代价检查的扫描行数预算，为空用全局默认
+    judge_dialect: str | None = None  # 判题后端：mysql / sqlite / postgresql / duckdb，为空用默认沙箱
+    ignore_column_order: bool = False  # 无别名要求时是否忽略列顺序（SELECT name, id 与 SELECT id, name 等价）
 
     @field_validator("difficulty")
     @classmethod
@@ -27,6 +34,15 @@ class QuestionCreate(BaseModel):
             raise ValueError("难度必须在 1～10 之间")
         return v
 
+    @field_validator("judge_dialect")
+    @classmethod
+    def judge_dialect_supported(cls, v: str | None) -> str | None:
+        if v is None or not v.strip():
+            return None
+        if not is_supported_dialect(v):
+            raise ValueError(f"不支持的判题方言：{v}（可选 {', '.join(DIALECTS)}）")
+        return get_dialect(v).name
+
 
 class QuestionOut(QuestionBase):
     id: int
@@ -36,6 +52,10 @@ class QuestionOut(QuestionBase):
     required_output_columns: str | None = None  # 要求的结果列名或完整说明，供学生端显著展示
     display_difficulty: float | None = None  # 动态计算 1～10，仅列表/详情返回时填充
     suggested_time_seconds: int | None = None  # 限时挑战建议秒数，仅列表/详情返回时填充
+    grade_efficiency: bool = False  # 是否对正确提交评估查询效率
+    judge_dialect: str | None = None  # 判题后端方言，为空用默认沙箱
+    ignore_column_order: bool = False  # 无别名要求时是否忽略列顺序
+    version: int = 1  # 题目版本号，每次修改 +1
     # 多语言题面（可选；未填写则前端回退到 title/content）
     title_en: str | None = None
     content_en: str | None = None
@@ -13,6 +13,8 @@ class SubmissionCreate(SubmissionBase):
     ai_hint: str | None = None
     is_correct: bool = False
     hint_level: int = 1
+    error_message: str | None = None
+    is_safety_blocked: bool = False
 
 
 class SubmissionOut(SubmissionBase):
@@ -21,6 +23,10 @@ class SubmissionOut(SubmissionBase):
     is_correct: bool
     hint_level: int
     created_at: datetime
+    rows_examined: int | None = None
+    full_scans: int | None = None
+    exec_time_ms: float | None = None
+    efficiency_score: float | None = None  # 相对标准答案的效率分 0～100，未评估时为空
 
     class Config:
         from_attributes = True
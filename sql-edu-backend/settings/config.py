@@ -59,7 +59,145 @@ class Settings(BaseSettings):
     # Token 过期时间
     JWT_ACCESS_TOKEN_EXPIRES : timedelta = timedelta(minutes=60)      # Access Token 1小时过期
     JWT_REFRESH_TOKEN_EXPIRES: timedelta = timedelta(days=7)         # Refresh Token 7天过期
-    # --- 8. 配置加载项 (Pydantic V2 新写法) ---
+
+    # --- 8. 判题数据集 ---
+    # 外部数据集文件（CSV/JSONL/Parquet）所在目录，schema_preview 中的 dataset.path 相对此目录解析
+    JUDGE_DATASET_DIR: str = "datasets"
+    # 批量导入时每批插入的行数（参数化 executemany）
+    JUDGE_DATASET_BATCH_SIZE: int = 1000
+    # 引用外部数据集的表，在返回给前端的 schema_preview 中最多保留的示例行数
+    SCHEMA_PREVIEW_MAX_ROWS: int = 5
+    # 合成数据（schema_preview 中的 generate 配置）单表允许生成的最大行数
+    JUDGE_GENERATE_MAX_ROWS: int = 5_000_000
+
+    # --- 9. 判题沙箱 ---
+    # 判题专用数据库连接串，留空则与 DB_URL 相同（学生 SQL 与建表均在此库执行）
+    SANDBOX_DB_URL: str = ""
+    SANDBOX_POOL_SIZE: int = 10
+    SANDBOX_MAX_OVERFLOW: int = 20
+    # 隐藏测试数据并发判题时，单次判题最多同时占用的沙箱连接数
+    # （MySQL 上每组隐藏数据建在 judge_scratch_ 前缀的暂存库中，沙箱账号需有这些库的建库、删库与建视图权限）
+    JUDGE_HIDDEN_DATASET_CONCURRENCY: int = 4
+    # 按方言的沙箱连接串（JSON），题目 judge_dialect 与默认沙箱方言不同时使用，例如
+    # {"sqlite": "sqlite+aiosqlite:///judge_sandbox.db", "postgresql": "postgresql+asyncpg://..."}
+    # sqlite 未配置时使用本地文件库 judge_sandbox.db
+    SANDBOX_DIALECT_URLS: dict[str, str] = {}
+    # 单条学生/标准答案 SQL 的执行超时（毫秒），<=0 不限制
+    JUDGE_STATEMENT_TIMEOUT_MS: int = 10_000
+    # 学生与标准答案 SQL 在两条独立沙箱连接（只读快照事务）上并发执行，任一失败立即取消另一条；
+    # 每次判题最多占用 3 条沙箱连接，SANDBOX_POOL_SIZE 需相应调大
+    JUDGE_PARALLEL_QUERIES: bool = True
+    # 学生与标准答案结果的单元格总数（行数 × 列数）达到此值时，标准化与对比放到线程池执行，不阻塞事件循环
+    JUDGE_OFFLOAD_MIN_CELLS: int = 20_000
+    # 题目数据总行数达到此值（或引用外部数据集）时，先在数据库内比较两条 SQL 结果的指纹，相同即判为正确，<=0 关闭
+    JUDGE_FINGERPRINT_MIN_ROWS: int = 100_000
+    # 题目数据总行数达到此值（或引用外部数据集）时，判题结果流式落盘后归并对比，<=0 关闭
+    JUDGE_SPILL_MIN_ROWS: int = 1_000_000
+    # 落盘对比时每侧结果在内存中缓冲的上限（字节），超过即排序写出一批 run 文件
+    JUDGE_SPILL_MEMORY_BYTES: int = 32 * 1024 * 1024
+    # run 文件的哈希分区数与每次从数据库取回的行数
+    JUDGE_SPILL_PARTITIONS: int = 8
+    JUDGE_SPILL_BATCH_ROWS: int = 5000
+    # 临时 run 文件目录，留空使用系统临时目录
+    JUDGE_SPILL_DIR: str = ""
+    # 沙箱分片连接串列表（JSON，须与默认沙箱同一方言），非空时按题目 ID 一致性哈希分配分片
+    SANDBOX_SHARD_URLS: list[str] = []
+    # 每个分片在哈希环上的虚拟节点数，越大分布越均匀
+    SANDBOX_SHARD_VNODES: int = 100
+    # 分片健康检查结果的缓存秒数，不可用的分片在此期间被跳过
+    SANDBOX_SHARD_HEALTH_TTL_SECONDS: int = 10
+
+    # --- 10. 执行前代价检查 ---
+    # 学生 SQL 执行前 EXPLAIN 估算的扫描行数上限（题目未单独设置 max_estimated_rows 时使用），<=0 关闭
+    JUDGE_COST_GUARD_ROW_BUDGET: int = 50_000_000
+    # 题目数据总行数不超过此值时跳过代价检查（小数据集上 EXPLAIN 的开销比执行本身还大）
+    JUDGE_COST_GUARD_MIN_ROWS: int = 10_000
+
+    # --- 11. 运行查询预览 ---
+    # /ai/run-sql 最多返回的行数，超出部分截断并标记 truncated
+    RUN_SQL_MAX_ROWS: int = 200
+    # 预览结果缓存：按 (题目 ID, 题目版本, 规范化 SQL) 缓存，过期秒数与最大条目数
+    RUN_SQL_CACHE_TTL_SECONDS: int = 300
+    RUN_SQL_CACHE_MAX_ENTRIES: int = 1024
+
+    # --- 12. 判题任务队列 ---
+    # 开启后 check_sql 只把判题任务写入 judge_jobs 表并等待结果，由独立的判题 worker（python -m core.judge_worker）执行
+    JUDGE_QUEUE_ENABLED: bool = False
+    # 可见性超时（秒）：worker 领取任务后在此时间内未回写结果，视为崩溃，任务可被其他 worker 重新领取
+    JUDGE_QUEUE_VISIBILITY_TIMEOUT_SECONDS: int = 60
+    # 同一任务最多被领取的次数，超过后标记失败
+    JUDGE_QUEUE_MAX_ATTEMPTS: int = 3
+    # check_sql 等待判题结果的最长时间（秒），超时返回 503 且不计提交
+    JUDGE_QUEUE_RESULT_TIMEOUT_SECONDS: int = 30
+    # 等待结果与 worker 空闲时的轮询间隔（毫秒）
+    JUDGE_QUEUE_POLL_INTERVAL_MS: int = 100
+    # 每个 worker 进程同时处理的任务数
+    JUDGE_WORKER_CONCURRENCY: int = 4
+    # 已结束（done / failed）任务的保留时间（秒），须大于 JUDGE_QUEUE_RESULT_TIMEOUT_SECONDS
+    JUDGE_QUEUE_RETENTION_SECONDS: int = 3600
+    # worker 清理已结束任务的间隔（秒），<=0 关闭清理
+    JUDGE_QUEUE_PURGE_INTERVAL_SECONDS: int = 300
+
+    # --- 13. 事件循环监控 ---
+    # 采样间隔（毫秒），<=0 关闭；单次延迟超过 WARN 阈值计入 event_loop.blocked
+    EVENT_LOOP_LAG_INTERVAL_MS: int = 100
+    EVENT_LOOP_LAG_WARN_MS: int = 50
+
+    # --- 14. 沙箱预热 ---
+    # 打开题目详情时在后台提前建好判题表；启动时预热近期提交最多的 Top-K 题目（0 关闭）
+    SANDBOX_WARMUP_ENABLED: bool = True
+    SANDBOX_WARMUP_QUEUE_SIZE: int = 64
+    SANDBOX_WARMUP_CONCURRENCY: int = 2
+    SANDBOX_WARMUP_TOP_K: int = 20
+    # 统计热门题目的提交时间窗口（小时）
+    SANDBOX_WARMUP_WINDOW_HOURS: int = 24
+    # 同一题目预热后在此时间内不再重复入队（秒）
+    SANDBOX_WARMUP_DEDUP_SECONDS: int = 60
+
+    # --- 15. SQL 预检查 ---
+    # 提交前在本地按题目表结构检查语法与表名/列名，发现问题时不进入沙箱判题、不调用 AI
+    SQL_PRECHECK_ENABLED: bool = True
+
+    # --- 16. SQL 自动补全 ---
+    # 按 (题目 ID, 题目版本) 缓存表名/列名前缀树
+    AUTOCOMPLETE_CACHE_MAX_ENTRIES: int = 512
+    AUTOCOMPLETE_CACHE_TTL_SECONDS: int = 3600
+
+    # --- 17. 考试模式 ---
+    # 开启后提供 /ai/exam 提交接口：提交先进入准入队列，以固定并发判题，AI 提示延后按需生成
+    EXAM_MODE_ENABLED: bool = False
+    EXAM_QUEUE_CONCURRENCY: int = 4
+    # 排队中的提交数上限，超出时返回 503
+    EXAM_QUEUE_MAX_SIZE: int = 1000
+    # 判题结束后票据保留时间（秒），供客户端取结果
+    EXAM_TICKET_TTL_SECONDS: int = 600
+    # 查询票据时长轮询的最长等待时间（秒）
+    EXAM_TICKET_MAX_WAIT_SECONDS: int = 20
+
+    # --- 18. 幂等提交 ---
+    # check-sql 携带 Idempotency-Key 时保存响应的时间（秒）与条目数，重试在此期间直接返回已保存的响应
+    IDEMPOTENCY_TTL_SECONDS: int = 600
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+
+    # --- 19. 客户端断开取消 ---
+    # check-sql 与对话接口检测客户端是否断开的间隔（毫秒）；断开后中断沙箱查询并取消 AI 调用，0 为不检测
+    DISCONNECT_POLL_INTERVAL_MS: int = 200
+
+    # --- 20. 题目统计对账 ---
+    # question_stats 随写入实时累加；每隔此时间（秒）按明细重算一次计数与展示难度，0 为不对账
+    QUESTION_STATS_RECONCILE_INTERVAL_SECONDS: int = 3600
+
+    # --- 21. 题目目录 ---
+    # 进程内缓存题目记录与预序列化响应体的时间（秒）与条目数；本进程修改题目时立即失效，其他进程的修改在此时间内生效
+    QUESTION_CATALOG_TTL_SECONDS: int = 60
+    QUESTION_CATALOG_MAX_ENTRIES: int = 20000
+
+    # --- 22. 条件请求与压缩 ---
+    # 题目列表/详情与知识点接口按 ETag 缓存 gzip / br 压缩结果的时间（秒）与条目数
+    HTTP_COMPRESSED_CACHE_TTL_SECONDS: int = 600
+    HTTP_COMPRESSED_CACHE_MAX_ENTRIES: int = 512
+
+    # --- 23. 配置加载项 (Pydantic V2 新写法) ---
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
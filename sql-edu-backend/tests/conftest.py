@@ -4,6 +4,7 @@ import pytest
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from core.question_catalog import get_question_catalog
 from models import Base
 from models.question import Question
 from models.user import User
@@ -17,6 +18,8 @@ TEST_DB_URL = "sqlite+aiosqlite:///:memory:"
 @pytest.fixture(scope="function")
 async def test_db_session():
     """创建测试数据库会话。"""
+    # 每个测试使用新的数据库，题目 ID 会重复：清空进程内题目目录
+    get_question_catalog().invalidate()
     # 创建测试引擎
     engine = create_async_engine(
         TEST_DB_URL,
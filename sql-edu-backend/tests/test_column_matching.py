@@ -0,0 +1,84 @@
+"""测试列顺序无关判题：按列值签名配对列，内存对比与落盘对比结论一致。"""
+
+import pytest
+from sqlalchemy import text
+
+import core.sql_judge as sql_judge
+from core.column_matching import candidate_pairings, column_signatures, reorder_rows
+from core.judge_pipeline import JudgeTask
+from core.sql_judge import SQLJudgeService
+
+CASES = [
+    # (学生 SQL, 标准答案 SQL, 列顺序无关时是否判对)
+    ("SELECT name, id FROM cm_t", "SELECT id, name FROM cm_t", True),
+    ("SELECT qty, name, id FROM cm_t", "SELECT id, name, qty FROM cm_t", True),
+    ("SELECT name, id FROM cm_t ORDER BY id", "SELECT id, name FROM cm_t ORDER BY id", True),
+    ("SELECT name, id FROM cm_t ORDER BY id DESC", "SELECT id, name FROM cm_t ORDER BY id", False),
+    ("SELECT name, id FROM cm_t WHERE id < 4", "SELECT id, name FROM cm_t", False),
+    ("SELECT name FROM cm_t", "SELECT id, name FROM cm_t", False),
+    ("SELECT name, qty FROM cm_t", "SELECT id, name FROM cm_t", False),
+    # 两列取值多重集相同（签名重复）：组内第一种配对错误，需尝试另一种
+    ("SELECT b, a FROM cm_pair", "SELECT a, b FROM cm_pair", True),
+    ("SELECT a, a FROM cm_pair", "SELECT a, b FROM cm_pair", False),
+]
+
+
+async def _create_tables(session) -> None:
+    await session.execute(text("CREATE TABLE cm_t (id INTEGER PRIMARY KEY, name TEXT, qty INT)"))
+    await session.execute(
+        text("INSERT INTO cm_t (id, name, qty) VALUES (:id, :name, :qty)"),
+        [{"id": i, "name": f"n{i % 4}", "qty": None if i % 5 == 0 else i % 3} for i in range(1, 41)],
+    )
+    await session.execute(text("CREATE TABLE cm_pair (a INT, b INT)"))
+    await session.execute(
+        text("INSERT INTO cm_pair (a, b) VALUES (:a, :b)"),
+        [{"a": 1, "b": 2}, {"a": 2, "b": 3}, {"a": 3, "b": 1}],
+    )
+
+
+def test_candidate_pairings_handles_duplicate_signatures():
+    correct = [("1", "x", "1"), ("2", "y", "2")]
+    student = [("x", "1", "1"), ("y", "2", "2")]
+    pairings = list(candidate_pairings(column_signatures(student), column_signatures(correct)))
+    assert len(pairings) == 2  # 第 0、2 列签名相同，组内两种配对
+    assert all(sorted(reorder_rows(student, p)) == sorted(correct) for p in pairings)
+    assert list(candidate_pairings(column_signatures(student), column_signatures([("1", "x", "z")]))) == []
+
+
+@pytest.mark.asyncio
+async def test_column_order_insensitive_verdicts(test_db_session):
+    await _create_tables(test_db_session)
+    strict = SQLJudgeService(test_db_session)
+    relaxed = SQLJudgeService(test_db_session, ignore_column_order=True)
+    for student_sql, correct_sql, expected in CASES:
+        result = await relaxed.judge_sql(student_sql, correct_sql)
+        assert result[0] is expected, (student_sql, correct_sql)
+        if not expected:
+            # 配对失败时回退到按列序对比，提示语与未开启时一致
+            assert result == await strict.judge_sql(student_sql, correct_sql)
+    assert (await strict.judge_sql("SELECT name, id FROM cm_t", "SELECT id, name FROM cm_t"))[0] is False
+
+
+@pytest.mark.asyncio
+async def test_alias_requirement_keeps_name_based_compare(test_db_session):
+    await _create_tables(test_db_session)
+    relaxed = SQLJudgeService(test_db_session, ignore_column_order=True)
+    ok, msg = await relaxed.judge_sql("SELECT name AS n, id AS i FROM cm_t", "SELECT id AS i, name AS nm FROM cm_t", "i,nm")
+    assert ok is False and "列结构不匹配" in msg
+
+
+@pytest.mark.asyncio
+async def test_spilled_column_matching_matches_in_memory(test_db_session, monkeypatch):
+    await _create_tables(test_db_session)
+    monkeypatch.setattr(sql_judge._settings, "JUDGE_SPILL_MEMORY_BYTES", 500)
+    monkeypatch.setattr(sql_judge._settings, "JUDGE_SPILL_BATCH_ROWS", 7)
+    in_memory = SQLJudgeService(test_db_session, ignore_column_order=True)
+    spilled = SQLJudgeService(test_db_session, ignore_column_order=True, spill_to_disk=True)
+    for student_sql, correct_sql, _ in CASES:
+        expected = await in_memory.judge_sql(student_sql, correct_sql)
+        assert await spilled.judge_sql(student_sql, correct_sql) == expected, (student_sql, correct_sql)
+
+
+def test_judge_task_carries_flag():
+    task = JudgeTask(question_id=1, student_sql="SELECT 1", correct_sql="SELECT 1", ignore_column_order=True)
+    assert JudgeTask.from_dict(task.to_dict()).ignore_column_order is True
@@ -0,0 +1,68 @@
+"""测试执行前代价检查。"""
+
+import json
+
+import pytest
+from sqlalchemy import text
+
+from core import metrics
+from core.cost_guard import check_query_cost, resolve_row_budget, schema_row_upper_bound
+from core.sql_judge import SQLCostExceededError, SQLJudgeService
+
+
+async def _create_cg_tables(session, rows: int) -> None:
+    for name in ("cg_a", "cg_b", "cg_c"):
+        await session.execute(text(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, a_id INT)"))
+        await session.execute(
+            text(f"INSERT INTO {name} (id, a_id) VALUES (:id, :id)"),
+            [{"id": i} for i in range(1, rows + 1)],
+        )
+
+
+def test_schema_row_upper_bound_and_skip_small():
+    """示例数据很小时跳过检查；引用外部数据集时行数未知，不跳过。"""
+    small = json.dumps({"tables": [{"name": "t", "columns": ["id"], "rows": [{"id": 1}]}]})
+    large = json.dumps({"tables": [{"name": "t", "columns": ["id"], "rows": [], "generate": {"rows": 200000}}]})
+    external = json.dumps({"tables": [{"name": "t", "columns": ["id"], "dataset": {"path": "t.csv"}}]})
+    assert schema_row_upper_bound(small) == 1
+    assert schema_row_upper_bound(external) is None
+    assert resolve_row_budget(None, small) is None
+    assert resolve_row_budget(None, large) is not None
+    assert resolve_row_budget(1000, external) == 1000
+    assert resolve_row_budget(0, large) is None
+
+
+@pytest.mark.asyncio
+async def test_cartesian_join_rejected_with_tables(test_db_session):
+    """漏写连接条件的三表笛卡尔积在执行前被拒绝，并指出涉及的表。"""
+    await _create_cg_tables(test_db_session, 50)
+    metrics.reset()
+    with pytest.raises(SQLCostExceededError) as exc:
+        await check_query_cost(test_db_session, "SELECT * FROM cg_a x, cg_b y, cg_c", row_budget=10_000)
+    assert exc.value.estimated_rows == 50 ** 3
+    assert exc.value.tables == ["cg_a", "cg_b", "cg_c"]
+    assert "cg_b" in str(exc.value)
+    snap = metrics.snapshot()
+    assert snap["timings"]["judge.cost_guard"]["count"] == 1
+    assert snap["counters"]["judge.cost_guard.rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_indexed_join_passes(test_db_session):
+    """带连接条件、走主键查找的连接只按驱动表计，不会被拒绝。"""
+    await _create_cg_tables(test_db_session, 50)
+    await check_query_cost(
+        test_db_session, "SELECT * FROM cg_a JOIN cg_b ON cg_b.id = cg_a.a_id", row_budget=10_000
+    )
+
+
+@pytest.mark.asyncio
+async def test_judge_sql_raises_before_execution(test_db_session):
+    """判题时学生 SQL 超预算直接抛出，标准答案不受影响；未设置预算时正常判题。"""
+    await _create_cg_tables(test_db_session, 30)
+    student_sql = "SELECT COUNT(*) FROM cg_a, cg_b, cg_c"
+    correct_sql = "SELECT COUNT(*) FROM cg_a"
+    with pytest.raises(SQLCostExceededError):
+        await SQLJudgeService(test_db_session, row_budget=1000).judge_sql(student_sql, correct_sql)
+    ok, _ = await SQLJudgeService(test_db_session).judge_sql(student_sql, correct_sql)
+    assert ok is False
@@ -0,0 +1,90 @@
+"""测试外部数据集批量导入与 schema_preview 示例行截断。"""
+
+import gzip
+import json
+
+import pytest
+from sqlalchemy import text
+
+from core.dataset_loader import (
+    DatasetError,
+    infer_dataset_format,
+    insert_rows_in_batches,
+    iter_dataset_rows,
+    resolve_dataset_path,
+    truncate_schema_preview_rows,
+)
+from core.judge_setup import generate_init_sql_from_schema_preview
+
+
+class TestDatasetFiles:
+    """测试数据集文件解析。"""
+
+    def test_infer_format(self):
+        assert infer_dataset_format("orders.csv") == "csv"
+        assert infer_dataset_format("orders.csv.gz") == "csv"
+        assert infer_dataset_format("orders.ndjson") == "jsonl"
+        assert infer_dataset_format("orders.bin", "parquet") == "parquet"
+        with pytest.raises(DatasetError):
+            infer_dataset_format("orders.xlsx")
+
+    def test_path_cannot_escape_dataset_dir(self, tmp_path):
+        """dataset.path 不允许通过 ../ 访问数据集目录之外的文件。"""
+        (tmp_path / "data").mkdir()
+        (tmp_path / "secret.csv").write_text("id\n1\n")
+        with pytest.raises(DatasetError):
+            resolve_dataset_path("../secret.csv", base_dir=str(tmp_path / "data"))
+
+    def test_csv_gzip_null_markers(self, tmp_path):
+        """gzip 压缩的 CSV 可流式读取，\\N 与空串视为 NULL。"""
+        path = tmp_path / "orders.csv.gz"
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write("id,status\n1,paid\n2,\\N\n3,\n")
+        rows = list(iter_dataset_rows(resolve_dataset_path("orders.csv.gz", str(tmp_path)), "csv"))
+        assert [r["status"] for r in rows] == ["paid", None, None]
+
+    def test_jsonl(self, tmp_path):
+        path = tmp_path / "users.jsonl"
+        path.write_text('{"id": 1, "name": "A"}\n\n{"id": 2, "name": "B"}\n', encoding="utf-8")
+        rows = list(iter_dataset_rows(path, "jsonl"))
+        assert rows == [{"id": 1, "name": "A"}, {"id": 2, "name": "B"}]
+
+
+@pytest.mark.asyncio
+async def test_insert_rows_in_batches(test_db_session):
+    """生成器输入按批次插入，总行数正确且缺失列写 NULL。"""
+    await test_db_session.execute(text("CREATE TABLE bulk_orders (id INT, amount INT, note TEXT)"))
+    rows = ({"id": i, "amount": i * 10} for i in range(2500))
+    count = await insert_rows_in_batches(
+        test_db_session, "bulk_orders", ["id", "amount", "note"], rows, batch_size=1000
+    )
+    assert count == 2500
+    total = await test_db_session.scalar(text("SELECT COUNT(*) FROM bulk_orders"))
+    nulls = await test_db_session.scalar(text("SELECT COUNT(*) FROM bulk_orders WHERE note IS NULL"))
+    assert total == 2500 and nulls == 2500
+
+
+def test_dataset_table_skips_preview_inserts():
+    """引用数据集的表只建表，不插入 rows 中的示例数据。"""
+    preview = json.dumps({"tables": [
+        {"name": "orders", "columns": ["id", "amount"], "rows": [{"id": 1, "amount": 9.5}],
+         "dataset": {"path": "orders.csv"}},
+        {"name": "users", "columns": ["id", "name"], "rows": [{"id": 1, "name": "A"}]},
+    ]})
+    init_sql = generate_init_sql_from_schema_preview(preview)
+    assert "CREATE TABLE `orders`" in init_sql
+    assert "INTO `orders`" not in init_sql
+    assert "INTO `users`" in init_sql
+
+
+def test_truncate_only_dataset_tables():
+    """只截断引用数据集的表的示例行，普通表保持完整。"""
+    rows = [{"id": i} for i in range(10)]
+    preview = json.dumps({"tables": [
+        {"name": "orders", "columns": ["id"], "rows": rows, "dataset": {"path": "orders.csv"}},
+        {"name": "users", "columns": ["id"], "rows": rows},
+    ]})
+    out = json.loads(truncate_schema_preview_rows(preview, max_rows=3))
+    assert len(out["tables"][0]["rows"]) == 3
+    assert len(out["tables"][1]["rows"]) == 10
+    assert truncate_schema_preview_rows("not json", max_rows=3) == "not json"
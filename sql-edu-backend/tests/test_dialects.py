@@ -0,0 +1,141 @@
+"""测试判题方言：建表语法、字面量转义、超时与结果值映射。"""
+
+import datetime as dt
+import json
+import re
+
+import pytest
+from sqlalchemy import text
+
+from core.dialects import get_dialect, is_supported_dialect
+from core.judge_setup import execute_setup_sql, generate_init_sql_from_schema_preview
+from core.multi_dataset_judge import judge_hidden_datasets, parse_hidden_datasets
+from core.sql_judge import SQLJudgeError, SQLJudgeService
+
+PREVIEW = json.dumps({"tables": [{
+    "name": "d_orders",
+    "columns": ["id", "user_id", "amount", "note", "paid", "created_at"],
+    "rows": [
+        {"id": 1, "user_id": 1, "amount": 9.9, "note": "it's \\ ok", "paid": True, "created_at": "2024-01-01 10:00:00"},
+        {"id": 2, "user_id": 2, "amount": 20, "note": None, "paid": False, "created_at": "2024-01-02 11:00:00"},
+    ],
+}]})
+
+
+def test_mysql_ddl_unchanged():
+    """默认方言仍为 MySQL：反引号、AUTO_INCREMENT、ON DUPLICATE KEY UPDATE、反斜杠转义。"""
+    init_sql = generate_init_sql_from_schema_preview(PREVIEW)
+    assert "`id` INT NOT NULL AUTO_INCREMENT PRIMARY KEY" in init_sql
+    assert "ENGINE=InnoDB" in init_sql and "ON DUPLICATE KEY UPDATE" in init_sql
+    assert "'it''s \\\\ ok'" in init_sql and ", 1, '2024-01-01" in init_sql
+
+
+def test_postgres_and_duckdb_ddl():
+    pg = generate_init_sql_from_schema_preview(PREVIEW, dialect="postgresql")
+    assert '"id" INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY' in pg
+    assert 'ON CONFLICT ("id") DO UPDATE SET "user_id" = EXCLUDED."user_id"' in pg
+    assert "'it''s \\ ok'" in pg and "TRUE" in pg and "`" not in pg and "ENGINE" not in pg
+
+    duck = generate_init_sql_from_schema_preview(PREVIEW, temporary=True, dialect="duckdb")
+    assert 'CREATE TEMP TABLE "d_orders"' in duck and '"note" VARCHAR' in duck
+
+
+def test_dialect_lookup():
+    assert get_dialect("postgres").name == "postgresql"
+    assert get_dialect(None).name == "mysql"
+    assert is_supported_dialect("DuckDB") and not is_supported_dialect("oracle")
+
+
+def test_result_value_mapping():
+    """不同驱动返回的布尔、TIME、时间戳统一后再比较。"""
+    d = get_dialect("postgresql")
+    assert d.map_result_value(True) == 1
+    assert d.map_result_value(dt.timedelta(hours=1, minutes=2, seconds=3)) == "01:02:03"
+    assert d.map_result_value(dt.datetime(2024, 1, 1, 10, 0)) == "2024-01-01 10:00:00"
+
+
+@pytest.mark.asyncio
+async def test_sqlite_setup_and_judge(test_db_session):
+    """SQLite 方言生成的建表语句可直接在 SQLite 沙箱执行并判题，且可重复执行。"""
+    init_sql = generate_init_sql_from_schema_preview(PREVIEW, dialect="sqlite")
+    await execute_setup_sql(test_db_session, init_sql)
+    await execute_setup_sql(test_db_session, init_sql)
+    rows = (await test_db_session.execute(text("SELECT id, note, paid FROM d_orders ORDER BY id"))).fetchall()
+    assert [tuple(r) for r in rows] == [(1, "it's \\ ok", 1), (2, None, 0)]
+
+    judge = SQLJudgeService(test_db_session)
+    ok, _ = await judge.judge_sql(
+        "SELECT user_id, SUM(amount) FROM d_orders GROUP BY user_id",
+        "SELECT user_id, SUM(amount) AS total FROM d_orders GROUP BY user_id",
+    )
+    assert ok is True
+
+
+@pytest.mark.asyncio
+async def test_sqlite_statement_timeout(test_db_session):
+    """SQLite 没有服务端超时，到时后中断查询并给出超时提示。"""
+    judge = SQLJudgeService(test_db_session, timeout_ms=100)
+    with pytest.raises(SQLJudgeError, match="超时"):
+        await judge.execute_sql_safely(
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+        )
+
+
+@pytest.mark.asyncio
+async def test_hidden_datasets_on_sqlite(test_db_session):
+    """隐藏测试数据在 SQLite 上用临时表遮蔽正式表，判题结束后临时表被清理。"""
+    await execute_setup_sql(test_db_session, generate_init_sql_from_schema_preview(PREVIEW, dialect="sqlite"))
+    await test_db_session.commit()
+    datasets = parse_hidden_datasets(json.dumps([
+        {"label": "empty", "tables": [{"name": "d_orders", "columns": ["id", "user_id", "amount"], "rows": []}]},
+    ]))
+    ok, _, label = await judge_hidden_datasets(
+        test_db_session.bind,
+        datasets,
+        "SELECT 2 AS cnt",  # 按示例数据硬编码
+        "SELECT COUNT(*) AS cnt FROM d_orders",
+    )
+    assert ok is False and label == "empty"
+    assert await test_db_session.scalar(text("SELECT COUNT(*) FROM d_orders")) == 2
+
+
+class _MySQLConnectionStub:
+    """模拟一条 MySQL 连接上的会话变量 max_execution_time（连接池中的同一条连接）。"""
+
+    def __init__(self, max_execution_time: int):
+        self.max_execution_time = max_execution_time
+        self.executed: list[str] = []
+
+    async def execute(self, statement):
+        sql = str(statement)
+        self.executed.append(sql)
+        match = re.fullmatch(r"SET SESSION MAX_EXECUTION_TIME = (\d+)", sql)
+        if match:
+            self.max_execution_time = int(match.group(1))
+        value = self.max_execution_time
+
+        class _Result:
+            def scalar(self):
+                return value
+
+        return _Result()
+
+
+@pytest.mark.asyncio
+async def test_mysql_statement_timeout_is_restored_on_exit():
+    """判题超时只在上下文内生效，退出后（含出错时）同一连接上的查询恢复原来的超时。"""
+    conn = _MySQLConnectionStub(max_execution_time=0)
+    dialect = get_dialect("mysql")
+    async with dialect.statement_timeout(conn, 1500):
+        assert (await conn.execute(text("SELECT @@SESSION.max_execution_time"))).scalar() == 1500
+    assert (await conn.execute(text("SELECT @@SESSION.max_execution_time"))).scalar() == 0
+
+    conn = _MySQLConnectionStub(max_execution_time=30000)
+    with pytest.raises(RuntimeError):
+        async with dialect.statement_timeout(conn, 1500):
+            raise RuntimeError("student query failed")
+    assert (await conn.execute(text("SELECT @@SESSION.max_execution_time"))).scalar() == 30000
+
+
+def test_postgresql_statement_timeout_is_transaction_scoped():
+    assert get_dialect("postgresql").statement_timeout_sql(1500) == "SET LOCAL statement_timeout = 1500"
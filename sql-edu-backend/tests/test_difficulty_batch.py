@@ -0,0 +1,69 @@
+"""测试展示难度批量计算：与逐题计算的结果完全相同；10k 道题的耗时对比按需运行（设置 DIFFICULTY_BENCHMARK=1）。"""
+
+import os
+import random
+import time
+
+import pytest
+
+import core.difficulty_service as difficulty_service
+from core.difficulty_service import (
+    compute_display_difficulties,
+    compute_display_difficulty,
+    suggested_time_seconds,
+    suggested_time_seconds_batch,
+)
+
+
+def _random_rows(rng: random.Random, count: int) -> list[tuple]:
+    rows = []
+    for _ in range(count):
+        total = rng.choice([0, 1, 4, 5, 14, 15, 39, 40, rng.randint(0, 5000)])
+        correct = rng.randint(0, total) if rng.random() < 0.8 else 0
+        feedback = rng.choice([0, 0, 1, rng.randint(0, 200)])
+        if feedback and rng.random() < 0.9:
+            rating = rng.randint(feedback, feedback * 10) / feedback  # 评分总和 / 条数
+        else:
+            rating = rng.choice([None, rng.uniform(-5, 15)])
+        rows.append((rng.randint(-2, 12), total, correct, rng.randint(0, 20000), feedback, rating))
+    return rows
+
+
+def _columns(rows):
+    return [list(col) for col in zip(*rows)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_scalar(seed):
+    rows = _random_rows(random.Random(seed), 4000)
+    # 舍入边界：combined 恰为 x.x5 附近的值
+    rows += [(t, 0, 0, 0, 1, r) for t in range(1, 11) for r in (1.05, 2.25, 4.35, 6.65, 8.95)]
+    expected = [compute_display_difficulty(*row) for row in rows]
+    assert compute_display_difficulties(*_columns(rows)) == expected
+    assert suggested_time_seconds_batch(expected) == [suggested_time_seconds(d) for d in expected]
+
+
+def test_batch_without_numpy_falls_back(monkeypatch):
+    rows = _random_rows(random.Random(42), 200)
+    monkeypatch.setattr(difficulty_service, "np", None)
+    assert compute_display_difficulties(*_columns(rows)) == [compute_display_difficulty(*row) for row in rows]
+    assert compute_display_difficulties([], [], [], [], [], []) == []
+
+
+@pytest.mark.skipif(difficulty_service.np is None, reason="需要 numpy")
+@pytest.mark.skipif(not os.getenv("DIFFICULTY_BENCHMARK"), reason="耗时对比受机器负载影响，设置 DIFFICULTY_BENCHMARK=1 运行")
+def test_benchmark_10k_questions():
+    rows = _random_rows(random.Random(7), 10_000)
+    columns = _columns(rows)
+
+    def best_of(fn, repeat=5):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    scalar = best_of(lambda: [suggested_time_seconds(compute_display_difficulty(*row)) for row in rows])
+    batch = best_of(lambda: suggested_time_seconds_batch(compute_display_difficulties(*columns)))
+    assert batch < scalar
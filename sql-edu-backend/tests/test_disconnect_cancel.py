@@ -0,0 +1,88 @@
+"""测试客户端断开时取消请求：中断沙箱中的查询、取消 AI 调用，未提交的消息不保存。"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+import routers.ai as ai_router
+from core import metrics
+from core.disconnect import ClientDisconnectedError, run_until_disconnect
+from core.sql_judge import SQLJudgeService
+from models.chat import ChatMessage
+from models.question import Question
+from schemas.chat import ChatSendIn
+
+# 计数到 2 亿的递归 CTE，SQLite 上需要数十秒，只能靠中断提前结束
+SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 200000000) "
+    "SELECT COUNT(*) FROM c"
+)
+
+
+class FakeRequest:
+    """is_disconnected() 在 after 秒后返回 True。"""
+
+    def __init__(self, after: float):
+        self.deadline = time.perf_counter() + after
+
+    async def is_disconnected(self) -> bool:
+        return time.perf_counter() >= self.deadline
+
+
+@pytest.mark.asyncio
+async def test_disconnect_interrupts_sandbox_query(test_db_session):
+    judge = SQLJudgeService(test_db_session, timeout_ms=0)
+    metrics.reset()
+    start = time.perf_counter()
+    with pytest.raises(ClientDisconnectedError):
+        await run_until_disconnect(FakeRequest(0.2), "judge", judge.judge_sql(SLOW_SQL, "SELECT 1"), 0.05)
+    assert time.perf_counter() - start < 5
+    snap = metrics.snapshot()
+    assert snap["counters"]["request.judge.cancelled"] == 1
+    assert snap["timings"]["request.judge.reclaimed"]["count"] == 1
+    # 被中断的查询不影响同一会话上的后续判题
+    await test_db_session.rollback()
+    assert await judge.judge_sql("SELECT 1", "SELECT 1") == (True, "结果匹配。")
+
+
+@pytest.mark.asyncio
+async def test_completed_work_is_returned_and_timed():
+    metrics.reset()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    assert await run_until_disconnect(FakeRequest(60), "quick", work(), 0.05) == "ok"
+    assert metrics.snapshot()["timings"]["request.quick"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_disconnect_cancels_ai_call_and_discards_message(test_db_session, test_user, monkeypatch):
+    question = Question(title="断开", content="c", difficulty=1, correct_sql="SELECT 1")
+    test_db_session.add(question)
+    await test_db_session.commit()
+    question_id, user_id = question.id, test_user.id
+    cancelled = asyncio.Event()
+
+    async def slow_chat(**kwargs):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    monkeypatch.setattr(ai_router, "chat_with_teacher", slow_chat)
+    payload = ChatSendIn(question_id=question_id, message="为什么不对？")
+    with pytest.raises(HTTPException) as exc_info:
+        await ai_router._cancel_on_disconnect(
+            FakeRequest(0.1), "chat", ai_router._chat(payload, user_id, test_db_session)
+        )
+    assert exc_info.value.status_code == 499 and cancelled.is_set()
+    # 会话关闭时回滚，本轮用户消息未保存
+    await test_db_session.rollback()
+    count = await test_db_session.scalar(select(func.count(ChatMessage.id)).where(ChatMessage.question_id == question_id))
+    assert count == 0
@@ -0,0 +1,142 @@
+"""测试查询效率评估：执行计划解析、相对评分与后台写回，沙箱表已被重建或执行超时时跳过。"""
+
+import json
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from core import metrics
+from core.efficiency_service import (
+    compute_efficiency_score,
+    grade_submission_efficiency,
+    parse_mysql_explain_json,
+    parse_sqlite_query_plan,
+    time_query,
+)
+from core.judge_pipeline import prepare_sandbox
+from models.submission import Submission
+
+
+def test_parse_mysql_explain_json_nested_loop():
+    """嵌套循环中被驱动表的扫描行数按驱动行数放大，access_type=ALL 计为全表扫描。"""
+    plan = {
+        "query_block": {
+            "select_id": 1,
+            "cost_info": {"query_cost": "25.40"},
+            "nested_loop": [
+                {"table": {"table_name": "u", "access_type": "ALL",
+                           "rows_examined_per_scan": 100, "rows_produced_per_join": 10}},
+                {"table": {"table_name": "o", "access_type": "ref",
+                           "rows_examined_per_scan": 3, "rows_produced_per_join": 30}},
+            ],
+        }
+    }
+    result = parse_mysql_explain_json(plan)
+    assert (result["rows_examined"], result["full_scans"], result["query_cost"]) == (130, 1, 25.4)
+    assert [(t["name"], t["access_type"], t["rows"]) for t in result["tables"]] == [("u", "ALL", 100), ("o", "ref", 3)]
+
+
+def test_parse_mysql_explain_json_subquery():
+    """子查询（物化/附加子查询）中的表同样计入。"""
+    plan = {
+        "query_block": {
+            "ordering_operation": {
+                "table": {
+                    "table_name": "t", "access_type": "ALL", "rows_examined_per_scan": 5,
+                    "materialized_from_subquery": {
+                        "query_block": {"table": {"table_name": "orders", "access_type": "ALL",
+                                                  "rows_examined_per_scan": 1000}}
+                    },
+                }
+            }
+        }
+    }
+    result = parse_mysql_explain_json(plan)
+    assert result["rows_examined"] == 1005 and result["full_scans"] == 2
+    assert result["query_cost"] is None
+
+
+def test_parse_sqlite_query_plan():
+    rows = [(2, 0, 0, "SCAN orders"), (5, 0, 0, "SEARCH users USING INTEGER PRIMARY KEY (rowid=?)")]
+    result = parse_sqlite_query_plan(rows)
+    assert result["rows_examined"] is None and result["full_scans"] == 1
+    assert [(t["name"], t["access_type"]) for t in result["tables"]] == [("orders", "SCAN"), ("users", "SEARCH")]
+
+
+def test_compute_efficiency_score():
+    """不劣于标准答案为 100；扫描行数缺失时回退到耗时。"""
+    assert compute_efficiency_score({"rows_examined": 10}, {"rows_examined": 100}) == 100.0
+    assert compute_efficiency_score({"rows_examined": 199}, {"rows_examined": 99}) == 50.0
+    assert compute_efficiency_score(
+        {"rows_examined": None, "exec_time_ms": 9.0}, {"rows_examined": None, "exec_time_ms": 4.0}
+    ) == 50.0
+    assert compute_efficiency_score({}, {}) is None
+
+
+@pytest.mark.asyncio
+async def test_grade_submission_efficiency_writes_back(test_db_session, test_submission):
+    """后台评估沿用已建好的表，结果写回提交记录。"""
+    await test_db_session.execute(text("CREATE TABLE eff_orders (id INTEGER PRIMARY KEY, amount INT)"))
+    await test_db_session.execute(text("INSERT INTO eff_orders (id, amount) VALUES (1, 10), (2, 20)"))
+    await test_db_session.commit()
+    factory = async_sessionmaker(test_db_session.bind, class_=AsyncSession, expire_on_commit=False)
+
+    values = await grade_submission_efficiency(
+        test_submission.id,
+        "SELECT amount FROM eff_orders WHERE amount > 5",
+        "SELECT amount FROM eff_orders WHERE id IN (1, 2)",
+        session_factory=factory,
+        sandbox_session_factory=factory,
+    )
+    assert values["full_scans"] == 1 and values["rows_examined"] is None
+    assert 0 < values["efficiency_score"] <= 100
+
+    async with factory() as session:
+        row = await session.scalar(select(Submission).where(Submission.id == test_submission.id))
+        assert row.full_scans == 1 and row.exec_time_ms is not None
+        assert row.efficiency_score == values["efficiency_score"]
+
+
+@pytest.mark.asyncio
+async def test_grade_submission_efficiency_swallows_errors(test_db_session, test_submission):
+    """评估失败只记录日志，不抛出。"""
+    factory = async_sessionmaker(test_db_session.bind, class_=AsyncSession, expire_on_commit=False)
+    assert await grade_submission_efficiency(
+        test_submission.id, "SELECT * FROM missing_table", "SELECT 1",
+        session_factory=factory, sandbox_session_factory=factory,
+    ) is None
+
+
+def _schema(amounts: list[int]) -> str:
+    return json.dumps({"tables": [{
+        "name": "eff_t", "columns": ["id", "amount"],
+        "rows": [{"id": i, "amount": a} for i, a in enumerate(amounts, 1)],
+    }]})
+
+
+@pytest.mark.asyncio
+async def test_grade_skips_when_tables_rebuilt_for_other_schema(test_db_session, test_submission):
+    """同名表已被另一道题的 schema 重建时不计时，避免在别的数据上评估。"""
+    factory = async_sessionmaker(test_db_session.bind, class_=AsyncSession, expire_on_commit=False)
+    mine, other = _schema([10, 20]), _schema([1])
+    await prepare_sandbox(mine, test_db_session)
+    kwargs = dict(session_factory=factory, sandbox_session_factory=factory)
+    sql = "SELECT amount FROM eff_t"
+    assert await grade_submission_efficiency(test_submission.id, sql, sql, schema_preview=mine, **kwargs)
+
+    await prepare_sandbox(other, test_db_session)
+    metrics.reset()
+    assert await grade_submission_efficiency(test_submission.id, sql, sql, schema_preview=mine, **kwargs) is None
+    assert metrics.snapshot()["counters"]["efficiency.skipped_stale_tables"] == 1
+
+
+@pytest.mark.asyncio
+async def test_time_query_applies_statement_timeout(test_db_session):
+    with pytest.raises(Exception, match="interrupted"):
+        await time_query(
+            test_db_session,
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c",
+            runs=1,
+            timeout_ms=100,
+        )
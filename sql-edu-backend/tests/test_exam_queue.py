@@ -0,0 +1,187 @@
+"""测试考试模式准入队列：每人同时最多一个判题、同一题排队中的提交合并为最新一次、首次提交优先。"""
+
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import routers.ai as ai_router
+from core import metrics
+from core.exam_queue import DONE, FAILED, QUEUED, ExamAdmissionQueue, ExamQueueFullError
+from dependencies import get_session
+from main import app
+from models.question import Question
+from schemas.agent import SQLCheckResultSchema
+
+
+class GatedJudge:
+    """判题函数替身：记录判题顺序，每次判题等待放行。"""
+
+    def __init__(self):
+        self.started: list[tuple[int, str]] = []
+        self.gate = asyncio.Semaphore(0)
+
+    async def __call__(self, ticket):
+        self.started.append((ticket.user_id, ticket.sql))
+        await self.gate.acquire()
+        if ticket.sql == "boom":
+            raise RuntimeError("判题失败")
+        return {"sql": ticket.sql}
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_per_user_limit_coalescing_and_priority():
+    judge = GatedJudge()
+    queue = ExamAdmissionQueue(judge, maxsize=10, ticket_ttl=60)
+    runner = asyncio.create_task(queue.run(concurrency=2))
+    try:
+        a1 = await queue.submit(1, 10, "a1", first_attempt=True)
+        await _settle()
+        assert judge.started == [(1, "a1")]  # 用户 1 的第一次提交开始判题
+
+        # 用户 1 判题期间的新提交排队；再次提交合并为最新一次，票据不变
+        a2 = await queue.submit(1, 10, "a2", first_attempt=False)
+        a3 = await queue.submit(1, 10, "a3", first_attempt=False)
+        assert a3 is a2 and a2.sql == "a3" and a2.coalesced == 1
+        # 另一个学生的重试提交先到，首次提交后到但排在前面
+        b = await queue.submit(2, 10, "b", first_attempt=False)
+        c = await queue.submit(3, 10, "c", first_attempt=True)
+        assert [queue.position(t) for t in (c, a2, b)] == [0, 1, 2]
+        await _settle()
+        # 第二个并发位给了 c；a2 因用户 1 仍在判题而被跳过
+        assert judge.started[1] == (3, "c") and queue.position(a2) == 0 and a2.status == QUEUED
+
+        judge.gate.release()  # a1 完成
+        await queue.wait(a1, 1)
+        await _settle()
+        assert a1.status == DONE and a1.result == {"sql": "a1"}
+        assert judge.started[2] == (1, "a3")  # 只判最新一次
+
+        for _ in range(3):
+            judge.gate.release()
+        await asyncio.wait_for(asyncio.gather(*(t.done.wait() for t in (a2, b, c))), 1)
+        assert [s for _, s in judge.started] == ["a1", "c", "a3", "b"]
+        assert queue.get(a2.ticket_id) is a2 and len(queue) == 0
+    finally:
+        runner.cancel()
+
+
+@pytest.mark.asyncio
+async def test_submissions_for_other_questions_are_not_coalesced():
+    judge = GatedJudge()
+    queue = ExamAdmissionQueue(judge, maxsize=10, ticket_ttl=60)
+    runner = asyncio.create_task(queue.run(concurrency=2))
+    try:
+        running = await queue.submit(1, 10, "q10", first_attempt=True)
+        await _settle()
+        # 判题期间对另外两道题的提交各自排队，不互相覆盖
+        q11 = await queue.submit(1, 11, "q11", first_attempt=True)
+        q12 = await queue.submit(1, 12, "q12", first_attempt=True)
+        assert q11 is not q12 and (q11.question_id, q11.sql, q11.coalesced) == (11, "q11", 0)
+        assert await queue.submit(1, 12, "q12-b", first_attempt=True) is q12 and q12.sql == "q12-b"
+        await _settle()
+        assert judge.started == [(1, "q10")]  # 仍然每人同时只判一个
+
+        for _ in range(3):
+            judge.gate.release()
+        await asyncio.wait_for(asyncio.gather(*(t.done.wait() for t in (running, q11, q12))), 1)
+        assert [t.result for t in (running, q11, q12)] == [{"sql": "q10"}, {"sql": "q11"}, {"sql": "q12-b"}]
+    finally:
+        runner.cancel()
+
+
+@pytest.mark.asyncio
+async def test_queue_full_and_judge_failure():
+    judge = GatedJudge()
+    queue = ExamAdmissionQueue(judge, maxsize=1, ticket_ttl=60)
+    metrics.reset()
+    ticket = await queue.submit(1, 10, "boom", first_attempt=True)
+    with pytest.raises(ExamQueueFullError):
+        await queue.submit(2, 10, "x", first_attempt=True)
+    assert metrics.snapshot()["counters"]["exam.queue.rejected"] == 1
+
+    runner = asyncio.create_task(queue.run())
+    try:
+        judge.gate.release()
+        await queue.wait(ticket, 1)
+        assert ticket.status == FAILED and ticket.error == "判题失败"
+        # 失败不影响后续提交
+        ok = await queue.submit(1, 10, "fine", first_attempt=False)
+        judge.gate.release()
+        assert (await queue.wait(ok, 1)).status == DONE
+    finally:
+        runner.cancel()
+
+
+@pytest.mark.asyncio
+async def test_exam_endpoints_defer_ai_hint(test_db_session, test_user, monkeypatch):
+    schema = json.dumps({"tables": [{"name": "ex_t", "columns": ["id"], "rows": [{"id": 1}, {"id": 2}]}]})
+    question = Question(title="考试", content="查询 ex_t", difficulty=1, correct_sql="SELECT id FROM ex_t",
+                        schema_preview=schema)
+    test_db_session.add(question)
+    await test_db_session.commit()
+    factory = async_sessionmaker(test_db_session.bind, expire_on_commit=False)
+
+    async def sandbox_factory_for(dialect, question_id=None):
+        return factory
+
+    hint_calls = []
+
+    async def fake_hint(**kwargs):
+        hint_calls.append(kwargs)
+        return SQLCheckResultSchema(diagnoses=[], overall_comment="做得好")
+
+    async def override_session():
+        yield test_db_session
+
+    monkeypatch.setattr(ai_router._settings, "EXAM_MODE_ENABLED", True)
+    monkeypatch.setattr(ai_router, "AsyncSessionFactory", factory)
+    monkeypatch.setattr(ai_router, "sandbox_session_factory_for", sandbox_factory_for)
+    monkeypatch.setattr(ai_router, "get_sql_hint", fake_hint)
+    queue = ExamAdmissionQueue(ai_router._judge_exam_ticket, maxsize=10, ticket_ttl=60)
+    monkeypatch.setattr(ai_router, "exam_queue", queue)
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: test_user.id
+    runner = asyncio.create_task(queue.run())
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            resp = await client.post(
+                "/ai/exam/submit", json={"question_id": question.id, "student_sql": "SELECT id FROM ex_t"}
+            )
+            assert resp.status_code == 202
+            ticket_id = resp.json()["ticket_id"]
+
+            resp = await client.get(f"/ai/exam/tickets/{ticket_id}", params={"wait": 5})
+            body = resp.json()
+            assert body["status"] == "done", body
+            result = body["result"]
+            assert result["is_correct"] is True and result["hint_deferred"] is True
+
+            resp = await client.post(f"/ai/exam/submissions/{result['submission_id']}/hint")
+            assert resp.json()["overall_comment"] == "做得好"
+
+            # 执行出错的提交：延后生成提示时带上判题时保存的错误信息
+            resp = await client.post(
+                "/ai/exam/submit", json={"question_id": question.id, "student_sql": "SELECT nope FROM ex_t"}
+            )
+            body = (await client.get(f"/ai/exam/tickets/{resp.json()['ticket_id']}", params={"wait": 5})).json()
+            failed = body["result"]
+            assert failed["is_correct"] is False and failed["error_message"]
+            await client.post(f"/ai/exam/submissions/{failed['submission_id']}/hint")
+            assert hint_calls[-1]["error_message"] == failed["error_message"]
+            assert hint_calls[-1]["failure_count"] == 0 and hint_calls[-1]["is_safety_blocked"] is False
+
+        app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: test_user.id + 1
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            resp = await client.get(f"/ai/exam/tickets/{ticket_id}")
+            assert resp.status_code == 404  # 只能查看自己的票据
+    finally:
+        runner.cancel()
+        app.dependency_overrides.clear()
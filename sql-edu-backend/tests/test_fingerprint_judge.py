@@ -0,0 +1,98 @@
+"""测试数据库内指纹对比：指纹相同直接判对，不同或出错时回退逐行对比，结论与内存对比一致。"""
+
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import text
+
+from core import metrics
+from core.dialects import get_dialect
+from core.sql_judge import SQLJudgeService
+
+CASES = [
+    # (学生 SQL, 标准答案 SQL, 别名要求)
+    ("SELECT UPPER(name), qty FROM fp_t", "SELECT name, qty FROM fp_t ", None),  # 大小写/空白不敏感
+    ("SELECT name FROM fp_t WHERE id IN (1, 1, 2, 3)", "SELECT name FROM fp_t WHERE id <= 3;", None),
+    ("SELECT name FROM fp_t WHERE id IN (1, 2, 3)", "SELECT name FROM fp_t WHERE id IN (1, 3, 4)", None),
+    ("SELECT qty FROM fp_t", "SELECT qty * 1.0 FROM fp_t", None),  # 数值表示不同：回退后判对
+    ("SELECT qty AS q, name AS n FROM fp_t", "SELECT name AS n, qty AS q FROM fp_t", "n,q"),
+    ("SELECT qty AS q FROM fp_t", "SELECT qty AS quantity FROM fp_t", "quantity"),
+    ("SELECT name, name FROM fp_t", "SELECT name FROM fp_t", None),
+    ("SELECT nope FROM fp_t", "SELECT name FROM fp_t", None),
+    ("SELECT id, name FROM fp_t ORDER BY id DESC", "SELECT id, name FROM fp_t ORDER BY id", None),
+]
+
+
+async def _create_table(session) -> None:
+    await session.execute(text("CREATE TABLE fp_t (id INTEGER PRIMARY KEY, name TEXT, qty INT)"))
+    await session.execute(
+        text("INSERT INTO fp_t (id, name, qty) VALUES (:id, :name, :qty)"),
+        [{"id": 1, "name": "Apple", "qty": 3}, {"id": 2, "name": " pear", "qty": None},
+         {"id": 3, "name": "apple", "qty": 3}, {"id": 4, "name": "fig", "qty": 0}],
+    )
+
+
+def test_mysql_fingerprint_sql():
+    sql = get_dialect("mysql").fingerprint_sql("SELECT a, b FROM t;", ["a", "b"])
+    assert sql.startswith("SELECT COUNT(*), SUM(CRC32(judge_r.judge_row)), SUM(CONV(LEFT(MD5(")
+    assert "CHAR_LENGTH(LOWER(TRIM(CAST(judge_q.`a` AS CHAR))))" in sql
+    assert "FROM (SELECT a, b FROM t) AS judge_q" in sql
+    assert get_dialect("postgresql").fingerprint_sql("SELECT 1 AS x", ["x"]) is not None
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_verdicts_match_in_memory(test_db_session):
+    await _create_table(test_db_session)
+    in_memory = SQLJudgeService(test_db_session)
+    pushed_down = SQLJudgeService(test_db_session, fingerprint_compare=True)
+    for student_sql, correct_sql, required in CASES:
+        expected = await in_memory.judge_sql(student_sql, correct_sql, required_output_columns=required)
+        actual = await pushed_down.judge_sql(student_sql, correct_sql, required_output_columns=required)
+        assert actual == expected, (student_sql, correct_sql, required)
+
+
+@pytest.mark.asyncio
+async def test_matching_fingerprint_skips_row_fetch(test_db_session):
+    """指纹相同直接判对；重复行不同（[a,a,b] 与 [a,b,b]）指纹不同，回退后判错。"""
+    await _create_table(test_db_session)
+    judge = SQLJudgeService(test_db_session, fingerprint_compare=True)
+    metrics.reset()
+    assert await judge.judge_sql("SELECT UPPER(name) FROM fp_t", "SELECT name FROM fp_t") == (True, "结果匹配。")
+    assert metrics.snapshot()["counters"]["judge.fingerprint.match"] == 1
+
+    ok, _ = await judge.judge_sql(
+        "SELECT LOWER(name) FROM fp_t WHERE id IN (1, 3, 4)",
+        "SELECT name FROM fp_t WHERE id IN (1, 4) UNION ALL SELECT 'fig'",
+    )
+    assert ok is False
+    assert metrics.snapshot()["counters"]["judge.fingerprint.fallback"] == 1
+
+
+@pytest.mark.asyncio
+async def test_column_probe_runs_under_statement_guard(test_db_session, monkeypatch):
+    """列名探测（LIMIT 0）与指纹查询一样在语句超时保护内执行。"""
+    await _create_table(test_db_session)
+    judge = SQLJudgeService(test_db_session, fingerprint_compare=True)
+    guarded, unguarded = [], []
+    depth = 0
+    original_guard, original_execute = judge._statement_guard, test_db_session.execute
+
+    @asynccontextmanager
+    async def guard(session):
+        nonlocal depth
+        depth += 1
+        try:
+            async with original_guard(session):
+                yield
+        finally:
+            depth -= 1
+
+    async def execute(statement, *args, **kwargs):
+        (guarded if depth else unguarded).append(str(statement))
+        return await original_execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(judge, "_statement_guard", guard)
+    monkeypatch.setattr(test_db_session, "execute", execute)
+    assert (await judge.judge_sql("SELECT UPPER(name) FROM fp_t", "SELECT name FROM fp_t"))[0] is True
+    assert sum("LIMIT 0" in s for s in guarded) == 2
+    assert not [s for s in unguarded if "fp_t" in s]
@@ -0,0 +1,84 @@
+"""测试题目与知识点接口的条件请求：强 ETag、If-None-Match 返回 304、gzip / br 协商与压缩结果缓存。"""
+
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from core import metrics
+from core.http_cache import choose_encoding, etag_matches
+from dependencies import get_session, require_teacher
+from main import app
+from repository import SubmissionRepository
+from schemas.submission import SubmissionCreate
+
+# 足够大的表预览，保证响应体超过压缩阈值
+_PREVIEW = json.dumps([{"table": "users", "columns": ["id", "name"], "rows": [[i, f"用户{i}"] for i in range(200)]}])
+
+
+def test_choose_encoding():
+    assert choose_encoding(None) is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("br;q=0, gzip;q=0.5") == "gzip"
+    assert choose_encoding("*") == "gzip"
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"c"')
+    assert not etag_matches('"a"', '"a-gzip"')
+    assert not etag_matches(None, '"a"')
+
+
+@pytest.mark.asyncio
+async def test_question_endpoints_conditional_and_compressed(test_db_session, test_user, test_question):
+    test_question.schema_preview = _PREVIEW
+    await test_db_session.commit()
+    question_id, user_id = test_question.id, test_user.id
+    metrics.reset()
+
+    async def override_session():
+        yield test_db_session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[require_teacher] = lambda: 1
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            for path in ("/questions/", f"/questions/{question_id}", "/questions/knowledge-points"):
+                plain = await client.get(path, headers={"Accept-Encoding": "identity"})
+                first = await client.get(path, headers={"Accept-Encoding": "gzip"})
+                assert first.headers["content-encoding"] == "gzip"
+                assert "Accept-Encoding" in first.headers["vary"]
+                assert first.json() == plain.json()
+                assert first.headers["etag"] != plain.headers["etag"]
+
+                again = await client.get(path, headers={"Accept-Encoding": "gzip"})
+                assert again.content == first.content
+
+                cached = await client.get(
+                    path, headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]}
+                )
+                assert cached.status_code == 304 and cached.content == b""
+                assert cached.headers["etag"] == first.headers["etag"]
+
+            detail = await client.get(f"/questions/{question_id}", headers={"Accept-Encoding": "gzip"})
+            etag = detail.headers["etag"]
+            # 新提交改变展示难度后 ETag 随之变化
+            submission_repo = SubmissionRepository(test_db_session)
+            for _ in range(10):
+                await submission_repo.create(
+                    SubmissionCreate(user_id=user_id, question_id=question_id, student_sql="SELECT 1", is_correct=False)
+                )
+            await test_db_session.commit()
+            changed = await client.get(
+                f"/questions/{question_id}", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+            )
+    finally:
+        app.dependency_overrides.clear()
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert changed.json()["display_difficulty"] != detail.json()["display_difficulty"]
+    counters = metrics.snapshot()["counters"]
+    assert counters["http_cache.not_modified"] == 3
+    assert counters["http_cache.compressed_hit"] >= 3
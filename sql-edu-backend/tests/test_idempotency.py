@@ -0,0 +1,103 @@
+"""测试 check-sql 幂等键：重试返回已保存的响应，并发的重复请求只计算一次。"""
+
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+import routers.ai as ai_router
+from core.idempotency import IdempotencyKeyReusedError, IdempotencyStore
+from dependencies import get_sandbox_session, get_session
+from main import app
+from models.question import Question
+from models.submission import Submission
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_computation():
+    store = IdempotencyStore(maxsize=10, ttl=60)
+    calls = []
+    release = asyncio.Event()
+
+    async def compute():
+        calls.append(1)
+        await release.wait()
+        return {"n": len(calls)}
+
+    first = asyncio.create_task(store.run("k", "fp", compute))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(store.run("k", "fp", compute))
+    await asyncio.sleep(0)
+    release.set()
+    assert await first == ({"n": 1}, False)
+    assert await second == ({"n": 1}, True)
+    assert await store.run("k", "fp", compute) == ({"n": 1}, True)
+    assert len(calls) == 1
+    with pytest.raises(IdempotencyKeyReusedError):
+        await store.run("k", "other", compute)
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_stored_and_cancelled_owner_is_taken_over():
+    store = IdempotencyStore(maxsize=10, ttl=60)
+
+    async def fail():
+        raise ValueError("AI 不可用")
+
+    with pytest.raises(ValueError):
+        await store.run("k", "fp", fail)
+
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "ok"
+
+    owner = asyncio.create_task(store.run("k", "fp", slow))
+    await started.wait()
+    joiner = asyncio.create_task(store.run("k", "fp", fast))
+    await asyncio.sleep(0)
+    owner.cancel()  # 首个请求的客户端断开
+    assert await joiner == ("ok", False)
+
+
+@pytest.mark.asyncio
+async def test_check_sql_retry_returns_stored_response(test_db_session, test_user):
+    schema = json.dumps({"tables": [{"name": "idem_t", "columns": ["id"]}]})
+    question = Question(title="幂等", content="c", difficulty=1, correct_sql="SELECT id FROM idem_t",
+                        schema_preview=schema)
+    test_db_session.add(question)
+    await test_db_session.commit()
+
+    async def override_session():
+        yield test_db_session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_sandbox_session] = override_session
+    app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: test_user.id
+    # 预检查失败的提交不进入沙箱与 AI，便于只验证幂等逻辑
+    body = {"question_id": question.id, "student_sql": "SELECT id FROM idem_t WHERE (id > 1"}
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            headers = {"Idempotency-Key": "retry-1"}
+            first = await client.post("/ai/check-sql", json=body, headers=headers)
+            retry = await client.post("/ai/check-sql", json=body, headers=headers)
+            assert first.status_code == retry.status_code == 200
+            assert retry.json() == first.json() and retry.headers["Idempotent-Replayed"] == "true"
+            assert "Idempotent-Replayed" not in first.headers
+
+            reused = await client.post(
+                "/ai/check-sql", json={**body, "student_sql": "SELECT id, FROM idem_t"}, headers=headers
+            )
+            assert reused.status_code == 422
+            # 不带幂等键时每次都是新的提交
+            await client.post("/ai/check-sql", json=body)
+    finally:
+        app.dependency_overrides.clear()
+    count = await test_db_session.scalar(select(func.count(Submission.id)).where(Submission.question_id == question.id))
+    assert count == 2
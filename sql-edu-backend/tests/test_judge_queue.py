@@ -0,0 +1,142 @@
+"""测试判题任务队列：入队、领取、租约过期重试、判题期间续租、清理已结束任务与 worker 端到端判题。"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import core.judge_worker as judge_worker
+from core import metrics
+from core.judge_pipeline import JudgeOutcome, JudgeTask
+from core.judge_queue import (
+    JudgeJobFailedError,
+    JudgeQueueTimeoutError,
+    claim_judge_job,
+    complete_judge_job,
+    enqueue_judge_job,
+    fail_judge_job,
+    purge_finished_judge_jobs,
+    wait_for_judge_result,
+)
+from core.judge_worker import process_one
+from models.judge_job import JudgeJob
+
+PREVIEW = json.dumps({"tables": [{
+    "name": "jq_orders",
+    "columns": ["id", "amount"],
+    "rows": [{"id": 1, "amount": 10}, {"id": 2, "amount": 20}],
+}]})
+
+
+def _task(student_sql: str = "SELECT 1") -> JudgeTask:
+    return JudgeTask(question_id=1, student_sql=student_sql, correct_sql="SELECT 1")
+
+
+@pytest.fixture
+def factory(test_db_session):
+    return async_sessionmaker(test_db_session.bind, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_claim_complete(test_db_session, factory):
+    job_id = await enqueue_judge_job(_task(), factory)
+    claimed = await claim_judge_job(test_db_session, "w1", visibility_timeout=60, max_attempts=3)
+    assert claimed is not None and claimed[0] == job_id and claimed[1].student_sql == "SELECT 1"
+    # 已被领取且租约未过期，其他 worker 领不到
+    assert await claim_judge_job(test_db_session, "w2", visibility_timeout=60, max_attempts=3) is None
+
+    assert await complete_judge_job(test_db_session, job_id, "w1", JudgeOutcome(is_correct=True))
+    outcome = await wait_for_judge_result(job_id, timeout=1, session_factory=factory)
+    assert outcome.is_correct is True and outcome.error_message is None
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_retried_then_failed(test_db_session, factory):
+    """worker 崩溃（未回写）后租约过期，任务被重新领取；超过重试上限后标记失败。"""
+    job_id = await enqueue_judge_job(_task(), factory)
+    now = datetime.utcnow()
+    assert (await claim_judge_job(test_db_session, "w1", 30, max_attempts=2, now=now))[0] == job_id
+    later = now + timedelta(seconds=31)
+    assert (await claim_judge_job(test_db_session, "w2", 30, max_attempts=2, now=later))[0] == job_id
+    # 崩溃的 w1 晚到的结果不会覆盖 w2 的租约
+    assert not await complete_judge_job(test_db_session, job_id, "w1", JudgeOutcome(is_correct=True))
+
+    assert await claim_judge_job(test_db_session, "w3", 30, max_attempts=2, now=later + timedelta(seconds=31)) is None
+    job = await test_db_session.get(JudgeJob, job_id)
+    assert job.status == "failed" and job.attempts == 2
+    with pytest.raises(JudgeJobFailedError):
+        await wait_for_judge_result(job_id, timeout=1, session_factory=factory)
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out(factory):
+    job_id = await enqueue_judge_job(_task(), factory)
+    with pytest.raises(JudgeQueueTimeoutError):
+        await wait_for_judge_result(job_id, timeout=0.05, poll_interval=0.01, session_factory=factory)
+
+
+@pytest.mark.asyncio
+async def test_worker_judges_job(factory):
+    """worker 领取任务，在沙箱中建表判题后回写结果，等待方拿到与直接判题一致的结果。"""
+    task = JudgeTask(
+        question_id=1,
+        student_sql="SELECT SUM(amount) AS s FROM jq_orders",
+        correct_sql="SELECT SUM(amount) AS total FROM jq_orders",
+        schema_preview=PREVIEW,
+    )
+    ok_id = await enqueue_judge_job(task, factory)
+    task.student_sql = "DELETE FROM jq_orders"
+    blocked_id = await enqueue_judge_job(task, factory)
+
+    assert await process_one(factory, factory, "w1")
+    assert await process_one(factory, factory, "w1")
+    assert not await process_one(factory, factory, "w1")
+
+    assert (await wait_for_judge_result(ok_id, timeout=1, session_factory=factory)).is_correct is True
+    blocked = await wait_for_judge_result(blocked_id, timeout=1, session_factory=factory)
+    assert blocked.is_correct is False and blocked.is_safety_blocked is True
+
+
+@pytest.mark.asyncio
+async def test_worker_renews_lease_while_judging(factory, monkeypatch):
+    """判题超过可见性超时也不会被其他 worker 重新领取，结果正常回写。"""
+    monkeypatch.setattr(judge_worker._settings, "JUDGE_QUEUE_VISIBILITY_TIMEOUT_SECONDS", 0.3)
+    job_id = await enqueue_judge_job(_task(), factory)
+    stolen = []
+
+    async def slow_judge(task, sandbox_session):
+        await asyncio.sleep(0.6)
+        async with factory() as session:
+            stolen.append(await claim_judge_job(session, "w2", 0.3, max_attempts=3))
+        return JudgeOutcome(is_correct=True)
+
+    monkeypatch.setattr(judge_worker, "run_judge", slow_judge)
+    metrics.reset()
+    assert await process_one(factory, factory, "w1")
+    assert stolen == [None]
+    counters = metrics.snapshot()["counters"]
+    assert counters["judge.worker.lease_renewed"] >= 1 and "judge.worker.stale_result" not in counters
+    outcome = await wait_for_judge_result(job_id, timeout=1, session_factory=factory)
+    assert outcome.is_correct is True
+
+
+@pytest.mark.asyncio
+async def test_purge_removes_only_old_finished_jobs(test_db_session, factory):
+    done_id = await enqueue_judge_job(_task(), factory)
+    failed_id = await enqueue_judge_job(_task(), factory)
+    pending_id = await enqueue_judge_job(_task(), factory)
+    for job_id, finish in ((done_id, "done"), (failed_id, "failed")):
+        assert (await claim_judge_job(test_db_session, "w1", 60, max_attempts=3))[0] == job_id
+        if finish == "done":
+            await complete_judge_job(test_db_session, job_id, "w1", JudgeOutcome(is_correct=True))
+        else:
+            await fail_judge_job(test_db_session, job_id, "w1", "boom")
+
+    # 仍在保留期内的结果不删除，等待方还能读到
+    assert await purge_finished_judge_jobs(test_db_session, retention_seconds=60) == 0
+    later = datetime.utcnow() + timedelta(seconds=120)
+    assert await purge_finished_judge_jobs(test_db_session, retention_seconds=60, now=later, batch_size=1) == 2
+    remaining = [(await test_db_session.get(JudgeJob, i)) for i in (done_id, failed_id, pending_id)]
+    assert remaining[0] is None and remaining[1] is None and remaining[2].status == "pending"
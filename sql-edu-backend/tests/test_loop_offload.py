@@ -0,0 +1,59 @@
+"""测试大结果集对比移出事件循环，以及事件循环阻塞监控。"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+import core.sql_judge as sql_judge
+from core import metrics
+from core.loop_monitor import monitor_event_loop_lag
+from core.sql_judge import SQLJudgeService
+
+
+async def _create_big_table(session, rows: int) -> None:
+    await session.execute(text("CREATE TABLE lo_big (id INTEGER PRIMARY KEY, v INT, name TEXT)"))
+    await session.execute(
+        text("INSERT INTO lo_big (id, v, name) VALUES (:id, :v, :name)"),
+        [{"id": i, "v": i % 97, "name": f"n{i}"} for i in range(1, rows + 1)],
+    )
+
+
+@pytest.mark.asyncio
+async def test_small_results_compare_inline(test_db_session):
+    await _create_big_table(test_db_session, 10)
+    metrics.reset()
+    ok, _ = await SQLJudgeService(test_db_session).judge_sql("SELECT v FROM lo_big", "SELECT v FROM lo_big")
+    assert ok is True
+    snap = metrics.snapshot()
+    assert snap["timings"]["judge.compare.inline"]["count"] == 1
+    assert "judge.compare.offloaded" not in snap["counters"]
+
+
+@pytest.mark.asyncio
+async def test_large_results_offloaded_with_same_verdict(test_db_session, monkeypatch):
+    """超过阈值时在线程池中对比，判题结论与同步对比一致。"""
+    await _create_big_table(test_db_session, 3000)
+    monkeypatch.setattr(sql_judge._settings, "JUDGE_OFFLOAD_MIN_CELLS", 1000)
+    metrics.reset()
+    judge = SQLJudgeService(test_db_session)
+    ok, _ = await judge.judge_sql("SELECT id, name FROM lo_big", "SELECT id, name FROM lo_big ORDER BY id DESC")
+    assert ok is False
+    ok, _ = await judge.judge_sql("SELECT name, id FROM lo_big WHERE v >= 0", "SELECT name, id FROM lo_big")
+    assert ok is True
+    assert metrics.snapshot()["counters"]["judge.compare.offloaded"] == 2
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_records_blocking():
+    import time
+
+    metrics.reset()
+    task = asyncio.create_task(monitor_event_loop_lag(interval_ms=5, warn_ms=30))
+    await asyncio.sleep(0.01)
+    time.sleep(0.06)  # 模拟同步计算卡住事件循环
+    await asyncio.sleep(0.02)
+    task.cancel()
+    snap = metrics.snapshot()
+    assert snap["counters"]["event_loop.blocked"] >= 1
+    assert snap["timings"]["event_loop.blocked"]["max_ms"] >= 30
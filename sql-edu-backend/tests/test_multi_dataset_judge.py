@@ -0,0 +1,125 @@
+"""测试隐藏测试数据的解析与并发判题调度。"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import core.multi_dataset_judge as mdj
+from core.dialects import get_dialect
+from core.judge_setup import generate_init_sql_from_schema_preview
+from core.multi_dataset_judge import judge_hidden_datasets, parse_hidden_datasets
+
+
+def test_parse_hidden_datasets():
+    """非法条目被忽略，缺省 label 自动编号。"""
+    raw = json.dumps([
+        {"label": "empty", "tables": [{"name": "orders", "columns": ["id"], "rows": []}]},
+        {"tables": [{"name": "orders", "columns": ["id"], "rows": [{"id": None}]}]},
+        {"label": "broken", "tables": []},
+        "oops",
+    ])
+    datasets = parse_hidden_datasets(raw)
+    assert [d["label"] for d in datasets] == ["empty", "hidden_2"]
+    assert json.loads(datasets[0]["schema"]) == {"tables": [{"name": "orders", "columns": ["id"], "rows": []}]}
+    assert parse_hidden_datasets("not json") == []
+    assert parse_hidden_datasets(None) == []
+
+
+def test_temporary_table_sql():
+    """隐藏数据使用临时表，遮蔽同名正式表且只对当前连接可见。"""
+    schema = json.dumps({"tables": [{"name": "orders", "columns": ["id"], "rows": [{"id": 1}]}]})
+    init_sql = generate_init_sql_from_schema_preview(schema, temporary=True)
+    assert "DROP TEMPORARY TABLE IF EXISTS `orders`" in init_sql
+    assert "CREATE TEMPORARY TABLE `orders`" in init_sql
+
+
+def test_mysql_hidden_datasets_use_scratch_database():
+    """MySQL 临时表在同一语句中不能打开两次，隐藏数据改建在暂存库中；其他后端沿用临时表。"""
+    assert get_dialect("mysql").current_database_sql == "SELECT DATABASE()"
+    assert get_dialect("mysql").use_database_sql("judge_scratch_x") == "USE `judge_scratch_x`"
+    assert get_dialect("sqlite").current_database_sql is None
+
+
+@pytest.mark.asyncio
+async def test_self_join_on_hidden_dataset(tmp_path):
+    """隐藏数据上的自连接：同一张表在一条语句中出现两次；未列出的表沿用可见数据。"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'sandbox.db'}", poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE emp (id INTEGER PRIMARY KEY, boss INTEGER, dept_id INTEGER)"))
+        await conn.execute(text("INSERT INTO emp VALUES (1, NULL, 1), (2, 1, 1)"))
+        await conn.execute(text("CREATE TABLE dept (id INTEGER PRIMARY KEY, name TEXT)"))
+        await conn.execute(text("INSERT INTO dept VALUES (1, 'A')"))
+    rows = [{"id": 1, "boss": None, "dept_id": 1}, {"id": 2, "boss": 1, "dept_id": 1},
+            {"id": 3, "boss": 1, "dept_id": 1}, {"id": 4, "boss": 3, "dept_id": 1}]
+    datasets = parse_hidden_datasets(json.dumps([
+        {"label": "edge", "tables": [{"name": "emp", "columns": ["id", "boss", "dept_id"], "rows": rows}]}
+    ]))
+    correct_sql = (
+        "SELECT e.id, m.id AS manager, d.name FROM emp e JOIN emp m ON e.boss = m.id "
+        "JOIN dept d ON d.id = e.dept_id"
+    )
+    try:
+        assert await judge_hidden_datasets(
+            engine, datasets,
+            "SELECT m.id AS manager, e.id, d.name FROM emp m, emp e, dept d "
+            "WHERE e.boss = m.id AND d.id = e.dept_id",
+            correct_sql, ignore_column_order=True,
+        ) == (True, None, None)
+        # 按示例数据硬编码的结果在隐藏数据上不通过
+        ok, _, label = await judge_hidden_datasets(
+            engine, datasets, "SELECT e.id, m.id AS manager, 'A' AS name FROM emp e JOIN emp m ON e.id = 2 AND m.id = 1",
+            correct_sql,
+        )
+        assert ok is False and label == "edge"
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SELECT COUNT(*) FROM emp"))).scalar() == 2  # 正式表未被改动
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_fail_fast_cancels_remaining(monkeypatch):
+    """任一组不一致立即返回该组类别，并取消仍在运行的其他组。"""
+    cancelled: list[str] = []
+
+    async def fake_judge(
+        engine, dataset, student_sql, correct_sql, required_output_columns, row_budget=None, ignore_column_order=False
+    ):
+        if dataset["label"] == "null_heavy":
+            await asyncio.sleep(0.01)
+            return False, "第 1 行与标准答案不一致"
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(dataset["label"])
+            raise
+        return True, "结果匹配。"
+
+    monkeypatch.setattr(mdj, "_judge_on_dataset", fake_judge)
+    datasets = [{"label": label, "tables": [], "schema": "{}"} for label in ("large", "null_heavy", "edge")]
+    start = time.perf_counter()
+    ok, msg, label = await judge_hidden_datasets(None, datasets, "SELECT 1", "SELECT 1")
+    assert time.perf_counter() - start < 1
+    assert ok is False and label == "null_heavy"
+    assert "大量 NULL" in msg and "第 1 行" not in msg
+    assert sorted(cancelled) == ["edge", "large"]
+
+
+@pytest.mark.asyncio
+async def test_reference_failure_does_not_blame_student(monkeypatch):
+    """标准答案在某组数据上执行失败时跳过该组，全部通过。"""
+    async def fake_judge(
+        engine, dataset, student_sql, correct_sql, required_output_columns, row_budget=None, ignore_column_order=False
+    ):
+        if dataset["label"] == "edge":
+            return False, "标准答案 SQL 执行失败: no such column"
+        return True, "结果匹配。"
+
+    monkeypatch.setattr(mdj, "_judge_on_dataset", fake_judge)
+    datasets = [{"label": label, "tables": [], "schema": "{}"} for label in ("edge", "empty")]
+    assert await judge_hidden_datasets(None, datasets, "SELECT 1", "SELECT 1") == (True, None, None)
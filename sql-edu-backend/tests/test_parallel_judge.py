@@ -0,0 +1,75 @@
+"""测试学生与标准答案 SQL 并发执行：结论与依次执行一致，一侧失败时立即取消另一侧。"""
+
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from core import metrics
+from core.sql_judge import SQLJudgeService, SQLSafetyError
+
+# 计数到 2 亿的递归 CTE，SQLite 上需要数十秒，只能靠取消提前结束
+SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 200000000) "
+    "SELECT COUNT(*) FROM c"
+)
+
+CASES = [
+    ("SELECT id, name FROM pj_t", "SELECT id, name FROM pj_t ORDER BY id DESC"),
+    ("SELECT id, name FROM pj_t ORDER BY id DESC", "SELECT id, name FROM pj_t ORDER BY id"),
+    ("SELECT name FROM pj_t WHERE id < 3", "SELECT name FROM pj_t"),
+    ("SELECT nope FROM pj_t", "SELECT name FROM pj_t"),
+    ("SELECT name FROM pj_t", "SELECT nope FROM pj_t"),
+    ("SELECT nope FROM pj_t", "SELECT nope FROM pj_t"),  # 两侧都失败时报告学生 SQL 的错误
+]
+
+
+@pytest.fixture
+async def file_sandbox(tmp_path):
+    """文件库 + NullPool：每个会话都是独立连接，与生产沙箱连接池行为一致。"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'sandbox.db'}", poolclass=NullPool)
+    async with AsyncSession(engine) as session:
+        await session.execute(text("CREATE TABLE pj_t (id INTEGER PRIMARY KEY, name TEXT)"))
+        await session.execute(
+            text("INSERT INTO pj_t (id, name) VALUES (:id, :name)"),
+            [{"id": i, "name": f"n{i % 3}"} for i in range(1, 51)],
+        )
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_parallel_verdicts_match_sequential(file_sandbox):
+    sequential = SQLJudgeService(file_sandbox)
+    parallel = SQLJudgeService(file_sandbox, parallel_queries=True)
+    spilled = SQLJudgeService(file_sandbox, parallel_queries=True, spill_to_disk=True)
+    assert parallel._parallel_engine() is not None
+    for student_sql, correct_sql in CASES:
+        expected = await sequential.judge_sql(student_sql, correct_sql)
+        assert await parallel.judge_sql(student_sql, correct_sql) == expected, (student_sql, correct_sql)
+        assert await spilled.judge_sql(student_sql, correct_sql) == expected, (student_sql, correct_sql)
+    with pytest.raises(SQLSafetyError):
+        await parallel.judge_sql("DELETE FROM pj_t", "SELECT name FROM pj_t")
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_other_query(file_sandbox):
+    judge = SQLJudgeService(file_sandbox, parallel_queries=True, timeout_ms=0)
+    metrics.reset()
+    start = time.perf_counter()
+    ok, msg = await judge.judge_sql("SELECT nope FROM pj_t", SLOW_SQL)
+    assert time.perf_counter() - start < 5
+    assert ok is False and msg.startswith("学生 SQL 执行失败")
+    assert metrics.snapshot()["counters"]["judge.parallel.cancelled"] == 1
+    # 被中断的连接已失效，不影响后续判题
+    assert await judge.judge_sql("SELECT name FROM pj_t", "SELECT name FROM pj_t") == (True, "结果匹配。")
+
+
+@pytest.mark.asyncio
+async def test_shared_connection_falls_back_to_sequential(test_db_session):
+    judge = SQLJudgeService(test_db_session, parallel_queries=True)
+    assert judge._parallel_engine() is None
+    assert await judge.judge_sql("SELECT 1", "SELECT 1") == (True, "结果匹配。")
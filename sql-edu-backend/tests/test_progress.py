@@ -0,0 +1,69 @@
+"""测试做题进度表：随提交与对话写入累加，与按明细统计的结果一致，回填可从明细重建。"""
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.progress import backfill_progress
+from models.progress import UserQuestionProgress, UserStats
+from repository import ChatRepository, ProgressRepository, SubmissionRepository
+from schemas.submission import SubmissionCreate
+
+
+async def _submit(session, user_id: int, question_id: int, is_correct: bool):
+    await SubmissionRepository(session).create(
+        SubmissionCreate(user_id=user_id, question_id=question_id, student_sql="SELECT 1", is_correct=is_correct)
+    )
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_submissions_and_chat(test_db_session, test_user, test_question):
+    uid, qid = test_user.id, test_question.id
+    progress_repo = ProgressRepository(test_db_session)
+    empty = await progress_repo.get_question_progress(uid, qid)
+    assert (empty.fail_count, empty.correct_count, empty.chat_count) == (0, 0, 0)
+    assert await progress_repo.get_user_stats(uid) == {"total": 0, "correct": 0, "success_rate": 0.5}
+
+    for is_correct in (False, False, True, True):
+        await _submit(test_db_session, uid, qid, is_correct)
+    chat_repo = ChatRepository(test_db_session)
+    for role in ("system", "user", "assistant"):
+        await chat_repo.add_message(uid, qid, role, "内容")
+    await test_db_session.commit()
+
+    progress = await progress_repo.get_question_progress(uid, qid)
+    submission_repo = SubmissionRepository(test_db_session)
+    assert progress.fail_count == await submission_repo.get_failure_count(uid, qid) == 2
+    assert progress.correct_count == await submission_repo.get_correct_count(uid, qid) == 2
+    assert progress.chat_count == await chat_repo.count_messages_for_user_question(uid, qid) == 3
+    assert progress.first_solved_at is not None
+    assert await progress_repo.get_user_stats(uid) == await submission_repo.get_user_overall_stats(uid)
+
+    first_solved_at = progress.first_solved_at
+    await _submit(test_db_session, uid, qid, True)
+    await chat_repo.delete_messages_by_user_question(uid, qid)
+    await test_db_session.commit()
+    progress = await progress_repo.get_question_progress(uid, qid)
+    assert progress.first_solved_at == first_solved_at and progress.correct_count == 3
+    assert progress.chat_count == 0
+
+
+@pytest.mark.asyncio
+async def test_backfill_rebuilds_from_history(test_db_session, test_user, test_question):
+    uid, qid = test_user.id, test_question.id
+    await _submit(test_db_session, uid, qid, False)
+    await _submit(test_db_session, uid, qid, True)
+    await ChatRepository(test_db_session).add_message(uid, qid, "user", "你好")
+    # 模拟上线前的历史数据：进度表为空或计数偏差
+    await test_db_session.execute(update(UserQuestionProgress).values(fail_count=9, chat_count=0))
+    await test_db_session.execute(update(UserStats).values(total=0, correct=0))
+    await test_db_session.commit()
+
+    factory = async_sessionmaker(test_db_session.bind, expire_on_commit=False)
+    assert await backfill_progress(factory) == (1, 1)
+
+    progress_repo = ProgressRepository(test_db_session)
+    progress = await progress_repo.get_question_progress(uid, qid)
+    assert (progress.fail_count, progress.correct_count, progress.chat_count) == (1, 1, 1)
+    assert progress.first_solved_at is not None
+    assert await progress_repo.get_user_stats(uid) == {"total": 2, "correct": 1, "success_rate": 0.5}
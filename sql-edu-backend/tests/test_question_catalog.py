@@ -0,0 +1,111 @@
+"""测试进程内题目目录：预序列化响应体与 QuestionOut 一致、命中时不查库、修改题目后立即失效。"""
+
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from core.question_catalog import QuestionCatalog, QuestionRecord, question_out
+from dependencies import get_session, require_teacher
+from main import app
+from models.question import Question
+
+_PREVIEW = json.dumps([{"table": "users", "columns": ["id", "age"], "rows": [[1, 20]]}])
+
+
+class _CountingSession:
+    """记录 execute 次数的会话包装。"""
+
+    def __init__(self, session):
+        self.session = session
+        self.executed = 0
+
+    async def execute(self, *args, **kwargs):
+        self.executed += 1
+        return await self.session.execute(*args, **kwargs)
+
+
+def test_render_matches_question_out():
+    question = Question(
+        id=7, title="题目", content="内容", title_en="Title", difficulty=3, correct_sql="SELECT 1",
+        time_limit_seconds=None, schema_preview=_PREVIEW, required_output_columns='["a"]',
+        grade_efficiency=None, judge_dialect="mysql", ignore_column_order=True, version=None,
+    )
+    record = QuestionRecord(question)
+    expected = question_out(question, 4.5, 336).model_dump(mode="json")
+    assert json.loads(record.render(4.5, 336)) == expected
+
+
+@pytest.mark.asyncio
+async def test_catalog_hits_skip_database(test_db_session, test_question):
+    question_id = test_question.id
+    await test_db_session.commit()
+    catalog = QuestionCatalog(maxsize=100, ttl=60)
+    session = _CountingSession(test_db_session)
+
+    first = await catalog.get(session, question_id)
+    assert first.title == "测试题目" and session.executed == 1
+    assert await catalog.get(session, question_id) is first
+    assert [r.id for r in await catalog.list(session, 0, 10)] == [question_id]
+    await catalog.list(session, 0, 10)
+    assert session.executed == 2
+    assert await catalog.get(session, question_id + 1) is None
+
+    await test_db_session.execute(update(Question).where(Question.id == question_id).values(title="新标题"))
+    await test_db_session.commit()
+    assert (await catalog.get(session, question_id)).title == "测试题目"
+    catalog.invalidate(question_id)
+    assert (await catalog.get(session, question_id)).title == "新标题"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_during_load_is_not_cached(test_db_session, test_question):
+    question_id = test_question.id
+    await test_db_session.commit()
+    catalog = QuestionCatalog(maxsize=100, ttl=60)
+
+    class _RacingSession(_CountingSession):
+        async def execute(self, *args, **kwargs):
+            result = await super().execute(*args, **kwargs)
+            catalog.invalidate(question_id)
+            return result
+
+    session = _RacingSession(test_db_session)
+    await catalog.get(session, question_id)
+    await catalog.list(session, 0, 10)
+    await catalog.get(session, question_id)
+    assert session.executed == 3
+
+
+@pytest.mark.asyncio
+async def test_endpoints_serve_catalog_and_invalidate_on_update(test_db_session, test_question):
+    test_question.schema_preview = _PREVIEW
+    await test_db_session.commit()
+    question_id = test_question.id
+
+    async def override_session():
+        yield test_db_session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[require_teacher] = lambda: 1
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            listed = (await client.get("/questions/")).json()
+            detail = (await client.get(f"/questions/{question_id}")).json()
+            assert listed == [detail]
+            assert detail["title"] == "测试题目" and detail["version"] == 1
+
+            resp = await client.put(
+                f"/questions/{question_id}",
+                json={"title": "改后的题目", "content": "查询用户，结果列别名为 uid", "difficulty": 2,
+                      "correct_sql": "SELECT id AS uid FROM users"},
+            )
+            assert resp.status_code == 200
+            detail = (await client.get(f"/questions/{question_id}")).json()
+            listed = (await client.get("/questions/")).json()
+    finally:
+        app.dependency_overrides.clear()
+    assert detail["title"] == "改后的题目" and detail["version"] == 2
+    assert listed == [detail]
+    assert detail == resp.json()
@@ -0,0 +1,134 @@
+"""测试题目累计统计：随写入累加、与按明细统计的展示难度一致，对账可修正偏差并预算展示难度。"""
+
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+
+from core import metrics
+from core.difficulty_service import compute_display_difficulty
+from core.question_stats import display_difficulty, reconcile_question_stats
+from dependencies import get_session
+from main import app
+from models.question_stats import QuestionStats
+from repository import (
+    ChatRepository,
+    DifficultyFeedbackRepository,
+    QuestionStatsRepository,
+    SubmissionRepository,
+)
+from schemas.submission import SubmissionCreate
+
+
+async def _expected_from_history(session, question) -> float:
+    """旧实现：每次按明细表统计后计算展示难度。"""
+    sub = await SubmissionRepository(session).get_question_submission_stats(question.id)
+    chats = await ChatRepository(session).count_messages_by_question(question.id)
+    fb = await DifficultyFeedbackRepository(session).get_question_stats(question.id)
+    return compute_display_difficulty(
+        question.difficulty, sub["total_submissions"], sub["correct_submissions"], chats,
+        fb["feedback_count"], fb["avg_rating"],
+    )
+
+
+async def _seed(session, user_id: int, question_id: int) -> None:
+    submission_repo = SubmissionRepository(session)
+    for i in range(12):
+        await submission_repo.create(
+            SubmissionCreate(user_id=user_id, question_id=question_id, student_sql="SELECT 1", is_correct=i % 4 == 0)
+        )
+    chat_repo = ChatRepository(session)
+    for _ in range(5):
+        await chat_repo.add_message(user_id, question_id, "user", "提问")
+    feedback_repo = DifficultyFeedbackRepository(session)
+    for rating in (7, 9):
+        await feedback_repo.add(user_id, question_id, rating)
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_counters_match_history(test_db_session, test_user, test_question):
+    assert display_difficulty(test_question, None) == await _expected_from_history(test_db_session, test_question)
+    await _seed(test_db_session, test_user.id, test_question.id)
+
+    stats = await QuestionStatsRepository(test_db_session).get(test_question.id)
+    assert (stats.total_submissions, stats.correct_submissions, stats.chat_messages) == (12, 3, 5)
+    assert (stats.feedback_count, stats.feedback_rating_sum) == (2, 16)
+    assert display_difficulty(test_question, stats) == await _expected_from_history(test_db_session, test_question)
+
+    await ChatRepository(test_db_session).delete_messages_by_user_question(test_user.id, test_question.id)
+    await test_db_session.commit()
+    stats = await QuestionStatsRepository(test_db_session).get(test_question.id)
+    assert stats.chat_messages == 0
+
+
+@pytest.mark.asyncio
+async def test_reconcile_fixes_drift_and_precomputes_difficulty(test_db_session, test_user, test_question):
+    await _seed(test_db_session, test_user.id, test_question.id)
+    await test_db_session.execute(update(QuestionStats).values(total_submissions=999, chat_messages=0))
+    await test_db_session.commit()
+
+    assert await reconcile_question_stats(test_db_session) == 1
+    repo = QuestionStatsRepository(test_db_session)
+    stats = await repo.get(test_question.id)
+    expected = await _expected_from_history(test_db_session, test_question)
+    assert (stats.total_submissions, stats.chat_messages) == (12, 5)
+    assert stats.display_difficulty == expected and stats.reconciled_at is not None
+
+    # 新的写入让预算值失效，读取时按计数现算
+    await ChatRepository(test_db_session).add_message(test_user.id, test_question.id, "user", "再问")
+    await test_db_session.commit()
+    stats = await repo.get(test_question.id)
+    assert stats.display_difficulty is None
+    assert display_difficulty(test_question, stats) == await _expected_from_history(test_db_session, test_question)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_writes_after_snapshot_cutoff(test_db_session, test_user, test_question):
+    await _seed(test_db_session, test_user.id, test_question.id)
+    await test_db_session.execute(update(QuestionStats).values(correct_submissions=0))
+    await test_db_session.commit()
+    repo = QuestionStatsRepository(test_db_session)
+    cutoff = await repo.snapshot_cutoff()
+    rows = await repo.recount(cutoff)
+    for row in rows:
+        row["display_difficulty"] = 1.0
+
+    # 重算之后、写回之前到达的提交：已累加进当前计数，写回时不能被覆盖
+    await SubmissionRepository(test_db_session).create(
+        SubmissionCreate(user_id=test_user.id, question_id=test_question.id, student_sql="SELECT 2", is_correct=True)
+    )
+    await test_db_session.commit()
+    assert await repo.reconcile(rows, cutoff, datetime.utcnow()) == 1
+    await test_db_session.commit()
+    stats = await repo.get(test_question.id)
+    assert (stats.total_submissions, stats.correct_submissions) == (13, 4)
+    assert stats.display_difficulty is None  # 截止点之后有新提交，不写入按截止点算的预算难度
+
+    assert await reconcile_question_stats(test_db_session) == 1
+    stats = await repo.get(test_question.id)
+    assert stats.display_difficulty == await _expected_from_history(test_db_session, test_question)
+    # 计数与预算难度都已一致时对账不再写入
+    metrics.reset()
+    await reconcile_question_stats(test_db_session)
+    assert metrics.snapshot()["counters"]["question_stats.reconcile_written"] == 0
+
+
+@pytest.mark.asyncio
+async def test_question_list_uses_stats(test_db_session, test_user, test_question):
+    await _seed(test_db_session, test_user.id, test_question.id)
+    expected = await _expected_from_history(test_db_session, test_question)
+
+    async def override_session():
+        yield test_db_session
+
+    app.dependency_overrides[get_session] = override_session
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            listed = (await client.get("/questions/")).json()
+            detail = (await client.get(f"/questions/{test_question.id}")).json()
+    finally:
+        app.dependency_overrides.clear()
+    assert [q["display_difficulty"] for q in listed if q["id"] == test_question.id] == [expected]
+    assert detail["display_difficulty"] == expected
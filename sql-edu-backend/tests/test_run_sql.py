@@ -0,0 +1,146 @@
+"""测试运行查询预览：行数上限、NDJSON 流与结果缓存。"""
+
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+
+import routers.ai as ai_router
+from core.sql_judge import SQLJudgeService, SQLSafetyError
+from core.sql_parser import canonicalize_sql
+from core.ttl_cache import TTLCache
+from dependencies import get_sandbox_session, get_session
+from main import app
+from models.question import Question
+
+
+def test_canonicalize_sql():
+    """注释、空白与末尾分号不影响缓存键，字符串字面量保持原样。"""
+    assert canonicalize_sql("select *\n  from t -- all\n;") == "select * from t"
+    assert canonicalize_sql("SELECT 'a  --b' FROM t /* c */ WHERE y='it''s';") == (
+        "SELECT 'a  --b' FROM t WHERE y='it''s'"
+    )
+
+
+def test_ttl_cache_expiry_and_lru():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, timer=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # 淘汰最久未使用的 b
+    assert cache.get("b") is None and cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None and len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_preview_sql_truncates(test_db_session):
+    await test_db_session.execute(text("CREATE TABLE rs_items (id INT)"))
+    await test_db_session.execute(text("INSERT INTO rs_items (id) VALUES (1), (2), (3)"))
+    judge = SQLJudgeService(test_db_session)
+    columns, rows, truncated = await judge.preview_sql("SELECT id FROM rs_items ORDER BY id", 2)
+    assert columns == ["id"] and rows == [(1,), (2,)] and truncated is True
+    _, rows, truncated = await judge.preview_sql("SELECT id FROM rs_items", 3)
+    assert len(rows) == 3 and truncated is False
+    with pytest.raises(SQLSafetyError):
+        await judge.preview_sql("DELETE FROM rs_items", 2)
+
+
+_PREVIEW = json.dumps({"tables": [{"name": "rs_items", "columns": ["id"], "rows": [{"id": 1}, {"id": 2}, {"id": 3}]}]})
+
+
+@pytest.mark.asyncio
+async def test_run_sql_endpoint_streams_and_caches(test_db_session, monkeypatch):
+    """返回 NDJSON 流；同一题目版本下等价 SQL 命中缓存，不再访问沙箱。"""
+    question = Question(
+        title="预览", content="查询 rs_items", difficulty=1, correct_sql="SELECT id FROM rs_items",
+        schema_preview=_PREVIEW,
+    )
+    test_db_session.add(question)
+    await test_db_session.commit()
+    question_id = question.id
+
+    async def override_session():
+        yield test_db_session
+
+    monkeypatch.setattr(ai_router._settings, "RUN_SQL_MAX_ROWS", 2)
+    monkeypatch.setattr(ai_router, "is_sandbox_isolated", lambda dialect=None: True)
+    ai_router._run_sql_cache.clear()
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_sandbox_session] = override_session
+    app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: 1
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            resp = await client.post(
+                "/ai/run-sql", json={"question_id": question_id, "sql": "SELECT id FROM rs_items ORDER BY id"}
+            )
+            assert resp.status_code == 200
+            assert resp.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in resp.text.splitlines()]
+            assert lines[0] == {"type": "meta", "columns": ["id"]}
+            assert [line["values"] for line in lines[1:-1]] == [[1], [2]]
+            assert lines[-1] == {"type": "end", "row_count": 2, "truncated": True, "cached": False}
+
+            await test_db_session.execute(text("DELETE FROM rs_items"))
+            resp = await client.post(
+                "/ai/run-sql",
+                json={"question_id": question_id, "sql": "SELECT id\n  FROM rs_items ORDER BY id;"},
+            )
+            lines = [json.loads(line) for line in resp.text.splitlines()]
+            assert len(lines) == 4 and lines[-1]["cached"] is True
+
+            resp = await client.post("/ai/run-sql", json={"question_id": question_id, "sql": "DROP TABLE rs_items"})
+            assert resp.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+        ai_router._run_sql_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_run_sql_only_reads_question_tables_in_isolated_sandbox(test_db_session, monkeypatch):
+    """沙箱即业务主库时拒绝运行；SQL 只能引用题目表结构中的表。"""
+    question = Question(
+        title="预览", content="查询 rs_items", difficulty=1, correct_sql="SELECT id FROM rs_items",
+        schema_preview=_PREVIEW,
+    )
+    test_db_session.add(question)
+    await test_db_session.commit()
+    question_id = question.id
+    isolated = [False]
+
+    async def override_session():
+        yield test_db_session
+
+    monkeypatch.setattr(ai_router, "is_sandbox_isolated", lambda dialect=None: isolated[0])
+    ai_router._run_sql_cache.clear()
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_sandbox_session] = override_session
+    app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: 1
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            resp = await client.post("/ai/run-sql", json={"question_id": question_id, "sql": "SELECT id FROM rs_items"})
+            assert resp.status_code == 503
+
+            isolated[0] = True
+            for sql in (
+                "SELECT email, password FROM users",
+                "SELECT correct_sql FROM rs_items JOIN questions ON 1 = 1",
+                "SELECT * FROM main.users",
+                "SELECT * FROM `users`",
+                "SELECT * FROM rs_items WHERE id IN (SELECT id FROM judge_jobs)",
+                "TABLE users",
+                "SELECT * FROM rs_items UNION (TABLE users)",
+                "SELECT * FROM rs_items /*! UNION SELECT password FROM users */",
+                "SELECT * FROM pragma_table_info('users')",
+            ):
+                resp = await client.post("/ai/run-sql", json={"question_id": question_id, "sql": sql})
+                assert resp.status_code == 400, sql
+            resp = await client.post(
+                "/ai/run-sql", json={"question_id": question_id, "sql": "WITH t AS (SELECT id FROM rs_items) SELECT * FROM t"}
+            )
+            assert resp.status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+        ai_router._run_sql_cache.clear()
@@ -0,0 +1,139 @@
+"""测试沙箱分片：一致性哈希分布、健康检查故障转移、判题途中连接中断后的重试与分片上的判题。"""
+
+import json
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+import core.sandbox as sandbox
+from core import metrics
+from core.dialects import get_dialect, is_connection_error
+from core.judge_pipeline import JudgeTask, run_judge
+from core.shard_ring import ConsistentHashRing
+from core.sql_judge import SQLConnectionLostError, SQLJudgeService
+
+PREVIEW = json.dumps({"tables": [{
+    "name": "sh_items",
+    "columns": ["id", "price"],
+    "rows": [{"id": 1, "price": 3}, {"id": 2, "price": 4}],
+}]})
+
+
+def test_ring_is_stable_and_remaps_a_fraction():
+    """增加一个分片只迁移约 1/(n+1) 的题目，迁移的题目全部落到新分片。"""
+    three = ConsistentHashRing(["s1", "s2", "s3"])
+    four = ConsistentHashRing(["s1", "s2", "s3", "s4"])
+    keys = range(1, 5001)
+    moved = [k for k in keys if three.get_node(k) != four.get_node(k)]
+    assert all(four.get_node(k) == "s4" for k in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    counts = {n: sum(1 for k in keys if three.get_node(k) == n) for n in three.nodes}
+    assert min(counts.values()) > 5000 / 3 * 0.7
+    assert ConsistentHashRing(["s1", "s2", "s3"]).get_node(42) == three.get_node(42)
+
+
+def test_iter_nodes_gives_distinct_failover_order():
+    ring = ConsistentHashRing(["a", "b", "c"], vnodes=10)
+    order = list(ring.iter_nodes(7))
+    assert sorted(order) == ["a", "b", "c"] and order[0] == ring.get_node(7)
+    assert ConsistentHashRing([]).get_node(7) is None
+
+
+@pytest.fixture
+def two_shards(tmp_path, monkeypatch):
+    urls = [f"sqlite+aiosqlite:///{tmp_path / 'shard_a.db'}", f"sqlite+aiosqlite:///{tmp_path / 'shard_b.db'}"]
+    monkeypatch.setattr(sandbox._settings, "SANDBOX_SHARD_URLS", urls)
+    monkeypatch.setattr(sandbox, "_uses_shards", lambda dialect: True)
+    sandbox._shard_health.clear()
+    yield urls
+    sandbox._shard_health.clear()
+
+
+@pytest.mark.asyncio
+async def test_failover_rebuilds_tables_on_next_shard(two_shards):
+    """首选分片不可用时判题转到环上的下一个分片，并在该分片上建表。"""
+    question_id = 11
+    primary, secondary = sandbox.get_shard_ring().iter_nodes(question_id)
+    assert await sandbox.select_sandbox_shard(question_id) == primary
+
+    sandbox.mark_shard_unhealthy(primary)
+    assert await sandbox.select_sandbox_shard(question_id) == secondary
+    task = JudgeTask(
+        question_id=question_id,
+        student_sql="SELECT SUM(price) AS s FROM sh_items",
+        correct_sql="SELECT SUM(price) FROM sh_items",
+        schema_preview=PREVIEW,
+    )
+    outcome = await run_judge(task, sandbox_session=None)
+    assert outcome.is_correct is True
+    factory = await sandbox.sandbox_session_factory_for(None, question_id)
+    async with factory() as session:
+        assert await session.scalar(text("SELECT COUNT(*) FROM sh_items")) == 2
+
+    sandbox.mark_shard_unhealthy(secondary)
+    with pytest.raises(sandbox.SandboxUnavailableError):
+        await sandbox.select_sandbox_shard(question_id)
+
+
+def _lost_connection(judge):
+    """判题执行中连接被断开：与 SQLJudgeService 包装执行异常的方式一致。"""
+    try:
+        try:
+            raise DBAPIError("SELECT 1", None, ConnectionResetError("reset by peer"), connection_invalidated=True)
+        except DBAPIError as e:
+            raise judge._execution_error(e)
+    except SQLConnectionLostError as lost:
+        return lost
+
+
+@pytest.mark.asyncio
+async def test_connection_lost_mid_judge_retries_on_next_shard(two_shards, monkeypatch):
+    """判题途中连接中断（已被判题包装为 SQLJudgeError）时标记分片不可用，并在环上的下一个分片重试一次。"""
+    question_id = 11
+    primary, secondary = sandbox.get_shard_ring().iter_nodes(question_id)
+    original = SQLJudgeService.judge_sql
+    judged_on = []
+
+    async def flaky_judge_sql(self, *args, **kwargs):
+        url = str(self.session.bind.url)
+        judged_on.append(url)
+        if url == primary:
+            raise _lost_connection(self)
+        return await original(self, *args, **kwargs)
+
+    monkeypatch.setattr(SQLJudgeService, "judge_sql", flaky_judge_sql)
+    metrics.reset()
+    task = JudgeTask(
+        question_id=question_id,
+        student_sql="SELECT SUM(price) FROM sh_items",
+        correct_sql="SELECT SUM(price) FROM sh_items",
+        schema_preview=PREVIEW,
+    )
+    outcome = await run_judge(task, sandbox_session=None)
+    assert outcome.is_correct is True and judged_on == [primary, secondary]
+    assert await sandbox.is_shard_healthy(primary) is False
+    counters = metrics.snapshot()["counters"]
+    assert counters["judge.shard_retry"] == 1 and counters["sandbox.shard.connection_lost"] == 1
+
+    # 重试的分片同样中断时不再重试，按沙箱不可用处理（调用方返回 503，不记提交）
+    sandbox._shard_health.clear()
+    monkeypatch.setattr(SQLJudgeService, "judge_sql", lambda self, *a, **kw: _raise(_lost_connection(self)))
+    with pytest.raises(sandbox.SandboxConnectionError):
+        await run_judge(task, sandbox_session=None)
+
+
+async def _raise(exc):
+    raise exc
+
+
+def test_connection_errors_are_classified():
+    assert is_connection_error(DBAPIError("SELECT 1", None, Exception("gone"), connection_invalidated=True))
+    assert not is_connection_error(DBAPIError("SELECT 1", None, Exception("syntax error")))
+    judge = SQLJudgeService.__new__(SQLJudgeService)
+    judge.dialect, judge.timeout_ms = get_dialect("sqlite"), 1000
+    assert isinstance(_lost_connection(judge), SQLConnectionLostError)
+    try:
+        raise ConnectionResetError("reset")
+    except ConnectionResetError as e:
+        assert isinstance(judge._execution_error(e), SQLConnectionLostError)
@@ -0,0 +1,155 @@
+"""测试沙箱预热：已由同一份 schema 建成的表直接复用，预热队列有界且去重，只为已登录学生预热；
+同名表被其他 schema 的判题使用时，重建等待其结束。"""
+
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import core.sandbox_warmup as sandbox_warmup
+import routers.question as question_router
+from core import metrics
+from core.auth import AuthHandler
+from core.judge_pipeline import SandboxTableGate, prepare_sandbox
+from core.sandbox_warmup import SandboxWarmer, hot_question_ids
+from dependencies import get_session
+from main import app
+from models.question import Question
+from models.submission import Submission
+from models.user import User
+
+
+def _schema(names: list[str]) -> str:
+    return json.dumps({"tables": [{
+        "name": "wu_t", "columns": ["id", "name"],
+        "rows": [{"id": i, "name": n} for i, n in enumerate(names, 1)],
+    }]})
+
+
+async def _names(session) -> list[str]:
+    return list((await session.execute(text("SELECT name FROM wu_t ORDER BY id"))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_prepare_sandbox_reuses_current_tables(test_db_session):
+    metrics.reset()
+    await prepare_sandbox(_schema(["a", "b"]), test_db_session)
+    await prepare_sandbox(_schema(["a", "b"]), test_db_session)
+    counters = metrics.snapshot()["counters"]
+    assert counters["sandbox.prepare.built"] == 1 and counters["sandbox.prepare.reused"] == 1
+    assert await _names(test_db_session) == ["a", "b"]
+
+    # schema 变化（另一道题使用同名表）后重建
+    await prepare_sandbox(_schema(["c"]), test_db_session)
+    assert metrics.snapshot()["counters"]["sandbox.prepare.built"] == 2
+    assert await _names(test_db_session) == ["c"]
+
+
+def test_warmer_deduplicates_and_is_bounded():
+    warmer = SandboxWarmer(maxsize=2, dedup_seconds=60)
+    assert warmer.request(1) is True
+    assert warmer.request(1) is False  # 已在队列中
+    assert warmer.request(2) is True
+    assert warmer.request(3) is False  # 队列已满，丢弃
+
+
+@pytest.mark.asyncio
+async def test_warmer_builds_tables_in_background(test_db_session, monkeypatch):
+    question = Question(title="t", content="c", difficulty=1, correct_sql="SELECT 1", schema_preview=_schema(["x"]))
+    test_db_session.add(question)
+    await test_db_session.commit()
+    factory = async_sessionmaker(test_db_session.bind, expire_on_commit=False)
+
+    async def sandbox_factory_for(dialect, question_id=None):
+        return factory
+
+    monkeypatch.setattr(sandbox_warmup, "sandbox_session_factory_for", sandbox_factory_for)
+    metrics.reset()
+    warmer = SandboxWarmer(maxsize=4, dedup_seconds=60)
+    runner = asyncio.create_task(warmer.run(factory))
+    try:
+        assert warmer.request(question.id) and warmer.request(10_000)  # 不存在的题目直接跳过
+        await asyncio.wait_for(warmer.join(), timeout=5)
+    finally:
+        runner.cancel()
+    assert await _names(test_db_session) == ["x"]
+    assert warmer.request(question.id) is False  # 刚预热过
+
+    # 随后学生提交时直接复用预热建好的表
+    await prepare_sandbox(question.schema_preview, test_db_session)
+    assert metrics.snapshot()["counters"]["sandbox.prepare.reused"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hot_question_ids_orders_by_recent_submissions(test_db_session, test_user):
+    for question_id, count in ((7, 1), (8, 3), (9, 2)):
+        for _ in range(count):
+            test_db_session.add(Submission(user_id=test_user.id, question_id=question_id, student_sql="SELECT 1"))
+    await test_db_session.flush()
+    assert await hot_question_ids(test_db_session, limit=2, window_hours=1) == [8, 9]
+
+
+@pytest.mark.asyncio
+async def test_only_authenticated_students_trigger_warmup(test_db_session, test_user, test_question, monkeypatch):
+    teacher = User(email="t@example.com", username="teacher", password="x", role="teacher")
+    test_db_session.add(teacher)
+    await test_db_session.commit()
+    requested = []
+    monkeypatch.setattr(question_router, "request_sandbox_warmup", requested.append)
+
+    async def override_session():
+        yield test_db_session
+
+    auth = AuthHandler()
+    app.dependency_overrides[get_session] = override_session
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            path = f"/questions/{test_question.id}"
+            assert (await client.get(path)).status_code == 200
+            assert (await client.get(path, headers={"Authorization": "Bearer bad"})).status_code == 200
+            teacher_token = auth.encode_login_token(teacher.id)["access_token"]
+            await client.get(path, headers={"Authorization": f"Bearer {teacher_token}"})
+            assert requested == []
+            student_token = auth.encode_login_token(test_user.id)["access_token"]
+            await client.get(path, headers={"Authorization": f"Bearer {student_token}"})
+    finally:
+        app.dependency_overrides.clear()
+    assert requested == [test_question.id]
+
+
+@pytest.mark.asyncio
+async def test_table_gate_serializes_different_schemas():
+    gate = SandboxTableGate()
+    events = []
+    judging = asyncio.Event()
+    release = asyncio.Event()
+
+    async def judge(signature, name):
+        async with gate.hold("sandbox", ["t"], signature):
+            events.append(f"{name} in")
+            judging.set()
+            await release.wait()
+            events.append(f"{name} out")
+
+    first = asyncio.create_task(judge("a", "a1"))
+    await judging.wait()
+    # 同一 schema 的判题可以并发
+    same = asyncio.create_task(judge("a", "a2"))
+    await asyncio.sleep(0)
+    assert events == ["a1 in", "a2 in"]
+
+    rebuild = asyncio.create_task(judge("b", "b1"))
+    await asyncio.sleep(0)
+    # 已有其他 schema 在等待时，新到的同 schema 判题也排队，不会饿死重建
+    late = asyncio.create_task(judge("a", "a3"))
+    await asyncio.sleep(0)
+    assert "b1 in" not in events and "a3 in" not in events
+    async with gate.hold("other-sandbox", ["t"], "c"):
+        pass  # 不同沙箱中的同名表互不影响
+
+    release.set()
+    await asyncio.wait_for(asyncio.gather(first, same, rebuild, late), timeout=5)
+    assert events.index("b1 in") > max(events.index("a1 out"), events.index("a2 out"))
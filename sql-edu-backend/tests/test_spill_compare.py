@@ -0,0 +1,87 @@
+"""测试落盘对比：与内存对比结论一致，且峰值内存受预算约束。"""
+
+import os
+import tracemalloc
+
+import pytest
+from sqlalchemy import text
+
+import core.sql_judge as sql_judge
+from core.spill_compare import SpilledRows, compare_spilled
+from core.sql_judge import SQLSafetyError, SQLJudgeService
+
+CASES = [
+    # (学生 SQL, 标准答案 SQL, 别名要求)
+    ("SELECT g, v FROM sp_t", "SELECT g, v FROM sp_t ORDER BY id DESC", None),
+    ("SELECT g, v FROM sp_t ORDER BY id", "SELECT g, v FROM sp_t", None),
+    ("SELECT g FROM sp_t WHERE id <= 3", "SELECT g FROM sp_t WHERE id IN (1, 3, 3) OR id = 2", None),
+    ("SELECT g FROM sp_t WHERE id IN (1, 2)", "SELECT g FROM sp_t WHERE id IN (1, 4)", None),  # 重复行不同
+    ("SELECT g FROM sp_t", "SELECT g FROM sp_t WHERE id > 1", None),
+    ("SELECT g, v FROM sp_t", "SELECT g FROM sp_t", None),
+    ("SELECT note FROM sp_t", "SELECT COALESCE(note, '') FROM sp_t", None),  # 无别名要求时 NULL 与空串相同
+    ("SELECT g AS grp FROM sp_t WHERE id IN (1, 2)", "SELECT g AS grp FROM sp_t WHERE id IN (1, 4)", "grp"),
+    ("SELECT g AS grp, v FROM sp_t", "SELECT g AS grp, v AS val FROM sp_t", "grp,val"),
+    ("SELECT note AS n FROM sp_t", "SELECT COALESCE(note, '') AS n FROM sp_t", "n"),
+    ("SELECT id, g FROM sp_t ORDER BY id", "SELECT id, g FROM sp_t ORDER BY id DESC", None),
+    ("SELECT id, g FROM sp_t ORDER BY id", "SELECT id, g FROM sp_t ORDER BY id DESC", "id,g"),
+    ("SELECT id, v FROM sp_t ORDER BY v, id", "SELECT id, v FROM sp_t ORDER BY v, id", "id,v"),
+    ("SELECT missing FROM sp_t", "SELECT g FROM sp_t", None),
+]
+
+
+async def _create_table(session) -> None:
+    await session.execute(text("CREATE TABLE sp_t (id INTEGER PRIMARY KEY, g TEXT, v REAL, note TEXT)"))
+    await session.execute(
+        text("INSERT INTO sp_t (id, g, v, note) VALUES (:id, :g, :v, :note)"),
+        [
+            {"id": i, "g": "a" if i in (1, 2) else f"g{i % 7}", "v": i % 5 + 0.5, "note": None if i % 3 else f"n{i}"}
+            for i in range(1, 301)
+        ],
+    )
+
+
+@pytest.mark.asyncio
+async def test_spill_matches_in_memory_verdicts(test_db_session, monkeypatch):
+    """极小内存预算（大量 run 文件）下，落盘对比的结论与提示语与内存对比完全一致。"""
+    await _create_table(test_db_session)
+    monkeypatch.setattr(sql_judge._settings, "JUDGE_SPILL_MEMORY_BYTES", 2000)
+    monkeypatch.setattr(sql_judge._settings, "JUDGE_SPILL_BATCH_ROWS", 37)
+    in_memory = SQLJudgeService(test_db_session)
+    spilled = SQLJudgeService(test_db_session, spill_to_disk=True)
+    for student_sql, correct_sql, required in CASES:
+        expected = await in_memory.judge_sql(student_sql, correct_sql, required_output_columns=required)
+        actual = await spilled.judge_sql(student_sql, correct_sql, required_output_columns=required)
+        assert actual == expected, (student_sql, correct_sql, required)
+    with pytest.raises(SQLSafetyError):
+        await spilled.judge_sql("DELETE FROM sp_t", "SELECT g FROM sp_t")
+
+
+def _check_bounded_peak(rows: int, budget: int) -> None:
+    def lines(reverse: bool):
+        ids = range(rows - 1, -1, -1) if reverse else range(rows)
+        return (f'["{i}","n{i % 1000}"]' for i in ids)
+
+    tracemalloc.start()
+    try:
+        with SpilledRows(ordered=False, memory_budget=budget) as student, \
+                SpilledRows(ordered=False, memory_budget=budget) as correct:
+            student.columns = correct.columns = ["id", "name"]
+            student.add(lines(False))
+            student.finish()
+            correct.add(lines(True))
+            correct.finish()
+            assert compare_spilled(student, correct, by_column_names=False) == (True, "结果匹配。")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # 全部放进内存时两侧各约 rows * 80 字节；落盘后峰值只与预算有关
+    assert peak < 3 * budget, f"peak {peak / 2**20:.1f} MiB"
+
+
+def test_spill_peak_memory_bounded():
+    _check_bounded_peak(rows=200_000, budget=2 * 1024 * 1024)
+
+
+@pytest.mark.skipif(not os.getenv("JUDGE_SPILL_BIG_TEST"), reason="5M 行落盘测试耗时约 2 分钟，设置 JUDGE_SPILL_BIG_TEST=1 运行")
+def test_spill_peak_memory_bounded_5m_rows():
+    _check_bounded_peak(rows=5_000_000, budget=8 * 1024 * 1024)
@@ -0,0 +1,94 @@
+"""测试 SQL 自动补全：前缀树排序、按上下文给出候选，题目修改后按新版本重建。"""
+
+import json
+
+import pytest
+from httpx import AsyncClient
+
+import routers.ai as ai_router
+from core import metrics
+from core.sql_autocomplete import Completion, PrefixTrie, QuestionCompleter
+from dependencies import get_session
+from main import app
+from models.question import Question
+
+SCHEMA = json.dumps({"tables": [
+    {"name": "employees", "columns": ["id", "name", "dept_id", "salary"]},
+    {"name": "departments", "columns": ["id", "dept_name"]},
+]})
+
+
+def _texts(result) -> list[str]:
+    return [item.text for item in result[2]]
+
+
+def test_prefix_trie_orders_by_rank_then_text():
+    trie = PrefixTrie(top_k=3)
+    for word, rank in (("sum", 1), ("substring", 1), ("salary", 0), ("select", 2)):
+        trie.insert(word, Completion(word, "x"), (rank,))
+    assert [c.text for c in trie.search("s")] == ["salary", "substring", "sum"]  # 每个节点只保留前 3 个
+    assert [c.text for c in trie.search("SU")] == ["substring", "sum"]
+    assert trie.search("q") == []
+
+
+def test_context_aware_completion():
+    completer = QuestionCompleter(SCHEMA)
+    assert completer.complete("SEL")[0:2] == ("keyword", "SEL") and _texts(completer.complete("SEL")) == ["SELECT"]
+    assert _texts(completer.complete("SELECT na")) == ["name"]
+    assert _texts(completer.complete("SELECT name FROM ")) == ["departments", "employees"]
+    assert _texts(completer.complete("SELECT name FROM employees, d")) == ["departments"]
+    assert _texts(completer.complete("SELECT name FROM employees WHERE sa")) == ["salary"]
+    assert _texts(completer.complete("SELECT name FROM employees ORDER ")) == ["BY"]
+    assert completer.complete("SELECT 'na")[2] == []  # 字符串内不补全
+
+    # 「别名.」只补全该表的列；光标之后的 FROM 子句用于解析别名
+    sql = "SELECT d. FROM employees e JOIN departments d ON e.dept_id = d.id"
+    context, _, items = completer.complete(sql, cursor=9)
+    assert context == "qualified_column" and [i.text for i in items] == ["dept_name", "id"]
+
+    # 同名列合并为一个候选，并标明所属的表
+    id_item = next(i for i in completer.complete("SELECT i")[2] if i.text == "id")
+    assert id_item.detail == "employees, departments"
+
+
+def test_knowledge_point_functions_rank_first():
+    completer = QuestionCompleter(SCHEMA)
+    assert _texts(completer.complete("SELECT co"))[0] == "COALESCE"
+    assert _texts(completer.complete("SELECT co", knowledge_point="agg-count"))[0] == "COUNT"
+    assert _texts(completer.complete("SELECT co", knowledge_point="no-such-point"))[0] == "COALESCE"
+
+
+@pytest.mark.asyncio
+async def test_complete_endpoint_rebuilds_on_new_version(test_db_session):
+    question = Question(title="补全", content="c", difficulty=1, correct_sql="SELECT 1", schema_preview=SCHEMA)
+    test_db_session.add(question)
+    await test_db_session.commit()
+
+    async def override_session():
+        yield test_db_session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: 1
+    metrics.reset()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            payload = {"question_id": question.id, "sql": "SELECT name FROM e"}
+            resp = await client.post("/ai/complete-sql", json=payload)
+            assert resp.json() == {
+                "context": "table", "prefix": "e",
+                "items": [{"text": "employees", "kind": "table", "detail": None}],
+            }
+            await client.post("/ai/complete-sql", json=payload)
+
+            question.schema_preview = json.dumps({"tables": [{"name": "events", "columns": ["id"]}]})
+            question.version += 1
+            await test_db_session.commit()
+            resp = await client.post("/ai/complete-sql", json=payload)
+            assert [i["text"] for i in resp.json()["items"]] == ["events"]
+
+            resp = await client.post("/ai/complete-sql", json={"question_id": 10_000, "sql": ""})
+            assert resp.status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+    counters = metrics.snapshot()["counters"]
+    assert counters["autocomplete.cache_miss"] == 2 and counters["autocomplete.cache_hit"] == 1
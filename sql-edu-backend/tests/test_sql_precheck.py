@@ -0,0 +1,177 @@
+"""测试 SQL 本地预检查：定位拼写错误与未知表/列，合法查询不误报，且无需连接数据库。"""
+
+import json
+import time
+
+import pytest
+from httpx import AsyncClient
+
+import routers.ai as ai_router
+from core import metrics
+from core.judge_pipeline import JudgeOutcome
+from core.sql_precheck import format_precheck_message, precheck_hint, precheck_sql
+from dependencies import get_sandbox_session, get_session
+from main import app
+from models.question import Question
+
+SCHEMA = json.dumps({"tables": [
+    {"name": "employees", "columns": ["id", "name", "dept_id", "salary", "hire_date"]},
+    {"name": "departments", "columns": ["id", "dept_name"]},
+]})
+
+VALID = [
+    "SELECT name, salary FROM employees",
+    "select e.name, d.dept_name from employees e join departments d on e.dept_id = d.id",
+    "SELECT d.dept_name, COUNT(e.id) FROM departments d LEFT JOIN employees AS e ON e.dept_id = d.id GROUP BY d.dept_name",
+    "WITH t AS (SELECT dept_id, AVG(salary) avg_s FROM employees GROUP BY dept_id) SELECT dept_id, avg_s FROM t",
+    "SELECT x.dept_id FROM (SELECT dept_id FROM employees) x",
+    "SELECT name, CASE WHEN salary > 100 THEN 'hi' ELSE 'lo' END level FROM employees ORDER BY level",
+    "SELECT EXTRACT(YEAR FROM hire_date) y, CAST(salary AS SIGNED) FROM employees",
+    "SELECT name FROM employees WHERE hire_date > NOW() - INTERVAL 3 DAY",
+    "SELECT name, ROW_NUMBER() OVER (PARTITION BY dept_id ORDER BY salary DESC) rn FROM employees",
+    "SELECT dept_id, COUNT(*) AS cnt FROM employees GROUP BY dept_id HAVING cnt > 1",
+    "SELECT name FROM employees WHERE dept_id IN (SELECT id FROM departments WHERE dept_name = 'x')",
+    "SELECT name FROM employees e WHERE NOT EXISTS (SELECT 1 FROM departments d WHERE d.id = e.dept_id)",
+    "SELECT TRIM(BOTH ' ' FROM name) FROM employees -- 注释里的 nmae 不检查",
+    "SELECT `name` FROM employees ORDER BY salary DESC LIMIT 3;",
+    "SELECT 1",
+    "DELETE FROM users",  # 非查询语句交给判题时的安全检查
+    # 非保留关键字可作表别名 / CTE 名
+    "SELECT first.name, last.name FROM employees first JOIN employees last ON first.id = last.id",
+    "SELECT date.name FROM employees date WHERE date.salary > 1",
+    "SELECT year.name, end.dept_name FROM employees AS year JOIN departments end ON end.id = year.dept_id",
+    "SELECT current.name FROM employees current",
+    "WITH first AS (SELECT dept_id FROM employees) SELECT dept_id FROM first",
+    # USING 之后是字符集名；字符集前缀与 N'' 字面量
+    "SELECT CONVERT(name USING utf8mb4) FROM employees",
+    "SELECT CHAR(65 USING ascii), name FROM employees",
+    "SELECT name FROM employees WHERE name = _utf8mb4'张三' COLLATE utf8mb4_bin",
+    "SELECT name FROM employees WHERE name = N'张三' OR name = _latin1 'x'",
+]
+
+INVALID = [
+    # (SQL, kind, 行, 列, 建议)
+    ("SELECT nmae FROM employees", "unknown_column", 1, 8, ["name"]),
+    ("SELECT name\nFROM employes", "unknown_table", 2, 6, ["employees"]),
+    ("SELECT e.nmae FROM employees e", "unknown_column", 1, 10, ["name"]),
+    ("SELECT z.name FROM employees e", "unknown_table", 1, 8, []),
+    ("SELECT name FORM employees", "syntax", 1, 13, ["FROM"]),
+    ("SELCT name FROM employees", "syntax", 1, 1, ["SELECT"]),
+    ("SELECT name, FROM employees", "syntax", 1, 12, []),
+    ("SELECT name FROM employees WHERE (salary > 1", "syntax", 1, 34, []),
+    ("SELECT name FROM employees GROUP dept_id", "syntax", 1, 28, []),
+    ("SELECT 'abc FROM employees", "syntax", 1, 8, []),
+    ("SELECT name FROM employees; DROP TABLE x", "syntax", 1, 29, []),
+    ("SELECT name FROM employees WHERE", "syntax", 1, 28, []),
+]
+
+
+@pytest.mark.parametrize("sql", VALID)
+def test_valid_queries_have_no_issues(sql):
+    assert precheck_sql(sql, SCHEMA) == []
+
+
+@pytest.mark.parametrize("sql,kind,line,column,suggestions", INVALID)
+def test_reports_issue_with_position(sql, kind, line, column, suggestions):
+    issues = precheck_sql(sql, SCHEMA)
+    assert [(i.kind, i.line, i.column, i.suggestions) for i in issues[:1]] == [(kind, line, column, suggestions)]
+
+
+def test_without_schema_only_checks_syntax():
+    assert precheck_sql("SELECT nmae FROM employes", None) == []
+    assert precheck_sql("SELECT a, FROM t", "") != []
+
+
+def test_hint_and_message_do_not_need_ai():
+    issues = precheck_sql("SELECT nmae FROM employees", SCHEMA)
+    assert "第 1 行第 8 列" in format_precheck_message(issues)
+    hint = precheck_hint(issues)
+    assert hint.diagnoses[0].error_type == "语法错误" and "name" in hint.diagnoses[0].explanation
+
+
+def test_precheck_is_fast():
+    sqls = VALID + [sql for sql, *_ in INVALID]
+    precheck_sql(sqls[0], SCHEMA)  # 解析表结构（缓存）
+    start = time.perf_counter()
+    for sql in sqls:
+        precheck_sql(sql, SCHEMA)
+    assert (time.perf_counter() - start) / len(sqls) < 0.001
+
+
+@pytest.mark.asyncio
+async def test_endpoints_short_circuit_without_sandbox_or_ai(test_db_session, test_user, monkeypatch):
+    question = Question(title="预检查", content="查询员工", difficulty=1, correct_sql="SELECT name FROM employees",
+                        schema_preview=SCHEMA)
+    test_db_session.add(question)
+    await test_db_session.commit()
+
+    async def override_session():
+        yield test_db_session
+
+    async def must_not_run(*args, **kwargs):
+        raise AssertionError("预检查失败时不应判题或调用 AI")
+
+    monkeypatch.setattr(ai_router, "_judge", must_not_run)
+    monkeypatch.setattr(ai_router, "get_sql_hint", must_not_run)
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_sandbox_session] = override_session
+    app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: test_user.id
+    metrics.reset()
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            resp = await client.post("/ai/precheck-sql", json={"question_id": question.id, "sql": "SELECT nmae FROM employees"})
+            body = resp.json()
+            assert body["ok"] is False and body["issues"][0]["suggestions"] == ["name"]
+
+            resp = await client.post(
+                "/ai/check-sql", json={"question_id": question.id, "student_sql": "SELECT name FORM employees"}
+            )
+            assert resp.status_code == 200
+            body = resp.json()
+            assert body["is_correct"] is False and body["submission_id"]
+            assert body["precheck_issues"][0]["column"] == 13 and "FROM" in body["error_message"]
+    finally:
+        app.dependency_overrides.clear()
+    assert metrics.snapshot()["counters"]["sql_precheck.short_circuit"] == 1
+
+
+def test_name_issues_are_uncertain():
+    assert [i.certain for i in precheck_sql("SELECT nmae FROM employees", SCHEMA)] == [False]
+    assert [i.certain for i in precheck_sql("SELECT z.name FROM employees e", SCHEMA)] == [False]
+    assert [i.certain for i in precheck_sql("SELECT 'abc FROM employees", SCHEMA)] == [True]
+
+
+@pytest.mark.asyncio
+async def test_uncertain_issues_fall_through_to_sandbox(test_db_session, test_user, monkeypatch):
+    """只有名称类问题时不短路：交给沙箱判题，以判题结果为准。"""
+    question = Question(title="预检查", content="查询员工", difficulty=1, correct_sql="SELECT name FROM employees",
+                        schema_preview=SCHEMA)
+    test_db_session.add(question)
+    await test_db_session.commit()
+    judged = []
+
+    async def override_session():
+        yield test_db_session
+
+    async def fake_judge(task, *args, **kwargs):
+        judged.append(task.student_sql)
+        return JudgeOutcome(is_correct=True)
+
+    async def fake_hint(**kwargs):
+        return precheck_hint(precheck_sql("SELECT nmae FROM employees", SCHEMA))
+
+    monkeypatch.setattr(ai_router, "_judge", fake_judge)
+    monkeypatch.setattr(ai_router, "get_sql_hint", fake_hint)
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_sandbox_session] = override_session
+    app.dependency_overrides[ai_router.auth_handler.auth_access_dependency] = lambda: test_user.id
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            resp = await client.post(
+                "/ai/check-sql", json={"question_id": question.id, "student_sql": "SELECT nmae FROM employees"}
+            )
+    finally:
+        app.dependency_overrides.clear()
+    body = resp.json()
+    assert judged == ["SELECT nmae FROM employees"]
+    assert body["is_correct"] is True and body["precheck_issues"] is None